@@ -1,7 +1,10 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.contrib.admin.utils import lookup_spawns_duplicates
 from django.core.exceptions import PermissionDenied
+from django.db.models import Q
+from django.http import StreamingHttpResponse
 from django.utils.html import format_html
-from import_export.admin import ImportExportModelAdmin
+from import_export.admin import ImportMixin
 
 from .models import (
     SystematicReview, ResearchQuestion, HypothesisKeyword,
@@ -12,8 +15,11 @@ from .models import (
     # new models
     DigitalLibrary,
     VenueQualitySource,
-    Venue
+    Venue,
+    Job
 )
+from .services import exporters, jobs, review_stats, search
+from .services.library_search import searched_libraries
 
 # -------------------------------------------------------------------------
 # 1. Inline Classes
@@ -75,14 +81,15 @@ class RelevancyFilter(admin.SimpleListFilter):
 class YearFilter(admin.SimpleListFilter):
     """
     Filter for PrimaryStudy objects by publication_year.
+    The years come from the reviews' stored statistics (slra.services.review_stats,
+    recounted when stale), not from a DISTINCT scan of the studies on every
+    changelist load.
     """
     title = 'Publication Year'
     parameter_name = 'publication_year'
 
     def lookups(self, request, model_admin):
-        # Example: Show only distinct years from the dataset
-        years = model_admin.model.objects.values_list('publication_year', flat=True).distinct()
-        return [(year, str(year)) for year in years if year]
+        return [(year, str(year)) for year in review_stats.publication_years()]
 
     def queryset(self, request, queryset):
         if self.value():
@@ -107,6 +114,92 @@ class LLMPhaseFilter(admin.SimpleListFilter):
         return queryset
 
 
+class FullTextSearchMixin:
+    """
+    Replaces the admin's LIKE '%term%' search (a full table scan over large
+    text columns) with slra.services.search: every word must match, the last
+    one as a prefix. search_fields outside the search target (short columns
+    like venue__name) also match when they start with the search term.
+    Deletes drop the objects' entries from the local index.
+    """
+    search_target = None
+
+    def get_search_results(self, request, queryset, search_term):
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        indexed = search.get_target(self.search_target).field_names
+        other_fields = [name for name in self.get_search_fields(request) if name not in indexed]
+        matches = search.filter_queryset(queryset, self.search_target, search_term)
+        if not other_fields:
+            return matches, False
+        condition = Q(pk__in=matches.values('pk'))
+        for name in other_fields:
+            condition |= Q(**{f'{name}__istartswith': search_term})
+        may_have_duplicates = any(lookup_spawns_duplicates(self.opts, name) for name in other_fields)
+        return queryset.filter(condition), may_have_duplicates
+
+    def delete_model(self, request, obj):
+        pk = obj.pk
+        super().delete_model(request, obj)
+        search.remove_objects(self.search_target, [pk])
+
+    def delete_queryset(self, request, queryset):
+        pks = list(queryset.values_list('pk', flat=True))
+        super().delete_queryset(request, queryset)
+        search.remove_objects(self.search_target, pks)
+
+
+class ReviewStatisticsMixin:
+    """
+    Marks the review statistics counting the deleted rows as changed (deletes
+    send no signal, see slra.signals), so the year filter and the stats
+    endpoint don't keep showing them.
+    """
+
+    def delete_model(self, request, obj):
+        review_ids = review_stats.review_ids_of(self.model._default_manager.filter(pk=obj.pk))
+        super().delete_model(request, obj)
+        review_stats.mark_changed(review_ids)
+
+    def delete_queryset(self, request, queryset):
+        review_ids = review_stats.review_ids_of(queryset)
+        super().delete_queryset(request, queryset)
+        review_stats.mark_changed(review_ids)
+
+
+class StreamingExportMixin:
+    """
+    Export actions (export_csv, export_jsonl, export_parquet) that stream the
+    selected rows with slra.services.exporters, a batch at a time, instead of
+    building the whole file in memory.
+    """
+
+    def _export(self, request, queryset, export_format):
+        name = exporters.dataset_for_model(self.model)
+        try:
+            chunks = exporters.stream_export(name, export_format, queryset=queryset)
+        except ImportError as e:
+            self.message_user(request, str(e), level=messages.ERROR)
+            return None
+        response = StreamingHttpResponse(chunks, content_type=exporters.CONTENT_TYPES[export_format])
+        response['Content-Disposition'] = f'attachment; filename="{name}.{export_format}"'
+        return response
+
+    def export_csv(self, request, queryset):
+        return self._export(request, queryset, 'csv')
+
+    def export_jsonl(self, request, queryset):
+        return self._export(request, queryset, 'jsonl')
+
+    def export_parquet(self, request, queryset):
+        return self._export(request, queryset, 'parquet')
+
+    export_csv.short_description = "Export selected as CSV"
+    export_jsonl.short_description = "Export selected as JSON Lines"
+    export_parquet.short_description = "Export selected as Parquet"
+
+
 # -------------------------------------------------------------------------
 # 3. Admin Classes for Each Model
 # -------------------------------------------------------------------------
@@ -122,38 +215,52 @@ class SystematicReviewAdmin(admin.ModelAdmin):
     inlines = [ResearchQuestionInline, HypothesisKeywordInline]
 
     # Custom actions
-    actions = ['perform_snowballing']
+    actions = ['perform_snowballing', 'update_citation_graph']
 
     def perform_snowballing(self, request, queryset):
         """
-        Example action to "perform snowballing" on selected reviews.
-        In real usage, you'd implement logic to fetch references,
-        parse citations, etc.
+        Queues a snowballing job per selected review: the references and
+        citations of its included studies are added as new studies and
+        citation edges by the `run_jobs` worker (slra.services.snowballing).
         """
-        count = queryset.count()
-        # Pseudocode: for each review -> fetch related papers -> link them
-        self.message_user(request, f"Snowballing triggered for {count} review(s).")
+        queued = [jobs.enqueue('snowballing', {'review_id': review.pk}, review=review) for review in queryset]
+        self.message_user(request, f"Queued snowballing for {len(queued)} review(s) (see Jobs).")
+
+    perform_snowballing.short_description = "Snowball included studies (background job)"
+
+    def update_citation_graph(self, request, queryset):
+        """
+        Queues a job per selected review recomputing the PageRank, degree and
+        co-citation scores of its studies (slra.services.citation_graph).
+        """
+        queued = [jobs.enqueue('citation_graph', {'review_id': review.pk}, review=review) for review in queryset]
+        self.message_user(request, f"Queued citation graph updates for {len(queued)} review(s) (see Jobs).")
+
+    update_citation_graph.short_description = "Update citation graph scores (background job)"
 
 
 @admin.register(PrimaryStudy)
-class PrimaryStudyAdmin(admin.ModelAdmin):
+class PrimaryStudyAdmin(ReviewStatisticsMixin, FullTextSearchMixin, StreamingExportMixin, admin.ModelAdmin):
     """
     Admin panel for PrimaryStudy with custom filters and search capabilities.
     """
     # We include 'venue' in list_display so the admin can control that too
     list_display = ('title', 'venue', 'publication_year', 'relevancy_level', 'citations')
     list_filter = (RelevancyFilter, YearFilter, 'venue')
+    list_select_related = ('venue',)
     search_fields = ('title', 'abstract', 'keywords', 'venue__name')
+    search_target = 'studies'
     readonly_fields = ('citations',)  # Example read-only field
 
     # Bulk actions for efficiency
-    actions = ['bulk_approve_relevancy', 'bulk_reject_relevancy']
+    actions = ['bulk_approve_relevancy', 'bulk_reject_relevancy', 'export_csv', 'export_jsonl', 'export_parquet']
 
     def bulk_approve_relevancy(self, request, queryset):
         """
         Sets relevancy_level to 'H' (High) for all selected studies.
         """
         updated = queryset.update(relevancy_level='H')
+        review_stats.mark_changed(queryset.values('systematic_review_id'))
         self.message_user(request, f"Approved relevancy for {updated} study/studies.")
 
     def bulk_reject_relevancy(self, request, queryset):
@@ -161,28 +268,38 @@ class PrimaryStudyAdmin(admin.ModelAdmin):
         Sets relevancy_level to 'L' (Low) for all selected studies.
         """
         updated = queryset.update(relevancy_level='L')
+        review_stats.mark_changed(queryset.values('systematic_review_id'))
         self.message_user(request, f"Rejected relevancy for {updated} study/studies.")
 
 
 @admin.register(SearchQuery)
 class SearchQueryAdmin(admin.ModelAdmin):
     """
-    Admin for managing search queries. 
-    Includes potential re-run of digital library search.
+    Admin for managing search queries.
+    Includes an incremental re-run of the digital library searches.
     """
     list_display = ('query_string', 'systematic_review', 'created_at')
+    list_select_related = ('systematic_review',)
     search_fields = ('query_string',)
     actions = ['re_run_library_search']
 
     def re_run_library_search(self, request, queryset):
         """
-        Example action to re-run library searches for each query.
+        Queues an incremental library search job per selected query, on the
+        libraries it was searched on before: only results newer than those
+        searches are fetched, and known results are updated, not duplicated.
         """
-        for sq in queryset:
-            # Pseudocode:
-            #  - sq.fetch_external_results()
-            pass
-        self.message_user(request, f"Re-ran library search for {queryset.count()} queries.")
+        queued = 0
+        for sq in queryset.select_related('systematic_review'):
+            libraries = searched_libraries(sq)
+            if libraries:
+                jobs.enqueue('library_search', {'search_query_id': sq.pk, 'libraries': libraries,
+                                                'incremental': True}, review=sq.systematic_review)
+                queued += 1
+        self.message_user(request, f"Queued incremental re-searches for {queued} of {queryset.count()} "
+                                   f"queries (queries never searched are skipped, see Jobs).")
+
+    re_run_library_search.short_description = "Re-run library searches, new results only (background job)"
 
 
 @admin.register(DigitalLibrary)
@@ -201,31 +318,38 @@ class DigitalLibrarySearchAdmin(admin.ModelAdmin):
     Admin for DigitalLibrarySearch entries.
     Inline management of SearchResult objects.
     """
-    list_display = ('search_query', 'library', 'search_date', 'total_results_found')
+    list_display = ('search_query', 'library', 'search_date', 'total_results_found', 'new_results', 'updated_results')
+    readonly_fields = ('since', 'high_water_mark', 'new_results', 'updated_results')
+    list_select_related = ('search_query__systematic_review', 'library')
     search_fields = ('search_query__query_string', 'library__name')
     inlines = [SearchResultInline]
 
 
 @admin.register(SearchResult)
-class SearchResultAdmin(admin.ModelAdmin):
+class SearchResultAdmin(ReviewStatisticsMixin, FullTextSearchMixin, StreamingExportMixin, admin.ModelAdmin):
     """
     Manually manage search results if needed.
     Read-only fields help maintain data integrity.
     """
     list_display = ('title', 'url', 'library_search')
+    list_select_related = ('library_search__library',)
     search_fields = ('title', 'authors', 'abstract', 'url')
+    search_target = 'results'
     readonly_fields = ('title', 'url', 'authors', 'abstract', 'library_search')
+    actions = ['export_csv', 'export_jsonl', 'export_parquet']
 
 
 @admin.register(RelevancyEvaluation)
-class RelevancyEvaluationAdmin(admin.ModelAdmin):
+class RelevancyEvaluationAdmin(ReviewStatisticsMixin, StreamingExportMixin, admin.ModelAdmin):
     """
     Keep track of all relevancy evaluations with possible auditing features.
     """
     list_display = ('primary_study', 'relevancy', 'evaluator', 'evaluated_at')
+    list_select_related = ('primary_study',)
     list_filter = ('relevancy', 'evaluator')
     readonly_fields = ('evaluated_at',)
     search_fields = ('notes', 'primary_study__title', 'evaluator')
+    actions = ['export_csv', 'export_jsonl', 'export_parquet']
 
 
 @admin.register(VenueQualitySource)
@@ -271,6 +395,7 @@ class LLMModelAdmin(admin.ModelAdmin):
     Restrict editing if needed to superusers.
     """
     list_display = ('model_name', 'version', 'provider', 'usage_method')
+    list_select_related = ('provider',)
     search_fields = ('model_name', 'version', 'usage_method')
 
     def has_change_permission(self, request, obj=None):
@@ -283,17 +408,23 @@ class LLMModelAdmin(admin.ModelAdmin):
 
 
 @admin.register(LLMQueryLog)
-class LLMQueryLogAdmin(ImportExportModelAdmin):
+class LLMQueryLogAdmin(ReviewStatisticsMixin, FullTextSearchMixin, StreamingExportMixin, ImportMixin,
+                       admin.ModelAdmin):
     """
     Manage logs of LLM interactions.
-    - Example usage of django-import-export for easy CSV/Excel manipulation
+    - Import through django-import-export; exports are streamed by the
+      export actions (tablib would build the whole file in memory)
     - Read-only for response_text to prevent tampering
     - Custom filter by phase (Problem Formulation, etc.)
     """
-    list_display = ('prompt_text_short', 'phase', 'systematic_review', 'created_at')
-    list_filter = (LLMPhaseFilter, 'systematic_review')
+    list_display = ('prompt_text_short', 'phase', 'systematic_review', 'created_at', 'prompt_tokens',
+                    'completion_tokens', 'cost')
+    list_select_related = ('systematic_review',)
+    list_filter = (LLMPhaseFilter, 'systematic_review', 'cache_hit')
     search_fields = ('prompt_text', 'response_text')
-    readonly_fields = ('response_text', 'created_at')
+    search_target = 'logs'
+    readonly_fields = ('response_text', 'created_at', 'wall_time', 'time_to_first_token', 'prompt_tokens',
+                       'completion_tokens', 'tokens_estimated', 'retries', 'cache_hit', 'cost')
 
     def prompt_text_short(self, obj):
         """
@@ -306,12 +437,47 @@ class LLMQueryLogAdmin(ImportExportModelAdmin):
     prompt_text_short.short_description = "Prompt"
 
     # Example custom actions:
-    actions = ['bulk_delete_outdated']
+    actions = ['bulk_delete_outdated', 'export_csv', 'export_jsonl', 'export_parquet']
 
     def bulk_delete_outdated(self, request, queryset):
         """
         Bulk deletion of outdated LLM queries.
         """
         count = queryset.count()
-        queryset.delete()
+        self.delete_queryset(request, queryset)
         self.message_user(request, f"Deleted {count} LLM query log(s).")
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    """
+    Background jobs run by `manage.py run_jobs`.
+    - Cancel queued/running jobs, or requeue failed and cancelled ones
+      (they resume after their completed steps)
+    """
+    list_display = ('id', 'kind', 'status', 'progress', 'message', 'systematic_review', 'attempts', 'created_at')
+    list_select_related = ('systematic_review',)
+    list_filter = ('status', 'kind')
+    readonly_fields = ('status', 'progress', 'message', 'steps', 'result', 'error', 'attempts', 'worker',
+                       'created_at', 'started_at', 'heartbeat_at', 'finished_at')
+
+    actions = ['cancel_jobs', 'requeue_jobs']
+
+    def cancel_jobs(self, request, queryset):
+        """
+        Cancels queued jobs and asks running ones to stop.
+        """
+        count = 0
+        for job in queryset.filter(status__in=[Job.QUEUED, Job.RUNNING]):
+            jobs.cancel(job)
+            count += 1
+        self.message_user(request, f"Cancelled {count} job(s).")
+
+    def requeue_jobs(self, request, queryset):
+        """
+        Puts failed or cancelled jobs back in the queue with fresh attempts.
+        """
+        updated = queryset.filter(status__in=[Job.FAILED, Job.CANCELLED]).update(
+            status=Job.QUEUED, attempts=0, cancel_requested=False, run_after=None, finished_at=None
+        )
+        self.message_user(request, f"Requeued {updated} job(s).")
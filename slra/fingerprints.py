@@ -0,0 +1,51 @@
+"""
+Normalization helpers used to recognise the same paper across imports and
+digital-library searches. Kept free of model imports so models.py can use them.
+"""
+import hashlib
+import re
+import unicodedata
+from urllib.parse import unquote
+
+
+DOI_RE = re.compile(r'\b(10\.\d{4,9}/[^\s"<>]+)', re.IGNORECASE)
+_NON_WORD_RE = re.compile(r'[^\w\s]+')
+_SPACE_RE = re.compile(r'\s+')
+
+
+def normalize_text(text: str) -> str:
+    """
+    Lower-cases, strips accents and punctuation and collapses whitespace,
+    so "Deep-Learning: A Survey." and "deep learning a survey" compare equal.
+    """
+    if not text:
+        return ''
+    if not text.isascii():
+        text = unicodedata.normalize('NFKD', text)
+        text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    text = _NON_WORD_RE.sub(' ', text.lower())
+    return _SPACE_RE.sub(' ', text).strip()
+
+
+def extract_doi(*values) -> str:
+    """
+    Returns the first DOI found in the given strings (e.g. a doi.org URL),
+    normalized to lower case without trailing punctuation; '' if none.
+    """
+    for value in values:
+        if not value:
+            continue
+        match = DOI_RE.search(unquote(value))
+        if match:
+            return match.group(1).rstrip('.,;)').lower()
+    return ''
+
+
+def title_fingerprint(title: str) -> str:
+    """
+    SHA-1 of the normalized title ('' for empty titles); identical for exact duplicates.
+    """
+    normalized = normalize_text(title)
+    if not normalized:
+        return ''
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest()
@@ -0,0 +1,63 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from slra.services.abstracts import available_parsers, extract_abstract, extract_abstract_full_parse
+from slra.services.http_cache import get_http_cache
+
+class Command(BaseCommand):
+    help = ("Benchmarks abstract extraction over saved landing pages (HTML files or the HTTP cache): "
+            "pages/sec of each parser against a full BeautifulSoup parse of every page.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*', help='HTML files or directories of saved pages')
+        parser.add_argument('--from-http-cache', action='store_true',
+                            help='Also use the HTML responses stored in the HTTP cache')
+        parser.add_argument('--parser', action='append', choices=available_parsers(),
+                            help='Parser to benchmark (repeatable; default: all installed)')
+        parser.add_argument('--repeat', type=int, default=3, help='Passes over the pages (best one counts)')
+
+    def handle(self, *args, **options):
+        pages = list(self.load_files(options['paths']))
+        if options['from_http_cache']:
+            cache = get_http_cache()
+            if cache is None:
+                raise CommandError("The HTTP cache is disabled (SLRA_HTTP_CACHE['ENABLED']).")
+            pages += [(response.url, response.to_response().text) for response in cache.responses('html')]
+        if not pages:
+            raise CommandError("No pages to benchmark: give HTML files / directories or --from-http-cache.")
+        if options['repeat'] < 1:
+            raise CommandError("--repeat must be at least 1.")
+
+        megabytes = sum(len(html) for _, html in pages) / 1024 / 1024
+        self.stdout.write(f"{len(pages)} page(s), {megabytes:.1f} MB, best of {options['repeat']} pass(es)")
+
+        methods = [('full parse (bs4)', lambda url, html: extract_abstract_full_parse(html))]
+        methods += [(f'extract_abstract ({name})', lambda url, html, name=name: extract_abstract(html, url, name))
+                    for name in options['parser'] or available_parsers()]
+        baseline = None
+        for label, method in methods:
+            best, found = None, 0
+            for _ in range(options['repeat']):
+                started_at = time.perf_counter()
+                found = sum(1 for url, html in pages if method(url, html))
+                elapsed = time.perf_counter() - started_at
+                best = elapsed if best is None else min(best, elapsed)
+            baseline = baseline or best
+            self.stdout.write(
+                f"{label:<30} {len(pages) / best:>10.1f} pages/s  {baseline / best:>7.1f}x  "
+                f"{found}/{len(pages)} abstracts"
+            )
+
+    def load_files(self, paths):
+        for path in paths:
+            if os.path.isdir(path):
+                names = sorted(os.path.join(path, name) for name in os.listdir(path)
+                               if name.lower().endswith(('.html', '.htm')))
+            elif os.path.isfile(path):
+                names = [path]
+            else:
+                raise CommandError(f"No such file or directory: {path}")
+            for name in names:
+                with open(name, encoding='utf-8', errors='replace') as f:
+                    yield '', f.read()
@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand, CommandError
+from slra.models import SystematicReview
+from slra.services.dedup import DEFAULT_THRESHOLD, deduplicate_search_results, deduplicate_studies
+
+class Command(BaseCommand):
+    help = "Finds duplicate Primary Studies (same title/DOI or near-identical title+abstract) in a review and links or merges them."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--review-id', type=int, required=True, help='Systematic Review ID')
+        parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                            help=f'Minimum estimated Jaccard similarity for near-duplicates (default {DEFAULT_THRESHOLD})')
+        parser.add_argument('--exact-only', action='store_true', help='Only match identical titles/DOIs')
+        parser.add_argument('--merge', action='store_true',
+                            help='Merge duplicates into the canonical study and delete them (default: link via duplicate_of)')
+        parser.add_argument('--search-results', action='store_true',
+                            help="Also link duplicate search results across the review's library searches")
+        parser.add_argument('--dry-run', action='store_true', help='Report duplicates without changing anything')
+
+    def handle(self, *args, **options):
+        review_id = options['review_id']
+        threshold = options['threshold']
+        if not 0 < threshold <= 1:
+            raise CommandError("--threshold must be in (0, 1].")
+
+        try:
+            review = SystematicReview.objects.get(pk=review_id)
+        except SystematicReview.DoesNotExist:
+            raise CommandError(f"Systematic Review with ID {review_id} not found.")
+
+        report = deduplicate_studies(review, threshold=threshold, near=not options['exact_only'],
+                                     merge=options['merge'], dry_run=options['dry_run'])
+        self.stdout.write(
+            f"Scanned {report.scanned} study/studies: {report.exact_duplicates} exact and "
+            f"{report.near_duplicates} near duplicate(s)."
+        )
+        if options['dry_run']:
+            for pk, canonical in sorted(report.duplicate_map.items()):
+                self.stdout.write(f" - Study ID {pk} duplicates ID {canonical}")
+        elif options['merge']:
+            self.stdout.write(self.style.SUCCESS(f"Merged {report.merged} duplicate(s)."))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f"Linked {report.linked} duplicate(s), cleared {report.unlinked} stale link(s)."
+            ))
+
+        if options['search_results']:
+            results = deduplicate_search_results(review, threshold=threshold, near=not options['exact_only'],
+                                                 dry_run=options['dry_run'])
+            self.stdout.write(self.style.SUCCESS(
+                f"Search results: scanned {results.scanned}, "
+                f"{len(results.duplicate_map)} duplicate(s), {results.linked} linked."
+            ))
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+from slra.models import LLMModel, SystematicReview
+from slra.services.embeddings import embed_studies, get_embedder, get_embedding_settings
+from slra.services.exceptions import LLMError
+
+class Command(BaseCommand):
+    help = ("Computes embeddings for the Primary Studies of a review (new or changed ones only), "
+            "used to rank studies by similarity to the research questions.")
+
+    def add_arguments(self, parser):
+        batch_size = get_embedding_settings()['BATCH_SIZE']
+        parser.add_argument('--review-id', type=int, required=True, help='Systematic Review ID')
+        parser.add_argument('--model-id', type=int,
+                            help='Embedding LLM Model ID (Ollama or together.ai; default: local hashing embedder)')
+        parser.add_argument('--batch-size', type=int, default=batch_size,
+                            help=f'Texts per embedding request (default {batch_size})')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be at least 1.")
+        try:
+            review = SystematicReview.objects.get(pk=options['review_id'])
+        except SystematicReview.DoesNotExist:
+            raise CommandError(f"Systematic Review with ID {options['review_id']} not found.")
+
+        llm_model = None
+        if options['model_id']:
+            try:
+                llm_model = LLMModel.objects.select_related('provider').get(pk=options['model_id'])
+            except LLMModel.DoesNotExist:
+                raise CommandError(f"LLM Model with ID {options['model_id']} not found.")
+
+        def report(stats):
+            if options['verbosity'] >= 2:
+                self.stdout.write(f"  {stats.embedded} embedded, {stats.scanned} scanned")
+
+        try:
+            embedder = get_embedder(llm_model)
+            stats = embed_studies(review, embedder, batch_size=options['batch_size'], progress_callback=report)
+        except LLMError as e:
+            raise CommandError(f"Embedding failed: {e}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Embedded {stats.embedded} study/studies with '{embedder.name}' "
+            f"({stats.unchanged} unchanged) in {stats.elapsed:.1f}s."
+        ))
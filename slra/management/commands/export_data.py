@@ -0,0 +1,53 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from slra.models import SystematicReview
+from slra.services import exporters
+
+class Command(BaseCommand):
+    help = ("Exports Primary Studies, Search Results, Relevancy Evaluations or LLM query logs as CSV, "
+            "JSON Lines or Parquet, streaming a batch of rows at a time.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=sorted(exporters.DATASETS), help='What to export')
+        parser.add_argument('--format', choices=exporters.FORMATS, default='csv', dest='export_format',
+                            help='csv (default), jsonl or parquet (needs pyarrow)')
+        parser.add_argument('--review-id', type=int, help='Only rows of this Systematic Review')
+        parser.add_argument('--output', help='Output file (default: stdout; required for parquet)')
+        parser.add_argument('--batch-size', type=int, help='Rows fetched per query')
+
+    def handle(self, *args, **options):
+        export_format = options['export_format']
+        if export_format == 'parquet' and not options['output']:
+            raise CommandError("Parquet exports need --output.")
+        if options['batch_size'] is not None and options['batch_size'] < 1:
+            raise CommandError("--batch-size must be at least 1.")
+
+        review = None
+        if options['review_id']:
+            try:
+                review = SystematicReview.objects.get(pk=options['review_id'])
+            except SystematicReview.DoesNotExist:
+                raise CommandError(f"Systematic Review with ID {options['review_id']} not found.")
+
+        try:
+            chunks = exporters.stream_export(options['dataset'], export_format, review=review,
+                                             batch_size=options['batch_size'])
+        except ImportError as e:
+            raise CommandError(str(e))
+
+        if not options['output']:
+            for chunk in chunks:
+                sys.stdout.write(chunk)
+            return
+        written = 0
+        if export_format == 'parquet':
+            with open(options['output'], 'wb') as f:
+                for chunk in chunks:
+                    written += f.write(chunk)
+        else:
+            with open(options['output'], 'w', encoding='utf-8', newline='') as f:
+                for chunk in chunks:
+                    written += f.write(chunk)
+        self.stdout.write(self.style.SUCCESS(f"Exported {options['dataset']} to {options['output']} "
+                                             f"({written / 1024 / 1024:.1f} MB)."))
@@ -1,7 +1,9 @@
 from django.core.management.base import BaseCommand, CommandError
 from slra.models import SystematicReview, ResearchQuestion, LLMQueryLog, LLMModel
 from slra.services.llm_integration import get_llm_response
+from slra.services.llm_usage import last_call_fields
 from slra.services import exceptions
+from slra.services.research_questions import build_prompt, parse_questions
 
 
 class Command(BaseCommand):
@@ -31,7 +33,7 @@ class Command(BaseCommand):
         # -------------------------
         # 2) Select an LLM Model
         # -------------------------
-        llm_models = LLMModel.objects.all()
+        llm_models = LLMModel.objects.for_display()
         if not llm_models.exists():
             self.stdout.write(self.style.ERROR(
                 "No LLMModel found. Create one first in the admin or via command line."
@@ -71,37 +73,9 @@ class Command(BaseCommand):
         # -------------------------
         # 5) Construct the Prompt
         # -------------------------
-        # We include an example to guide the LLM's style. 
-        # We ask the LLM to enumerate the questions with `--1--`, `--2--`, etc.
-        example_questions = """
---1-- How do researchers design and conduct AI-related studies in RSE, and what research methods are most commonly used?
---2-- What ethical issues do researchers face when developing AI software, and how are concerns like bias, explainability, and fairness addressed in RSE practices?
---3-- How does funding and institutional support influence the development, sustainability, and ethical alignment of AI research software in RSE?
---4-- What are the common software development practices in AI research within RSE, particularly regarding data management, sustainability, and the use of machine learning tools?
---5-- How are the FAIR principles (Findable, Accessible, Interoperable, Reusable) implemented in AI-related research software, and what challenges do researchers face in achieving compliance?
---6-- How do Research Software Engineers (RSEs) make decisions regarding the trade-offs between model performance, interpretability, and ethical considerations in AI development?
---7-- What are the key challenges and best practices in integrating AI technologies into existing research software infrastructures within different scientific domains?
---8-- What strategies are employed to manage and mitigate the environmental impact of AI research software, particularly concerning energy consumption and carbon footprint?
-        """.strip()
-
-        # We'll instruct the LLM to produce a set of N questions, each prefixed by `--1--`, `--2--`, etc.
-        final_prompt = f"""You are an expert in research. 
-Below is an example of the style we would like for the questions:
---------------------
-{example_questions}
---------------------
-
-Now, please generate {num_questions} possible research questions based on the following topic:
-"{base_topic}"
-
-Use the following format exactly:
---1-- <Question #1>
---2-- <Question #2>
-... 
-(Up to --{num_questions}--)
-
-Only output the questions in that format, do not provide extra commentary.
-"""
+        # The LLM is shown example questions and asked to enumerate its own
+        # with `--1--`, `--2--`, etc.
+        final_prompt = build_prompt(base_topic, num_questions)
 
         self.stdout.write("\nGenerating questions via LLM, please wait...\n")
 
@@ -110,6 +84,7 @@ Only output the questions in that format, do not provide extra commentary.
         # -------------------------
         try:
             response_text = get_llm_response(selected_model, final_prompt)
+            usage_fields = last_call_fields()
         except exceptions.LLMError as e:
             self.stdout.write(self.style.ERROR(f"LLM call failed: {e}"))
             return
@@ -118,35 +93,7 @@ Only output the questions in that format, do not provide extra commentary.
         # 7) Parse the LLM output
         # -------------------------
         # We want to split by lines that start with `--<number>--`
-        lines = [line.strip() for line in response_text.split('\n') if line.strip()]
-        parsed_questions = []
-        current_question_parts = []
-
-        for line in lines:
-            if line.startswith("--") and line.count("--") >= 2:
-                # new question start
-                if current_question_parts:
-                    parsed_questions.append(" ".join(current_question_parts).strip())
-                    current_question_parts = []
-                # remove the leading format, e.g., "--1-- "
-                # we could do something like:
-                splitted = line.split('--')
-                # splitted might be ['', '1', '', ' question text'] depending on how it's structured
-                # let's just strip from the start
-                question_text = line
-                question_text = question_text.replace('--', '', 2).strip()
-                # e.g. turned from "--1-- question text" into "question text"
-                current_question_parts.append(question_text)
-            else:
-                # continuation of the current question
-                current_question_parts.append(line)
-
-        # append last question if any
-        if current_question_parts:
-            parsed_questions.append(" ".join(current_question_parts).strip())
-
-        # remove empty or whitespace questions
-        parsed_questions = [q for q in parsed_questions if q.strip()]
+        parsed_questions = parse_questions(response_text)
 
         if not parsed_questions:
             self.stdout.write(self.style.WARNING(
@@ -174,7 +121,8 @@ Only output the questions in that format, do not provide extra commentary.
                 llm_model=selected_model,
                 phase=1,
                 prompt_text=final_prompt,
-                response_text=response_text
+                response_text=response_text,
+                **usage_fields
             )
             return
 
@@ -202,7 +150,8 @@ Only output the questions in that format, do not provide extra commentary.
             llm_model=selected_model,
             phase=1,
             prompt_text=final_prompt,
-            response_text=response_text
+            response_text=response_text,
+            **usage_fields
         )
 
         # -------------------------
@@ -1,6 +1,7 @@
 from django.core.management.base import BaseCommand, CommandError
 from slra.models import SystematicReview, SearchQuery, LLMModel, LLMQueryLog
 from slra.services.llm_integration import get_llm_response
+from slra.services.llm_usage import last_call_fields
 from slra.services import exceptions
 
 class Command(BaseCommand):
@@ -17,7 +18,7 @@ class Command(BaseCommand):
             raise CommandError(f"No SystematicReview with ID {review_id}.")
 
         # Let user pick an LLM:
-        llm_models = LLMModel.objects.all()
+        llm_models = LLMModel.objects.for_display()
         if not llm_models.exists():
             raise CommandError("No LLMModel found. Create one first.")
 
@@ -56,7 +57,8 @@ class Command(BaseCommand):
             llm_model=selected_model,
             phase=4,  # Query String Definition
             prompt_text=final_prompt,
-            response_text=response_text
+            response_text=response_text,
+            **last_call_fields()
         )
 
         self.stdout.write(self.style.SUCCESS(
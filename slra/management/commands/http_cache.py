@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+from slra.services.http_cache import get_http_cache
+
+class Command(BaseCommand):
+    help = "Shows, prunes or clears the on-disk cache of digital library responses."
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=['stats', 'prune', 'clear'], nargs='?', default='stats',
+                            help="stats (default), prune (drop stale entries without validators) or clear")
+
+    def handle(self, *args, **options):
+        cache = get_http_cache()
+        if cache is None:
+            raise CommandError("The HTTP cache is disabled (SLRA_HTTP_CACHE['ENABLED']).")
+
+        if options['action'] == 'prune':
+            self.stdout.write(self.style.SUCCESS(f"Pruned {cache.prune()} stale entr(y/ies)."))
+        elif options['action'] == 'clear':
+            cache.clear()
+            self.stdout.write(self.style.SUCCESS(f"Cleared {cache.path}."))
+
+        stats = cache.stats()
+        self.stdout.write(
+            f"{cache.path}: {stats['entries']} entr(y/ies), {stats['fresh']} fresh, "
+            f"{stats['size'] / 1024 / 1024:.1f} of {stats['max_size'] / 1024 / 1024:.0f} MB"
+            f"{' (offline)' if cache.offline else ''}"
+        )
@@ -1,6 +1,7 @@
-import csv
 from django.core.management.base import BaseCommand, CommandError
-from slra.models import SystematicReview, PrimaryStudy
+from slra.models import SystematicReview
+from slra.services.dedup import deduplicate_studies
+from slra.services.importers import DEFAULT_BATCH_SIZE, StudyImporter
 
 class Command(BaseCommand):
     help = "Imports primary studies from a CSV file into a specified Systematic Review."
@@ -8,37 +9,56 @@ class Command(BaseCommand):
     def add_arguments(self, parser):
         parser.add_argument('--file', type=str, required=True, help='Path to CSV file')
         parser.add_argument('--review-id', type=int, required=True, help='Systematic Review ID')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                            help=f'Rows inserted per bulk INSERT/transaction (default {DEFAULT_BATCH_SIZE})')
+        parser.add_argument('--dedupe', action='store_true',
+                            help='Skip rows already in the review (same title/DOI) and link near-duplicates afterwards')
 
     def handle(self, *args, **options):
         file_path = options['file']
         review_id = options['review_id']
+        batch_size = options['batch_size']
+        verbosity = options['verbosity']
+
+        if batch_size < 1:
+            raise CommandError("--batch-size must be at least 1.")
 
         try:
             review = SystematicReview.objects.get(pk=review_id)
         except SystematicReview.DoesNotExist:
             raise CommandError(f"Systematic Review with ID {review_id} not found.")
 
+        def report(stats):
+            if verbosity >= 2:
+                self.stdout.write(
+                    f"  {stats.created} imported, {stats.rows_read} rows read "
+                    f"({stats.rows_per_second:,.0f} rows/sec)"
+                )
+
+        importer = StudyImporter(review, batch_size=batch_size, progress_callback=report,
+                                 skip_duplicates=options['dedupe'])
         try:
-            with open(file_path, mode='r', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                created_count = 0
-                for row in reader:
-                    title = row.get('title', '').strip()
-                    if not title:
-                        # skip blank lines
-                        continue
-                    ps = PrimaryStudy.objects.create(
-                        systematic_review=review,
-                        title=title,
-                        url=row.get('url'),
-                        abstract=row.get('abstract'),
-                        publication_year=row.get('publication_year') or None,
-                        citations=row.get('citations') or None
-                    )
-                    created_count += 1
+            stats = importer.import_file(file_path)
         except FileNotFoundError:
             raise CommandError(f"File not found: {file_path}")
 
+        if stats.coerced:
+            self.stdout.write(self.style.WARNING(
+                f"{stats.coerced} invalid publication_year/citations value(s) were stored as empty."
+            ))
+        if stats.truncated:
+            self.stdout.write(self.style.WARNING(
+                f"{stats.truncated} value(s) longer than their column were shortened (too long URLs dropped)."
+            ))
         self.stdout.write(self.style.SUCCESS(
-            f"Imported {created_count} primary study/studies into review '{review.name}'."
+            f"Imported {stats.created} primary study/studies into review '{review.name}' "
+            f"({stats.skipped} row(s) skipped, {stats.duplicates} duplicate(s) skipped, "
+            f"{stats.venues_created} new venue(s)) "
+            f"in {stats.elapsed:.1f}s ({stats.rows_per_second:,.0f} rows/sec)."
         ))
+
+        if options['dedupe']:
+            dedup = deduplicate_studies(review)
+            self.stdout.write(self.style.SUCCESS(
+                f"Linked {dedup.linked} near-duplicate study/studies to their canonical study."
+            ))
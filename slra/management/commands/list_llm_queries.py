@@ -20,10 +20,10 @@ class Command(BaseCommand):
             review = None
 
         if review:
-            queries = LLMQueryLog.objects.filter(systematic_review=review)
+            queries = LLMQueryLog.objects.filter(systematic_review=review).select_related('llm_model__provider')
             self.stdout.write(self.style.SUCCESS(f"LLM Queries for review '{review.name}':"))
         else:
-            queries = LLMQueryLog.objects.all()
+            queries = LLMQueryLog.objects.select_related('llm_model__provider')
             self.stdout.write(self.style.SUCCESS("All LLM Queries:"))
 
         if not queries.exists():
@@ -1,4 +1,5 @@
 from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Prefetch
 from slra.models import SearchQuery, DigitalLibrarySearch, SearchResult
 
 class Command(BaseCommand):
@@ -14,15 +15,16 @@ class Command(BaseCommand):
         except SearchQuery.DoesNotExist:
             raise CommandError(f"No SearchQuery with ID {query_id}.")
 
-        library_searches = DigitalLibrarySearch.objects.filter(search_query=sq)
+        library_searches = DigitalLibrarySearch.objects.filter(search_query=sq) \
+            .select_related('library') \
+            .prefetch_related(Prefetch('search_results', SearchResult.objects.only('library_search', 'title', 'url')))
         if not library_searches.exists():
             self.stdout.write(self.style.WARNING(f"No library searches found for SearchQuery ID {query_id}."))
             return
 
         for ls in library_searches:
             self.stdout.write(self.style.SUCCESS(
-                f"DigitalLibrarySearch (ID {ls.id}) - {ls.library_name}, found {ls.total_results_found}"
+                f"DigitalLibrarySearch (ID {ls.id}) - {ls.library.name}, found {ls.total_results_found}"
             ))
-            results = SearchResult.objects.filter(library_search=ls)
-            for r in results:
-                self.stdout.write(f"   - {r.title[:50]} (URL: {r.url})")
+            for r in ls.search_results.all():
+                self.stdout.write(f"   - {(r.title or '')[:50]} (URL: {r.url})")
@@ -1,42 +1,56 @@
 from django.core.management.base import BaseCommand, CommandError
-from slra.models import SearchQuery, DigitalLibrarySearch, SearchResult
+from slra.models import SearchQuery
+from slra.services.exceptions import LibrarySearchError
+from slra.services.library_adapters import get_library_settings, supported_libraries
+from slra.services.library_search import run_library_search
 
 class Command(BaseCommand):
-    help = "Performs a digital library search using an existing SearchQuery ID."
+    help = ("Searches digital libraries (in parallel) with an existing SearchQuery and stores the results. "
+            f"Supported libraries: {', '.join(supported_libraries())}.")
 
     def add_arguments(self, parser):
+        max_results = get_library_settings()['MAX_RESULTS']
         parser.add_argument('--query-id', type=int, required=True, help='SearchQuery ID')
-        parser.add_argument('--library', type=str, required=True, help='Library name (ACM, Elsevier, etc.)')
+        parser.add_argument('--library', type=str, required=True, action='append',
+                            help='Library name, e.g. arXiv (repeatable, or comma-separated)')
+        parser.add_argument('--max-results', type=int, default=max_results,
+                            help=f'Results per library (default {max_results})')
+        parser.add_argument('--no-enrich', action='store_true',
+                            help="Don't fetch landing pages for missing abstracts")
+        parser.add_argument('--incremental', action='store_true',
+                            help="Only ask for results newer than the query's previous searches of each library")
 
     def handle(self, *args, **options):
         query_id = options['query_id']
-        library = options['library']
+        libraries = [name for value in options['library'] for name in value.split(',') if name.strip()]
+        if options['max_results'] < 1:
+            raise CommandError("--max-results must be at least 1.")
 
         try:
             sq = SearchQuery.objects.get(pk=query_id)
         except SearchQuery.DoesNotExist:
             raise CommandError(f"No SearchQuery with ID {query_id}.")
 
-        # For demonstration, we pretend we found 5 results:
-        found_count = 5
+        def report(outcomes):
+            if options['verbosity'] >= 2:
+                self.stdout.write("  " + ", ".join(f"{o.library}: {o.fetched}" for o in outcomes))
 
-        # Create a DigitalLibrarySearch record
-        dl_search = DigitalLibrarySearch.objects.create(
-            search_query=sq,
-            library_name=library,
-            total_results_found=found_count
-        )
-
-        # Possibly create dummy SearchResult objects
-        for i in range(1, found_count + 1):
-            SearchResult.objects.create(
-                library_search=dl_search,
-                url=f"https://example.com/paper-{i}",
-                title=f"Fake Paper {i} for {library}",
-                authors="Doe, J",
-                abstract="This is a dummy abstract."
-            )
-
-        self.stdout.write(self.style.SUCCESS(
-            f"Library search complete. Created DigitalLibrarySearch (ID {dl_search.id}) with {found_count} results."
-        ))
+        try:
+            outcomes = run_library_search(sq, libraries, max_results=options['max_results'],
+                                          enrich=not options['no_enrich'], progress_callback=report,
+                                          incremental=options['incremental'])
+        except LibrarySearchError as e:
+            raise CommandError(str(e))
+
+        for outcome in outcomes:
+            if outcome.ok:
+                self.stdout.write(self.style.SUCCESS(
+                    f"{outcome.library}: created DigitalLibrarySearch (ID {outcome.library_search.id}) with "
+                    f"{outcome.results} new result(s) ({outcome.updated} updated, {outcome.unchanged} unchanged) "
+                    f"of {outcome.library_search.total_results_found} found, "
+                    f"{outcome.enriched} abstract(s) enriched, in {outcome.elapsed:.1f}s."
+                ))
+            else:
+                self.stdout.write(self.style.ERROR(
+                    f"{outcome.library}: search failed after {outcome.results} result(s): {outcome.error}"
+                ))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from slra.services import search
+
+class Command(BaseCommand):
+    help = "Rebuilds the local full-text search index (not needed when MySQL FULLTEXT indexes are in use)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target', choices=sorted(search.TARGETS), action='append',
+                            help='Only rebuild this target (repeatable; default: all)')
+
+    def handle(self, *args, **options):
+        if search.uses_fulltext():
+            self.stdout.write("Search uses the database's FULLTEXT indexes; nothing to rebuild.")
+            return
+
+        for name in options['target'] or sorted(search.TARGETS):
+            indexed = search.rebuild_index(
+                name, progress_callback=lambda n, name=name: self.stdout.write(f"{name}: {n} indexed...")
+            )
+            self.stdout.write(self.style.SUCCESS(f"Indexed {indexed} object(s) for '{name}'."))
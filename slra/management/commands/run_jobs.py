@@ -0,0 +1,48 @@
+import threading
+
+from django.core.management.base import BaseCommand, CommandError
+from slra.models import Job
+from slra.services import jobs
+
+class Command(BaseCommand):
+    help = ("Runs queued background jobs (library searches, screening, embeddings, LLM calls) on a pool of "
+            "worker threads. Keep it running next to the web server, or use --once to drain the queue.")
+
+    def add_arguments(self, parser):
+        options = jobs.get_job_settings()
+        parser.add_argument('--workers', type=int, default=options['WORKERS'],
+                            help=f"Jobs run concurrently (default {options['WORKERS']})")
+        parser.add_argument('--poll-interval', type=float, default=options['POLL_INTERVAL'],
+                            help=f"Seconds between queue polls when idle (default {options['POLL_INTERVAL']})")
+        parser.add_argument('--kind', choices=jobs.job_kinds(), action='append',
+                            help='Only run jobs of this kind (repeatable; default: all)')
+        parser.add_argument('--once', action='store_true', help='Exit when the queue is empty')
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1:
+            raise CommandError("--workers must be at least 1.")
+
+        counts = {status: 0 for status, _ in Job.STATUS_CHOICES}
+        lock = threading.Lock()  # report() runs on the worker threads
+
+        def report(job):
+            with lock:
+                counts[job.status] += 1
+            if job.status == Job.FAILED or options['verbosity'] >= 2:
+                style = self.style.ERROR if job.status == Job.FAILED else self.style.SUCCESS
+                self.stdout.write(style(f"{job} after {job.attempts} attempt(s)"))
+                if job.status == Job.FAILED and options['verbosity'] >= 2:
+                    self.stdout.write(job.error)
+
+        worker = jobs.Worker(workers=options['workers'], poll_interval=options['poll_interval'],
+                             kinds=options['kind'], once=options['once'], on_finished=report)
+        self.stdout.write(f"Worker {worker.name} running {worker.workers} thread(s)...")
+        try:
+            worker.run()
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING("Interrupted; waited for the running jobs to finish."))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{counts[Job.SUCCEEDED]} job(s) succeeded, {counts[Job.FAILED]} failed, "
+            f"{counts[Job.CANCELLED]} cancelled, {counts[Job.QUEUED]} requeued for retry."
+        ))
@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand, CommandError
+from slra.models import LLMModel, SystematicReview
+from slra.services.screening import StudyScreener, get_screening_settings
+
+class Command(BaseCommand):
+    help = ("Screens the unevaluated Primary Studies of a review with an LLM (phase 6), several abstracts per prompt. "
+            "Resumable: studies already rated by the same evaluator are skipped.")
+
+    def add_arguments(self, parser):
+        options = get_screening_settings()
+        parser.add_argument('--review-id', type=int, required=True, help='Systematic Review ID')
+        parser.add_argument('--model-id', type=int, required=True, help='LLM Model ID')
+        parser.add_argument('--studies-per-prompt', type=int, default=options['STUDIES_PER_PROMPT'],
+                            help=f"Studies packed into one prompt (default {options['STUDIES_PER_PROMPT']})")
+        parser.add_argument('--prompts-per-round', type=int, default=options['PROMPTS_PER_ROUND'],
+                            help=f"Concurrent prompts per checkpointed round (default {options['PROMPTS_PER_ROUND']})")
+        parser.add_argument('--limit', type=int, help='Screen at most this many studies')
+        parser.add_argument('--evaluator', type=str,
+                            help='Evaluator name stored on the evaluations (default: "LLM: <model>")')
+        parser.add_argument('--no-cache', action='store_true', help='Bypass the LLM response cache')
+
+    def handle(self, *args, **options):
+        if options['studies_per_prompt'] < 1 or options['prompts_per_round'] < 1:
+            raise CommandError("--studies-per-prompt and --prompts-per-round must be at least 1.")
+
+        try:
+            review = SystematicReview.objects.get(pk=options['review_id'])
+        except SystematicReview.DoesNotExist:
+            raise CommandError(f"Systematic Review with ID {options['review_id']} not found.")
+        try:
+            llm_model = LLMModel.objects.select_related('provider').get(pk=options['model_id'])
+        except LLMModel.DoesNotExist:
+            raise CommandError(f"LLM Model with ID {options['model_id']} not found.")
+
+        def report(stats):
+            self.stdout.write(
+                f"  round {stats.rounds}: {stats.evaluated} evaluated, {stats.screened} screened "
+                f"({stats.studies_per_second:.1f} studies/sec)"
+            )
+
+        screener = StudyScreener(
+            review, llm_model, evaluator=options['evaluator'],
+            studies_per_prompt=options['studies_per_prompt'], prompts_per_round=options['prompts_per_round'],
+            use_cache=not options['no_cache'],
+            progress_callback=report if options['verbosity'] >= 2 else None,
+        )
+        stats = screener.run(limit=options['limit'])
+
+        if stats.failed_prompts or stats.unparsed:
+            self.stdout.write(self.style.WARNING(
+                f"{stats.failed_prompts} prompt(s) failed and {stats.unparsed} study/studies got no usable verdict; "
+                f"run the command again to retry them."
+            ))
+        verdicts = ', '.join(f"{key}: {stats.verdicts[key]}" for key in 'HMLX')
+        self.stdout.write(self.style.SUCCESS(
+            f"Evaluated {stats.evaluated} of {stats.screened} screened study/studies in review '{review.name}' "
+            f"as '{screener.evaluator}' ({verdicts}) with {stats.prompts} prompt(s) in {stats.elapsed:.1f}s."
+        ))
@@ -1,6 +1,7 @@
 from django.core.management.base import BaseCommand, CommandError
 from slra.models import LLMModel, SystematicReview, LLMQueryLog
 from slra.services.llm_integration import get_llm_response
+from slra.services.llm_usage import last_call_fields
 from slra.services import exceptions
 
 class Command(BaseCommand):
@@ -10,6 +11,7 @@ class Command(BaseCommand):
         parser.add_argument('--model-id', type=int, required=True, help='LLMModel ID')
         parser.add_argument('--review-id', type=int, required=False, help='Systematic Review ID for context')
         parser.add_argument('--prompt', type=str, required=True, help='Prompt text to send')
+        parser.add_argument('--no-cache', action='store_true', help='Always call the LLM, ignoring cached responses')
 
     def handle(self, *args, **options):
         model_id = options['model_id']
@@ -31,7 +33,8 @@ class Command(BaseCommand):
                 self.stdout.write(self.style.WARNING(f"No SystematicReview with ID {review_id}, proceeding without link."))
 
         try:
-            response_text = get_llm_response(llm_model, prompt_text)
+            response_text = get_llm_response(llm_model, prompt_text, use_cache=not options['no_cache'])
+            usage_fields = last_call_fields()
         except exceptions.LLMError as e:
             raise CommandError(f"LLM call failed: {e}")
 
@@ -46,6 +49,7 @@ class Command(BaseCommand):
             llm_model=llm_model,
             phase=phase,
             prompt_text=prompt_text,
-            response_text=response_text
+            response_text=response_text,
+            **usage_fields
         )
         self.stdout.write(self.style.SUCCESS("Query logged in LLMQueryLog."))
@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand, CommandError
+from slra.models import SystematicReview
+from slra.services.citation_graph import update_citation_graph
+from slra.services.exceptions import LibrarySearchError
+from slra.services.snowballing import DIRECTIONS, SnowballingEngine, get_snowballing_settings
+
+class Command(BaseCommand):
+    help = ("Forward / backward snowballing: adds the references and citations of a review's included "
+            "Primary Studies as new studies, and the links between them as citation edges "
+            "(then updates the citation graph scores).")
+
+    def add_arguments(self, parser):
+        options = get_snowballing_settings()
+        parser.add_argument('--review-id', type=int, required=True, help='Systematic Review ID')
+        parser.add_argument('--iterations', type=int, default=options['ITERATIONS'],
+                            help=f"Snowballing iterations (default {options['ITERATIONS']})")
+        parser.add_argument('--direction', choices=sorted(DIRECTIONS), default=options['DIRECTION'],
+                            help=f"backward (references), forward (citations) or both "
+                                 f"(default {options['DIRECTION']})")
+        parser.add_argument('--libraries', type=str, default=','.join(options['LIBRARIES']),
+                            help=f"Comma-separated libraries (default {','.join(options['LIBRARIES'])})")
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError("--iterations must be at least 1.")
+        try:
+            review = SystematicReview.objects.get(pk=options['review_id'])
+        except SystematicReview.DoesNotExist:
+            raise CommandError(f"Systematic Review with ID {options['review_id']} not found.")
+        try:
+            engine = SnowballingEngine(review, libraries=options['libraries'].split(','),
+                                       direction=options['direction'])
+        except LibrarySearchError as e:
+            raise CommandError(str(e))
+
+        def report(outcome, done, total):
+            if done == total or done % 100 == 0:
+                self.stdout.write(f"  iteration {outcome.iteration}: {done} of {total} lists fetched")
+
+        outcomes = engine.run(options['iterations'], progress_callback=report if options['verbosity'] >= 2 else None)
+        for outcome in outcomes:
+            if outcome.failed_requests:
+                self.stdout.write(self.style.WARNING(
+                    f"Iteration {outcome.iteration}: {outcome.failed_requests} of {outcome.requests} "
+                    f"reference / citation list(s) could not be fetched."
+                ))
+            self.stdout.write(
+                f"Iteration {outcome.iteration}: {outcome.seeds} seed(s), {outcome.records} listed paper(s), "
+                f"{outcome.matched} already in the review, {len(outcome.new_studies)} new "
+                f"({outcome.dropped} over the limit), {outcome.edges} new edge(s) in {outcome.elapsed:.1f}s."
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"Added {sum(len(outcome.new_studies) for outcome in outcomes)} study/studies and "
+            f"{sum(outcome.edges for outcome in outcomes)} citation edge(s) to review '{review.name}'."
+        ))
+        update = update_citation_graph(review)
+        self.stdout.write(f"Citation graph: {update.nodes} study/studies, {update.edges} edge(s); scores updated.")
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+from slra.models import StudyCentrality, SystematicReview
+from slra.services.citation_graph import update_citation_graph
+
+class Command(BaseCommand):
+    help = ("Updates the citation graph of a review with its new citation edges and recomputes the "
+            "PageRank, degree and co-citation scores of its Primary Studies.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--review-id', type=int, required=True, help='Systematic Review ID')
+        parser.add_argument('--full', action='store_true',
+                            help='Rebuild the graph from all edges instead of the stored one')
+        parser.add_argument('--top', type=int, default=0, help='List the N studies with the highest PageRank')
+
+    def handle(self, *args, **options):
+        try:
+            review = SystematicReview.objects.get(pk=options['review_id'])
+        except SystematicReview.DoesNotExist:
+            raise CommandError(f"Systematic Review with ID {options['review_id']} not found.")
+
+        update = update_citation_graph(review, full=options['full'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Citation graph of review '{review.name}': {update.nodes} study/studies, {update.edges} edge(s) "
+            f"({update.new_edges} new, {'rebuilt' if update.rebuilt else 'incremental'}) in {update.elapsed:.2f}s."
+        ))
+        top = StudyCentrality.objects.filter(primary_study__systematic_review=review) \
+            .select_related('primary_study').order_by('-pagerank')[:options['top']]
+        for centrality in top:
+            self.stdout.write(f"  {centrality.pagerank:.5f}  cited {centrality.in_degree}x  "
+                              f"[{centrality.primary_study_id}] {centrality.primary_study.title}")
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+from slra.models import SystematicReview
+from slra.services import review_stats
+
+class Command(BaseCommand):
+    help = ("Recomputes the stored per-review statistics (studies per relevancy and year, evaluations, "
+            "LLM calls, search results) served by /api/reviews/{id}/stats/ and the admin filters.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--review-id', type=int, help='Systematic Review ID (default: every review)')
+        parser.add_argument('--stale', action='store_true',
+                            help='Only reviews without statistics or changed since their last refresh')
+
+    def handle(self, *args, **options):
+        if options['review_id']:
+            if not SystematicReview.objects.filter(pk=options['review_id']).exists():
+                raise CommandError(f"Systematic Review with ID {options['review_id']} not found.")
+            refreshed = review_stats.refresh([options['review_id']])
+        elif options['stale']:
+            refreshed = review_stats.refresh_stale()
+        else:
+            refreshed = review_stats.refresh()
+        self.stdout.write(self.style.SUCCESS(f"Refreshed the statistics of {refreshed} review(s)."))
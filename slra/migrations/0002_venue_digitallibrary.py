@@ -0,0 +1,94 @@
+# Brings the schema in line with the Venue / DigitalLibrary models.
+# Existing free-text venue and library names are carried over into the new tables.
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def copy_names_to_relations(apps, schema_editor):
+    Venue = apps.get_model('slra', 'Venue')
+    DigitalLibrary = apps.get_model('slra', 'DigitalLibrary')
+    PrimaryStudy = apps.get_model('slra', 'PrimaryStudy')
+    DigitalLibrarySearch = apps.get_model('slra', 'DigitalLibrarySearch')
+
+    venues = {}
+    for name in PrimaryStudy.objects.exclude(venue_name__isnull=True).exclude(venue_name='') \
+            .values_list('venue_name', flat=True).distinct():
+        venues[name] = Venue.objects.create(name=name)
+    for name, venue in venues.items():
+        PrimaryStudy.objects.filter(venue_name=name).update(venue=venue)
+
+    for name in DigitalLibrarySearch.objects.values_list('library_name', flat=True).distinct():
+        library, _ = DigitalLibrary.objects.get_or_create(name=name or 'Unknown Library')
+        DigitalLibrarySearch.objects.filter(library_name=name).update(library=library)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('slra', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DigitalLibrary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text="Name of the digital library (e.g., 'Google Scholar', 'Arxiv').", max_length=255, unique=True)),
+                ('base_url', models.URLField(blank=True, help_text='Optional base URL or endpoint for API calls.', null=True)),
+                ('usage_method', models.CharField(blank=True, help_text="Method of usage: 'web-scraping', 'official API', etc.", max_length=255, null=True)),
+                ('credentials', models.TextField(blank=True, help_text='Any credentials or tokens needed for this library.', null=True)),
+                ('usage_instructions', models.TextField(blank=True, help_text='Documentation or instructions on how to query this library.', null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Venue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='Name of the journal or conference.', max_length=255)),
+                ('venue_type', models.CharField(choices=[('journal', 'Journal'), ('conference', 'Conference'), ('workshop', 'Workshop'), ('unknown', 'Unknown')], default='unknown', help_text='Type of venue (journal, conference, etc.).', max_length=50)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='VenueQualitySource',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='Name of the quality source (e.g., SJR, Scopus, etc.).', max_length=255, unique=True)),
+                ('base_url', models.URLField(blank=True, help_text='Endpoint or homepage for the quality source.', null=True)),
+                ('usage_instructions', models.TextField(blank=True, help_text='How to query or retrieve data from this source.', null=True)),
+            ],
+        ),
+        migrations.RemoveField(
+            model_name='primarystudy',
+            name='venue_quality',
+        ),
+        migrations.RenameField(
+            model_name='primarystudy',
+            old_name='venue',
+            new_name='venue_name',
+        ),
+        migrations.AddField(
+            model_name='primarystudy',
+            name='venue',
+            field=models.ForeignKey(blank=True, help_text='Venue (journal, conference, etc.) associated with this study.', null=True, on_delete=django.db.models.deletion.SET_NULL, to='slra.venue'),
+        ),
+        migrations.AddField(
+            model_name='digitallibrarysearch',
+            name='library',
+            field=models.ForeignKey(null=True, help_text='The digital library used for this search.', on_delete=django.db.models.deletion.CASCADE, related_name='performed_searches', to='slra.digitallibrary'),
+        ),
+        migrations.RunPython(copy_names_to_relations, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='primarystudy',
+            name='venue_name',
+        ),
+        migrations.RemoveField(
+            model_name='digitallibrarysearch',
+            name='library_name',
+        ),
+        migrations.AlterField(
+            model_name='digitallibrarysearch',
+            name='library',
+            field=models.ForeignKey(help_text='The digital library used for this search.', on_delete=django.db.models.deletion.CASCADE, related_name='performed_searches', to='slra.digitallibrary'),
+        ),
+    ]
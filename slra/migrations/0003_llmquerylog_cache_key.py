@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('slra', '0002_venue_digitallibrary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='llmquerylog',
+            name='cache_key',
+            field=models.CharField(blank=True, db_index=True, editable=False, help_text='Content hash of provider, model, prompt and params (response cache lookup).', max_length=64, null=True),
+        ),
+    ]
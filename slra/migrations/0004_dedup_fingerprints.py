@@ -0,0 +1,99 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:29
+
+import hashlib
+import re
+import unicodedata
+from urllib.parse import unquote
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Frozen copies of slra.fingerprints as of this migration, so that later
+# changes to the helpers don't change what this migration computes.
+DOI_RE = re.compile(r'\b(10\.\d{4,9}/[^\s"<>]+)', re.IGNORECASE)
+_NON_WORD_RE = re.compile(r'[^\w\s]+')
+_SPACE_RE = re.compile(r'\s+')
+
+
+def normalize_text(text):
+    if not text:
+        return ''
+    if not text.isascii():
+        text = unicodedata.normalize('NFKD', text)
+        text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    text = _NON_WORD_RE.sub(' ', text.lower())
+    return _SPACE_RE.sub(' ', text).strip()
+
+
+def extract_doi(*values):
+    for value in values:
+        if not value:
+            continue
+        match = DOI_RE.search(unquote(value))
+        if match:
+            return match.group(1).rstrip('.,;)').lower()
+    return ''
+
+
+def title_fingerprint(title):
+    normalized = normalize_text(title)
+    if not normalized:
+        return ''
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest()
+
+
+def backfill_fingerprints(apps, schema_editor):
+    for model_name in ('PrimaryStudy', 'SearchResult'):
+        model = apps.get_model('slra', model_name)
+        batch = []
+        for obj in model.objects.only('pk', 'title', 'url').iterator(chunk_size=2000):
+            obj.doi = extract_doi(obj.url)[:255] or None
+            obj.fingerprint = title_fingerprint(obj.title) or None
+            batch.append(obj)
+            if len(batch) >= 2000:
+                model.objects.bulk_update(batch, ['doi', 'fingerprint'])
+                batch = []
+        if batch:
+            model.objects.bulk_update(batch, ['doi', 'fingerprint'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('slra', '0003_llmquerylog_cache_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='primarystudy',
+            name='doi',
+            field=models.CharField(blank=True, db_index=True, help_text='Normalized DOI, if known (extracted from the URL when not given).', max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='primarystudy',
+            name='duplicate_of',
+            field=models.ForeignKey(blank=True, help_text='Canonical study this one duplicates, if any.', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='duplicates', to='slra.primarystudy'),
+        ),
+        migrations.AddField(
+            model_name='primarystudy',
+            name='fingerprint',
+            field=models.CharField(blank=True, db_index=True, editable=False, help_text='Hash of the normalized title, used to find exact duplicates.', max_length=40, null=True),
+        ),
+        migrations.AddField(
+            model_name='searchresult',
+            name='doi',
+            field=models.CharField(blank=True, db_index=True, help_text='Normalized DOI, if known (extracted from the URL when not given).', max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='searchresult',
+            name='duplicate_of',
+            field=models.ForeignKey(blank=True, help_text='Earlier search result this one duplicates, if any.', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='duplicates', to='slra.searchresult'),
+        ),
+        migrations.AddField(
+            model_name='searchresult',
+            name='fingerprint',
+            field=models.CharField(blank=True, db_index=True, editable=False, help_text='Hash of the normalized title, used to find exact duplicates.', max_length=40, null=True),
+        ),
+        migrations.RunPython(backfill_fingerprints, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('slra', '0004_dedup_fingerprints'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='llmquerylog',
+            index=models.Index(fields=['systematic_review', 'phase', 'created_at'], name='llmlog_review_phase_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='llmquerylog',
+            index=models.Index(fields=['phase', 'created_at'], name='llmlog_phase_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='primarystudy',
+            index=models.Index(fields=['systematic_review', 'relevancy_level'], name='study_review_relevancy_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='primarystudy',
+            index=models.Index(fields=['systematic_review', 'publication_year'], name='study_review_year_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='primarystudy',
+            index=models.Index(fields=['citations'], name='study_citations_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='relevancyevaluation',
+            index=models.Index(fields=['primary_study', 'evaluated_at'], name='eval_study_evaluated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='relevancyevaluation',
+            index=models.Index(fields=['relevancy', 'evaluator'], name='eval_relevancy_evaluator_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='searchquery',
+            index=models.Index(fields=['systematic_review', 'created_at'], name='query_review_created_idx'),
+        ),
+    ]
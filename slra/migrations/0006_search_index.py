@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:36
+
+from django.db import migrations, models
+
+
+# Index name -> (table, columns); the columns must match the fields of the
+# corresponding target in slra.services.search (MATCH lists them all).
+FULLTEXT_INDEXES = {
+    'study_fulltext_idx': ('slra_primarystudy', ('title', 'keywords', 'abstract')),
+    'result_fulltext_idx': ('slra_searchresult', ('title', 'authors', 'abstract')),
+    'llmlog_fulltext_idx': ('slra_llmquerylog', ('prompt_text', 'response_text')),
+}
+
+
+def create_fulltext_indexes(apps, schema_editor):
+    # Only MySQL has FULLTEXT; other backends use the local SearchIndexEntry index.
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    quote = schema_editor.quote_name
+    for name, (table, columns) in FULLTEXT_INDEXES.items():
+        schema_editor.execute(
+            f"CREATE FULLTEXT INDEX {quote(name)} ON {quote(table)} ({', '.join(map(quote, columns))})"
+        )
+
+
+def drop_fulltext_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    quote = schema_editor.quote_name
+    for name, (table, _) in FULLTEXT_INDEXES.items():
+        schema_editor.execute(f"DROP INDEX {quote(name)} ON {quote(table)}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('slra', '0005_review_scoped_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchIndexEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('target', models.CharField(help_text="Indexed model (search target name, e.g. 'studies').", max_length=16)),
+                ('object_id', models.PositiveBigIntegerField(help_text='Primary key of the indexed object.')),
+                ('term', models.CharField(help_text='Normalized term.', max_length=64)),
+                ('weight', models.FloatField(help_text='Length-normalized, field-boosted term frequency.')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['target', 'term', 'object_id'], name='search_term_idx'), models.Index(fields=['target', 'object_id'], name='search_object_idx')],
+            },
+        ),
+        migrations.RunPython(create_fulltext_indexes, drop_fulltext_indexes),
+    ]
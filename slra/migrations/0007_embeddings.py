@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('slra', '0006_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResearchQuestionEmbedding',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('embedding_model', models.CharField(help_text="Embedder that produced the vector, e.g. 'hashing-512' or 'ollama:nomic-embed-text'.", max_length=255)),
+                ('dimensions', models.PositiveSmallIntegerField(help_text='Length of the vector.')),
+                ('vector', models.BinaryField(help_text='float16 vector bytes.')),
+                ('content_hash', models.CharField(help_text='SHA-1 of the embedded text; the vector is recomputed when the text changes.', max_length=40)),
+                ('updated_at', models.DateTimeField(auto_now=True, help_text='Timestamp when the vector was last computed.')),
+                ('research_question', models.ForeignKey(help_text='Embedded research question.', on_delete=django.db.models.deletion.CASCADE, related_name='embeddings', to='slra.researchquestion')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('research_question', 'embedding_model'), name='unique_question_embedding')],
+            },
+        ),
+        migrations.CreateModel(
+            name='StudyEmbedding',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('embedding_model', models.CharField(help_text="Embedder that produced the vector, e.g. 'hashing-512' or 'ollama:nomic-embed-text'.", max_length=255)),
+                ('dimensions', models.PositiveSmallIntegerField(help_text='Length of the vector.')),
+                ('vector', models.BinaryField(help_text='float16 vector bytes.')),
+                ('content_hash', models.CharField(help_text='SHA-1 of the embedded text; the vector is recomputed when the text changes.', max_length=40)),
+                ('updated_at', models.DateTimeField(auto_now=True, help_text='Timestamp when the vector was last computed.')),
+                ('primary_study', models.ForeignKey(help_text='Embedded study.', on_delete=django.db.models.deletion.CASCADE, related_name='embeddings', to='slra.primarystudy')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['embedding_model', 'primary_study'], name='study_embedding_model_idx')],
+                'constraints': [models.UniqueConstraint(fields=('primary_study', 'embedding_model'), name='unique_study_embedding')],
+            },
+        ),
+    ]
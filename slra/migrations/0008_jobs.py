@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('slra', '0007_embeddings'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(help_text="Registered job handler, e.g. 'screen_studies'.", max_length=64)),
+                ('params', models.JSONField(blank=True, default=dict, help_text='Keyword parameters of the handler.')),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('succeeded', 'Succeeded'), ('failed', 'Failed'), ('cancelled', 'Cancelled')], default='queued', max_length=16)),
+                ('progress', models.FloatField(default=0.0, help_text='Completion percentage (0-100).')),
+                ('message', models.CharField(blank=True, help_text='Current step or last progress note.', max_length=255)),
+                ('steps', models.JSONField(blank=True, default=dict, editable=False, help_text='Results of completed steps (checkpoints for retries).')),
+                ('result', models.JSONField(blank=True, editable=False, help_text='Handler result once the job succeeded.', null=True)),
+                ('error', models.TextField(blank=True, editable=False, help_text='Error of the last failed attempt.')),
+                ('cancel_requested', models.BooleanField(default=False, help_text='Set to stop a running job at its next progress update.')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, editable=False, help_text='Number of times a worker picked the job up.')),
+                ('run_after', models.DateTimeField(blank=True, editable=False, help_text='Not picked up before this time (retry backoff).', null=True)),
+                ('worker', models.CharField(blank=True, editable=False, help_text='Worker running (or that last ran) the job.', max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, editable=False, null=True)),
+                ('heartbeat_at', models.DateTimeField(blank=True, editable=False, help_text='Last sign of life of the worker; stale running jobs are requeued.', null=True)),
+                ('finished_at', models.DateTimeField(blank=True, editable=False, null=True)),
+                ('systematic_review', models.ForeignKey(blank=True, help_text='Systematic review the job works on, if any.', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='jobs', to='slra.systematicreview')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'created_at'], name='job_status_created_idx')],
+            },
+        ),
+    ]
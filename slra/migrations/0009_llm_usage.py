@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('slra', '0008_jobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='llmquerylog',
+            name='cache_hit',
+            field=models.BooleanField(default=False, editable=False, help_text='Answered from the response cache, nothing sent to the provider.'),
+        ),
+        migrations.AddField(
+            model_name='llmquerylog',
+            name='completion_tokens',
+            field=models.PositiveIntegerField(blank=True, editable=False, help_text='Completion tokens, as reported by the provider or estimated locally.', null=True),
+        ),
+        migrations.AddField(
+            model_name='llmquerylog',
+            name='cost',
+            field=models.FloatField(blank=True, editable=False, help_text='Estimated cost in USD (settings.SLRA_LLM_PRICING).', null=True),
+        ),
+        migrations.AddField(
+            model_name='llmquerylog',
+            name='prompt_tokens',
+            field=models.PositiveIntegerField(blank=True, editable=False, help_text='Prompt tokens, as reported by the provider or estimated locally.', null=True),
+        ),
+        migrations.AddField(
+            model_name='llmquerylog',
+            name='retries',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, help_text='Retried provider requests (timeouts, 5xx, rate limits).'),
+        ),
+        migrations.AddField(
+            model_name='llmquerylog',
+            name='time_to_first_token',
+            field=models.FloatField(blank=True, editable=False, help_text='Seconds until the first token (streamed calls, or as reported by the provider).', null=True),
+        ),
+        migrations.AddField(
+            model_name='llmquerylog',
+            name='tokens_estimated',
+            field=models.BooleanField(default=False, editable=False, help_text='Token counts are local estimates (the provider reported none).'),
+        ),
+        migrations.AddField(
+            model_name='llmquerylog',
+            name='wall_time',
+            field=models.FloatField(blank=True, editable=False, help_text='Seconds from the call to the full response, retries included.', null=True),
+        ),
+    ]
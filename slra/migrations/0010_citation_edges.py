@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('slra', '0009_llm_usage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CitationEdge',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cited', models.ForeignKey(help_text='Study cited by the citing study.', on_delete=django.db.models.deletion.CASCADE, related_name='citation_edges', to='slra.primarystudy')),
+                ('citing', models.ForeignKey(help_text='Study whose reference list contains the cited study.', on_delete=django.db.models.deletion.CASCADE, related_name='reference_edges', to='slra.primarystudy')),
+                ('systematic_review', models.ForeignKey(help_text='Review whose citation graph the edge belongs to.', on_delete=django.db.models.deletion.CASCADE, related_name='citation_edges', to='slra.systematicreview')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('citing', 'cited'), name='unique_citation_edge')],
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('slra', '0010_citation_edges'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudyCentrality',
+            fields=[
+                ('primary_study', models.OneToOneField(help_text='Scored study.', on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='centrality', serialize=False, to='slra.primarystudy')),
+                ('pagerank', models.FloatField(default=0.0, help_text="PageRank in the review's citation graph (sums to 1 over the review).")),
+                ('in_degree', models.PositiveIntegerField(default=0, help_text='Studies of the review citing this one.')),
+                ('out_degree', models.PositiveIntegerField(default=0, help_text='Studies of the review this one cites.')),
+                ('co_citations', models.PositiveIntegerField(default=0, help_text='Times this study is cited together with another study of the review.')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CitationGraphSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('format_version', models.PositiveSmallIntegerField(help_text='Version of the binary format of `data`.')),
+                ('node_count', models.PositiveIntegerField(help_text='Studies in the graph.')),
+                ('edge_count', models.PositiveIntegerField(help_text='Citation edges in the graph.')),
+                ('last_edge_id', models.BigIntegerField(default=0, help_text='Highest CitationEdge ID included; later edges are merged on the next update.')),
+                ('data', models.BinaryField(help_text='Serialized CSR arrays (study IDs, row pointers, column indices).')),
+                ('updated_at', models.DateTimeField(auto_now=True, help_text='Timestamp when the graph and scores were last updated.')),
+                ('systematic_review', models.OneToOneField(help_text='Review whose citation graph this is.', on_delete=django.db.models.deletion.CASCADE, related_name='citation_graph', to='slra.systematicreview')),
+            ],
+        ),
+    ]
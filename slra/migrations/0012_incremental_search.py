@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('slra', '0011_citation_graph'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='digitallibrarysearch',
+            name='high_water_mark',
+            field=models.DateTimeField(blank=True, editable=False, help_text='Library fully searched up to this time; the next re-search of the query asks for newer results only.', null=True),
+        ),
+        migrations.AddField(
+            model_name='digitallibrarysearch',
+            name='new_results',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Results not stored before for this query and library (stored under this search).'),
+        ),
+        migrations.AddField(
+            model_name='digitallibrarysearch',
+            name='since',
+            field=models.DateTimeField(blank=True, editable=False, help_text='Lower date bound sent to the library (incremental re-search); empty for a full search.', null=True),
+        ),
+        migrations.AddField(
+            model_name='digitallibrarysearch',
+            name='updated_results',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Results already stored for this query and library whose details changed.'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('slra', '0012_incremental_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReviewStatistics',
+            fields=[
+                ('systematic_review', models.OneToOneField(help_text='Review counted.', on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='statistics', serialize=False, to='slra.systematicreview')),
+                ('studies', models.PositiveIntegerField(default=0, help_text='Primary studies of the review.')),
+                ('studies_by_relevancy', models.JSONField(default=dict, help_text='Studies per relevancy level.')),
+                ('studies_by_year', models.JSONField(default=dict, help_text='Studies per publication year (when known).')),
+                ('evaluations', models.PositiveIntegerField(default=0, help_text="Relevancy evaluations of the review's studies.")),
+                ('evaluations_by_evaluator', models.JSONField(default=dict, help_text='Relevancy evaluations per evaluator.')),
+                ('llm_calls', models.PositiveIntegerField(default=0, help_text='LLM queries logged for the review.')),
+                ('llm_calls_by_phase', models.JSONField(default=dict, help_text='LLM queries per review phase.')),
+                ('search_results', models.PositiveIntegerField(default=0, help_text="Search results of the review's queries.")),
+                ('search_results_by_library', models.JSONField(default=dict, help_text='Search results per digital library.')),
+                ('changed_at', models.DateTimeField(blank=True, db_index=True, help_text='Last write to the counted rows seen; newer than refreshed_at means the counts are stale.', null=True)),
+                ('refreshed_at', models.DateTimeField(help_text='Start of the last recomputation.')),
+            ],
+        ),
+    ]
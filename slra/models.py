@@ -1,5 +1,23 @@
+import hashlib
+import json
+
 from django.db import models
 
+from .fingerprints import extract_doi, title_fingerprint
+
+
+class DisplayQuerySet(models.QuerySet):
+    """
+    Default queryset of models whose __str__ walks foreign keys.
+    for_display() joins those relations (Model.display_related), so admin
+    changelists, select widgets and command listings that print objects
+    don't run one query per row.
+    """
+
+    def for_display(self):
+        return self.select_related(*self.model.display_related)
+
+
 # ------------------------------------------------------------------------
 # 1. Core Models for Systematic Review
 # ------------------------------------------------------------------------
@@ -46,6 +64,9 @@ class ResearchQuestion(models.Model):
         help_text="Full text of the research question."
     )
 
+    objects = DisplayQuerySet.as_manager()
+    display_related = ('systematic_review',)  # relations walked by __str__
+
     def __str__(self):
         return f"RQ for {self.systematic_review.name}: {self.question_text[:50]}..."
 
@@ -209,9 +230,54 @@ class PrimaryStudy(models.Model):
         help_text="Overall relevancy level after initial screening."
     )
 
+    # Deduplication (see slra.services.dedup)
+    doi = models.CharField(
+        max_length=255,
+        blank=True,
+        null=True,
+        db_index=True,
+        help_text="Normalized DOI, if known (extracted from the URL when not given)."
+    )
+    fingerprint = models.CharField(
+        max_length=40,
+        blank=True,
+        null=True,
+        db_index=True,
+        editable=False,
+        help_text="Hash of the normalized title, used to find exact duplicates."
+    )
+    duplicate_of = models.ForeignKey(
+        'self',
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name='duplicates',
+        help_text="Canonical study this one duplicates, if any."
+    )
+
+    class Meta:
+        indexes = [
+            # Review-scoped listings filtered by relevancy / year (API, admin filters, commands)
+            models.Index(fields=['systematic_review', 'relevancy_level'], name='study_review_relevancy_idx'),
+            models.Index(fields=['systematic_review', 'publication_year'], name='study_review_year_idx'),
+            # Quality checks such as citations__gt=50
+            models.Index(fields=['citations'], name='study_citations_idx'),
+        ]
+
     def __str__(self):
         return self.title[:80]
 
+    def refresh_fingerprint(self):
+        """
+        Recomputes doi/fingerprint from title and url (bulk_create skips save()).
+        """
+        self.doi = extract_doi(self.doi, self.url)[:255] or None
+        self.fingerprint = title_fingerprint(self.title) or None
+
+    def save(self, *args, **kwargs):
+        self.refresh_fingerprint()
+        super().save(*args, **kwargs)
+
 
 # ------------------------------------------------------------------------
 # 4. Search Queries & Libraries
@@ -235,6 +301,14 @@ class SearchQuery(models.Model):
         help_text="Timestamp when this query was recorded."
     )
 
+    objects = DisplayQuerySet.as_manager()
+    display_related = ('systematic_review',)  # relations walked by __str__
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['systematic_review', 'created_at'], name='query_review_created_idx'),
+        ]
+
     def __str__(self):
         return f"Query for {self.systematic_review.name}: {self.query_string[:50]}..."
 
@@ -301,10 +375,37 @@ class DigitalLibrarySearch(models.Model):
         help_text="Number of results returned by the library for this query."
     )
 
+    # Incremental re-search (see slra.services.library_search)
+    since = models.DateTimeField(
+        blank=True,
+        null=True,
+        editable=False,
+        help_text="Lower date bound sent to the library (incremental re-search); empty for a full search."
+    )
+    high_water_mark = models.DateTimeField(
+        blank=True,
+        null=True,
+        editable=False,
+        help_text="Library fully searched up to this time; the next re-search of the query asks for newer results only."
+    )
+    new_results = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="Results not stored before for this query and library (stored under this search)."
+    )
+    updated_results = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="Results already stored for this query and library whose details changed."
+    )
+
+    objects = DisplayQuerySet.as_manager()
+    display_related = ('library',)  # relations walked by __str__
+
     def __str__(self):
         return (f"Search on '{self.library.name}' "
                 f"({self.search_date.strftime('%Y-%m-%d %H:%M:%S')}) "
-                f"- Query ID: {self.search_query.id}")
+                f"- Query ID: {self.search_query_id}")
 
 
 class SearchResult(models.Model):
@@ -338,9 +439,48 @@ class SearchResult(models.Model):
         help_text="Abstract or summary of the publication."
     )
 
+    # Deduplication (see slra.services.dedup)
+    doi = models.CharField(
+        max_length=255,
+        blank=True,
+        null=True,
+        db_index=True,
+        help_text="Normalized DOI, if known (extracted from the URL when not given)."
+    )
+    fingerprint = models.CharField(
+        max_length=40,
+        blank=True,
+        null=True,
+        db_index=True,
+        editable=False,
+        help_text="Hash of the normalized title, used to find exact duplicates."
+    )
+    duplicate_of = models.ForeignKey(
+        'self',
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name='duplicates',
+        help_text="Earlier search result this one duplicates, if any."
+    )
+
+    objects = DisplayQuerySet.as_manager()
+    display_related = ('library_search__library',)  # relations walked by __str__
+
     def __str__(self):
         return f"Result from {self.library_search.library.name}: {self.title[:50]}"
 
+    def refresh_fingerprint(self):
+        """
+        Recomputes doi/fingerprint from title and url (bulk_create skips save()).
+        """
+        self.doi = extract_doi(self.doi, self.url)[:255] or None
+        self.fingerprint = title_fingerprint(self.title) or None
+
+    def save(self, *args, **kwargs):
+        self.refresh_fingerprint()
+        super().save(*args, **kwargs)
+
 
 # ------------------------------------------------------------------------
 # 5. Relevancy Evaluations
@@ -385,6 +525,16 @@ class RelevancyEvaluation(models.Model):
         help_text="Timestamp when this evaluation was recorded."
     )
 
+    objects = DisplayQuerySet.as_manager()
+    display_related = ('primary_study',)  # relations walked by __str__
+
+    class Meta:
+        indexes = [
+            # Latest evaluation(s) of a study, and the admin relevancy/evaluator filters
+            models.Index(fields=['primary_study', 'evaluated_at'], name='eval_study_evaluated_idx'),
+            models.Index(fields=['relevancy', 'evaluator'], name='eval_relevancy_evaluator_idx'),
+        ]
+
     def __str__(self):
         return f"{self.primary_study.title[:50]} - {self.get_relevancy_display()}"
 
@@ -457,6 +607,9 @@ class LLMModel(models.Model):
         help_text="Documentation or instructions on how to call this model."
     )
 
+    objects = DisplayQuerySet.as_manager()
+    display_related = ('provider',)  # relations walked by __str__
+
     class Meta:
         unique_together = ('provider', 'model_name', 'version')
 
@@ -508,6 +661,480 @@ class LLMQueryLog(models.Model):
         auto_now_add=True,
         help_text="Timestamp when this query was made."
     )
+    cache_key = models.CharField(
+        max_length=64,
+        blank=True,
+        null=True,
+        db_index=True,
+        editable=False,
+        help_text="Content hash of provider, model, prompt and params (response cache lookup)."
+    )
+    # Call instrumentation (slra.services.llm_usage), aggregated by /api/llm-usage/
+    wall_time = models.FloatField(
+        blank=True,
+        null=True,
+        editable=False,
+        help_text="Seconds from the call to the full response, retries included."
+    )
+    time_to_first_token = models.FloatField(
+        blank=True,
+        null=True,
+        editable=False,
+        help_text="Seconds until the first token (streamed calls, or as reported by the provider)."
+    )
+    prompt_tokens = models.PositiveIntegerField(
+        blank=True,
+        null=True,
+        editable=False,
+        help_text="Prompt tokens, as reported by the provider or estimated locally."
+    )
+    completion_tokens = models.PositiveIntegerField(
+        blank=True,
+        null=True,
+        editable=False,
+        help_text="Completion tokens, as reported by the provider or estimated locally."
+    )
+    tokens_estimated = models.BooleanField(
+        default=False,
+        editable=False,
+        help_text="Token counts are local estimates (the provider reported none)."
+    )
+    retries = models.PositiveSmallIntegerField(
+        default=0,
+        editable=False,
+        help_text="Retried provider requests (timeouts, 5xx, rate limits)."
+    )
+    cache_hit = models.BooleanField(
+        default=False,
+        editable=False,
+        help_text="Answered from the response cache, nothing sent to the provider."
+    )
+    cost = models.FloatField(
+        blank=True,
+        null=True,
+        editable=False,
+        help_text="Estimated cost in USD (settings.SLRA_LLM_PRICING)."
+    )
+
+    objects = DisplayQuerySet.as_manager()
+    display_related = ('systematic_review',)  # relations walked by __str__
+
+    class Meta:
+        indexes = [
+            # Review-scoped log listings by phase, newest first
+            models.Index(fields=['systematic_review', 'phase', 'created_at'], name='llmlog_review_phase_idx'),
+            # Phase filter across all reviews (admin LLMPhaseFilter)
+            models.Index(fields=['phase', 'created_at'], name='llmlog_phase_created_idx'),
+        ]
 
     def __str__(self):
         return f"LLM Query (Step {self.phase}) for {self.systematic_review.name}"
+
+    @staticmethod
+    def make_cache_key(llm_model, prompt_text, params=None):
+        """
+        SHA-256 over provider, model_name, version, prompt and generation params.
+        Identical requests to the same model always map to the same key.
+        """
+        payload = json.dumps(
+            [llm_model.provider.name, llm_model.model_name, llm_model.version or '',
+             prompt_text, params or {}],
+            sort_keys=True,
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def save(self, *args, **kwargs):
+        # Callers store the key the response was requested under (generation
+        # options included, see llm_usage.LLMCallStats). Without one, key the
+        # prompt with no options so later identical prompts can reuse it.
+        if not self.cache_key and self.llm_model_id and self.prompt_text:
+            llm_model = self.llm_model if LLMQueryLog.llm_model.is_cached(self) else None
+            if llm_model is None or not LLMModel.provider.is_cached(llm_model):
+                llm_model = LLMModel.objects.select_related('provider').get(pk=self.llm_model_id)
+            self.cache_key = self.make_cache_key(llm_model, self.prompt_text)
+        super().save(*args, **kwargs)
+
+
+class SearchIndexEntry(models.Model):
+    """
+    One term of the local inverted index (slra.services.search), used for
+    full-text search when the database has no FULLTEXT indexes.
+    Rows are derived data and can be rebuilt with `manage.py rebuild_search_index`.
+    """
+    target = models.CharField(
+        max_length=16,
+        help_text="Indexed model (search target name, e.g. 'studies')."
+    )
+    object_id = models.PositiveBigIntegerField(
+        help_text="Primary key of the indexed object."
+    )
+    term = models.CharField(
+        max_length=64,
+        help_text="Normalized term."
+    )
+    weight = models.FloatField(
+        help_text="Length-normalized, field-boosted term frequency."
+    )
+
+    class Meta:
+        indexes = [
+            # Posting lists (exact and prefix term lookups)
+            models.Index(fields=['target', 'term', 'object_id'], name='search_term_idx'),
+            # Re-indexing / removing one object
+            models.Index(fields=['target', 'object_id'], name='search_object_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.target}:{self.object_id} {self.term}"
+
+
+# ------------------------------------------------------------------------
+# 7. Embeddings (semantic similarity, slra.services.embeddings)
+# ------------------------------------------------------------------------
+
+class EmbeddingFields(models.Model):
+    """
+    Common columns of the embedding tables. Vectors are L2-normalized and
+    stored as raw float16 bytes (2 bytes per dimension).
+    """
+    embedding_model = models.CharField(
+        max_length=255,
+        help_text="Embedder that produced the vector, e.g. 'hashing-512' or 'ollama:nomic-embed-text'."
+    )
+    dimensions = models.PositiveSmallIntegerField(
+        help_text="Length of the vector."
+    )
+    vector = models.BinaryField(
+        help_text="float16 vector bytes."
+    )
+    content_hash = models.CharField(
+        max_length=40,
+        help_text="SHA-1 of the embedded text; the vector is recomputed when the text changes."
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        help_text="Timestamp when the vector was last computed."
+    )
+
+    class Meta:
+        abstract = True
+
+
+class StudyEmbedding(EmbeddingFields):
+    """
+    Embedding of a PrimaryStudy's title and abstract (one per study and embedder).
+    """
+    primary_study = models.ForeignKey(
+        PrimaryStudy,
+        on_delete=models.CASCADE,
+        related_name='embeddings',
+        help_text="Embedded study."
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['primary_study', 'embedding_model'], name='unique_study_embedding'),
+        ]
+        indexes = [
+            models.Index(fields=['embedding_model', 'primary_study'], name='study_embedding_model_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.embedding_model} embedding of study {self.primary_study_id}"
+
+
+class ResearchQuestionEmbedding(EmbeddingFields):
+    """
+    Embedding of a ResearchQuestion's text (one per question and embedder).
+    """
+    research_question = models.ForeignKey(
+        ResearchQuestion,
+        on_delete=models.CASCADE,
+        related_name='embeddings',
+        help_text="Embedded research question."
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['research_question', 'embedding_model'],
+                                    name='unique_question_embedding'),
+        ]
+
+    def __str__(self):
+        return f"{self.embedding_model} embedding of research question {self.research_question_id}"
+
+
+# ------------------------------------------------------------------------
+# 8. Background Jobs (slra.services.jobs, `manage.py run_jobs`)
+# ------------------------------------------------------------------------
+
+class Job(models.Model):
+    """
+    A long-running operation (library search, screening, LLM call, ...)
+    queued for the `run_jobs` worker instead of running in a request.
+    Completed steps are recorded in `steps`, so a retried or requeued job
+    skips the work it already did.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    CANCELLED = 'cancelled'
+    STATUS_CHOICES = (
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+        (CANCELLED, 'Cancelled'),
+    )
+    FINISHED_STATUSES = (SUCCEEDED, FAILED, CANCELLED)
+
+    kind = models.CharField(
+        max_length=64,
+        help_text="Registered job handler, e.g. 'screen_studies'."
+    )
+    params = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text="Keyword parameters of the handler."
+    )
+    systematic_review = models.ForeignKey(
+        SystematicReview,
+        on_delete=models.CASCADE,
+        related_name='jobs',
+        null=True,
+        blank=True,
+        help_text="Systematic review the job works on, if any."
+    )
+    status = models.CharField(
+        max_length=16,
+        choices=STATUS_CHOICES,
+        default=QUEUED
+    )
+    progress = models.FloatField(
+        default=0.0,
+        help_text="Completion percentage (0-100)."
+    )
+    message = models.CharField(
+        max_length=255,
+        blank=True,
+        help_text="Current step or last progress note."
+    )
+    steps = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        help_text="Results of completed steps (checkpoints for retries)."
+    )
+    result = models.JSONField(
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="Handler result once the job succeeded."
+    )
+    error = models.TextField(
+        blank=True,
+        editable=False,
+        help_text="Error of the last failed attempt."
+    )
+    cancel_requested = models.BooleanField(
+        default=False,
+        help_text="Set to stop a running job at its next progress update."
+    )
+    attempts = models.PositiveSmallIntegerField(
+        default=0,
+        editable=False,
+        help_text="Number of times a worker picked the job up."
+    )
+    run_after = models.DateTimeField(
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="Not picked up before this time (retry backoff)."
+    )
+    worker = models.CharField(
+        max_length=255,
+        blank=True,
+        editable=False,
+        help_text="Worker running (or that last ran) the job."
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True, editable=False)
+    heartbeat_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="Last sign of life of the worker; stale running jobs are requeued."
+    )
+    finished_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # Queue polling (oldest queued job first) and stale-job recovery
+            models.Index(fields=['status', 'created_at'], name='job_status_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"Job {self.pk} ({self.kind}, {self.status})"
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in self.FINISHED_STATUSES
+
+
+# ------------------------------------------------------------------------
+# 9. Citation Graph (slra.services.snowballing, slra.services.citation_graph)
+# ------------------------------------------------------------------------
+
+class CitationEdge(models.Model):
+    """
+    "citing cites cited" between two studies of a review, found by
+    backward (references) or forward (citations) snowballing. Only the
+    two study IDs are stored per edge, so graphs of tens of thousands of
+    edges stay small and load in one query.
+    """
+    systematic_review = models.ForeignKey(
+        SystematicReview,
+        on_delete=models.CASCADE,
+        related_name='citation_edges',
+        help_text="Review whose citation graph the edge belongs to."
+    )
+    citing = models.ForeignKey(
+        PrimaryStudy,
+        on_delete=models.CASCADE,
+        related_name='reference_edges',
+        help_text="Study whose reference list contains the cited study."
+    )
+    cited = models.ForeignKey(
+        PrimaryStudy,
+        on_delete=models.CASCADE,
+        related_name='citation_edges',
+        help_text="Study cited by the citing study."
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['citing', 'cited'], name='unique_citation_edge'),
+        ]
+
+    def __str__(self):
+        return f"{self.citing_id} cites {self.cited_id}"
+
+
+class CitationGraphSnapshot(models.Model):
+    """
+    A review's citation graph in compressed sparse row form, serialized by
+    slra.services.citation_graph (versioned binary format). Updated
+    incrementally from the CitationEdges added after last_edge_id.
+    """
+    systematic_review = models.OneToOneField(
+        SystematicReview,
+        on_delete=models.CASCADE,
+        related_name='citation_graph',
+        help_text="Review whose citation graph this is."
+    )
+    format_version = models.PositiveSmallIntegerField(
+        help_text="Version of the binary format of `data`."
+    )
+    node_count = models.PositiveIntegerField(
+        help_text="Studies in the graph."
+    )
+    edge_count = models.PositiveIntegerField(
+        help_text="Citation edges in the graph."
+    )
+    last_edge_id = models.BigIntegerField(
+        default=0,
+        help_text="Highest CitationEdge ID included; later edges are merged on the next update."
+    )
+    data = models.BinaryField(
+        help_text="Serialized CSR arrays (study IDs, row pointers, column indices)."
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        help_text="Timestamp when the graph and scores were last updated."
+    )
+
+    def __str__(self):
+        return f"Citation graph of review {self.systematic_review_id} ({self.node_count} studies, {self.edge_count} edges)"
+
+
+class StudyCentrality(models.Model):
+    """
+    Citation graph scores of a PrimaryStudy, computed with the graph
+    (slra.services.citation_graph) and used to order the studies API.
+    """
+    primary_study = models.OneToOneField(
+        PrimaryStudy,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='centrality',
+        help_text="Scored study."
+    )
+    pagerank = models.FloatField(
+        default=0.0,
+        help_text="PageRank in the review's citation graph (sums to 1 over the review)."
+    )
+    in_degree = models.PositiveIntegerField(
+        default=0,
+        help_text="Studies of the review citing this one."
+    )
+    out_degree = models.PositiveIntegerField(
+        default=0,
+        help_text="Studies of the review this one cites."
+    )
+    co_citations = models.PositiveIntegerField(
+        default=0,
+        help_text="Times this study is cited together with another study of the review."
+    )
+
+    def __str__(self):
+        return f"Centrality of study {self.primary_study_id}"
+
+
+# ------------------------------------------------------------------------
+# 10. Review Statistics (slra.services.review_stats)
+# ------------------------------------------------------------------------
+
+class ReviewStatistics(models.Model):
+    """
+    Denormalized counts of a review, served by /api/reviews/{id}/stats/ and
+    the admin filters instead of COUNT / DISTINCT scans of the big tables.
+    Writes to the review's studies, evaluations, LLM logs and search results
+    set changed_at (signals, bulk paths); the counts are recomputed when read
+    after a change, or by the review_stats job.
+    Histogram fields map keys (relevancy level, year, evaluator, phase,
+    library name) to counts.
+    """
+    systematic_review = models.OneToOneField(
+        SystematicReview,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='statistics',
+        help_text="Review counted."
+    )
+    studies = models.PositiveIntegerField(default=0, help_text="Primary studies of the review.")
+    studies_by_relevancy = models.JSONField(default=dict, help_text="Studies per relevancy level.")
+    studies_by_year = models.JSONField(default=dict, help_text="Studies per publication year (when known).")
+    evaluations = models.PositiveIntegerField(default=0, help_text="Relevancy evaluations of the review's studies.")
+    evaluations_by_evaluator = models.JSONField(default=dict, help_text="Relevancy evaluations per evaluator.")
+    llm_calls = models.PositiveIntegerField(default=0, help_text="LLM queries logged for the review.")
+    llm_calls_by_phase = models.JSONField(default=dict, help_text="LLM queries per review phase.")
+    search_results = models.PositiveIntegerField(default=0, help_text="Search results of the review's queries.")
+    search_results_by_library = models.JSONField(default=dict, help_text="Search results per digital library.")
+    changed_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        db_index=True,
+        help_text="Last write to the counted rows seen; newer than refreshed_at means the counts are stale."
+    )
+    refreshed_at = models.DateTimeField(
+        help_text="Start of the last recomputation."
+    )
+
+    def __str__(self):
+        return f"Statistics of review {self.systematic_review_id}"
+
+    @property
+    def stale(self) -> bool:
+        return self.changed_at is not None and self.changed_at >= self.refreshed_at
@@ -0,0 +1,58 @@
+from django.db.models import F
+from rest_framework.filters import OrderingFilter
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class PrimaryKeyCursorPagination(CursorPagination):
+    """
+    Default pagination of the API viewsets.
+    Cursor pagination keyed on the primary key (newest first): every page is
+    an indexed range scan (`WHERE id < cursor ORDER BY id DESC LIMIT n`),
+    so deep pages cost the same as the first one, unlike OFFSET paging,
+    and rows inserted while paging don't shift the pages.
+    GET /slra/api/primary-studies/?page_size=100 -> {"next", "previous", "results"}
+    """
+    ordering = '-pk'
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+
+class OrderedPageNumberPagination(PageNumberPagination):
+    """
+    Pagination of lists ordered by another field than the primary key
+    (?ordering=citations): a cursor only keeps the position of the first
+    ordering field, so it skips rows among ties or NULLs (all centrality
+    scores are 0 until computed). Used with StableOrderingFilter.
+    GET /slra/api/primary-studies/?ordering=-pagerank&page=2 -> {"count", "next", "previous", "results"}
+    """
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+
+class StableOrderingFilter(OrderingFilter):
+    """
+    OrderingFilter with NULLs last and the primary key as tiebreak, so that
+    each row is on exactly one page whatever the ties in the ordering field.
+    A view using it pages ?ordering= requests with OrderedPageNumberPagination
+    and keeps PrimaryKeyCursorPagination for its default order.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        ordering = self.get_ordering(request, queryset, view)
+        if not ordering:
+            return queryset
+        expressions = [F(name[1:]).desc(nulls_last=True) if name.startswith('-') else F(name).asc(nulls_last=True)
+                       for name in ordering]
+        if not {name.lstrip('-') for name in ordering} & {'pk', 'id'}:
+            expressions.append(F('pk').asc())
+        return queryset.order_by(*expressions)
+
+    def orders_by_request(self, request, view) -> bool:
+        """
+        True when the request asks for a valid ordering of its own (?ordering=).
+        """
+        params = request.query_params.get(self.ordering_param)
+        if not params:
+            return False
+        fields = [param.strip() for param in params.split(',')]
+        return bool(self.remove_invalid_fields(view.queryset, fields, view, request))
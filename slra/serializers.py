@@ -3,71 +3,142 @@ from .models import (
     SystematicReview, ResearchQuestion, HypothesisKeyword,
     PrimaryStudy, SearchQuery, DigitalLibrarySearch,
     SearchResult, RelevancyEvaluation, LLMProvider,
-    LLMModel, LLMQueryLog
+    LLMModel, LLMQueryLog, Job
 )
-
-
-class SystematicReviewSerializer(serializers.ModelSerializer):
+from .services import jobs
+
+
+def get_sparse_fieldset(request, field_names):
+    """
+    Field names selected by ?fields=a,b (keep only these) and/or ?omit=c,d
+    (drop these) on a GET request; None when the full representation is wanted.
+    Unknown names are rejected so typos don't silently return everything.
+    """
+    if request is None or request.method != 'GET':
+        return None
+    params = request.query_params
+    fields = [name for name in params.get('fields', '').split(',') if name.strip()]
+    omit = [name for name in params.get('omit', '').split(',') if name.strip()]
+    if not fields and not omit:
+        return None
+
+    field_names = list(field_names)
+    requested = [name.strip() for name in fields + omit]
+    unknown = sorted(set(requested) - set(field_names))
+    if unknown:
+        raise serializers.ValidationError({'fields': f"Unknown field(s): {', '.join(unknown)}."})
+
+    selected = [name.strip() for name in fields] if fields else field_names
+    omitted = {name.strip() for name in omit}
+    return [name for name in field_names if name in selected and name not in omitted]
+
+
+class SparseFieldsetModelSerializer(serializers.ModelSerializer):
+    """
+    ModelSerializer honouring ?fields= / ?omit= (see get_sparse_fieldset).
+    The viewsets trim the SELECT to the same fields.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        selected = get_sparse_fieldset(self.context.get('request'), self.fields)
+        if selected is not None:
+            for name in set(self.fields) - set(selected):
+                self.fields.pop(name)
+
+    def build_relational_field(self, field_name, relation_info):
+        field_class, field_kwargs = super().build_relational_field(field_name, relation_info)
+        # The browsable API renders related objects' __str__ in select widgets
+        queryset = field_kwargs.get('queryset')
+        if queryset is not None and hasattr(queryset, 'for_display'):
+            field_kwargs['queryset'] = queryset.for_display()
+        return field_class, field_kwargs
+
+
+class SystematicReviewSerializer(SparseFieldsetModelSerializer):
     class Meta:
         model = SystematicReview
         fields = '__all__'
 
 
-class ResearchQuestionSerializer(serializers.ModelSerializer):
+class ResearchQuestionSerializer(SparseFieldsetModelSerializer):
     class Meta:
         model = ResearchQuestion
         fields = '__all__'
 
 
-class HypothesisKeywordSerializer(serializers.ModelSerializer):
+class HypothesisKeywordSerializer(SparseFieldsetModelSerializer):
     class Meta:
         model = HypothesisKeyword
         fields = '__all__'
 
 
-class PrimaryStudySerializer(serializers.ModelSerializer):
+class PrimaryStudySerializer(SparseFieldsetModelSerializer):
+    # Citation graph scores (StudyCentrality), annotated by PrimaryStudyViewSet
+    pagerank = serializers.FloatField(read_only=True, allow_null=True)
+    in_degree = serializers.IntegerField(read_only=True, allow_null=True)
+    co_citations = serializers.IntegerField(read_only=True, allow_null=True)
+
     class Meta:
         model = PrimaryStudy
         fields = '__all__'
 
 
-class SearchQuerySerializer(serializers.ModelSerializer):
+class SearchQuerySerializer(SparseFieldsetModelSerializer):
     class Meta:
         model = SearchQuery
         fields = '__all__'
 
 
-class DigitalLibrarySearchSerializer(serializers.ModelSerializer):
+class DigitalLibrarySearchSerializer(SparseFieldsetModelSerializer):
     class Meta:
         model = DigitalLibrarySearch
         fields = '__all__'
 
 
-class SearchResultSerializer(serializers.ModelSerializer):
+class SearchResultSerializer(SparseFieldsetModelSerializer):
     class Meta:
         model = SearchResult
         fields = '__all__'
 
 
-class RelevancyEvaluationSerializer(serializers.ModelSerializer):
+class RelevancyEvaluationSerializer(SparseFieldsetModelSerializer):
     class Meta:
         model = RelevancyEvaluation
         fields = '__all__'
 
 
-class LLMProviderSerializer(serializers.ModelSerializer):
+class LLMProviderSerializer(SparseFieldsetModelSerializer):
     class Meta:
         model = LLMProvider
         fields = '__all__'
 
 
-class LLMModelSerializer(serializers.ModelSerializer):
+class LLMModelSerializer(SparseFieldsetModelSerializer):
     class Meta:
         model = LLMModel
         fields = '__all__'
 
 
-class LLMQueryLogSerializer(serializers.ModelSerializer):
+class LLMQueryLogSerializer(SparseFieldsetModelSerializer):
     class Meta:
         model = LLMQueryLog
         fields = '__all__'
+
+
+class JobSerializer(SparseFieldsetModelSerializer):
+    class Meta:
+        model = Job
+        fields = '__all__'
+        # Only kind, params and systematic_review are set by clients; the rest is worker state
+        read_only_fields = ('status', 'progress', 'message', 'cancel_requested')
+
+    def validate_kind(self, value):
+        if value not in jobs.job_kinds():
+            raise serializers.ValidationError(f"Unknown job kind. Must be one of {jobs.job_kinds()}.")
+        return value
+
+    def validate_params(self, value):
+        if not isinstance(value, dict):
+            raise serializers.ValidationError("Expected a JSON object of handler parameters.")
+        return value
@@ -0,0 +1,265 @@
+import html as html_lib
+import json
+import re
+from typing import Callable, Iterator, List, Optional
+from urllib.parse import urlsplit
+
+from bs4 import BeautifulSoup
+
+try:
+    from selectolax.parser import HTMLParser as SelectolaxParser
+except ImportError:  # optional, fastest backend
+    SelectolaxParser = None
+
+try:
+    import lxml.html
+except ImportError:  # optional
+    lxml = None
+
+
+TAG_RE = re.compile(r'<[^>]+>')
+SPACE_RE = re.compile(r'\s+')
+ABSTRACT_LABEL_RE = re.compile(r'^abstract\b[:.\s]*', re.IGNORECASE)
+
+
+def clean_text(text) -> str:
+    """
+    Collapses whitespace and drops markup (e.g. Crossref's JATS abstracts).
+    """
+    return SPACE_RE.sub(' ', TAG_RE.sub(' ', text or '')).strip()
+
+
+# --------------------------------------------------------------------
+# Extraction rules
+# --------------------------------------------------------------------
+
+# Abstract containers of publisher landing pages, by host (suffix match).
+# Selectors are limited to `tag`, `.class`, `#id` and their combinations.
+PUBLISHER_SELECTORS = {
+    'arxiv.org': ('blockquote.abstract',),
+    'dl.acm.org': ('section#abstract', 'div.abstractSection'),
+    'ieeexplore.ieee.org': ('div.abstract-text',),
+    'link.springer.com': ('section#Abs1', 'div#Abs1-content'),
+    'nature.com': ('div#Abs1-content',),
+    'sciencedirect.com': ('div.abstract.author', 'div#abstracts'),
+    'onlinelibrary.wiley.com': ('section.article-section__abstract',),
+    'mdpi.com': ('div.art-abstract',),
+    'pubmed.ncbi.nlm.nih.gov': ('div#eng-abstract', 'div.abstract-content'),
+    'semanticscholar.org': ('div.paper-detail-page__paper-abstract',),
+}
+
+# Meta tags holding the full abstract, tried before the generic containers
+ABSTRACT_META_NAMES = ('citation_abstract', 'dc.description', 'dcterms.abstract')
+
+# Generic containers, as scraped in main_test.py (`div.abstract`) and beyond
+GENERIC_SELECTORS = ('div.abstract', '#abstract', 'section.abstract', 'blockquote.abstract')
+
+# Often a shortened abstract: only used when nothing better is found
+SUMMARY_META_NAMES = ('description', 'og:description', 'twitter:description')
+
+# Characters parsed from the start of a matched container (partial parsing)
+FRAGMENT_CHARS = 16 * 1024
+
+SELECTOR_RE = re.compile(r'^(?P<tag>[a-z][a-z0-9]*)?(?P<rest>(?:[.#][\w-]+)*)$', re.IGNORECASE)
+META_RE = re.compile(r'<meta\b[^>]*>', re.IGNORECASE)
+ATTRIBUTE_RE = re.compile(r'([\w:.-]+)\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s>]+))')
+HEAD_END_RE = re.compile(r'</head\s*>|<body\b', re.IGNORECASE)
+JSON_LD_RE = re.compile(r'<script\b[^>]*type\s*=\s*["\']?application/ld\+json[^>]*>(.*?)</script>',
+                        re.IGNORECASE | re.DOTALL)
+
+
+class Selector:
+    """
+    A simple CSS selector (`div.abstract`, `#abstract`, `section#Abs1`) with
+    a regex locating candidate start tags in the raw HTML, so only a small
+    fragment from the match onwards is handed to the parser.
+    """
+
+    def __init__(self, css: str):
+        match = SELECTOR_RE.match(css)
+        if not css or match is None:
+            raise ValueError(f"Unsupported selector: {css!r}")
+        self.css = css
+        self.tag = (match.group('tag') or '').lower()
+        rest = match.group('rest')
+        self.classes = re.findall(r'\.([\w-]+)', rest)
+        ids = re.findall(r'#([\w-]+)', rest)
+        self.id = ids[0] if ids else None
+
+        attributes = [('class', name) for name in self.classes]
+        if self.id:
+            attributes.insert(0, ('id', self.id))
+        pattern = r'<' + (re.escape(self.tag) + r'\b' if self.tag else r'[a-z][a-z0-9]*\b')
+        for name, value in attributes:
+            # Lookahead per attribute: order-independent, token-bounded
+            pattern += (r'(?=[^>]*?\b' + name + r'\s*=\s*["\']?(?:[^"\'>]*?[\s"\'=])?'
+                        + re.escape(value) + r'(?![\w-]))')
+        self.start_re = re.compile(pattern, re.IGNORECASE)
+
+    @property
+    def xpath(self) -> str:
+        conditions = [f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')" for name in self.classes]
+        if self.id:
+            conditions.insert(0, f"@id='{self.id}'")
+        return f"//{self.tag or '*'}" + ''.join(f'[{condition}]' for condition in conditions)
+
+    def fragments(self, html: str) -> Iterator[str]:
+        for match in self.start_re.finditer(html):
+            yield html[match.start():match.start() + FRAGMENT_CHARS]
+
+    def __repr__(self):
+        return f'Selector({self.css!r})'
+
+
+def _selectors(names) -> List[Selector]:
+    return [Selector(css) for css in names]
+
+
+_PUBLISHER_RULES = {host: _selectors(names) for host, names in PUBLISHER_SELECTORS.items()}
+_GENERIC_RULES = _selectors(GENERIC_SELECTORS)
+
+
+def publisher_selectors(url: str) -> List[Selector]:
+    host = (urlsplit(url).hostname or '').lower()
+    for suffix, selectors in _PUBLISHER_RULES.items():
+        if host == suffix or host.endswith('.' + suffix):
+            return selectors
+    return []
+
+
+# --------------------------------------------------------------------
+# Parser backends
+# --------------------------------------------------------------------
+
+def _bs4_text(fragment: str, selector: Selector) -> Optional[str]:
+    tag = BeautifulSoup(fragment, 'html.parser').select_one(selector.css)
+    return tag.get_text(' ', strip=True) if tag is not None else None
+
+
+def _lxml_text(fragment: str, selector: Selector) -> Optional[str]:
+    try:
+        elements = lxml.html.document_fromstring(fragment).xpath(selector.xpath)
+    except (ValueError, lxml.etree.ParserError):
+        return None
+    return ' '.join(elements[0].itertext()) if elements else None
+
+
+def _selectolax_text(fragment: str, selector: Selector) -> Optional[str]:
+    node = SelectolaxParser(fragment).css_first(selector.css)
+    return node.text(separator=' ') if node is not None else None
+
+
+PARSERS = {
+    'selectolax': _selectolax_text if SelectolaxParser is not None else None,
+    'lxml': _lxml_text if lxml is not None else None,
+    'bs4': _bs4_text,
+}
+
+
+def available_parsers() -> List[str]:
+    return [name for name, backend in PARSERS.items() if backend is not None]
+
+
+def get_parser(name: str = 'auto') -> Callable[[str, Selector], Optional[str]]:
+    """
+    Fragment parser by name; 'auto' is the fastest installed one
+    (selectolax, lxml, then BeautifulSoup's html.parser).
+    """
+    if not name or name == 'auto':
+        name = available_parsers()[0]
+    if name not in PARSERS:
+        raise ValueError(f"Unknown HTML parser '{name}' (choose from {', '.join(PARSERS)}).")
+    if PARSERS[name] is None:
+        raise ValueError(f"HTML parser '{name}' is not installed.")
+    return PARSERS[name]
+
+
+# --------------------------------------------------------------------
+# Extraction
+# --------------------------------------------------------------------
+
+def meta_tags(html: str) -> dict:
+    """
+    name / property -> content of the meta tags in the <head> (first one wins).
+    """
+    head_end = HEAD_END_RE.search(html)
+    tags = {}
+    for tag in META_RE.finditer(html, 0, head_end.start() if head_end else len(html)):
+        attributes = {name.lower(): next((value for value in values if value), '')
+                      for name, *values in ATTRIBUTE_RE.findall(tag.group(0))}
+        key = (attributes.get('name') or attributes.get('property') or '').lower()
+        if key and 'content' in attributes:
+            tags.setdefault(key, html_lib.unescape(attributes['content']))
+    return tags
+
+
+def json_ld_abstract(html: str) -> str:
+    """
+    `abstract` (or the `description` of an article) from JSON-LD blocks.
+    """
+    for block in JSON_LD_RE.finditer(html):
+        try:
+            data = json.loads(block.group(1))
+        except ValueError:
+            continue
+        items = data if isinstance(data, list) else [data]
+        items += [item for data in list(items) if isinstance(data, dict)
+                  for item in data.get('@graph', []) if isinstance(item, dict)]
+        for item in items:
+            if not isinstance(item, dict):
+                continue
+            if isinstance(item.get('abstract'), str) and clean_text(item['abstract']):
+                return clean_text(html_lib.unescape(item['abstract']))
+            types = item.get('@type') if isinstance(item.get('@type'), list) else [item.get('@type')]
+            if any('Article' in str(kind) for kind in types) and isinstance(item.get('description'), str):
+                return clean_text(html_lib.unescape(item['description']))
+    return ''
+
+
+def _select(html: str, selectors: List[Selector], parse) -> str:
+    for selector in selectors:
+        for fragment in selector.fragments(html):
+            text = clean_text(parse(fragment, selector))
+            if text:
+                return ABSTRACT_LABEL_RE.sub('', text)
+    return ''
+
+
+def extract_abstract(html: str, url: str = '', parser: str = 'auto') -> str:
+    """
+    Abstract of a publisher landing page, without parsing the whole page.
+    In order, stopping at the first hit:
+    1. the publisher's container (PUBLISHER_SELECTORS, by the page URL)
+    2. citation / Dublin Core abstract meta tags in the <head>
+    3. JSON-LD `abstract`
+    4. a generic abstract container (`div.abstract`, `#abstract`, ...)
+    5. description / Open Graph meta tags
+    Containers are located with a regex and only a fragment starting at the
+    match is parsed, with `parser` ('auto', 'selectolax', 'lxml' or 'bs4').
+    """
+    if not html:
+        return ''
+    parse = get_parser(parser)
+    abstract = _select(html, publisher_selectors(url), parse) if url else ''
+    if abstract:
+        return abstract
+    tags = meta_tags(html)
+    for name in ABSTRACT_META_NAMES:
+        if clean_text(tags.get(name)):
+            return ABSTRACT_LABEL_RE.sub('', clean_text(tags[name]))
+    abstract = json_ld_abstract(html) or _select(html, _GENERIC_RULES, parse)
+    if abstract:
+        return abstract
+    for name in SUMMARY_META_NAMES:
+        if clean_text(tags.get(name)):
+            return clean_text(tags[name])
+    return ''
+
+
+def extract_abstract_full_parse(html: str) -> str:
+    """
+    Former approach (main_test.get_paper_details): the whole page parsed
+    with BeautifulSoup to find `div.abstract`. Baseline of benchmark_abstracts.
+    """
+    tag = BeautifulSoup(html, 'html.parser').find('div', class_='abstract')
+    return clean_text(tag.get_text(' ', strip=True)) if tag is not None else ''
@@ -0,0 +1,280 @@
+import struct
+import time
+from dataclasses import asdict, dataclass
+
+import numpy as np
+from django.conf import settings
+from django.db import connection, transaction
+
+from slra.models import CitationEdge, CitationGraphSnapshot, PrimaryStudy, StudyCentrality, SystematicReview
+
+DEFAULT_CITATION_GRAPH_SETTINGS = {
+    # PageRank damping factor (probability of following a citation)
+    'DAMPING': 0.85,
+    # Power iterations stop after this many, or once the L1 change is below TOLERANCE
+    'MAX_ITERATIONS': 100,
+    'TOLERANCE': 1e-10,
+    # Rows per INSERT when the StudyCentrality scores are written
+    'BATCH_SIZE': 2000,
+}
+
+
+def get_citation_graph_settings() -> dict:
+    options = dict(DEFAULT_CITATION_GRAPH_SETTINGS)
+    options.update(getattr(settings, 'SLRA_CITATION_GRAPH', {}))
+    return options
+
+
+# --------------------------------------------------------------------
+# Graph (CSR adjacency) and its binary format
+# --------------------------------------------------------------------
+
+FORMAT_MAGIC = b'SLCG'
+FORMAT_VERSION = 1
+# magic, version, nodes, edges, last CitationEdge ID; the arrays follow:
+# study IDs (int64, sorted), row pointers (int64, nodes + 1), cited nodes (int32, edges)
+_HEADER = struct.Struct('<4sHIIq')
+
+
+class CitationGraph:
+    """
+    Citation graph of a review in compressed sparse row form: node i is
+    study_ids[i] (sorted), and the nodes it cites are
+    indices[indptr[i]:indptr[i + 1]] (sorted, no duplicates or self-citations).
+    Three flat arrays instead of per-edge objects, so a graph of millions of
+    edges takes a few bytes per edge and every score is a vectorized pass.
+    """
+
+    def __init__(self, study_ids: np.ndarray, indptr: np.ndarray, indices: np.ndarray, last_edge_id: int = 0):
+        self.study_ids = study_ids
+        self.indptr = indptr
+        self.indices = indices
+        self.last_edge_id = last_edge_id
+
+    @classmethod
+    def from_edges(cls, study_ids, citing_ids, cited_ids, last_edge_id: int = 0) -> 'CitationGraph':
+        """
+        Builds the graph from parallel arrays of citing / cited study IDs.
+        Studies without edges are given in study_ids; edge endpoints are
+        added as nodes as well.
+        """
+        citing_ids = np.asarray(citing_ids, dtype=np.int64)
+        cited_ids = np.asarray(cited_ids, dtype=np.int64)
+        ids = np.unique(np.concatenate([np.asarray(study_ids, dtype=np.int64), citing_ids, cited_ids]))
+        src = np.searchsorted(ids, citing_ids)
+        dst = np.searchsorted(ids, cited_ids)
+        keep = src != dst
+        # Row-major edge keys: unique() sorts by citing node, then cited node
+        keys = np.unique(src[keep] * len(ids) + dst[keep])
+        counts = np.bincount(keys // len(ids), minlength=len(ids)) if len(ids) else np.zeros(0, dtype=np.int64)
+        indptr = np.concatenate([np.zeros(1, dtype=np.int64), np.cumsum(counts, dtype=np.int64)])
+        indices = (keys % len(ids)).astype(np.int32) if len(ids) else np.zeros(0, dtype=np.int32)
+        return cls(ids, indptr, indices, last_edge_id)
+
+    @classmethod
+    def empty(cls) -> 'CitationGraph':
+        return cls.from_edges([], [], [])
+
+    @property
+    def node_count(self) -> int:
+        return len(self.study_ids)
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.indices)
+
+    def edges(self):
+        """
+        (citing study IDs, cited study IDs) of every edge.
+        """
+        return np.repeat(self.study_ids, self.out_degree()), self.study_ids[self.indices]
+
+    def add_edges(self, study_ids, citing_ids, cited_ids, last_edge_id: int = None) -> 'CitationGraph':
+        """
+        Graph with new studies and edges merged in (already known ones are
+        ignored), without going back to the database for the existing edges.
+        """
+        citing, cited = self.edges()
+        return CitationGraph.from_edges(
+            np.concatenate([self.study_ids, np.asarray(study_ids, dtype=np.int64)]),
+            np.concatenate([citing, np.asarray(citing_ids, dtype=np.int64)]),
+            np.concatenate([cited, np.asarray(cited_ids, dtype=np.int64)]),
+            self.last_edge_id if last_edge_id is None else last_edge_id,
+        )
+
+    def to_bytes(self) -> bytes:
+        return b''.join([
+            _HEADER.pack(FORMAT_MAGIC, FORMAT_VERSION, self.node_count, self.edge_count, self.last_edge_id),
+            self.study_ids.astype('<i8').tobytes(),
+            self.indptr.astype('<i8').tobytes(),
+            self.indices.astype('<i4').tobytes(),
+        ])
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'CitationGraph':
+        """
+        Reads to_bytes() output; ValueError for other data or another format version.
+        """
+        data = bytes(data)
+        if len(data) < _HEADER.size:
+            raise ValueError("Truncated citation graph data.")
+        magic, version, nodes, edges, last_edge_id = _HEADER.unpack_from(data)
+        if magic != FORMAT_MAGIC:
+            raise ValueError("Not citation graph data.")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported citation graph format version {version}.")
+        if len(data) != _HEADER.size + 8 * nodes + 8 * (nodes + 1) + 4 * edges:
+            raise ValueError("Truncated citation graph data.")
+        offset = _HEADER.size
+        study_ids = np.frombuffer(data, dtype='<i8', count=nodes, offset=offset).astype(np.int64)
+        offset += 8 * nodes
+        indptr = np.frombuffer(data, dtype='<i8', count=nodes + 1, offset=offset).astype(np.int64)
+        offset += 8 * (nodes + 1)
+        indices = np.frombuffer(data, dtype='<i4', count=edges, offset=offset).astype(np.int32)
+        return cls(study_ids, indptr, indices, last_edge_id)
+
+    # ----------------------------------------------------------------
+    # Scores
+    # ----------------------------------------------------------------
+
+    def in_degree(self) -> np.ndarray:
+        """
+        Times each study is cited by studies of the review.
+        """
+        return np.bincount(self.indices, minlength=self.node_count)
+
+    def out_degree(self) -> np.ndarray:
+        """
+        Studies of the review each study cites.
+        """
+        return np.diff(self.indptr)
+
+    def co_citations(self) -> np.ndarray:
+        """
+        Co-citation count of each study: pairs (citing paper, other study
+        it cites) the study is part of, i.e. the row sums of the
+        co-citation matrix without forming it.
+        """
+        out = self.out_degree()
+        src = np.repeat(np.arange(self.node_count), out)
+        return np.rint(np.bincount(self.indices, weights=(out - 1)[src], minlength=self.node_count)).astype(np.int64)
+
+    def pagerank(self, damping: float = None, max_iterations: int = None, tolerance: float = None) -> np.ndarray:
+        """
+        PageRank by power iteration, one bincount per iteration. The rank
+        of studies citing nothing in the review is spread over all studies.
+        Sums to 1.
+        """
+        options = get_citation_graph_settings()
+        damping = options['DAMPING'] if damping is None else damping
+        max_iterations = max_iterations or options['MAX_ITERATIONS']
+        tolerance = options['TOLERANCE'] if tolerance is None else tolerance
+        n = self.node_count
+        if not n:
+            return np.zeros(0)
+        out = self.out_degree()
+        src = np.repeat(np.arange(n), out)
+        weights = 1.0 / out[src]
+        dangling = out == 0
+        rank = np.full(n, 1.0 / n)
+        for _ in range(max_iterations):
+            spread = np.bincount(self.indices, weights=rank[src] * weights, minlength=n)
+            updated = damping * spread + (1.0 - damping + damping * rank[dangling].sum()) / n
+            change = np.abs(updated - rank).sum()
+            rank = updated
+            if change < tolerance:
+                break
+        return rank
+
+
+# --------------------------------------------------------------------
+# Persistence and StudyCentrality
+# --------------------------------------------------------------------
+
+@dataclass
+class GraphUpdate:
+    """
+    Result of update_citation_graph.
+    """
+    nodes: int = 0
+    edges: int = 0
+    new_edges: int = 0      # edges merged by this update
+    rebuilt: bool = False   # built from all edges instead of the stored graph
+    elapsed: float = 0.0
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+def load_citation_graph(review: SystematicReview):
+    """
+    Stored graph of a review, or None when there is none or it can't be read
+    (older format version).
+    """
+    snapshot = CitationGraphSnapshot.objects.filter(systematic_review=review).first()
+    if snapshot is None:
+        return None
+    try:
+        return CitationGraph.from_bytes(snapshot.data)
+    except ValueError:
+        return None
+
+
+def update_citation_graph(review: SystematicReview, full: bool = False) -> GraphUpdate:
+    """
+    Brings a review's stored citation graph up to date and recomputes the
+    StudyCentrality scores of its studies.
+    Incremental: only CitationEdges added after the stored graph's
+    last_edge_id are read. The graph is rebuilt from all edges when asked
+    (full), when there is no readable stored graph, or when edges or studies
+    were removed since (e.g. deleted, or merged by deduplication).
+    """
+    started_at = time.monotonic()
+    options = get_citation_graph_settings()
+    update = GraphUpdate()
+    study_ids = np.fromiter(
+        PrimaryStudy.objects.filter(systematic_review=review, duplicate_of__isnull=True)
+        .values_list('pk', flat=True).iterator(chunk_size=5000),
+        dtype=np.int64,
+    )
+    edges = CitationEdge.objects.filter(systematic_review=review)
+
+    graph = None if full else load_citation_graph(review)
+    if graph is not None and (
+            edges.filter(pk__lte=graph.last_edge_id).count() != graph.edge_count
+            or not np.isin(graph.study_ids, study_ids).all()):
+        graph = None
+    if graph is None:
+        graph, update.rebuilt = CitationGraph.empty(), True
+
+    rows = np.array(list(edges.filter(pk__gt=graph.last_edge_id).order_by('pk')
+                         .values_list('pk', 'citing_id', 'cited_id').iterator(chunk_size=5000)),
+                    dtype=np.int64).reshape(-1, 3)
+    update.new_edges = len(rows)
+    last_edge_id = int(rows[-1, 0]) if len(rows) else graph.last_edge_id
+    graph = graph.add_edges(study_ids, rows[:, 1], rows[:, 2], last_edge_id)
+    update.nodes, update.edges = graph.node_count, graph.edge_count
+
+    pagerank = graph.pagerank()
+    in_degree, out_degree, co_citations = graph.in_degree(), graph.out_degree(), graph.co_citations()
+    scores = [
+        StudyCentrality(primary_study_id=int(study_id), pagerank=float(pagerank[i]), in_degree=int(in_degree[i]),
+                        out_degree=int(out_degree[i]), co_citations=int(co_citations[i]))
+        for i, study_id in enumerate(graph.study_ids)
+    ]
+    # MySQL upserts on the primary key without naming it
+    unique_fields = ['primary_study'] if connection.features.supports_update_conflicts_with_target else None
+    with transaction.atomic():
+        StudyCentrality.objects.bulk_create(
+            scores, batch_size=options['BATCH_SIZE'], update_conflicts=True, unique_fields=unique_fields,
+            update_fields=['pagerank', 'in_degree', 'out_degree', 'co_citations'],
+        )
+        CitationGraphSnapshot.objects.update_or_create(systematic_review=review, defaults={
+            'format_version': FORMAT_VERSION,
+            'node_count': graph.node_count,
+            'edge_count': graph.edge_count,
+            'last_edge_id': graph.last_edge_id,
+            'data': graph.to_bytes(),
+        })
+    update.elapsed = time.monotonic() - started_at
+    return update
@@ -0,0 +1,334 @@
+import zlib
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Tuple
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Q
+
+from slra.fingerprints import normalize_text
+from slra.models import CitationEdge, PrimaryStudy, RelevancyEvaluation, SearchResult
+from . import review_stats, search
+
+
+# Buckets larger than this are compared against their first member only
+# (keeps pathological buckets, e.g. many empty abstracts, linear).
+MAX_BUCKET_PAIRS = 50
+
+# MinHash parameters: NUM_PERM = BANDS * ROWS. With 16 bands of 4 rows, pairs
+# with Jaccard similarity around 0.5 and above become LSH candidates; they are
+# then confirmed against the requested threshold.
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 3
+DEFAULT_THRESHOLD = 0.8
+
+_MERSENNE_PRIME = (1 << 31) - 1
+_rng = np.random.RandomState(1)  # fixed seed: signatures must be stable across runs
+_PERM_A = _rng.randint(1, _MERSENNE_PRIME, size=NUM_PERM, dtype=np.int64)
+_PERM_B = _rng.randint(0, _MERSENNE_PRIME, size=NUM_PERM, dtype=np.int64)
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> set:
+    """
+    Word n-gram shingles of the normalized text (single words for very short texts).
+    """
+    words = normalize_text(text).split()
+    if len(words) < size:
+        return {' '.join(words)} if words else set()
+    return {' '.join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def minhash_signature(text: str) -> np.ndarray:
+    """
+    NUM_PERM-long MinHash signature of the text's shingles, computed in one
+    vectorized pass: h_i(x) = (a_i * x + b_i) mod p, minimised over shingles.
+    """
+    items = shingles(text)
+    if not items:
+        return None
+    hashes = np.fromiter((zlib.crc32(s.encode('utf-8')) & _MERSENNE_PRIME for s in items),
+                         dtype=np.int64, count=len(items))
+    values = (np.outer(_PERM_A, hashes) + _PERM_B[:, None]) % _MERSENNE_PRIME
+    return values.min(axis=1)
+
+
+class MinHashLSH:
+    """
+    Locality-sensitive index over MinHash signatures.
+    Signatures are split into BANDS bands; items sharing any band bucket are
+    candidates, so finding near-duplicates is roughly linear in the number of
+    items rather than quadratic.
+    """
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD):
+        self.threshold = threshold
+        self._buckets = defaultdict(list)
+        self._signatures = {}
+
+    def add(self, key, signature: np.ndarray):
+        self._signatures[key] = signature
+        for band in range(BANDS):
+            chunk = signature[band * ROWS:(band + 1) * ROWS]
+            self._buckets[(band, chunk.tobytes())].append(key)
+
+    def __len__(self):
+        return len(self._signatures)
+
+    def similarity(self, a, b) -> float:
+        """
+        Estimated Jaccard similarity: the share of equal signature positions.
+        """
+        return float(np.mean(self._signatures[a] == self._signatures[b]))
+
+    def candidate_pairs(self) -> Iterable[Tuple]:
+        seen = set()
+        for keys in self._buckets.values():
+            if len(keys) < 2:
+                continue
+            heads = keys if len(keys) <= MAX_BUCKET_PAIRS else keys[:1]
+            for i, a in enumerate(heads):
+                for b in keys[i + 1:]:
+                    pair = (a, b) if a < b else (b, a)
+                    if pair not in seen:
+                        seen.add(pair)
+                        yield pair
+
+    def duplicate_pairs(self) -> Iterable[Tuple]:
+        for a, b in self.candidate_pairs():
+            if self.similarity(a, b) >= self.threshold:
+                yield a, b
+
+
+class UnionFind:
+    """
+    Disjoint sets over item keys; the smallest key of each set is its root,
+    so the earliest-created record becomes the canonical one.
+    """
+
+    def __init__(self):
+        self._parent = {}
+
+    def find(self, key):
+        parent = self._parent.setdefault(key, key)
+        if parent != key:
+            parent = self._parent[key] = self.find(parent)
+        return parent
+
+    def union(self, a, b):
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a != root_b:
+            if root_b < root_a:
+                root_a, root_b = root_b, root_a
+            self._parent[root_b] = root_a
+
+    def groups(self) -> Dict:
+        """
+        Maps every non-root key to its root.
+        """
+        return {key: self.find(key) for key in list(self._parent) if self.find(key) != key}
+
+
+@dataclass
+class DedupReport:
+    """
+    Outcome of a deduplication pass.
+    """
+    scanned: int = 0
+    exact_duplicates: int = 0
+    near_duplicates: int = 0
+    linked: int = 0
+    unlinked: int = 0     # earlier duplicate_of links no longer backed by a match
+    merged: int = 0
+    duplicate_map: Dict[int, int] = field(default_factory=dict)  # duplicate id -> canonical id
+
+
+def find_duplicates(rows: Iterable[Tuple[int, str, str, str, str]],
+                    threshold: float = DEFAULT_THRESHOLD, near: bool = True) -> DedupReport:
+    """
+    Groups duplicate records.
+    - rows: (id, fingerprint, doi, title, abstract) tuples, e.g. from values_list().iterator().
+    - Exact duplicates share a title fingerprint or DOI (dict lookups).
+    - Near duplicates have MinHash-estimated Jaccard >= threshold over
+      title+abstract shingles (LSH candidates only).
+    """
+    report = DedupReport()
+    union = UnionFind()
+    by_key = {}
+    lsh = MinHashLSH(threshold) if near else None
+
+    for pk, fingerprint, doi, title, abstract in rows:
+        report.scanned += 1
+        for key in (('f', fingerprint), ('d', doi)):
+            if not key[1]:
+                continue
+            first = by_key.setdefault(key, pk)
+            if first != pk and union.find(first) != union.find(pk):
+                union.union(first, pk)
+                report.exact_duplicates += 1
+        if lsh is not None:
+            signature = minhash_signature(f"{title or ''} {abstract or ''}")
+            if signature is not None:
+                lsh.add(pk, signature)
+
+    if lsh is not None:
+        for a, b in lsh.duplicate_pairs():
+            if union.find(a) != union.find(b):
+                union.union(a, b)
+                report.near_duplicates += 1
+
+    report.duplicate_map = union.groups()
+    return report
+
+
+def _study_rows(queryset):
+    return queryset.order_by('pk').values_list('pk', 'fingerprint', 'doi', 'title', 'abstract') \
+        .iterator(chunk_size=2000)
+
+
+def deduplicate_studies(review, threshold: float = DEFAULT_THRESHOLD, near: bool = True,
+                        merge: bool = False, dry_run: bool = False) -> DedupReport:
+    """
+    Finds duplicate PrimaryStudy rows in a review.
+    - link (default): sets duplicate_of on every duplicate to its canonical study,
+      and clears the links of studies that no longer match anything.
+    - merge: moves relevancy evaluations to the canonical study, fills its empty
+      fields from the duplicates and keeps the highest relevancy level of the
+      group, then deletes the duplicates.
+    """
+    studies = PrimaryStudy.objects.filter(systematic_review=review)
+    report = find_duplicates(_study_rows(studies), threshold=threshold, near=near)
+    if dry_run:
+        return report
+
+    if merge:
+        report.merged = _merge_studies(report.duplicate_map) if report.duplicate_map else 0
+    else:
+        report.linked, report.unlinked = _link(studies, report.duplicate_map)
+    return report
+
+
+def deduplicate_search_results(review, threshold: float = DEFAULT_THRESHOLD, near: bool = True,
+                               dry_run: bool = False) -> DedupReport:
+    """
+    Links duplicate SearchResult rows across all library searches of a review
+    (duplicate_of points at the earliest result).
+    """
+    results = SearchResult.objects.filter(library_search__search_query__systematic_review=review)
+    report = find_duplicates(_study_rows(results), threshold=threshold, near=near)
+    if not dry_run:
+        report.linked, report.unlinked = _link(results, report.duplicate_map)
+    return report
+
+
+def _link(queryset, duplicate_map: Dict[int, int], batch_size: int = 1000) -> Tuple[int, int]:
+    """
+    Makes duplicate_of of the scanned rows match duplicate_map: links the
+    duplicates and clears stale links of rows that are no longer duplicates.
+    Only changed rows are written. Returns (linked, unlinked).
+    """
+    model = queryset.model
+    current = dict(queryset.filter(duplicate_of__isnull=False).values_list('pk', 'duplicate_of_id')
+                   .iterator(chunk_size=5000))
+    objects = [model(pk=pk, duplicate_of_id=canonical) for pk, canonical in duplicate_map.items()
+               if current.get(pk) != canonical]
+    stale = [model(pk=pk, duplicate_of_id=None) for pk in current if pk not in duplicate_map]
+    with transaction.atomic():
+        model.objects.bulk_update(objects + stale, ['duplicate_of'], batch_size=batch_size)
+    return len(duplicate_map), len(stale)
+
+
+MERGE_FILL_FIELDS = ('url', 'abstract', 'keywords', 'source', 'venue_id', 'publication_type',
+                     'publication_year', 'doi')
+# Relevancy levels from least to most relevant; a merged group keeps its highest
+RELEVANCY_RANK = {'N': 0, 'L': 1, 'M': 2, 'H': 3}
+
+
+def _merge_studies(duplicate_map: Dict[int, int], batch_size: int = 1000) -> int:
+    groups = defaultdict(list)
+    for pk, canonical in duplicate_map.items():
+        groups[canonical].append(pk)
+
+    with transaction.atomic():
+        canonicals = PrimaryStudy.objects.in_bulk(list(groups))
+        duplicates = PrimaryStudy.objects.in_bulk(list(duplicate_map))
+        changed = []
+        for canonical_pk, duplicate_pks in groups.items():
+            canonical = canonicals[canonical_pk]
+            filled = False
+            for duplicate in sorted((duplicates[pk] for pk in duplicate_pks), key=lambda d: d.pk):
+                for name in MERGE_FILL_FIELDS:
+                    if getattr(canonical, name) in (None, '') and getattr(duplicate, name) not in (None, ''):
+                        setattr(canonical, name, getattr(duplicate, name))
+                        filled = True
+                if (duplicate.citations or 0) > (canonical.citations or 0):
+                    canonical.citations = duplicate.citations
+                    filled = True
+                # Screened duplicates must not be folded into an unscreened (or less relevant) study
+                rank = RELEVANCY_RANK.get(duplicate.relevancy_level, 0)
+                if rank > RELEVANCY_RANK.get(canonical.relevancy_level, 0):
+                    canonical.relevancy_level = duplicate.relevancy_level
+                    filled = True
+            if filled:
+                changed.append(canonical)
+        PrimaryStudy.objects.bulk_update(
+            changed, list(MERGE_FILL_FIELDS) + ['citations', 'relevancy_level'], batch_size=batch_size
+        )
+
+        # Re-point evaluations, citation edges and earlier duplicate links, then drop the duplicates
+        duplicate_pks = list(duplicate_map)
+        for chunk in _chunks(duplicate_pks, batch_size):
+            evaluations = list(RelevancyEvaluation.objects.filter(primary_study_id__in=chunk)
+                               .only('pk', 'primary_study_id'))
+            for evaluation in evaluations:
+                evaluation.primary_study_id = duplicate_map[evaluation.primary_study_id]
+            RelevancyEvaluation.objects.bulk_update(evaluations, ['primary_study'], batch_size=batch_size)
+
+            linked = list(PrimaryStudy.objects.filter(duplicate_of_id__in=chunk)
+                          .exclude(pk__in=chunk).only('pk', 'duplicate_of_id'))
+            for study in linked:
+                study.duplicate_of_id = duplicate_map[study.duplicate_of_id]
+            PrimaryStudy.objects.bulk_update(linked, ['duplicate_of'], batch_size=batch_size)
+
+            edges = CitationEdge.objects.filter(Q(citing_id__in=chunk) | Q(cited_id__in=chunk))
+            repointed = []
+            for review_id, citing, cited in edges.values_list('systematic_review_id', 'citing_id', 'cited_id'):
+                citing, cited = duplicate_map.get(citing, citing), duplicate_map.get(cited, cited)
+                if citing != cited:
+                    repointed.append(CitationEdge(systematic_review_id=review_id, citing_id=citing, cited_id=cited))
+            edges.delete()
+            CitationEdge.objects.bulk_create(repointed, batch_size=batch_size, ignore_conflicts=True)
+        for chunk in _chunks(duplicate_pks, batch_size):
+            PrimaryStudy.objects.filter(pk__in=chunk).delete()
+            search.remove_objects('studies', chunk)
+        review_stats.mark_changed({canonical.systematic_review_id for canonical in canonicals.values()})
+    return len(duplicate_map)
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class ExactDuplicateFilter:
+    """
+    Import hook: remembers the fingerprints/DOIs already present in a review
+    (and those seen earlier in the same import) and reports rows that repeat them.
+    """
+
+    def __init__(self, review):
+        self._seen = set()
+        for fingerprint, doi in PrimaryStudy.objects.filter(systematic_review=review) \
+                .values_list('fingerprint', 'doi').iterator(chunk_size=5000):
+            if fingerprint:
+                self._seen.add(('f', fingerprint))
+            if doi:
+                self._seen.add(('d', doi))
+
+    def is_duplicate(self, study: PrimaryStudy) -> bool:
+        keys = [key for key in (('f', study.fingerprint), ('d', study.doi)) if key[1]]
+        duplicate = any(key in self._seen for key in keys)
+        self._seen.update(keys)
+        return duplicate
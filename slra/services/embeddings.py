@@ -0,0 +1,397 @@
+import hashlib
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import requests
+import together
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, Max
+
+from slra.models import (
+    LLMModel, PrimaryStudy, ResearchQuestion, ResearchQuestionEmbedding, StudyEmbedding, SystematicReview
+)
+from . import exceptions
+from .llm_clients import get_client_registry
+from .llm_integration import _http_error, _together_error, ollama_url
+from .llm_throttle import get_provider_guard
+from .search import tokenize
+
+
+DEFAULT_EMBEDDING_SETTINGS = {
+    # Dimensions of the local hashing embedder (used when no model is given)
+    'HASHING_DIMENSIONS': 1024,
+    # Texts sent per embedding request / written per bulk INSERT
+    'BATCH_SIZE': 64,
+    # Characters of title + abstract that are embedded
+    'MAX_TEXT_CHARS': 4000,
+}
+
+VECTOR_DTYPE = np.float16
+
+
+def get_embedding_settings() -> dict:
+    options = dict(DEFAULT_EMBEDDING_SETTINGS)
+    options.update(getattr(settings, 'SLRA_EMBEDDINGS', {}))
+    return options
+
+
+# ------------------------------------------------------------------------
+# Embedders
+# ------------------------------------------------------------------------
+
+class HashingEmbedder:
+    """
+    Local, dependency-free embedder: signed feature hashing of the search
+    terms (stop words removed) with sublinear term frequency, L2-normalized.
+    Captures lexical overlap only, but needs no model and is deterministic
+    across processes. Unrelated texts score around +-1/sqrt(dimensions).
+    """
+
+    def __init__(self, dimensions: int = 1024):
+        self.dimensions = dimensions
+        self.name = f"hashing-{dimensions}"
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        matrix = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for term in tokenize(text):
+                digest = zlib.crc32(term.encode('utf-8'))
+                sign = 1.0 if digest & 0x80000000 else -1.0
+                matrix[row, digest % self.dimensions] += sign
+        matrix = np.sign(matrix) * np.log1p(np.abs(matrix))
+        return normalize_rows(matrix)
+
+
+class OllamaEmbedder:
+    """
+    Embeddings from a local Ollama server (/api/embed), e.g. nomic-embed-text.
+    """
+
+    def __init__(self, llm_model: LLMModel):
+        self.llm_model = llm_model
+        self.model_name = llm_model.model_name + (f":{llm_model.version}" if llm_model.version else '')
+        self.name = f"ollama:{self.model_name}"
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        registry = get_client_registry()
+        url = ollama_url(self.llm_model.provider, '/api/embed')
+
+        def call():
+            try:
+                with registry.session(self.llm_model) as session:
+                    response = session.post(url, json={'model': self.model_name, 'input': texts},
+                                            timeout=registry.request_timeout)
+                response.raise_for_status()
+            except requests.RequestException as e:
+                raise _http_error("Ollama embedding request failed", e, getattr(e, 'response', None),
+                                  transient=isinstance(e, (requests.Timeout, requests.ConnectionError)))
+            try:
+                return response.json()['embeddings']
+            except (ValueError, KeyError) as e:
+                raise exceptions.LLMError(f"Unexpected Ollama embedding response: {e}")
+
+        vectors = get_provider_guard(self.llm_model.provider).call(call, ' '.join(texts), max_tokens=0)
+        return normalize_rows(np.asarray(vectors, dtype=np.float32))
+
+
+class TogetherEmbedder:
+    """
+    Embeddings from together.ai's embeddings endpoint.
+    """
+
+    def __init__(self, llm_model: LLMModel):
+        self.llm_model = llm_model
+        self.name = f"together:{llm_model.model_name}"
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        registry = get_client_registry()
+
+        def call():
+            try:
+                with registry.together_client(self.llm_model) as client:
+                    response = client.embeddings.create(model=self.llm_model.model_name, input=texts)
+            except together.TogetherError as e:
+                raise _together_error(e)
+            return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+        vectors = get_provider_guard(self.llm_model.provider).call(call, ' '.join(texts), max_tokens=0)
+        return normalize_rows(np.asarray(vectors, dtype=np.float32))
+
+
+def get_embedder(llm_model: LLMModel = None):
+    """
+    Embedder for an LLMModel (matched on the provider name like get_llm_response),
+    or the local hashing embedder when no model is given.
+    """
+    if llm_model is None:
+        return HashingEmbedder(get_embedding_settings()['HASHING_DIMENSIONS'])
+    provider_name = llm_model.provider.name.lower()
+    if 'ollama' in provider_name:
+        return OllamaEmbedder(llm_model)
+    if 'together' in provider_name:
+        return TogetherEmbedder(llm_model)
+    raise exceptions.LLMError(f"Provider '{llm_model.provider.name}' has no embedding support yet.")
+
+
+# ------------------------------------------------------------------------
+# Vector helpers
+# ------------------------------------------------------------------------
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def encode_vector(vector: np.ndarray) -> bytes:
+    return np.asarray(vector, dtype=VECTOR_DTYPE).tobytes()
+
+
+def decode_vectors(blobs: List[bytes], dimensions: int) -> np.ndarray:
+    """
+    Stacks float16 blobs into one float16 (n, dimensions) matrix.
+    """
+    if not blobs:
+        return np.zeros((0, dimensions), dtype=VECTOR_DTYPE)
+    data = np.frombuffer(b''.join(bytes(blob) for blob in blobs), dtype=VECTOR_DTYPE)
+    return data.reshape(len(blobs), dimensions)
+
+
+def cosine_scores(matrix: np.ndarray, queries: np.ndarray, block_size: int = 8192) -> np.ndarray:
+    """
+    (n, q) cosine similarities of normalized float16 rows against normalized
+    queries. Rows are upcast to float32 one block at a time, so the cached
+    matrix stays at half size.
+    """
+    queries = queries.astype(np.float32).T
+    scores = np.empty((len(matrix), queries.shape[1]), dtype=np.float32)
+    for start in range(0, len(matrix), block_size):
+        block = matrix[start:start + block_size].astype(np.float32)
+        np.matmul(block, queries, out=scores[start:start + block_size])
+    return scores
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def study_text(title: str, abstract: str, max_chars: int) -> str:
+    return f"{title or ''}\n{abstract or ''}"[:max_chars]
+
+
+# ------------------------------------------------------------------------
+# Indexing
+# ------------------------------------------------------------------------
+
+@dataclass
+class EmbeddingStats:
+    """
+    Outcome of an embed_studies run.
+    """
+    scanned: int = 0
+    embedded: int = 0
+    unchanged: int = 0
+    elapsed: float = 0.0
+
+
+def embed_studies(review: SystematicReview, embedder=None, batch_size: int = None,
+                  progress_callback: Callable[[EmbeddingStats], None] = None) -> EmbeddingStats:
+    """
+    Computes missing or stale embeddings for a review's studies, batch_size
+    texts per embedder call and one bulk write per batch. Studies whose text
+    hash matches the stored vector are skipped, so re-runs are incremental.
+    """
+    embedder = embedder or get_embedder()
+    options = get_embedding_settings()
+    batch_size = batch_size or options['BATCH_SIZE']
+    stats = EmbeddingStats()
+    started_at = time.monotonic()
+
+    existing = dict(StudyEmbedding.objects.filter(
+        primary_study__systematic_review=review, embedding_model=embedder.name
+    ).values_list('primary_study_id', 'content_hash'))
+
+    pending = []
+    rows = PrimaryStudy.objects.filter(systematic_review=review).order_by('pk') \
+        .values_list('pk', 'title', 'abstract').iterator(chunk_size=2000)
+    for pk, title, abstract in rows:
+        stats.scanned += 1
+        text = study_text(title, abstract, options['MAX_TEXT_CHARS'])
+        digest = content_hash(text)
+        if existing.get(pk) == digest:
+            stats.unchanged += 1
+            continue
+        pending.append((pk, text, digest))
+        if len(pending) >= batch_size:
+            _store_study_embeddings(embedder, pending)
+            stats.embedded += len(pending)
+            pending = []
+            stats.elapsed = time.monotonic() - started_at
+            if progress_callback is not None:
+                progress_callback(stats)
+    if pending:
+        _store_study_embeddings(embedder, pending)
+        stats.embedded += len(pending)
+    stats.elapsed = time.monotonic() - started_at
+    return stats
+
+
+def _store_study_embeddings(embedder, pending):
+    """
+    Upserts the vectors of a batch: new studies and studies whose text
+    changed in one statement (updated_at is set by the INSERT in both cases).
+    """
+    vectors = embedder.embed([text for _, text, _ in pending])
+    dimensions = vectors.shape[1]
+    embeddings = [
+        StudyEmbedding(primary_study_id=pk, embedding_model=embedder.name, dimensions=dimensions,
+                       vector=encode_vector(vector), content_hash=digest)
+        for (pk, _, digest), vector in zip(pending, vectors)
+    ]
+    # MySQL upserts on the unique constraint without naming it
+    unique_fields = ['primary_study', 'embedding_model'] \
+        if connection.features.supports_update_conflicts_with_target else None
+    StudyEmbedding.objects.bulk_create(
+        embeddings, update_conflicts=True, unique_fields=unique_fields,
+        update_fields=['dimensions', 'vector', 'content_hash', 'updated_at'],
+    )
+
+
+def question_vectors(review: SystematicReview, embedder) -> Tuple[List[int], Optional[np.ndarray]]:
+    """
+    (question ids, normalized matrix) for a review's research questions,
+    embedding new or edited questions on the fly.
+    """
+    questions = list(ResearchQuestion.objects.filter(systematic_review=review)
+                     .order_by('pk').values_list('pk', 'question_text'))
+    if not questions:
+        return [], None
+    stored = {e.research_question_id: e for e in ResearchQuestionEmbedding.objects.filter(
+        research_question__systematic_review=review, embedding_model=embedder.name)}
+
+    stale = [(pk, text) for pk, text in questions
+             if pk not in stored or stored[pk].content_hash != content_hash(text)]
+    if stale:
+        vectors = embedder.embed([text for _, text in stale])
+        with transaction.atomic():
+            for (pk, text), vector in zip(stale, vectors):
+                stored[pk], _ = ResearchQuestionEmbedding.objects.update_or_create(
+                    research_question_id=pk, embedding_model=embedder.name,
+                    defaults={'dimensions': len(vector), 'vector': encode_vector(vector),
+                              'content_hash': content_hash(text)},
+                )
+    ids = [pk for pk, _ in questions]
+    return ids, decode_vectors([stored[pk].vector for pk in ids], stored[ids[0]].dimensions)
+
+
+# ------------------------------------------------------------------------
+# Search
+# ------------------------------------------------------------------------
+
+class StudyMatrixCache:
+    """
+    Per-process cache of a review's study matrix per embedder, so ranking
+    doesn't decode every vector on each request. An entry is reused while the
+    review's embedding count and latest update are unchanged (one aggregate query).
+    """
+
+    def __init__(self, max_entries: int = 8):
+        self.max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, review: SystematicReview, embedding_model: str):
+        embeddings = StudyEmbedding.objects.filter(primary_study__systematic_review=review,
+                                                   embedding_model=embedding_model)
+        version = tuple(embeddings.aggregate(n=Count('pk'), latest=Max('updated_at')).values())
+        key = (review.pk, embedding_model)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                return entry[1], entry[2]
+
+        rows = list(embeddings.order_by('primary_study_id').values_list('primary_study_id', 'dimensions', 'vector'))
+        ids = np.array([pk for pk, _, _ in rows], dtype=np.int64)
+        matrix = decode_vectors([vector for _, _, vector in rows], rows[0][1] if rows else 0)
+        with self._lock:
+            if len(self._entries) >= self.max_entries and key not in self._entries:
+                self._entries.pop(next(iter(self._entries)))
+            self._entries[key] = (version, ids, matrix)
+        return ids, matrix
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_matrix_cache = StudyMatrixCache()
+
+
+def get_matrix_cache() -> StudyMatrixCache:
+    return _matrix_cache
+
+
+@dataclass
+class StudyMatch:
+    study_id: int
+    score: float
+    question_id: Optional[int] = None   # closest research question (None for free-text queries)
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Indices of the k highest scores, best first (argpartition, then sort only k).
+    """
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    candidates = np.argpartition(-scores, k - 1)[:k]
+    return candidates[np.argsort(-scores[candidates], kind='stable')]
+
+
+def rank_studies(review: SystematicReview, embedder=None, query: str = None, k: int = 50,
+                 exclude_ids=None) -> List[StudyMatch]:
+    """
+    Ranks a review's embedded studies by cosine similarity, highest first:
+    against a free-text query if given, otherwise against the closest of the
+    review's research questions. exclude_ids (e.g. already evaluated studies)
+    are left out.
+    """
+    embedder = embedder or get_embedder()
+    ids, matrix = get_matrix_cache().get(review, embedder.name)
+    if not len(ids):
+        return []
+
+    if query:
+        question_ids, queries = [None], embedder.embed([query])
+    else:
+        question_ids, queries = question_vectors(review, embedder)
+        if not question_ids:
+            return []
+    if queries.shape[1] != matrix.shape[1]:
+        raise exceptions.LLMError("Study and query embeddings have different dimensions; re-run embed_studies.")
+
+    similarities = cosine_scores(matrix, queries)
+    best_question = similarities.argmax(axis=1)
+    scores = similarities[np.arange(len(ids)), best_question]
+    if exclude_ids:
+        scores = np.where(np.isin(ids, np.fromiter(exclude_ids, dtype=np.int64)), -np.inf, scores)
+
+    matches = []
+    for index in top_k(scores, k):
+        if not np.isfinite(scores[index]):
+            break
+        matches.append(StudyMatch(int(ids[index]), float(scores[index]), question_ids[best_question[index]]))
+    return matches
+
+
+def embedded_counts(review: SystematicReview, embedding_model: str) -> Dict[str, int]:
+    total = PrimaryStudy.objects.filter(systematic_review=review).count()
+    embedded = StudyEmbedding.objects.filter(primary_study__systematic_review=review,
+                                             embedding_model=embedding_model).count()
+    return {'studies': total, 'embedded': embedded}
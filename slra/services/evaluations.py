@@ -0,0 +1,89 @@
+from dataclasses import dataclass
+from typing import List, Optional
+
+from django.db import transaction
+
+from slra.models import PrimaryStudy, RelevancyEvaluation
+from . import review_stats
+from .screening import RELEVANCY_LEVELS
+
+
+@dataclass
+class EvaluationOutcome:
+    """
+    Result of one decision submitted to bulk_evaluate.
+    Exactly one of `evaluation` / `error` is set.
+    """
+    index: int
+    study_id: object
+    evaluation: Optional[RelevancyEvaluation] = None
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def _study_id(decision: dict):
+    value = decision.get('study', decision.get('primary_study'))
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def bulk_evaluate(decisions: List[dict], evaluator: str = 'Unknown') -> List[EvaluationOutcome]:
+    """
+    Records manual relevancy decisions, each {"study": id, "relevancy":
+    "H"/"M"/"L"/"X", "notes": ..., "evaluator": ...}, with the semantics of
+    the single-study evaluate endpoint: an evaluation row per decision, and
+    the study's relevancy_level set to the decision (X leaves it "N").
+    All decisions are validated first (one query for the studies); the valid
+    ones are then written in one transaction, with one INSERT for the
+    evaluations and one UPDATE for the studies. Invalid decisions are
+    reported in their outcome and don't stop the others.
+    With several decisions for one study, the last one sets its level.
+    """
+    valid_choices = [choice[0] for choice in RelevancyEvaluation.RELEVANCY_CHOICES]
+    max_evaluator_length = RelevancyEvaluation._meta.get_field('evaluator').max_length
+    study_ids = {_study_id(decision) for decision in decisions if isinstance(decision, dict)}
+    studies = PrimaryStudy.objects.only('pk', 'relevancy_level').in_bulk(study_ids - {None})
+
+    outcomes, evaluations, changed = [], [], {}
+    for index, decision in enumerate(decisions):
+        if not isinstance(decision, dict):
+            outcomes.append(EvaluationOutcome(index, None, error="Each decision must be an object."))
+            continue
+        study_id = _study_id(decision)
+        outcome = EvaluationOutcome(index, study_id if study_id is not None else decision.get('study'))
+        outcomes.append(outcome)
+        relevancy = decision.get('relevancy')
+        if study_id is None:
+            outcome.error = "A study ID is required."
+        elif study_id not in studies:
+            outcome.error = f"No PrimaryStudy with ID {study_id}."
+        elif relevancy not in valid_choices:
+            outcome.error = f"Invalid relevancy. Must be one of {valid_choices}."
+        elif len(decision.get('evaluator') or evaluator) > max_evaluator_length:
+            outcome.error = f"Evaluator names are limited to {max_evaluator_length} characters."
+        if outcome.error:
+            continue
+
+        study = studies[study_id]
+        outcome.evaluation = RelevancyEvaluation(
+            primary_study=study,
+            evaluator=decision.get('evaluator') or evaluator,
+            relevancy=relevancy,
+            notes=decision.get('notes', ''),
+        )
+        evaluations.append(outcome.evaluation)
+        if study.relevancy_level != RELEVANCY_LEVELS[relevancy]:
+            study.relevancy_level = RELEVANCY_LEVELS[relevancy]
+            changed[study_id] = study
+
+    with transaction.atomic():
+        RelevancyEvaluation.objects.bulk_create(evaluations)
+        PrimaryStudy.objects.bulk_update(changed.values(), ['relevancy_level'])
+    if evaluations:
+        review_stats.mark_changed(systematic_review__primary_studies__in=list(studies))
+    return outcomes
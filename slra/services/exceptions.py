@@ -3,3 +3,35 @@ class LLMError(Exception):
     Generic exception to raise if an LLM call fails.
     """
     pass
+
+
+class LLMTransientError(LLMError):
+    """
+    Temporary LLM failure worth retrying (timeout, connection drop, 5xx, 429).
+    retry_after: seconds the provider asked us to wait, if it said so.
+    """
+    def __init__(self, message, retry_after: float = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class LLMRateLimitError(LLMTransientError):
+    """
+    The provider throttled the request (HTTP 429).
+    """
+    pass
+
+
+class LLMCircuitOpenError(LLMError):
+    """
+    Raised without calling the provider while its circuit breaker is open,
+    i.e. after repeated failures and before the cool-down has elapsed.
+    """
+    pass
+
+
+class LibrarySearchError(Exception):
+    """
+    A digital library search failed (unknown library, HTTP error, unparsable response).
+    """
+    pass
@@ -0,0 +1,263 @@
+import csv
+import json
+from dataclasses import dataclass
+from typing import Iterator, List, Tuple
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import QuerySet
+
+from slra.models import LLMQueryLog, PrimaryStudy, RelevancyEvaluation, SearchResult, SystematicReview
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # optional, only needed for Parquet exports
+    pyarrow = None
+
+
+DEFAULT_EXPORT_SETTINGS = {
+    # Rows fetched per query (keyset pages on the primary key)
+    'BATCH_SIZE': 2000,
+    # Rows buffered per Parquet row group
+    'ROW_GROUP_SIZE': 20000,
+}
+
+FORMATS = ('csv', 'jsonl', 'parquet')
+
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+
+def get_export_settings() -> dict:
+    options = dict(DEFAULT_EXPORT_SETTINGS)
+    options.update(getattr(settings, 'SLRA_EXPORT', {}))
+    return options
+
+
+@dataclass(frozen=True)
+class Dataset:
+    """
+    An exportable model: its columns (values_list lookups, primary key
+    first) and the lookup of its SystematicReview.
+    """
+    model: type
+    columns: Tuple[str, ...]
+    review_lookup: str
+
+
+DATASETS = {
+    'studies': Dataset(
+        PrimaryStudy,
+        ('id', 'systematic_review_id', 'title', 'abstract', 'keywords', 'url', 'doi', 'source', 'venue__name',
+         'publication_type', 'publication_year', 'citations', 'relevancy_level', 'duplicate_of_id'),
+        'systematic_review',
+    ),
+    'results': Dataset(
+        SearchResult,
+        ('id', 'library_search_id', 'library_search__library__name', 'library_search__search_query_id',
+         'title', 'authors', 'abstract', 'url', 'doi', 'duplicate_of_id'),
+        'library_search__search_query__systematic_review',
+    ),
+    'evaluations': Dataset(
+        RelevancyEvaluation,
+        ('id', 'primary_study_id', 'evaluator', 'relevancy', 'notes', 'evaluated_at'),
+        'primary_study__systematic_review',
+    ),
+    'logs': Dataset(
+        LLMQueryLog,
+        ('id', 'systematic_review_id', 'llm_model_id', 'llm_model__model_name', 'phase', 'prompt_text',
+         'response_text', 'created_at', 'cache_key', 'wall_time', 'time_to_first_token', 'prompt_tokens',
+         'completion_tokens', 'tokens_estimated', 'retries', 'cache_hit', 'cost'),
+        'systematic_review',
+    ),
+}
+
+
+def get_dataset(name: str) -> Dataset:
+    try:
+        return DATASETS[name]
+    except KeyError:
+        raise ValueError(f"Unknown dataset '{name}'. Must be one of {sorted(DATASETS)}.")
+
+
+def dataset_for_model(model) -> str:
+    """
+    Name of the dataset exporting a model (e.g. for admin actions).
+    """
+    return next(name for name, dataset in DATASETS.items() if dataset.model is model)
+
+
+# --------------------------------------------------------------------
+# Rows
+# --------------------------------------------------------------------
+
+def iter_batches(queryset: QuerySet, columns, batch_size: int) -> Iterator[List[tuple]]:
+    """
+    Yields lists of value tuples, one query per batch. Batches are keyset
+    pages on the primary key (pk > last one seen), so memory stays flat even
+    on MySQL, whose driver buffers a whole result set even with iterator().
+    """
+    queryset = queryset.order_by('pk').values_list(*columns)
+    last_pk = None
+    while True:
+        page = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        rows = list(page[:batch_size])
+        if not rows:
+            return
+        yield rows
+        if len(rows) < batch_size:
+            return
+        last_pk = rows[-1][0]
+
+
+def export_queryset(name: str, review: SystematicReview = None) -> QuerySet:
+    dataset = get_dataset(name)
+    queryset = dataset.model.objects.all()
+    if review is not None:
+        queryset = queryset.filter(**{dataset.review_lookup: review})
+    return queryset
+
+
+# --------------------------------------------------------------------
+# Writers
+# --------------------------------------------------------------------
+
+class _Echo:
+    """
+    File-like object returning what csv.writer writes instead of storing it.
+    """
+
+    def write(self, value):
+        return value
+
+
+def write_csv(batches, columns) -> Iterator[str]:
+    writer = csv.writer(_Echo())
+    yield writer.writerow(columns)
+    for rows in batches:
+        yield ''.join(writer.writerow(['' if value is None else value for value in row]) for row in rows)
+
+
+def write_jsonl(batches, columns) -> Iterator[str]:
+    for rows in batches:
+        yield ''.join(json.dumps(dict(zip(columns, row)), cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+                      for row in rows)
+
+
+class _ByteSink:
+    """
+    Write-only file for ParquetWriter, drained after every row group so the
+    file can be streamed while it is written.
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+ARROW_TYPES = {
+    'AutoField': 'int64', 'BigAutoField': 'int64', 'SmallAutoField': 'int64',
+    'IntegerField': 'int64', 'BigIntegerField': 'int64', 'SmallIntegerField': 'int64',
+    'PositiveIntegerField': 'int64', 'PositiveBigIntegerField': 'int64', 'PositiveSmallIntegerField': 'int64',
+    'FloatField': 'float64',
+    'BooleanField': 'bool_',
+}
+
+
+def arrow_schema(model, columns):
+    """
+    Parquet schema from the model fields behind the column lookups.
+    """
+    fields = []
+    for column in columns:
+        *relations, name = column.split('__')
+        opts = model._meta
+        for relation in relations:
+            opts = opts.get_field(relation).related_model._meta
+        field = opts.get_field(name)
+        if field.is_relation:
+            field = field.target_field
+        internal_type = field.get_internal_type()
+        if internal_type == 'DateTimeField':
+            arrow_type = pyarrow.timestamp('us', tz='UTC')
+        elif internal_type == 'DateField':
+            arrow_type = pyarrow.date32()
+        else:
+            arrow_type = getattr(pyarrow, ARROW_TYPES.get(internal_type, 'string'))()
+        fields.append(pyarrow.field(column, arrow_type))
+    return pyarrow.schema(fields)
+
+
+def write_parquet(batches, schema, row_group_size: int) -> Iterator[bytes]:
+    """
+    Columnar Parquet file, one row group per row_group_size rows; only the
+    current row group is held in memory.
+    """
+    sink = _ByteSink()
+    writer = pyarrow.parquet.ParquetWriter(sink, schema, compression='zstd')
+    buffered = []
+
+    def row_group():
+        table = pyarrow.Table.from_arrays(
+            [pyarrow.array(values, type=field.type) for values, field in zip(zip(*buffered), schema)],
+            schema=schema,
+        )
+        writer.write_table(table, row_group_size=len(buffered))
+        buffered.clear()
+        return sink.drain()
+
+    for rows in batches:
+        buffered.extend(rows)
+        if len(buffered) >= row_group_size:
+            yield row_group()
+    if buffered:
+        yield row_group()
+    writer.close()
+    yield sink.drain()
+
+
+def stream_export(name: str, export_format: str, review: SystematicReview = None, queryset: QuerySet = None,
+                  batch_size: int = None) -> Iterator:
+    """
+    Exports a dataset ('studies', 'results', 'evaluations' or 'logs') of a
+    review, or of the given queryset, as chunks of CSV / JSONL text or
+    Parquet bytes. Memory use doesn't grow with the number of rows.
+    """
+    if export_format not in FORMATS:
+        raise ValueError(f"Unknown export format '{export_format}'. Must be one of {list(FORMATS)}.")
+    if export_format == 'parquet' and pyarrow is None:
+        raise ImportError("Parquet exports need the optional 'pyarrow' package.")
+    dataset = get_dataset(name)
+    options = get_export_settings()
+    if queryset is None:
+        queryset = export_queryset(name, review)
+    batches = iter_batches(queryset, dataset.columns, batch_size or options['BATCH_SIZE'])
+    if export_format == 'csv':
+        return write_csv(batches, dataset.columns)
+    if export_format == 'jsonl':
+        return write_jsonl(batches, dataset.columns)
+    return write_parquet(batches, arrow_schema(dataset.model, dataset.columns), options['ROW_GROUP_SIZE'])
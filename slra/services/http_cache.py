@@ -0,0 +1,311 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Iterator, Optional
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from django.conf import settings
+
+
+DEFAULT_HTTP_CACHE_SETTINGS = {
+    'ENABLED': True,
+    # SQLite file of the cache (default: http_cache.sqlite3 next to manage.py)
+    'PATH': None,
+    # Upper bound of the stored (compressed) bodies; least recently used entries go first
+    'MAX_SIZE': 512 * 1024 * 1024,
+    # Freshness of responses without Cache-Control max-age / Expires (seconds)
+    'DEFAULT_TTL': 60 * 60 * 24 * 7,
+    # Upper bound of the freshness of search / listing API pages, whatever their
+    # headers: new publications appear in them, and a week-old page would hide
+    # them from the next (incremental) search
+    'LISTING_TTL': 60 * 5,
+    # Serve only from the cache, never touch the network (recorded fixtures, tests)
+    'OFFLINE': False,
+    'COMPRESSION_LEVEL': 6,
+}
+
+# Hop-by-hop and body-encoding headers that don't apply to the stored (decoded) body
+DROPPED_HEADERS = ('content-encoding', 'content-length', 'transfer-encoding', 'connection', 'set-cookie')
+
+
+def get_http_cache_settings() -> dict:
+    options = dict(DEFAULT_HTTP_CACHE_SETTINGS)
+    options.update(getattr(settings, 'SLRA_HTTP_CACHE', {}))
+    if not options['PATH']:
+        options['PATH'] = os.path.join(settings.BASE_DIR, 'http_cache.sqlite3')
+    return options
+
+
+@dataclass
+class CachedResponse:
+    url: str
+    status: int
+    headers: dict
+    body: bytes
+    expires_at: float
+
+    @property
+    def fresh(self) -> bool:
+        return self.expires_at > time.time()
+
+    def validators(self) -> dict:
+        """
+        Conditional request headers that let the server answer 304 Not Modified.
+        """
+        headers = {}
+        if self.headers.get('etag'):
+            headers['If-None-Match'] = self.headers['etag']
+        if self.headers.get('last-modified'):
+            headers['If-Modified-Since'] = self.headers['last-modified']
+        return headers
+
+    def to_response(self) -> requests.Response:
+        response = requests.Response()
+        response.status_code = self.status
+        response.headers = CaseInsensitiveDict(self.headers)
+        response._content = self.body
+        response.url = self.url
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        response.from_cache = True
+        return response
+
+
+def freshness_lifetime(headers, default_ttl: float) -> Optional[float]:
+    """
+    Seconds a response stays fresh: Cache-Control max-age, then Expires, then
+    the default. None when the response must not be stored (no-store).
+    """
+    cache_control = [part.strip().lower() for part in headers.get('Cache-Control', '').split(',')]
+    if 'no-store' in cache_control:
+        return None
+    if 'no-cache' in cache_control:
+        return 0.0
+    for part in cache_control:
+        if part.startswith('max-age='):
+            try:
+                return max(float(part[len('max-age='):]), 0.0)
+            except ValueError:
+                break
+    if headers.get('Expires'):
+        try:
+            return max(parsedate_to_datetime(headers['Expires']).timestamp() - time.time(), 0.0)
+        except (TypeError, ValueError):
+            return 0.0
+    return default_ttl
+
+
+class HttpCache:
+    """
+    Persistent cache of GET responses in a SQLite file, for the digital
+    library searches and abstract enrichment (slra.services.library_adapters).
+    - Entries are keyed by URL (query string included) plus the request
+      headers that select a variant (Accept, API keys, ...).
+    - Bodies are stored zlib-compressed; once MAX_SIZE is exceeded the least
+      recently used entries are evicted.
+    - Stale entries with an ETag / Last-Modified are revalidated with a
+      conditional request instead of being downloaded again.
+    - Listings (search result pages, listing=True) stay fresh for at most
+      listing_ttl; landing pages use the response headers or default_ttl.
+    - offline=True serves every request from the cache, stale or not, and
+      never touches the network (recorded fixtures, tests).
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS entries (
+            key TEXT PRIMARY KEY,
+            url TEXT NOT NULL,
+            status INTEGER NOT NULL,
+            headers TEXT NOT NULL,
+            body BLOB NOT NULL,
+            size INTEGER NOT NULL,
+            stored_at REAL NOT NULL,
+            expires_at REAL NOT NULL,
+            accessed_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS entries_accessed_idx ON entries (accessed_at);
+    """
+
+    def __init__(self, path: str, max_size: int = 512 * 1024 * 1024, default_ttl: float = 604800,
+                 offline: bool = False, compression_level: int = 6, listing_ttl: float = 300):
+        self.path = path
+        self.max_size = max_size
+        self.default_ttl = default_ttl
+        self.listing_ttl = listing_ttl
+        self.offline = offline
+        self.compression_level = compression_level
+        self._lock = threading.Lock()
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.executescript(self.SCHEMA)
+        self._size = self._connection.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+
+    @classmethod
+    def from_settings(cls):
+        options = get_http_cache_settings()
+        return cls(
+            options['PATH'],
+            max_size=options['MAX_SIZE'],
+            default_ttl=options['DEFAULT_TTL'],
+            offline=options['OFFLINE'],
+            compression_level=options['COMPRESSION_LEVEL'],
+            listing_ttl=options['LISTING_TTL'],
+        )
+
+    @staticmethod
+    def make_key(url: str, headers: dict = None) -> str:
+        variant = sorted((name.lower(), str(value)) for name, value in (headers or {}).items())
+        return hashlib.sha256(json.dumps([url, variant]).encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT url, status, headers, body, expires_at FROM entries WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._connection.execute('UPDATE entries SET accessed_at = ? WHERE key = ?', (time.time(), key))
+        url, status, headers, body, expires_at = row
+        return CachedResponse(url, status, json.loads(headers), zlib.decompress(body), expires_at)
+
+    def lifetime(self, headers, listing: bool = False) -> Optional[float]:
+        """
+        freshness_lifetime of a response, capped at listing_ttl for listings.
+        """
+        lifetime = freshness_lifetime(headers, self.default_ttl)
+        if listing and lifetime is not None:
+            lifetime = min(lifetime, self.listing_ttl)
+        return lifetime
+
+    def store(self, key: str, response: requests.Response, url: str = None, listing: bool = False) -> bool:
+        """
+        Stores a 200 response unless it forbids it (no-store); returns whether it was stored.
+        """
+        lifetime = self.lifetime(response.headers, listing)
+        if response.status_code != 200 or lifetime is None:
+            return False
+        headers = {name.lower(): value for name, value in response.headers.items()
+                   if name.lower() not in DROPPED_HEADERS}
+        body = zlib.compress(response.content, self.compression_level)
+        now = time.time()
+        with self._lock:
+            previous = self._connection.execute('SELECT size FROM entries WHERE key = ?', (key,)).fetchone()
+            self._connection.execute(
+                'INSERT OR REPLACE INTO entries (key, url, status, headers, body, size, stored_at, expires_at, '
+                'accessed_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (key, url or response.url, response.status_code, json.dumps(headers), body, len(body),
+                 now, now + lifetime, now),
+            )
+            self._size += len(body) - (previous[0] if previous else 0)
+            if self._size > self.max_size:
+                self._evict()
+        return True
+
+    def revalidated(self, key: str, headers, listing: bool = False) -> None:
+        """
+        Marks an entry fresh again after a 304 Not Modified.
+        """
+        lifetime = self.lifetime(headers, listing) or 0.0
+        now = time.time()
+        with self._lock:
+            self._connection.execute('UPDATE entries SET expires_at = ?, accessed_at = ? WHERE key = ?',
+                                     (now + lifetime, now, key))
+
+    def _evict(self):
+        """
+        Drops least recently used entries down to 90% of max_size (lock held).
+        """
+        target = self.max_size * 0.9
+        rows = self._connection.execute('SELECT key, size FROM entries ORDER BY accessed_at')
+        evicted = []
+        for key, size in rows:
+            if self._size <= target:
+                break
+            evicted.append((key,))
+            self._size -= size
+        self._connection.executemany('DELETE FROM entries WHERE key = ?', evicted)
+
+    def responses(self, content_type: str = '') -> Iterator[CachedResponse]:
+        """
+        Stored responses whose Content-Type contains content_type, e.g. the
+        landing pages for `manage.py benchmark_abstracts`. Doesn't touch the LRU order.
+        """
+        with self._lock:
+            keys = [row[0] for row in self._connection.execute('SELECT key FROM entries ORDER BY stored_at')]
+        for key in keys:
+            with self._lock:
+                row = self._connection.execute(
+                    'SELECT url, status, headers, body, expires_at FROM entries WHERE key = ?', (key,)
+                ).fetchone()
+            if row is None:
+                continue
+            url, status, headers, body, expires_at = row
+            headers = json.loads(headers)
+            if content_type in headers.get('content-type', ''):
+                yield CachedResponse(url, status, headers, zlib.decompress(body), expires_at)
+
+    def stats(self) -> dict:
+        with self._lock:
+            count, fresh = self._connection.execute(
+                'SELECT COUNT(*), COALESCE(SUM(expires_at > ?), 0) FROM entries', (time.time(),)
+            ).fetchone()
+        return {'entries': count, 'fresh': fresh, 'size': self._size, 'max_size': self.max_size}
+
+    def prune(self) -> int:
+        """
+        Deletes stale entries that can't be revalidated (no ETag / Last-Modified).
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                'SELECT key, headers, size FROM entries WHERE expires_at <= ?', (time.time(),)
+            ).fetchall()
+            dropped = [(key, size) for key, headers, size in rows
+                       if not {'etag', 'last-modified'} & set(json.loads(headers))]
+            self._connection.executemany('DELETE FROM entries WHERE key = ?', [(key,) for key, _ in dropped])
+            self._size -= sum(size for _, size in dropped)
+        return len(dropped)
+
+    def clear(self):
+        with self._lock:
+            self._connection.execute('DELETE FROM entries')
+            self._connection.execute('VACUUM')
+            self._size = 0
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_http_cache() -> Optional[HttpCache]:
+    """
+    Returns the process-wide HttpCache (None when disabled), opening it on first use.
+    """
+    global _cache
+    if _cache is None and get_http_cache_settings()['ENABLED']:
+        with _cache_lock:
+            if _cache is None:
+                _cache = HttpCache.from_settings()
+    return _cache
+
+
+def reset_http_cache():
+    """
+    Closes the cache file (next call reopens it from settings).
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is not None:
+            _cache.close()
+        _cache = None
@@ -0,0 +1,170 @@
+import csv
+import time
+from dataclasses import dataclass
+from itertools import islice
+from typing import Callable, Iterable, Iterator, List
+
+from django.db import transaction
+
+from slra.models import PrimaryStudy, SystematicReview, Venue
+from . import review_stats, search
+from .dedup import ExactDuplicateFilter
+
+
+DEFAULT_BATCH_SIZE = 1000
+
+# CSV column -> PrimaryStudy text field (besides title, which is required)
+TEXT_COLUMNS = ('url', 'abstract', 'keywords', 'source', 'publication_type')
+INTEGER_COLUMNS = ('publication_year', 'citations')
+
+
+@dataclass
+class ImportStats:
+    """
+    Running totals of a CSV import.
+    """
+    rows_read: int = 0
+    created: int = 0
+    skipped: int = 0          # rows without a title
+    coerced: int = 0          # non-numeric/negative integers stored as NULL
+    truncated: int = 0        # text values cut to their column's max_length
+    duplicates: int = 0       # rows repeating a title/DOI already in the review
+    venues_created: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows_read / self.elapsed if self.elapsed else 0.0
+
+
+def iter_chunks(rows: Iterable, size: int) -> Iterator[List]:
+    """
+    Splits an iterable into lists of at most `size` items without materializing it.
+    """
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def coerce_positive_int(value):
+    """
+    Parses CSV numbers such as '2019', ' 12 ' or '2019.0'.
+    Returns (int_or_None, valid) where valid is False if a non-empty value was dropped.
+    """
+    if value is None:
+        return None, True
+    value = str(value).strip()
+    if not value:
+        return None, True
+    try:
+        number = int(float(value.replace(',', '')))
+    except (TypeError, ValueError, OverflowError):
+        return None, False
+    if number < 0:
+        return None, False
+    return number, True
+
+
+class StudyImporter:
+    """
+    Streams a CSV export into PrimaryStudy rows for one SystematicReview.
+    Rows are read in fixed-size chunks, validated/coerced per chunk and
+    written with one bulk_create per chunk inside its own transaction, so
+    memory stays flat regardless of file size and a failure only rolls back
+    the current chunk.
+    Venue names (column 'venue') are resolved per chunk, one query for the names
+    not seen before, and remembered; missing venues are bulk-created once per chunk.
+    With skip_duplicates, rows whose title fingerprint or DOI is already in the
+    review (or earlier in the file) are not inserted.
+    """
+
+    def __init__(self, review: SystematicReview, batch_size: int = DEFAULT_BATCH_SIZE,
+                 progress_callback: Callable[[ImportStats], None] = None,
+                 skip_duplicates: bool = False):
+        self.review = review
+        self.batch_size = batch_size
+        self.progress_callback = progress_callback
+        self.stats = ImportStats()
+        self._venues = {}  # venue name -> pk, for the names met so far
+        self._duplicates = ExactDuplicateFilter(review) if skip_duplicates else None
+
+    def import_file(self, file_path: str) -> ImportStats:
+        with open(file_path, mode='r', encoding='utf-8', newline='') as f:
+            return self.import_rows(csv.DictReader(f))
+
+    def import_rows(self, rows: Iterable[dict]) -> ImportStats:
+        started_at = time.monotonic()
+        for chunk in iter_chunks(rows, self.batch_size):
+            studies = self._build_studies(chunk)
+            with transaction.atomic():
+                self._resolve_venues(studies)
+                created = PrimaryStudy.objects.bulk_create(
+                    [study for study, _ in studies], batch_size=self.batch_size
+                )
+                # bulk_create skips post_save, so feed the local search index here
+                search.index_objects('studies', created)
+                review_stats.mark_changed([self.review.pk])
+            self.stats.created += len(studies)
+            self.stats.elapsed = time.monotonic() - started_at
+            if self.progress_callback is not None:
+                self.progress_callback(self.stats)
+        self.stats.elapsed = time.monotonic() - started_at
+        return self.stats
+
+    def _build_studies(self, chunk):
+        """
+        Validates a chunk of CSV rows; returns (unsaved PrimaryStudy, venue name) pairs.
+        """
+        studies = []
+        max_lengths = {column: PrimaryStudy._meta.get_field(column).max_length for column in TEXT_COLUMNS}
+        for row in chunk:
+            self.stats.rows_read += 1
+            title = (row.get('title') or '').strip()
+            if not title:
+                # skip blank lines
+                self.stats.skipped += 1
+                continue
+
+            values = {}
+            for column in TEXT_COLUMNS:
+                value = (row.get(column) or '').strip()
+                max_length = max_lengths[column]
+                if max_length and len(value) > max_length:
+                    # A cut URL would point elsewhere: drop it
+                    value = '' if column == 'url' else value[:max_length].rstrip()
+                    self.stats.truncated += 1
+                values[column] = value or None
+            for column in INTEGER_COLUMNS:
+                values[column], valid = coerce_positive_int(row.get(column))
+                if not valid:
+                    self.stats.coerced += 1
+
+            study = PrimaryStudy(systematic_review=self.review, title=title, **values)
+            # bulk_create skips save(), so fill the dedup columns here
+            study.refresh_fingerprint()
+            if self._duplicates is not None and self._duplicates.is_duplicate(study):
+                self.stats.duplicates += 1
+                continue
+
+            venue_name = (row.get('venue') or '').strip()[:255] or None
+            studies.append((study, venue_name))
+        return studies
+
+    def _resolve_venues(self, studies):
+        unknown = {name for _, name in studies if name and name not in self._venues}
+        if unknown:
+            self._venues.update(Venue.objects.filter(name__in=unknown).values_list('name', 'pk'))
+
+        missing = unknown.difference(self._venues)
+        if missing:
+            Venue.objects.bulk_create([Venue(name=name) for name in missing])
+            # bulk_create doesn't return primary keys on every backend (MySQL), re-read them
+            self._venues.update(Venue.objects.filter(name__in=missing).values_list('name', 'pk'))
+            self.stats.venues_created += len(missing)
+
+        for study, name in studies:
+            if name:
+                study.venue_id = self._venues[name]
@@ -0,0 +1,516 @@
+import os
+import socket
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import timedelta
+from typing import Callable, Dict, Iterable, Optional
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, connections
+from django.db.models import F, Q
+from django.utils import timezone
+
+from slra.models import (
+    DigitalLibrarySearch, Job, LLMModel, LLMQueryLog, PrimaryStudy, SearchQuery, SystematicReview
+)
+from . import citation_graph, embeddings, research_questions, review_stats, screening, snowballing
+from .exceptions import LibrarySearchError
+from .library_adapters import get_library_settings
+from .library_search import run_library_search
+from .llm_integration import get_llm_response
+from .llm_usage import last_call_fields
+
+
+DEFAULT_JOB_SETTINGS = {
+    # Jobs run concurrently by one `run_jobs` process
+    'WORKERS': 4,
+    # Seconds an idle worker waits before polling the queue again
+    'POLL_INTERVAL': 2.0,
+    # A failing job is retried (resuming after its completed steps) up to this many runs
+    'MAX_ATTEMPTS': 3,
+    # Seconds before a failed attempt is retried, multiplied by the attempt number
+    'RETRY_DELAY': 30,
+    # Running jobs without a heartbeat for this long belong to a dead worker
+    # and are requeued; keep it above the slowest single step (LLM timeout)
+    'STALE_AFTER': 900,
+    # Minimum seconds between two progress writes of a job
+    'PROGRESS_INTERVAL': 1.0,
+}
+
+
+def get_job_settings() -> dict:
+    options = dict(DEFAULT_JOB_SETTINGS)
+    options.update(getattr(settings, 'SLRA_JOBS', {}))
+    return options
+
+
+class JobCancelled(Exception):
+    """
+    Raised inside a handler (at a progress update) once cancellation was requested.
+    """
+
+
+class JobError(Exception):
+    """
+    A permanent job failure (bad parameters, missing objects): not retried.
+    """
+
+
+# --------------------------------------------------------------------
+# Handler registry
+# --------------------------------------------------------------------
+
+_handlers: Dict[str, Callable] = {}
+
+
+def job_handler(kind: str):
+    """
+    Registers a function as the handler of a job kind. Handlers receive a
+    JobContext and return a JSON-serializable result.
+    """
+    def register(func):
+        _handlers[kind] = func
+        return func
+    return register
+
+
+def get_handler(kind: str) -> Callable:
+    try:
+        return _handlers[kind]
+    except KeyError:
+        raise JobError(f"Unknown job kind '{kind}'. Must be one of {sorted(_handlers)}.")
+
+
+def job_kinds():
+    return sorted(_handlers)
+
+
+# --------------------------------------------------------------------
+# Queue
+# --------------------------------------------------------------------
+
+def enqueue(kind: str, params: dict = None, review: SystematicReview = None) -> Job:
+    get_handler(kind)
+    return Job.objects.create(kind=kind, params=params or {}, systematic_review=review)
+
+
+def cancel(job: Job) -> Job:
+    """
+    Cancels a queued job right away; a running one stops at its next
+    progress update (completed steps are kept).
+    """
+    now = timezone.now()
+    if not Job.objects.filter(pk=job.pk, status=Job.QUEUED).update(status=Job.CANCELLED, finished_at=now):
+        Job.objects.filter(pk=job.pk, status=Job.RUNNING).update(cancel_requested=True)
+    job.refresh_from_db()
+    return job
+
+
+def claim_next(worker: str, kinds: Iterable[str] = None) -> Optional[Job]:
+    """
+    Atomically moves the oldest queued job to 'running' for this worker.
+    The claim is a conditional UPDATE (compare-and-swap on the status), so
+    concurrent workers never run the same job and no row lock is held.
+    """
+    queued = Job.objects.filter(status=Job.QUEUED)
+    if kinds:
+        queued = queued.filter(kind__in=list(kinds))
+    while True:
+        now = timezone.now()
+        pk = queued.filter(Q(run_after__isnull=True) | Q(run_after__lte=now)) \
+            .order_by('created_at', 'pk').values_list('pk', flat=True).first()
+        if pk is None:
+            return None
+        claimed = Job.objects.filter(pk=pk, status=Job.QUEUED).update(
+            status=Job.RUNNING, worker=worker, attempts=F('attempts') + 1,
+            started_at=now, heartbeat_at=now, error='',
+        )
+        if claimed:
+            return Job.objects.get(pk=pk)
+        # Another worker got it first; try the next one
+
+
+def requeue_stale(options: dict = None) -> int:
+    """
+    Requeues running jobs whose worker stopped sending heartbeats (crash,
+    OOM kill, deploy); jobs out of attempts are marked failed instead.
+    """
+    options = options or get_job_settings()
+    now = timezone.now()
+    stale = Job.objects.filter(status=Job.RUNNING, heartbeat_at__lt=now - timedelta(seconds=options['STALE_AFTER']))
+    stale.filter(attempts__gte=options['MAX_ATTEMPTS']).update(
+        status=Job.FAILED, finished_at=now, error='Worker stopped responding.'
+    )
+    return stale.update(status=Job.QUEUED)
+
+
+# --------------------------------------------------------------------
+# Running jobs
+# --------------------------------------------------------------------
+
+class JobContext:
+    """
+    What a handler sees of its job: parameters, throttled progress reports
+    (which double as heartbeat and cancellation check) and checkpointed steps.
+    """
+
+    def __init__(self, job: Job, options: dict = None):
+        self.job = job
+        self.options = options or get_job_settings()
+        self._last_report = 0.0
+
+    @property
+    def params(self) -> dict:
+        return self.job.params
+
+    def progress(self, percent: float, message: str = None, force: bool = False):
+        """
+        Records the completion percentage (at most every PROGRESS_INTERVAL
+        seconds unless forced) and raises JobCancelled if cancellation was requested.
+        """
+        now = time.monotonic()
+        if not force and now - self._last_report < self.options['PROGRESS_INTERVAL']:
+            return
+        self._last_report = now
+        self.job.progress = round(max(0.0, min(float(percent), 100.0)), 1)
+        fields = {'progress': self.job.progress, 'heartbeat_at': timezone.now()}
+        if message is not None:
+            self.job.message = fields['message'] = message[:Job._meta.get_field('message').max_length]
+        Job.objects.filter(pk=self.job.pk).update(**fields)
+        self.check_cancelled()
+
+    def check_cancelled(self):
+        if Job.objects.filter(pk=self.job.pk, cancel_requested=True).exists():
+            raise JobCancelled()
+
+    def step(self, name: str, func: Callable):
+        """
+        Runs one idempotent step: its result is stored on the job, and a
+        retried run returns the stored result instead of running it again.
+        """
+        if name in self.job.steps:
+            return self.job.steps[name]
+        self.check_cancelled()
+        value = func()
+        self.checkpoint(name, value)
+        return value
+
+    def checkpoint(self, name: str, value):
+        """
+        Stores a value on the job right away (e.g. IDs of rows a step is
+        writing, so a retry can clean them up).
+        """
+        self.job.steps[name] = value
+        Job.objects.filter(pk=self.job.pk).update(steps=self.job.steps, heartbeat_at=timezone.now())
+
+
+def run_job(job: Job, options: dict = None) -> Job:
+    """
+    Runs a claimed job to its next state: succeeded, cancelled, failed, or
+    back to queued for a retry.
+    """
+    options = options or get_job_settings()
+    context = JobContext(job, options)
+    try:
+        result = get_handler(job.kind)(context)
+    except JobCancelled:
+        fields = {'status': Job.CANCELLED, 'message': 'Cancelled.'}
+    except Exception as e:
+        fields = {'status': Job.FAILED, 'error': traceback.format_exc()}
+        if not isinstance(e, JobError) and job.attempts < options['MAX_ATTEMPTS']:
+            delay = options['RETRY_DELAY'] * job.attempts
+            fields.update(status=Job.QUEUED, run_after=timezone.now() + timedelta(seconds=delay))
+    else:
+        fields = {'status': Job.SUCCEEDED, 'result': result, 'progress': 100.0, 'message': 'Done.'}
+
+    if fields['status'] != Job.QUEUED:
+        fields['finished_at'] = timezone.now()
+    for name, value in fields.items():
+        setattr(job, name, value)
+    Job.objects.filter(pk=job.pk).update(**fields)
+    return job
+
+
+class Worker:
+    """
+    Runs queued jobs on a pool of threads. Each thread claims a job, runs it
+    and polls again; with `once`, threads exit when the queue is empty.
+    """
+
+    def __init__(self, workers: int = None, poll_interval: float = None, kinds: Iterable[str] = None,
+                 once: bool = False, on_finished: Callable[[Job], None] = None):
+        self.options = get_job_settings()
+        self.workers = workers or self.options['WORKERS']
+        self.poll_interval = self.options['POLL_INTERVAL'] if poll_interval is None else poll_interval
+        self.kinds = list(kinds) if kinds else None
+        self.once = once
+        self.on_finished = on_finished
+        self.name = f"{socket.gethostname()}:{os.getpid()}"
+        self.stopping = threading.Event()
+
+    def run(self):
+        requeue_stale(self.options)
+        stats_options = review_stats.get_review_stats_settings()
+        last_stats_refresh = time.monotonic()
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='slra-job') as pool:
+            futures = [pool.submit(self._loop, f"{self.name}:{index}") for index in range(self.workers)]
+            try:
+                pending = futures
+                while pending:
+                    _, pending = wait(pending, timeout=1.0)
+                    if pending and time.monotonic() - last_stats_refresh > stats_options['REFRESH_INTERVAL']:
+                        self._refresh_statistics(stats_options)
+                        last_stats_refresh = time.monotonic()
+            except KeyboardInterrupt:
+                # Running jobs finish their current handler call before the pool exits
+                self.stop()
+                raise
+            for future in futures:
+                future.result()
+
+    def stop(self):
+        self.stopping.set()
+
+    @staticmethod
+    def _refresh_statistics(stats_options: dict):
+        """
+        Keeps the review statistics read by the admin filters current: the
+        reviews changed since their last refresh, and those older than MAX_AGE.
+        """
+        close_old_connections()
+        try:
+            review_stats.refresh_stale(max_age=stats_options['MAX_AGE'])
+        except DatabaseError:
+            pass  # retried at the next interval
+
+    def _loop(self, worker: str):
+        last_recovery = time.monotonic()
+        try:
+            while not self.stopping.is_set():
+                close_old_connections()
+                if time.monotonic() - last_recovery > self.options['STALE_AFTER'] / 2:
+                    requeue_stale(self.options)
+                    last_recovery = time.monotonic()
+                job = claim_next(worker, self.kinds)
+                if job is None:
+                    if self.once:
+                        return
+                    self.stopping.wait(self.poll_interval)
+                    continue
+                run_job(job, self.options)
+                if self.on_finished is not None:
+                    self.on_finished(job)
+        finally:
+            # Thread-local connections of this pool thread
+            connections.close_all()
+
+
+# --------------------------------------------------------------------
+# Handlers
+# --------------------------------------------------------------------
+
+def _get(model, pk, label: str):
+    queryset = model.objects.select_related('provider') if model is LLMModel else model.objects.all()
+    try:
+        return queryset.get(pk=pk)
+    except (model.DoesNotExist, TypeError, ValueError):
+        raise JobError(f"{label} with ID {pk} not found.")
+
+
+@job_handler('library_search')
+def library_search_job(context: JobContext):
+    """
+    params: search_query_id, libraries (DigitalLibrary names), max_results, enrich (default true),
+    incremental (only results newer than the query's previous searches, default false)
+    A retry first deletes the library searches a failed attempt left half-written;
+    results it stored are found again and updated rather than duplicated.
+    """
+    params = context.params
+    search_query = _get(SearchQuery, params.get('search_query_id'), 'SearchQuery')
+    libraries = params.get('libraries') or [params.get('library_name') or '']
+    max_results = params.get('max_results') or get_library_settings()['MAX_RESULTS']
+    if 'search' not in context.job.steps and context.job.steps.get('partial'):
+        DigitalLibrarySearch.objects.filter(pk__in=context.job.steps['partial']).delete()
+
+    def report(outcomes):
+        done = sum(min(outcome.fetched, max_results) for outcome in outcomes)
+        context.progress(100.0 * done / (max_results * len(outcomes)),
+                         ', '.join(f"{outcome.library}: {outcome.fetched}" for outcome in outcomes))
+
+    def search():
+        context.progress(0, f"Searching {', '.join(libraries)}", force=True)
+        try:
+            outcomes = run_library_search(
+                search_query, libraries, max_results=max_results, enrich=params.get('enrich', True),
+                progress_callback=report, incremental=bool(params.get('incremental')),
+                on_start=lambda searches: context.checkpoint('partial', [item.pk for item in searches]),
+            )
+        except LibrarySearchError as e:
+            raise JobError(str(e))
+        return {
+            outcome.library: {
+                'library_search': outcome.library_search.pk, 'results': outcome.results,
+                'updated': outcome.updated, 'unchanged': outcome.unchanged,
+                'total_found': outcome.total_found, 'enriched': outcome.enriched, 'error': outcome.error,
+            }
+            for outcome in outcomes
+        }
+    return context.step('search', search)
+
+
+@job_handler('send_prompt')
+def send_prompt_job(context: JobContext):
+    """
+    params: query_log_id, prompt_override (optional)
+    """
+    query_log = _get(LLMQueryLog, context.params.get('query_log_id'), 'LLMQueryLog')
+    if query_log.llm_model_id is None:
+        raise JobError("This query log has no LLM model to send the prompt to.")
+    llm_model = _get(LLMModel, query_log.llm_model_id, 'LLM Model')
+    prompt_text = context.params.get('prompt_override') or query_log.prompt_text
+
+    def respond():
+        return {'response_text': get_llm_response(llm_model, prompt_text), **last_call_fields()}
+
+    context.progress(0, f"Waiting for {llm_model}", force=True)
+    response = context.step('response', respond)
+    query_log.llm_model = llm_model
+    query_log.prompt_text = prompt_text
+    for name, value in response.items():
+        setattr(query_log, name, value)
+    query_log.save()
+    return {'query_log': query_log.pk}
+
+
+@job_handler('generate_research_questions')
+def generate_research_questions_job(context: JobContext):
+    """
+    params: review_id, model_id, topic, num_questions (default 10), save (default false)
+    """
+    params = context.params
+    review = _get(SystematicReview, params.get('review_id'), 'Systematic Review')
+    llm_model = _get(LLMModel, params.get('model_id'), 'LLM Model')
+    if not (params.get('topic') or '').strip():
+        raise JobError("A topic is required.")
+
+    context.progress(0, f"Waiting for {llm_model}", force=True)
+    return context.step('generate', lambda: research_questions.generate_questions(
+        review, llm_model, params['topic'].strip(), int(params.get('num_questions') or 10),
+        save=bool(params.get('save')),
+    ))
+
+
+@job_handler('screen_studies')
+def screen_studies_job(context: JobContext):
+    """
+    params: review_id, model_id, evaluator, limit, studies_per_prompt, prompts_per_round, use_cache
+    Resumable by construction: studies the evaluator already rated are skipped.
+    """
+    params = context.params
+    review = _get(SystematicReview, params.get('review_id'), 'Systematic Review')
+    llm_model = _get(LLMModel, params.get('model_id'), 'LLM Model')
+    screener = screening.StudyScreener(
+        review, llm_model, evaluator=params.get('evaluator'),
+        studies_per_prompt=params.get('studies_per_prompt'), prompts_per_round=params.get('prompts_per_round'),
+        use_cache=params.get('use_cache', True),
+    )
+    # Progress is measured against the work pending when the job first ran
+    pending = screening.pending_studies(review, screener.evaluator).count()
+    total = context.step('total', lambda: min(pending, params['limit']) if params.get('limit') else pending)
+    done_before = max(total - pending, 0)
+
+    def report(stats):
+        done = done_before + stats.screened
+        context.progress(100.0 * done / total if total else 100.0,
+                         f"{done} of {total} studies screened ({stats.evaluated} evaluated this run)")
+
+    screener.progress_callback = report
+    limit = max(total - done_before, 0) if params.get('limit') else None
+    stats = screener.run(limit=limit)
+    return {
+        'evaluator': screener.evaluator,
+        'screened': stats.screened,
+        'evaluated': stats.evaluated,
+        'failed_prompts': stats.failed_prompts,
+        'unparsed': stats.unparsed,
+        'verdicts': dict(stats.verdicts),
+    }
+
+
+@job_handler('embed_studies')
+def embed_studies_job(context: JobContext):
+    """
+    params: review_id, model_id (optional), batch_size (optional)
+    Incremental: studies whose text is unchanged keep their vectors.
+    """
+    params = context.params
+    review = _get(SystematicReview, params.get('review_id'), 'Systematic Review')
+    llm_model = _get(LLMModel, params['model_id'], 'LLM Model') if params.get('model_id') else None
+    total = PrimaryStudy.objects.filter(systematic_review=review).count()
+
+    def report(stats):
+        context.progress(100.0 * stats.scanned / total if total else 100.0,
+                         f"{stats.scanned} of {total} studies scanned, {stats.embedded} embedded")
+
+    embedder = embeddings.get_embedder(llm_model)
+    stats = embeddings.embed_studies(review, embedder, batch_size=params.get('batch_size'),
+                                     progress_callback=report)
+    return {'embedding_model': embedder.name, 'embedded': stats.embedded, 'unchanged': stats.unchanged}
+
+
+@job_handler('snowballing')
+def snowballing_job(context: JobContext):
+    """
+    params: review_id, iterations, direction (backward, forward or both), libraries
+    Each iteration is a step: a retry resumes after the last completed one.
+    The citation graph scores are updated with the new edges at the end.
+    """
+    params = context.params
+    review = _get(SystematicReview, params.get('review_id'), 'Systematic Review')
+    try:
+        engine = snowballing.SnowballingEngine(review, libraries=params.get('libraries'),
+                                               direction=params.get('direction'))
+    except LibrarySearchError as e:
+        raise JobError(str(e))
+    iterations = int(params.get('iterations') or engine.iterations)
+    seed_ids = context.step('seeds', engine.included_study_ids)
+    summary = []
+    for number in range(1, iterations + 1):
+        def report(outcome, done, total):
+            context.progress(100.0 * (number - 1 + done / total) / iterations,
+                             f"Iteration {number}: {done} of {total} reference / citation lists")
+
+        outcome = context.step(f'iteration-{number}',
+                               lambda: engine.iteration(seed_ids, number, progress_callback=report).as_dict())
+        seed_ids = outcome['new_studies']
+        summary.append(dict(outcome, new_studies=len(seed_ids)))
+        if not seed_ids:
+            break
+    graph = context.step('citation-graph', lambda: citation_graph.update_citation_graph(review).as_dict())
+    return {'iterations': summary, 'citation_graph': graph}
+
+
+@job_handler('review_stats')
+def review_stats_job(context: JobContext):
+    """
+    params: review_id (default: every review missing statistics or changed since their refresh), all
+    """
+    params = context.params
+    if params.get('review_id'):
+        review = _get(SystematicReview, params['review_id'], 'Systematic Review')
+        return {'refreshed': review_stats.refresh([review.pk])}
+    if params.get('all'):
+        return {'refreshed': review_stats.refresh()}
+    return {'refreshed': review_stats.refresh_stale()}
+
+
+@job_handler('citation_graph')
+def citation_graph_job(context: JobContext):
+    """
+    params: review_id, full (rebuild from all edges, default false)
+    """
+    params = context.params
+    review = _get(SystematicReview, params.get('review_id'), 'Systematic Review')
+    return citation_graph.update_citation_graph(review, full=bool(params.get('full'))).as_dict()
@@ -0,0 +1,576 @@
+import re
+import threading
+import time
+import xml.etree.ElementTree as ET
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Iterator, List, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+
+from slra.models import DigitalLibrary
+from .abstracts import ABSTRACT_LABEL_RE, clean_text, extract_abstract
+from .exceptions import LibrarySearchError
+from .http_cache import HttpCache, get_http_cache
+
+
+DEFAULT_LIBRARY_SETTINGS = {
+    # Results fetched per library and search
+    'MAX_RESULTS': 100,
+    # Threads fetching landing pages for abstracts missing from the listing
+    'ENRICH_WORKERS': 8,
+    # Simultaneous requests per host, and overrides for strict hosts
+    'DEFAULT_HOST_CONCURRENCY': 4,
+    'HOST_CONCURRENCY': {
+        'export.arxiv.org': 1,
+        'api.semanticscholar.org': 1,
+        'scholar.google.com': 1,
+    },
+    # Minimum seconds between two requests to a host (API terms of use)
+    'HOST_MIN_INTERVAL': {
+        'export.arxiv.org': 3.0,
+        'api.semanticscholar.org': 1.0,
+    },
+    'REQUEST_TIMEOUT': 30,
+    # Retries for connection errors, 429 and 5xx (exponential backoff)
+    'MAX_RETRIES': 2,
+    'USER_AGENT': 'SLRA/1.0 (systematic literature review assistant)',
+    # Landing page parser for abstracts: 'auto', 'selectolax', 'lxml' or 'bs4' (slra.services.abstracts)
+    'HTML_PARSER': 'auto',
+    # Contact address sent to Crossref / OpenAlex (their "polite pool")
+    'MAILTO': '',
+    # Incremental re-searches ask for results from this many days before the
+    # previous search, since libraries index some publications late
+    'INCREMENTAL_OVERLAP_DAYS': 30,
+}
+
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+# Snowballing directions (LibraryAdapter.related)
+BACKWARD = 'backward'  # the paper's references
+FORWARD = 'forward'    # papers citing it
+
+
+def get_library_settings() -> dict:
+    options = dict(DEFAULT_LIBRARY_SETTINGS)
+    options.update(getattr(settings, 'SLRA_LIBRARY_SEARCH', {}))
+    return options
+
+
+# --------------------------------------------------------------------
+# HTTP client with per-host limits
+# --------------------------------------------------------------------
+
+class HostLimiter:
+    """
+    Caps simultaneous requests per host and spaces consecutive requests to
+    hosts with a minimum interval, across all threads of the process.
+    """
+
+    def __init__(self, default_concurrency: int = 4, concurrency: dict = None, min_interval: dict = None):
+        self.default_concurrency = default_concurrency
+        self.concurrency = concurrency or {}
+        self.min_interval = min_interval or {}
+        self._semaphores = {}
+        self._next_start = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def slot(self, host: str):
+        with self._lock:
+            semaphore = self._semaphores.get(host)
+            if semaphore is None:
+                semaphore = threading.BoundedSemaphore(self.concurrency.get(host, self.default_concurrency))
+                self._semaphores[host] = semaphore
+        with semaphore:
+            interval = self.min_interval.get(host)
+            if interval:
+                with self._lock:
+                    now = time.monotonic()
+                    start = max(now, self._next_start.get(host, 0.0))
+                    self._next_start[host] = start + interval
+                time.sleep(max(start - now, 0.0))
+            yield
+
+
+class LibraryHttpClient:
+    """
+    Pooled keep-alive session shared by all library adapters; every request
+    goes through the HostLimiter and is retried on transient errors.
+    With an HttpCache, fresh responses are served from disk and stale ones
+    are revalidated (304 Not Modified) before being downloaded again.
+    Adapters pass listing=True for search result pages, which the cache
+    keeps fresh for minutes rather than days (HttpCache.listing_ttl).
+    """
+
+    def __init__(self, options: dict = None, cache: HttpCache = None):
+        options = options or get_library_settings()
+        self.cache = cache
+        self.timeout = options['REQUEST_TIMEOUT']
+        self.max_retries = options['MAX_RETRIES']
+        self.limiter = HostLimiter(options['DEFAULT_HOST_CONCURRENCY'], options['HOST_CONCURRENCY'],
+                                   options['HOST_MIN_INTERVAL'])
+        pool_size = max([options['DEFAULT_HOST_CONCURRENCY'], options['ENRICH_WORKERS'],
+                         *options['HOST_CONCURRENCY'].values()])
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=10, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers['User-Agent'] = options['USER_AGENT']
+
+    def get(self, url: str, params: dict = None, headers: dict = None, listing: bool = False) -> requests.Response:
+        if self.cache is None:
+            return self._fetch(url, params, headers)
+        url = requests.Request('GET', url, params=params).prepare().url
+        key = self.cache.make_key(url, headers)
+        cached = self.cache.get(key)
+        if cached is not None and (cached.fresh or self.cache.offline):
+            return cached.to_response()
+        if self.cache.offline:
+            raise LibrarySearchError(f"{urlsplit(url).hostname}: {url} is not in the HTTP cache (offline mode).")
+        request_headers = dict(headers or {})
+        if cached is not None:
+            request_headers.update(cached.validators())
+        response = self._fetch(url, None, request_headers)
+        if response.status_code == 304 and cached is not None:
+            self.cache.revalidated(key, response.headers, listing)
+            return cached.to_response()
+        self.cache.store(key, response, url, listing)
+        return response
+
+    def _fetch(self, url: str, params: dict = None, headers: dict = None) -> requests.Response:
+        host = urlsplit(url).hostname or ''
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+            try:
+                with self.limiter.slot(host):
+                    response = self.session.get(url, params=params, headers=headers, timeout=self.timeout)
+            except requests.RequestException as e:
+                if attempt == self.max_retries:
+                    raise LibrarySearchError(f"Request to {host} failed: {e}")
+            else:
+                if response.status_code not in RETRY_STATUS_CODES or attempt == self.max_retries:
+                    if response.status_code >= 400:
+                        raise LibrarySearchError(f"{host} returned HTTP {response.status_code}.")
+                    return response
+                retry_after = response.headers.get('Retry-After')
+            delay = float(retry_after) if retry_after and retry_after.isdigit() else 2.0 ** attempt
+            time.sleep(min(delay, 60.0))
+
+    def get_json(self, url: str, params: dict = None, headers: dict = None, listing: bool = False):
+        response = self.get(url, params=params, headers=headers, listing=listing)
+        try:
+            return response.json()
+        except ValueError:
+            raise LibrarySearchError(f"{urlsplit(url).hostname} returned malformed JSON.")
+
+    def close(self):
+        self.session.close()
+
+
+_http_client = None
+_http_client_lock = threading.Lock()
+
+
+def get_http_client() -> LibraryHttpClient:
+    """
+    Returns the process-wide LibraryHttpClient, creating it on first use.
+    """
+    global _http_client
+    if _http_client is None:
+        with _http_client_lock:
+            if _http_client is None:
+                _http_client = LibraryHttpClient(cache=get_http_cache())
+    return _http_client
+
+
+def reset_http_client():
+    """
+    Closes the shared client (next call rebuilds it from settings).
+    """
+    global _http_client
+    with _http_client_lock:
+        if _http_client is not None:
+            _http_client.close()
+        _http_client = None
+
+
+# --------------------------------------------------------------------
+# Records and abstract enrichment
+# --------------------------------------------------------------------
+
+@dataclass
+class SearchRecord:
+    """
+    One publication found by a library, before it is stored as a SearchResult.
+    """
+    title: str
+    url: str = ''
+    authors: str = ''
+    abstract: str = ''
+    doi: str = ''
+
+
+# --------------------------------------------------------------------
+# Library adapters
+# --------------------------------------------------------------------
+
+class LibraryAdapter:
+    """
+    Searches one digital library. pages() yields lists of SearchRecords
+    until max_results are returned or the library has no more; total_found
+    is set to the library's reported hit count when it gives one.
+    - aliases: normalized DigitalLibrary names served by the adapter
+    - DigitalLibrary.base_url overrides default_url, DigitalLibrary.credentials
+      holds the API key where one is used
+    - supports_snowballing: related() lists references and citations
+    - supports_since: pages() only returns results published / indexed
+      after `since` when it is set (incremental re-search); other adapters
+      return everything and rely on the upsert of the results
+    """
+    name = ''
+    aliases = ()
+    default_url = ''
+    page_size = 100
+    supports_snowballing = False
+    supports_since = False
+
+    def __init__(self, library: DigitalLibrary, http: LibraryHttpClient = None, options: dict = None):
+        self.library = library
+        self.http = http or get_http_client()
+        self.options = options or get_library_settings()
+        self.base_url = library.base_url or self.default_url
+        self.total_found = None
+        self.since = None
+
+    def pages(self, query: str, max_results: int) -> Iterator[List[SearchRecord]]:
+        raise NotImplementedError
+
+    def related(self, doi: str, direction: str, max_results: int) -> List[SearchRecord]:
+        """
+        References (BACKWARD) or citing papers (FORWARD) of the paper with
+        this DOI, up to max_results. Used by slra.services.snowballing.
+        """
+        raise LibrarySearchError(f"{self.name} doesn't provide reference or citation lists.")
+
+    def needs_enrichment(self, record: SearchRecord) -> bool:
+        return not record.abstract and record.url.startswith('http')
+
+    def enrich(self, record: SearchRecord) -> SearchRecord:
+        """
+        Fills in the abstract from the record's landing page. Best effort: a
+        page that can't be fetched or parsed leaves the record as it is.
+        """
+        try:
+            response = self.http.get(record.url)
+        except LibrarySearchError:
+            return record
+        if 'html' not in response.headers.get('Content-Type', ''):
+            return record  # e.g. a PDF
+        abstract = extract_abstract(response.text, response.url or record.url, self.options['HTML_PARSER'])
+        if len(abstract) > len(record.abstract):
+            record.abstract = abstract
+        return record
+
+    def _offset_pages(self, max_results: int, fetch) -> Iterator[List[SearchRecord]]:
+        """
+        Offset pagination: fetch(offset, size) returns one page of records.
+        """
+        offset = 0
+        while offset < max_results:
+            size = min(self.page_size, max_results - offset)
+            records = fetch(offset, size)
+            if not records:
+                return
+            yield records[:size]
+            offset += len(records)
+            if len(records) < size or (self.total_found is not None and offset >= self.total_found):
+                return
+
+
+class ArxivAdapter(LibraryAdapter):
+    """
+    arXiv Atom API (one request every 3 seconds, see HOST_MIN_INTERVAL).
+    Incremental searches filter on the submission date.
+    """
+    name = 'arXiv'
+    aliases = ('arxiv',)
+    default_url = 'http://export.arxiv.org/api/query'
+    supports_since = True
+    NS = {
+        'atom': 'http://www.w3.org/2005/Atom',
+        'arxiv': 'http://arxiv.org/schemas/atom',
+        'opensearch': 'http://a9.com/-/spec/opensearch/1.1/',
+    }
+
+    def pages(self, query, max_results):
+        search_query = query if re.search(r'\b(all|ti|abs|au|cat):', query) else f'all:{query}'
+        if self.since is not None:
+            search_query = f"({search_query}) AND submittedDate:[{self.since:%Y%m%d%H%M} TO 999912312359]"
+
+        def fetch(offset, size):
+            response = self.http.get(self.base_url, params={
+                'search_query': search_query, 'start': offset, 'max_results': size,
+            }, listing=True)
+            return self.parse(response.content)
+        return self._offset_pages(max_results, fetch)
+
+    def parse(self, content: bytes) -> List[SearchRecord]:
+        try:
+            root = ET.fromstring(content)
+        except ET.ParseError:
+            raise LibrarySearchError("arXiv returned a malformed Atom feed.")
+        total = root.findtext('opensearch:totalResults', namespaces=self.NS)
+        if total and total.isdigit():
+            self.total_found = int(total)
+        records = []
+        for entry in root.findall('atom:entry', self.NS):
+            records.append(SearchRecord(
+                title=clean_text(entry.findtext('atom:title', '', self.NS)),
+                url=(entry.findtext('atom:id', '', self.NS) or '').strip(),
+                authors='; '.join(clean_text(name.text) for name in entry.findall('atom:author/atom:name', self.NS)),
+                abstract=clean_text(entry.findtext('atom:summary', '', self.NS)),
+                doi=(entry.findtext('arxiv:doi', '', self.NS) or '').strip(),
+            ))
+        return records
+
+
+class CrossrefAdapter(LibraryAdapter):
+    """
+    Crossref REST API (/works). Abstracts are only deposited for part of the
+    records; the others are enriched from the DOI landing page.
+    Incremental searches filter on the index date, which also catches
+    updated records.
+    """
+    name = 'Crossref'
+    aliases = ('crossref',)
+    default_url = 'https://api.crossref.org/works'
+    supports_since = True
+
+    def pages(self, query, max_results):
+        def fetch(offset, size):
+            params = {'query': query, 'rows': size, 'offset': offset,
+                      'select': 'DOI,title,author,abstract,URL'}
+            if self.since is not None:
+                params['filter'] = f'from-index-date:{self.since:%Y-%m-%d}'
+            if self.options['MAILTO']:
+                params['mailto'] = self.options['MAILTO']
+            return self.parse(self.http.get_json(self.base_url, params=params, listing=True))
+        return self._offset_pages(max_results, fetch)
+
+    def parse(self, data: dict) -> List[SearchRecord]:
+        message = data.get('message') or {}
+        if isinstance(message.get('total-results'), int):
+            self.total_found = message['total-results']
+        records = []
+        for item in message.get('items') or []:
+            authors = [' '.join(filter(None, [author.get('given'), author.get('family')])) or author.get('name', '')
+                       for author in item.get('author') or []]
+            doi = item.get('DOI') or ''
+            records.append(SearchRecord(
+                title=clean_text(' '.join(item.get('title') or [])),
+                url=item.get('URL') or (f'https://doi.org/{doi}' if doi else ''),
+                authors='; '.join(filter(None, authors)),
+                abstract=ABSTRACT_LABEL_RE.sub('', clean_text(item.get('abstract'))),
+                doi=doi,
+            ))
+        return records
+
+
+class OpenAlexAdapter(LibraryAdapter):
+    """
+    OpenAlex /works search. Abstracts come as an inverted index (word -> positions).
+    Incremental searches filter on the publication date (creation dates need
+    a premium key).
+    """
+    name = 'OpenAlex'
+    aliases = ('openalex',)
+    default_url = 'https://api.openalex.org/works'
+    supports_snowballing = True
+    supports_since = True
+    FIELDS = 'id,doi,display_name,authorships,abstract_inverted_index,primary_location'
+
+    def pages(self, query, max_results):
+        params = {'search': query}
+        if self.since is not None:
+            params['filter'] = f'from_publication_date:{self.since:%Y-%m-%d}'
+        return self._works(params, max_results)
+
+    def related(self, doi, direction, max_results):
+        params = {'select': 'id'}
+        if self.options['MAILTO']:
+            params['mailto'] = self.options['MAILTO']
+        work_id = (self.http.get_json(f'{self.base_url}/doi:{doi}', params=params).get('id') or '').rsplit('/', 1)[-1]
+        if not work_id:
+            return []
+        relation = 'cited_by' if direction == BACKWARD else 'cites'
+        return [record for page in self._works({'filter': f'{relation}:{work_id}'}, max_results) for record in page]
+
+    def _works(self, params: dict, max_results: int) -> Iterator[List[SearchRecord]]:
+        # OpenAlex pages are numbered, so every page has the same size
+        self.page_size = min(self.page_size, max_results)
+
+        def fetch(offset, size):
+            page_params = dict(params, **{'per-page': self.page_size, 'page': offset // self.page_size + 1,
+                                          'select': self.FIELDS})
+            if self.options['MAILTO']:
+                page_params['mailto'] = self.options['MAILTO']
+            return self.parse(self.http.get_json(self.base_url, params=page_params, listing=True))
+        return self._offset_pages(max_results, fetch)
+
+    @staticmethod
+    def rebuild_abstract(inverted_index: Optional[dict]) -> str:
+        if not inverted_index:
+            return ''
+        positions = {position: word for word, indexes in inverted_index.items() for position in indexes}
+        return ' '.join(positions[i] for i in sorted(positions))
+
+    def parse(self, data: dict) -> List[SearchRecord]:
+        count = (data.get('meta') or {}).get('count')
+        if isinstance(count, int):
+            self.total_found = count
+        records = []
+        for item in data.get('results') or []:
+            location = item.get('primary_location') or {}
+            doi = (item.get('doi') or '').replace('https://doi.org/', '')
+            records.append(SearchRecord(
+                title=clean_text(item.get('display_name')),
+                url=location.get('landing_page_url') or item.get('doi') or item.get('id') or '',
+                authors='; '.join(filter(None, ((authorship.get('author') or {}).get('display_name')
+                                                for authorship in item.get('authorships') or []))),
+                abstract=self.rebuild_abstract(item.get('abstract_inverted_index')),
+                doi=doi,
+            ))
+        return records
+
+
+class SemanticScholarAdapter(LibraryAdapter):
+    """
+    Semantic Scholar Graph API paper search (first 1000 hits). An API key in
+    DigitalLibrary.credentials raises the rate limit. Incremental searches
+    filter on the publication date.
+    """
+    name = 'Semantic Scholar'
+    aliases = ('semanticscholar',)
+    default_url = 'https://api.semanticscholar.org/graph/v1/paper/search'
+    supports_snowballing = True
+    supports_since = True
+    MAX_OFFSET = 1000
+    FIELDS = 'title,authors,abstract,url,externalIds'
+
+    @property
+    def headers(self):
+        return {'x-api-key': self.library.credentials.strip()} if self.library.credentials else None
+
+    def pages(self, query, max_results):
+        def fetch(offset, size):
+            params = {'query': query, 'offset': offset, 'limit': size, 'fields': self.FIELDS}
+            if self.since is not None:
+                params['publicationDateOrYear'] = f'{self.since:%Y-%m-%d}:'
+            return self.parse(self.http.get_json(self.base_url, headers=self.headers, params=params, listing=True))
+        return self._offset_pages(min(max_results, self.MAX_OFFSET), fetch)
+
+    def related(self, doi, direction, max_results):
+        # /paper/search -> /paper/DOI:<doi>/references (or /citations)
+        paper_url = f"{self.base_url.rsplit('/search', 1)[0]}/DOI:{doi}"
+        endpoint, key = ('references', 'citedPaper') if direction == BACKWARD else ('citations', 'citingPaper')
+
+        def fetch(offset, size):
+            data = self.http.get_json(f'{paper_url}/{endpoint}', headers=self.headers, params={
+                'offset': offset, 'limit': size, 'fields': self.FIELDS,
+            }, listing=True)
+            return self.parse({'data': [item.get(key) or {} for item in data.get('data') or []]})
+        pages = self._offset_pages(min(max_results, self.MAX_OFFSET), fetch)
+        return [record for page in pages for record in page if record.title]
+
+    def parse(self, data: dict) -> List[SearchRecord]:
+        if isinstance(data.get('total'), int):
+            self.total_found = data['total']
+        records = []
+        for item in data.get('data') or []:
+            doi = (item.get('externalIds') or {}).get('DOI') or ''
+            records.append(SearchRecord(
+                title=clean_text(item.get('title')),
+                url=item.get('url') or (f'https://doi.org/{doi}' if doi else ''),
+                authors='; '.join(filter(None, (author.get('name') for author in item.get('authors') or []))),
+                abstract=clean_text(item.get('abstract')),
+                doi=doi,
+            ))
+        return records
+
+
+class GoogleScholarAdapter(LibraryAdapter):
+    """
+    Google Scholar through the optional `scholarly` package (scraping, one
+    request at a time). Scholar only shows a snippet of the abstract, so
+    every result with a publisher URL is enriched from its landing page.
+    Incremental searches can only filter on the publication year.
+    """
+    name = 'Google Scholar'
+    aliases = ('googlescholar', 'scholar')
+    page_size = 10
+    supports_since = True
+    HOST = 'scholar.google.com'
+
+    def pages(self, query, max_results):
+        try:
+            from scholarly import scholarly
+        except ImportError:
+            raise LibrarySearchError("Google Scholar searches need the 'scholarly' package (pip install scholarly).")
+
+        # scholarly fetches result pages lazily while iterating
+        with self.http.limiter.slot(self.HOST):
+            publications = scholarly.search_pubs(query, year_low=self.since.year if self.since else None)
+        page = []
+        for _ in range(max_results):
+            with self.http.limiter.slot(self.HOST):
+                publication = next(publications, None)
+            if publication is None:
+                break
+            page.append(self.parse(publication))
+            if len(page) == self.page_size:
+                yield page
+                page = []
+        if page:
+            yield page
+
+    def parse(self, publication: dict) -> SearchRecord:
+        bib = publication.get('bib') or {}
+        authors = bib.get('author') or ''
+        return SearchRecord(
+            title=clean_text(bib.get('title')),
+            url=publication.get('pub_url') or '',
+            authors='; '.join(authors) if isinstance(authors, list) else authors,
+            abstract=clean_text(bib.get('abstract')),
+        )
+
+    def needs_enrichment(self, record):
+        # The snippet is kept when the landing page has no longer abstract
+        return record.url.startswith('http')
+
+
+ADAPTERS = [ArxivAdapter, CrossrefAdapter, OpenAlexAdapter, SemanticScholarAdapter, GoogleScholarAdapter]
+
+
+def normalize_library_name(name: str) -> str:
+    return re.sub(r'[^a-z0-9]', '', (name or '').lower())
+
+
+def get_adapter_class(library_name: str):
+    """
+    Adapter serving a DigitalLibrary name ('arXiv', 'Google Scholar', ...).
+    """
+    normalized = normalize_library_name(library_name)
+    for adapter_class in ADAPTERS:
+        if normalized in adapter_class.aliases:
+            return adapter_class
+    raise LibrarySearchError(
+        f"No search adapter for library '{library_name}'. Supported: {', '.join(supported_libraries())}."
+    )
+
+
+def supported_libraries() -> List[str]:
+    return [adapter_class.name for adapter_class in ADAPTERS]
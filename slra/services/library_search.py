@@ -0,0 +1,299 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional
+
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from slra.models import DigitalLibrary, DigitalLibrarySearch, SearchQuery, SearchResult
+from . import review_stats, search
+from .exceptions import LibrarySearchError
+from .library_adapters import get_adapter_class, get_http_client, get_library_settings
+
+URL_MAX_LENGTH = SearchResult._meta.get_field('url').max_length
+# Columns refreshed when a search returns an already stored result
+UPSERT_FIELDS = ('title', 'authors', 'abstract', 'doi')
+
+
+@dataclass
+class LibraryOutcome:
+    """
+    Result of one library of a search.
+    """
+    library: str
+    library_search: DigitalLibrarySearch
+    results: int = 0       # SearchResult rows stored (results new for the query and library)
+    updated: int = 0       # already stored results whose details changed
+    unchanged: int = 0     # already stored results returned as they were
+    pages: int = 0
+    enriched: int = 0      # abstracts filled in from landing pages
+    total_found: int = None  # hit count reported by the library
+    error: str = ''
+    elapsed: float = 0.0
+    exhausted: bool = False  # the library had no page left (not stopped at max_results)
+
+    @property
+    def ok(self) -> bool:
+        return not self.error
+
+    @property
+    def fetched(self) -> int:
+        return self.results + self.updated + self.unchanged
+
+
+class StoredResults:
+    """
+    DOI / URL / title fingerprint -> ID of the results a query already has
+    from one library, loaded in one query, so returned records are matched
+    without a query per record. Results stored during the search are added
+    (as instances until bulk_create gives them an ID).
+    """
+
+    def __init__(self, search_query: SearchQuery, library: DigitalLibrary):
+        self._keys = {}
+        rows = SearchResult.objects.filter(library_search__search_query=search_query,
+                                           library_search__library=library) \
+            .values_list('pk', 'doi', 'url', 'fingerprint').iterator(chunk_size=5000)
+        for pk, doi, url, fingerprint in rows:
+            self.add(pk, doi, url, fingerprint)
+
+    def add(self, value, doi: str, url: str, fingerprint: str):
+        for key in (('d', doi), ('u', url), ('f', fingerprint)):
+            if key[1]:
+                self._keys.setdefault(key, value)
+
+    def get(self, result: SearchResult):
+        """
+        The stored result's ID, the SearchResult instance of a record already
+        returned by this search, or None for a new result.
+        """
+        for key in (('d', result.doi), ('u', result.url), ('f', result.fingerprint)):
+            if key[1] and key in self._keys:
+                return self._keys[key]
+        return None
+
+
+class LibrarySearchEngine:
+    """
+    Runs one SearchQuery on several digital libraries at once.
+    - Each library is paginated in its own thread; landing pages for missing
+      abstracts are fetched by a shared enrichment pool while the next page
+      is requested. Requests obey the per-host limits of LibraryHttpClient.
+    - Pages are written by the calling thread as they arrive, one
+      bulk_create per page, so the search takes about as long as the
+      slowest library and only one thread writes to the database.
+    - Results are upserted: a record the query already has from the library
+      (same DOI, URL or title fingerprint) updates the stored result
+      instead of being stored again.
+    - Incremental searches only ask the libraries for results newer than
+      the high-water mark of the query's previous searches (see since_for).
+    A failing library is reported in its outcome and doesn't stop the others.
+    """
+
+    def __init__(self, search_query: SearchQuery, library_names: List[str], max_results: int = None,
+                 enrich: bool = True, progress_callback: Callable[[List[LibraryOutcome]], None] = None,
+                 on_start: Callable[[List[DigitalLibrarySearch]], None] = None, incremental: bool = False):
+        options = get_library_settings()
+        self.search_query = search_query
+        self.library_names = list(dict.fromkeys(name.strip() for name in library_names if name.strip()))
+        self.max_results = max_results or options['MAX_RESULTS']
+        self.enrich = enrich
+        self.enrich_workers = options['ENRICH_WORKERS']
+        self.incremental = incremental
+        self.overlap = timedelta(days=options['INCREMENTAL_OVERLAP_DAYS'])
+        self.progress_callback = progress_callback
+        self.on_start = on_start
+        self._stopping = threading.Event()
+        if not self.library_names:
+            raise LibrarySearchError("No digital library given.")
+        # Unknown libraries fail before anything is written
+        self._adapter_classes = [get_adapter_class(name) for name in self.library_names]
+
+    def since_for(self, library: DigitalLibrary) -> Optional[datetime]:
+        """
+        Lower date bound of an incremental search: the latest high-water mark
+        of the query's searches on this library, minus INCREMENTAL_OVERLAP_DAYS.
+        None (full search) when not incremental or never searched completely.
+        """
+        if not self.incremental:
+            return None
+        mark = DigitalLibrarySearch.objects.filter(search_query=self.search_query, library=library) \
+            .aggregate(mark=Max('high_water_mark'))['mark']
+        return mark - self.overlap if mark is not None else None
+
+    def run(self) -> List[LibraryOutcome]:
+        http = get_http_client()
+        started_at = timezone.now()
+        outcomes, adapters = [], []
+        self._stored = {}
+        for name, adapter_class in zip(self.library_names, self._adapter_classes):
+            library = DigitalLibrary.objects.filter(name__iexact=name).first() \
+                or DigitalLibrary.objects.create(name=name)
+            adapter = adapter_class(library, http)
+            adapter.since = self.since_for(library) if adapter.supports_since else None
+            library_search = DigitalLibrarySearch.objects.create(search_query=self.search_query, library=library,
+                                                                 since=adapter.since)
+            self._stored[library_search.pk] = StoredResults(self.search_query, library)
+            outcomes.append(LibraryOutcome(name, library_search))
+            adapters.append(adapter)
+        if self.on_start is not None:
+            self.on_start([outcome.library_search for outcome in outcomes])
+
+        pages = queue.Queue()
+        library_pool = ThreadPoolExecutor(max_workers=len(adapters), thread_name_prefix='slra-library')
+        enrich_pool = ThreadPoolExecutor(max_workers=self.enrich_workers, thread_name_prefix='slra-enrich')
+        try:
+            for adapter, outcome in zip(adapters, outcomes):
+                library_pool.submit(self._fetch, adapter, outcome, enrich_pool, pages)
+            running = len(outcomes)
+            while running:
+                outcome, items = pages.get()
+                if items is None:
+                    running -= 1
+                    continue
+                records = []
+                for item in items:
+                    if isinstance(item, Future):
+                        item, enriched = item.result()
+                        outcome.enriched += enriched
+                    records.append(item)
+                self._store(outcome, records)
+                if self.progress_callback is not None:
+                    self.progress_callback(outcomes)
+        finally:
+            # On an error or cancellation here, fetch threads stop after their current page
+            self._stopping.set()
+            enrich_pool.shutdown(wait=True, cancel_futures=True)
+            library_pool.shutdown(wait=True)
+
+        for outcome in outcomes:
+            library_search = outcome.library_search
+            library_search.total_results_found = \
+                outcome.total_found if outcome.total_found is not None else outcome.fetched
+            library_search.new_results, library_search.updated_results = outcome.results, outcome.updated
+            # A failed library, or one cut off at max_results, keeps the previous mark:
+            # the next search covers the results this one did not get to
+            library_search.high_water_mark = started_at if outcome.ok and outcome.exhausted else None
+            library_search.save(update_fields=['total_results_found', 'new_results', 'updated_results',
+                                               'high_water_mark'])
+        # bulk_create skips post_save: the statistics don't see the stored results otherwise
+        review_stats.mark_changed([self.search_query.systematic_review_id])
+        return outcomes
+
+    def _fetch(self, adapter, outcome: LibraryOutcome, enrich_pool: ThreadPoolExecutor, pages: queue.Queue):
+        """
+        Library thread: puts (outcome, page items) on the queue, where an item is
+        a SearchRecord or a Future of its enrichment, then (outcome, None).
+        """
+        started_at = time.monotonic()
+        fetched = 0
+        try:
+            for records in adapter.pages(self.search_query.query_string, self.max_results):
+                if self._stopping.is_set():
+                    break
+                records = records[:self.max_results - fetched]
+                fetched += len(records)
+                outcome.pages += 1
+                outcome.total_found = adapter.total_found
+                pages.put((outcome, [
+                    enrich_pool.submit(self._enrich, adapter, record)
+                    if self.enrich and adapter.needs_enrichment(record) else record
+                    for record in records
+                ]))
+                if fetched >= self.max_results:
+                    break
+            else:
+                outcome.exhausted = True
+        except Exception as e:
+            outcome.error = str(e) or e.__class__.__name__
+        finally:
+            outcome.elapsed = time.monotonic() - started_at
+            pages.put((outcome, None))
+
+    @staticmethod
+    def _enrich(adapter, record):
+        """
+        Enrichment thread: (record, whether its abstract got longer).
+        """
+        before = len(record.abstract)
+        try:
+            record = adapter.enrich(record)
+        except Exception:
+            pass  # best effort, like a page without an abstract
+        return record, len(record.abstract) > before
+
+    def _store(self, outcome: LibraryOutcome, records):
+        stored = self._stored[outcome.library_search.pk]
+        results, matched = [], {}
+        for record in records:
+            if not record.title and not record.url:
+                continue
+            result = SearchResult(
+                library_search=outcome.library_search,
+                url=record.url[:URL_MAX_LENGTH],
+                title=record.title or None,
+                authors=record.authors or None,
+                abstract=record.abstract or None,
+                doi=record.doi or None,
+            )
+            result.refresh_fingerprint()  # bulk_create skips save()
+            existing = stored.get(result)
+            if isinstance(existing, SearchResult):
+                existing = existing.pk
+            if existing is not None:
+                matched[existing] = result
+            elif stored.get(result) is not None:
+                outcome.unchanged += 1  # listed twice by this search (MySQL: no ID yet)
+            else:
+                stored.add(result, result.doi, result.url, result.fingerprint)
+                results.append(result)
+
+        changed = []
+        if matched:
+            previous = SearchResult.objects.only('pk', 'url', *UPSERT_FIELDS).in_bulk(list(matched))
+            for pk, result in matched.items():
+                current = previous.get(pk)
+                if current is None:
+                    continue
+                values = {name: getattr(result, name) for name in UPSERT_FIELDS
+                          if getattr(result, name) and getattr(result, name) != getattr(current, name)}
+                if values:
+                    for name, value in values.items():
+                        setattr(current, name, value)
+                    current.refresh_fingerprint()
+                    changed.append(current)
+            outcome.updated += len(changed)
+            outcome.unchanged += len(matched) - len(changed)
+        with transaction.atomic():
+            # bulk_create / bulk_update skip post_save as well: index the page here
+            SearchResult.objects.bulk_update(changed, [*UPSERT_FIELDS, 'fingerprint'])
+            search.index_objects('results', SearchResult.objects.bulk_create(results) + changed)
+        outcome.results += len(results)
+
+
+def run_library_search(search_query: SearchQuery, library_names: List[str], max_results: int = None,
+                       enrich: bool = True, progress_callback=None, on_start=None,
+                       incremental: bool = False) -> List[LibraryOutcome]:
+    """
+    Searches the given digital libraries (by DigitalLibrary name, e.g.
+    ['arXiv', 'Crossref']) with the query string and stores one
+    DigitalLibrarySearch per library, with the results the query didn't
+    have yet from that library. With incremental, only results newer than
+    the previous searches are asked for.
+    """
+    return LibrarySearchEngine(search_query, library_names, max_results=max_results, enrich=enrich,
+                               progress_callback=progress_callback, on_start=on_start,
+                               incremental=incremental).run()
+
+
+def searched_libraries(search_query: SearchQuery) -> List[str]:
+    """
+    Names of the libraries a query was searched on, for re-running it.
+    """
+    return list(DigitalLibrary.objects.filter(performed_searches__search_query=search_query)
+                .order_by('name').values_list('name', flat=True).distinct())
@@ -0,0 +1,133 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Optional
+
+from django.conf import settings
+from django.utils import timezone
+
+from slra.models import LLMQueryLog
+
+
+DEFAULT_CACHE_SETTINGS = {
+    # Master switch; get_llm_response(use_cache=False) bypasses it per call
+    'ENABLED': True,
+    # Entries kept in the in-process LRU tier
+    'MAX_ENTRIES': 1024,
+    # Seconds a response stays valid (None = never expires)
+    'TTL': 60 * 60 * 24 * 30,
+    # Fall back to previously logged responses in LLMQueryLog
+    'USE_QUERY_LOG': True,
+}
+
+
+def get_cache_settings() -> dict:
+    options = dict(DEFAULT_CACHE_SETTINGS)
+    options.update(getattr(settings, 'SLRA_LLM_CACHE', {}))
+    return options
+
+
+class LLMResponseCache:
+    """
+    Two-tier, content-addressed cache for LLM responses.
+    - Tier 1: in-process LRU dict (key -> (response, stored_at)).
+    - Tier 2: LLMQueryLog rows, looked up through the indexed cache_key column.
+    Keys come from LLMQueryLog.make_cache_key().
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: Optional[float] = None,
+                 use_query_log: bool = True, enabled: bool = True):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.use_query_log = use_query_log
+        self.enabled = enabled
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_settings(cls):
+        options = get_cache_settings()
+        return cls(
+            max_entries=options['MAX_ENTRIES'],
+            ttl=options['TTL'],
+            use_query_log=options['USE_QUERY_LOG'],
+            enabled=options['ENABLED'],
+        )
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Returns the cached response for key, or None on a miss/expired entry.
+        """
+        response = self._get_local(key)
+        if response is None and self.use_query_log:
+            response = self._get_from_query_log(key)
+            if response is not None:
+                self.set(key, response)
+        with self._lock:
+            if response is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return response
+
+    def set(self, key: str, response: str):
+        with self._lock:
+            self._entries[key] = (response, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _get_local(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            response, stored_at = entry
+            if self.ttl is not None and time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return response
+
+    def _get_from_query_log(self, key):
+        logs = LLMQueryLog.objects.filter(cache_key=key) \
+            .exclude(response_text__isnull=True).exclude(response_text='')
+        if self.ttl is not None:
+            logs = logs.filter(created_at__gte=timezone.now() - timedelta(seconds=self.ttl))
+        return logs.order_by('-created_at').values_list('response_text', flat=True).first()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> LLMResponseCache:
+    """
+    Returns the process-wide LLMResponseCache, creating it on first use.
+    """
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = LLMResponseCache.from_settings()
+    return _cache
+
+
+def reset_response_cache():
+    """
+    Forgets the process-wide cache (next call rebuilds it from settings).
+    """
+    global _cache
+    with _cache_lock:
+        _cache = None
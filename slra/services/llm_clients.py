@@ -0,0 +1,284 @@
+import asyncio
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from together import AsyncTogether, Together
+from django.conf import settings
+
+
+DEFAULT_CLIENT_SETTINGS = {
+    # Connections kept alive per host in each pool
+    'POOL_CONNECTIONS': 10,
+    # Upper bound of simultaneous connections per pool
+    'POOL_MAXSIZE': 20,
+    # Seconds a client may sit unused before it is closed and dropped
+    'IDLE_TIMEOUT': 300,
+    # Per-request timeout (seconds) for HTTP based providers
+    'REQUEST_TIMEOUT': 300,
+}
+
+
+def get_client_settings() -> dict:
+    """
+    Returns the effective client settings: defaults overridden by
+    settings.SLRA_LLM_CLIENTS (if defined).
+    """
+    options = dict(DEFAULT_CLIENT_SETTINGS)
+    options.update(getattr(settings, 'SLRA_LLM_CLIENTS', {}))
+    return options
+
+
+class ProviderClientRegistry:
+    """
+    Keeps one long-lived client per LLMProvider so that consecutive prompts
+    reuse keep-alive connections instead of doing a new TCP/TLS handshake.
+    - HTTP providers (Ollama) get a pooled requests.Session.
+    - SDK providers (together.ai) get a single SDK client on a pooled httpx client.
+    - Async callers get httpx.AsyncClient / AsyncTogether counterparts, one per
+      event loop (async clients can't be shared between loops). They live as
+      long as their loop and are closed when it shuts down.
+    Use the context manager lookups (session(), together_client(), ...) around
+    a call: a client stays checked out until the block exits and is never
+    evicted while checked out. Clients idle for longer than idle_timeout
+    since their last release are closed by a lookup (at most one sweep per
+    half idle_timeout).
+    """
+
+    def __init__(self, pool_connections: int = 10, pool_maxsize: int = 20,
+                 idle_timeout: float = 300, request_timeout: float = 300):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.idle_timeout = idle_timeout
+        self.request_timeout = request_timeout
+        self._clients = {}  # key -> [client, last_used, in_use]
+        self._lock = threading.Lock()
+        self._next_eviction = 0.0
+        self._loop_clients = weakref.WeakKeyDictionary()  # event loop -> (clients by key, closer)
+
+    @classmethod
+    def from_settings(cls):
+        options = get_client_settings()
+        return cls(
+            pool_connections=options['POOL_CONNECTIONS'],
+            pool_maxsize=options['POOL_MAXSIZE'],
+            idle_timeout=options['IDLE_TIMEOUT'],
+            request_timeout=options['REQUEST_TIMEOUT'],
+        )
+
+    # ------------------------------------------------------------------
+    # Public lookups
+    # ------------------------------------------------------------------
+    def session(self, llm_model):
+        """
+        Checks out the pooled requests.Session of an HTTP based provider (e.g., Ollama):
+            with registry.session(llm_model) as session: ...
+        """
+        return self._lease(('http', self._provider_key(llm_model)), self._build_session)
+
+    def together_client(self, llm_model):
+        """
+        Checks out the together.ai SDK client of a provider (see session()).
+        Uses TOGETHER_API_KEY from the environment.
+        """
+        return self._lease(('together', self._provider_key(llm_model)), self._build_together_client)
+
+    def get_session(self, llm_model) -> requests.Session:
+        """
+        Pooled requests.Session for HTTP based providers (e.g., Ollama).
+        Not checked out: prefer session() for anything that may outlive idle_timeout.
+        """
+        return self._get_or_create(('http', self._provider_key(llm_model)), self._build_session)
+
+    def get_together_client(self, llm_model) -> Together:
+        """
+        Reusable together.ai SDK client. Uses TOGETHER_API_KEY from the environment.
+        Not checked out: prefer together_client() for anything that may outlive idle_timeout.
+        """
+        return self._get_or_create(('together', self._provider_key(llm_model)), self._build_together_client)
+
+    def get_async_http_client(self, llm_model) -> httpx.AsyncClient:
+        """
+        Pooled httpx.AsyncClient for HTTP based providers, bound to the running event loop.
+        """
+        return self._get_or_create_async(('async-http', self._provider_key(llm_model)),
+                                         self._build_async_http_client)
+
+    def get_async_together_client(self, llm_model) -> AsyncTogether:
+        """
+        Reusable AsyncTogether client, bound to the running event loop.
+        """
+        return self._get_or_create_async(('async-together', self._provider_key(llm_model)),
+                                         self._build_async_together_client)
+
+    def evict_idle(self) -> int:
+        """
+        Closes and drops clients that were not used within idle_timeout.
+        Checked out clients are kept. Returns the number of evicted clients.
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._next_eviction = now + self.idle_timeout / 2
+            expired = [key for key, (_, last_used, in_use) in self._clients.items()
+                       if not in_use and now - last_used > self.idle_timeout]
+            clients = [self._clients.pop(key)[0] for key in expired]
+        for client in clients:
+            self._close(client)
+        return len(clients)
+
+    def close(self):
+        """
+        Closes every pooled client (e.g., on shutdown or in tests). Async
+        clients are closed on their own loop, if it is still running.
+        """
+        with self._lock:
+            clients = [client for client, *_ in self._clients.values()]
+            self._clients.clear()
+            loop_clients = list(self._loop_clients.items())
+            self._loop_clients.clear()
+        for client in clients:
+            self._close(client)
+        for loop, (_, closer) in loop_clients:
+            if loop.is_running():
+                asyncio.run_coroutine_threadsafe(closer.aclose(), loop)
+
+    def __len__(self):
+        return len(self._clients) + sum(len(clients) for clients, _ in list(self._loop_clients.values()))
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _provider_key(llm_model):
+        provider = llm_model.provider
+        return (provider.pk, provider.base_url or '')
+
+    def _get_or_create(self, key, factory, checkout: bool = False):
+        if time.monotonic() >= self._next_eviction:
+            self.evict_idle()
+        with self._lock:
+            entry = self._clients.get(key)
+            if entry is None:
+                entry = [factory(), 0, 0]
+                self._clients[key] = entry
+            entry[1] = time.monotonic()
+            if checkout:
+                entry[2] += 1
+            return entry[0]
+
+    def _get_or_create_async(self, key, factory):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            entry = self._loop_clients.get(loop)
+            if entry is None:
+                clients = {}
+                closer = _close_at_loop_shutdown(clients)
+                # Run the closer up to its `yield`, which registers it with the
+                # running loop's async generator hooks
+                try:
+                    closer.asend(None).send(None)
+                except StopIteration:
+                    pass
+                entry = self._loop_clients[loop] = (clients, closer)
+            clients = entry[0]
+            client = clients.get(key)
+            if client is None:
+                client = clients[key] = factory()
+            return client
+
+    @contextmanager
+    def _lease(self, key, factory):
+        client = self._get_or_create(key, factory, checkout=True)
+        try:
+            yield client
+        finally:
+            with self._lock:
+                entry = self._clients.get(key)
+                # close() may have dropped (and closed) the client meanwhile
+                if entry is not None and entry[0] is client:
+                    entry[1] = time.monotonic()
+                    entry[2] -= 1
+
+    def _build_session(self) -> requests.Session:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def _build_together_client(self) -> Together:
+        http_client = httpx.Client(limits=self._httpx_limits(), timeout=self.request_timeout)
+        # Retries are handled by llm_throttle (rate limits, Retry-After, circuit breaker)
+        return Together(http_client=http_client, max_retries=0)
+
+    def _httpx_limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.pool_maxsize,
+            max_keepalive_connections=self.pool_connections,
+            keepalive_expiry=self.idle_timeout,
+        )
+
+    def _build_async_http_client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(limits=self._httpx_limits(), timeout=self.request_timeout)
+
+    def _build_async_together_client(self) -> AsyncTogether:
+        return AsyncTogether(http_client=self._build_async_http_client(), max_retries=0)
+
+    @staticmethod
+    def _close(client):
+        close = getattr(client, 'close', None)
+        if close is not None:
+            try:
+                close()
+            except Exception:
+                pass
+
+
+async def _close_at_loop_shutdown(clients: dict):
+    """
+    Closes the async clients of one event loop when it shuts down: a loop
+    finalizes its pending async generators before closing
+    (loop.shutdown_asyncgens(), called by asyncio.run and so by asgiref),
+    while they can still await.
+    """
+    try:
+        yield
+    finally:
+        for client in list(clients.values()):
+            try:
+                await (client.aclose() if isinstance(client, httpx.AsyncClient) else client.close())
+            except Exception:
+                pass
+        clients.clear()
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_client_registry() -> ProviderClientRegistry:
+    """
+    Returns the process-wide ProviderClientRegistry, creating it on first use.
+    """
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ProviderClientRegistry.from_settings()
+    return _registry
+
+
+def reset_client_registry():
+    """
+    Closes all pooled clients and forgets the registry (next call rebuilds it
+    from settings).
+    """
+    global _registry
+    with _registry_lock:
+        if _registry is not None:
+            _registry.close()
+        _registry = None
@@ -1,69 +1,322 @@
+import functools
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+import httpx
 import requests
-from together import Together
+import together
+from asgiref.sync import sync_to_async
+from django.db import connections
+from together import AsyncTogether, Together
 from django.conf import settings
 from . import exceptions
+from .llm_cache import get_response_cache
+from .llm_clients import get_client_registry
+from .llm_throttle import completion_limit, get_provider_guard, parse_retry_after
+from .llm_usage import LLMCallStats, last_call_stats, record_call
+
+from slra.models import LLMModel, LLMProvider, LLMQueryLog
 
-from slra.models import LLMModel, LLMProvider
 
+DEFAULT_OLLAMA_BASE_URL = "http://127.0.0.1:11434"
+DEFAULT_OLLAMA_URL = DEFAULT_OLLAMA_BASE_URL + "/api/generate"
 
-DEFAULT_OLLAMA_URL = "http://127.0.0.1:11434/api/generate"
 
-def call_ollama(model_name: str, prompt: str, stream: bool = False) -> str:
+def ollama_url(provider: LLMProvider, path: str = '/api/generate') -> str:
     """
-    Calls the local Ollama endpoint using the specified model_name
+    URL of an Ollama API endpoint on the provider's server: provider.base_url
+    (the server root, or any of its /api/ endpoints) or the local default.
+    """
+    base_url = (provider.base_url or DEFAULT_OLLAMA_BASE_URL).split('/api/', 1)[0].rstrip('/')
+    return base_url + path
+
+
+def call_ollama(model_name: str, prompt: str, stream: bool = False,
+                session: requests.Session = None, timeout: float = None,
+                options: dict = None, usage: dict = None, url: str = None) -> str:
+    """
+    Calls the Ollama endpoint using the specified model_name
     and returns the final text response.
+    - session: pooled session to reuse keep-alive connections (see llm_clients).
+      Falls back to a one-off request if not given.
+    - url: generate endpoint (see ollama_url), the local server by default.
+    - options: generation parameters (temperature, seed, ...) passed as Ollama "options".
+    - usage: dict filled with the token counts and timings Ollama reports.
     """
     payload = {
         "model": model_name,
         "prompt": prompt,
         "stream": stream
     }
+    if options:
+        payload["options"] = options
 
     try:
-        response = requests.post(DEFAULT_OLLAMA_URL, json=payload, stream=stream)
+        http = session or requests
+        response = http.post(url or DEFAULT_OLLAMA_URL, json=payload, stream=stream, timeout=timeout)
         response.raise_for_status()
     except requests.RequestException as e:
-        raise exceptions.LLMError(f"Ollama request failed: {e}")
+        raise _http_error("Ollama request failed", e, getattr(e, 'response', None),
+                          transient=isinstance(e, (requests.Timeout, requests.ConnectionError)))
 
-    # If streaming, you'd read chunks. For now, let's assume we wait for the full content:
     if stream:
-        content = []
-        for chunk in response.iter_content(chunk_size=None, decode_unicode=True):
-            if chunk:
-                content.append(chunk)
-        return "".join(content)
+        # Ollama streams NDJSON: one {"response": "<delta>", "done": false} object per line
+        parts = []
+        for delta, line_usage in _iter_ollama_lines(response):
+            parts.append(delta)
+            if line_usage and usage is not None:
+                usage.update(line_usage)
+        return "".join(parts)
     else:
         # Non-streaming: parse JSON or plain text
         try:
             data = response.json()
-            # The actual Ollama response schema might differ; adapt as needed:
-            return data.get('generated_text', '')
         except ValueError:
             return response.text or ''
+        if usage is not None:
+            usage.update(_ollama_usage(data))
+        return data.get('response', data.get('generated_text', ''))
+
+
+def _ollama_usage(data: dict) -> dict:
+    """
+    Token counts and timings of a final Ollama response object.
+    """
+    # Ollama reports durations in nanoseconds
+    load_and_prompt = (data.get('load_duration') or 0) + (data.get('prompt_eval_duration') or 0)
+    return {
+        'prompt_tokens': data.get('prompt_eval_count'),
+        'completion_tokens': data.get('eval_count'),
+        'eval_seconds': (data.get('eval_duration') or 0) / 1e9 or None,
+        'time_to_first_token': load_and_prompt / 1e9 or None,
+    }
+
+
+def _parse_ollama_line(line: str):
+    """
+    Parses one NDJSON line of an Ollama stream into a (text_delta, usage) tuple;
+    usage is only set on the final ("done") line.
+    """
+    try:
+        data = json.loads(line)
+    except ValueError:
+        raise exceptions.LLMError(f"Malformed Ollama stream line: {line[:100]}")
+    if data.get('error'):
+        raise exceptions.LLMError(f"Ollama stream failed: {data['error']}")
+    usage = _ollama_usage(data) if data.get('done') else None
+    return data.get('response', ''), usage
+
+
+def _iter_ollama_lines(response):
+    """
+    Parses an Ollama NDJSON stream line by line as it arrives.
+    Yields (text_delta, usage) tuples; usage is only set on the final line.
+    """
+    try:
+        for line in response.iter_lines(decode_unicode=True):
+            if line:
+                yield _parse_ollama_line(line)
+    except requests.RequestException as e:
+        raise exceptions.LLMError(f"Ollama stream interrupted: {e}")
+    finally:
+        response.close()
+
+
+def stream_ollama(model_name: str, prompt: str, session: requests.Session = None,
+                  timeout: float = None, options: dict = None, url: str = None):
+    """
+    Streaming variant of call_ollama: yields (text_delta, usage) tuples as
+    soon as each NDJSON line arrives.
+    """
+    yield from _iter_ollama_lines(_open_ollama_stream(model_name, prompt, session, timeout, options, url))
+
+
+def _open_ollama_stream(model_name: str, prompt: str, session: requests.Session = None,
+                        timeout: float = None, options: dict = None, url: str = None) -> requests.Response:
+    """
+    Sends a streaming generate request; returns the response once its
+    headers arrived, before any of the body is read.
+    """
+    payload = {
+        "model": model_name,
+        "prompt": prompt,
+        "stream": True
+    }
+    if options:
+        payload["options"] = options
+
+    try:
+        http = session or requests
+        response = http.post(url or DEFAULT_OLLAMA_URL, json=payload, stream=True, timeout=timeout)
+        response.raise_for_status()
+    except requests.RequestException as e:
+        raise _http_error("Ollama request failed", e, getattr(e, 'response', None),
+                          transient=isinstance(e, (requests.Timeout, requests.ConnectionError)))
+    return response
 
 
-def call_together_ai(model_name: str, prompt: str) -> str:
+def _http_error(message: str, error: Exception, response=None, transient: bool = False) -> exceptions.LLMError:
+    """
+    Maps an HTTP client error to the LLMError hierarchy:
+    429 -> LLMRateLimitError, 5xx/timeouts/connection errors -> LLMTransientError,
+    anything else -> LLMError. Retry-After is carried along when present.
+    """
+    retry_after = None
+    status_code = None
+    if response is not None:
+        status_code = response.status_code
+        retry_after = parse_retry_after(response.headers.get('Retry-After'))
+    if status_code == 429:
+        return exceptions.LLMRateLimitError(f"{message}: {error}", retry_after=retry_after)
+    if transient or (status_code is not None and status_code >= 500):
+        return exceptions.LLMTransientError(f"{message}: {error}", retry_after=retry_after)
+    return exceptions.LLMError(f"{message}: {error}")
+
+
+def _together_error(error: Exception) -> exceptions.LLMError:
+    """
+    Maps together.ai SDK exceptions onto the LLMError hierarchy.
+    """
+    transient = isinstance(error, (together.APITimeoutError, together.APIConnectionError))
+    return _http_error("together.ai request failed", error, getattr(error, 'response', None),
+                       transient=transient)
+
+
+def call_together_ai(model_name: str, prompt: str, client=None, options: dict = None,
+                     usage: dict = None) -> str:
     """
     Example integration with together.ai's Python SDK.
     Assumes a global or environment-based API key is set.
+    - client: reusable Together client (see llm_clients). A new one is built if not given.
+    - options: extra completion parameters (temperature, max_tokens, ...).
+    - usage: dict filled with the token counts reported by together.ai.
     """
-    client = Together()  # Typically uses environment variable: TOGETHER_API_KEY
-    response = client.chat.completions.create(
-        model=model_name,
-        messages=[{"role": "user", "content": prompt}]
-    )
+    if client is None:
+        client = Together()  # Typically uses environment variable: TOGETHER_API_KEY
+    try:
+        response = client.chat.completions.create(
+            model=model_name,
+            messages=[{"role": "user", "content": prompt}],
+            **(options or {})
+        )
+    except together.TogetherError as e:
+        raise _together_error(e)
+    if usage is not None:
+        usage.update(_together_usage(response))
     # The response structure may differ; adapt as needed:
     content = response.choices[0].message.content
     return content or ''
 
 
-def get_llm_response(llm_model: LLMModel, user_prompt: str, stream: bool = False) -> str:
+def _together_usage(response) -> dict:
+    if not getattr(response, 'usage', None):
+        return {}
+    return {
+        'prompt_tokens': response.usage.prompt_tokens,
+        'completion_tokens': response.usage.completion_tokens,
+    }
+
+
+def stream_together_ai(model_name: str, prompt: str, client=None, options: dict = None):
+    """
+    Streaming variant of call_together_ai: yields (text_delta, usage) tuples
+    for each server-sent chunk.
+    """
+    if client is None:
+        client = Together()
+    yield from _iter_together_chunks(_open_together_stream(model_name, prompt, client, options))
+
+
+def _open_together_stream(model_name: str, prompt: str, client, options: dict = None):
+    try:
+        return client.chat.completions.create(
+            model=model_name,
+            messages=[{"role": "user", "content": prompt}],
+            stream=True,
+            **(options or {})
+        )
+    except together.TogetherError as e:
+        raise _together_error(e)
+
+
+def _iter_together_chunks(chunks):
+    try:
+        for chunk in chunks:
+            yield _together_chunk(chunk)
+    except together.TogetherError as e:
+        raise _together_error(e)
+
+
+def _together_chunk(chunk):
+    """
+    (text_delta, usage) of one streamed together.ai chunk; usage is only
+    set on the chunk that reports it.
+    """
+    delta = ''
+    if chunk.choices:
+        delta = getattr(chunk.choices[0].delta, 'content', None) or ''
+    usage = None
+    if getattr(chunk, 'usage', None):
+        usage = {
+            'prompt_tokens': chunk.usage.prompt_tokens,
+            'completion_tokens': chunk.usage.completion_tokens,
+        }
+    return delta, usage
+
+
+def get_llm_response(llm_model: LLMModel, user_prompt: str, stream: bool = False,
+                     options: dict = None, use_cache: bool = True) -> str:
     """
     Main entry point to call a specific LLMModel.
     - llm_model: instance of LLMModel specifying provider, model_name, usage_method, etc.
     - user_prompt: the text to send to the LLM
+    - options: generation parameters forwarded to the provider (part of the cache key)
+    - use_cache: set to False to bypass the response cache (see llm_cache)
     - Returns the LLM’s generated text.
+    Identical (model, prompt, options) requests are answered from the response
+    cache when possible; otherwise the provider is called (rate limited, with
+    retries and a circuit breaker, see llm_throttle) and the result cached.
+    Timings, token counts, retries and cache hits of the call are available
+    afterwards from llm_usage.last_call_stats() (LLMQueryLog usage columns).
     """
+    started_at = time.monotonic()
+    stats = LLMCallStats(cache_key=LLMQueryLog.make_cache_key(llm_model, user_prompt, options))
+    cache = get_response_cache()
+    cache_key = None
+    if use_cache and cache.enabled and not stream:
+        cache_key = stats.cache_key
+        cached = cache.get(cache_key)
+        if cached is not None:
+            stats.cache_hit, stats.wall_time = True, time.monotonic() - started_at
+            record_call(stats)
+            return cached
+
+    guard = get_provider_guard(llm_model.provider)
+    usage = {}
+    response_text = guard.call(
+        lambda: _call_provider(llm_model, user_prompt, stream=stream, options=options, usage=usage),
+        user_prompt,
+        on_retry=stats.count_retry,
+        max_tokens=completion_limit(options),
+        usage=usage,
+    )
+    record_call(stats.finish(started_at, llm_model.model_name, user_prompt, response_text, usage))
+    if cache_key is not None:
+        cache.set(cache_key, response_text)
+    return response_text
+
+
+def _call_provider(llm_model: LLMModel, user_prompt: str, stream: bool = False,
+                   options: dict = None, usage: dict = None) -> str:
+    """
+    Dispatches a single call to the provider behind llm_model.
+    Provider clients come from the process-wide registry, so connections
+    are pooled and reused across calls.
+    """
+    registry = get_client_registry()
     provider_name = llm_model.provider.name.lower()
     model_name = llm_model.model_name
 
@@ -72,7 +325,10 @@ def get_llm_response(llm_model: LLMModel, user_prompt: str, stream: bool = False
         full_model_name = f"{model_name}"
         if llm_model.version:
             full_model_name += f":{llm_model.version}"
-        return call_ollama(full_model_name, user_prompt, stream=stream)
+        with registry.session(llm_model) as session:
+            return call_ollama(full_model_name, user_prompt, stream=stream, session=session,
+                               timeout=registry.request_timeout, options=options, usage=usage,
+                               url=ollama_url(llm_model.provider))
 
     elif 'together' in provider_name:
         # E.g., "deepseek-ai/DeepSeek-V3"
@@ -80,8 +336,523 @@ def get_llm_response(llm_model: LLMModel, user_prompt: str, stream: bool = False
         if llm_model.version:
             # If the version is relevant for together.ai
             full_model_name += f":{llm_model.version}"
-        return call_together_ai(full_model_name, user_prompt)
+        with registry.together_client(llm_model) as client:
+            return call_together_ai(full_model_name, user_prompt, client=client,
+                                    options=options, usage=usage)
 
     # Add more conditions for other providers (OpenAI, etc.)
 
     raise exceptions.LLMError(f"Provider '{llm_model.provider.name}' not supported yet.")
+
+
+
+# ------------------------------------------------------------------------
+# Incremental streaming
+# ------------------------------------------------------------------------
+
+class LLMStream:
+    """
+    Iterator over the text deltas of a streamed completion.
+    Wraps either a sync iterator (use `for`) or an async iterator (use `async for`).
+    Timing stats are filled in while iterating:
+    - time_to_first_token: seconds from the request until the first non-empty delta
+    - tokens_per_second: completion tokens / generation time (provider-reported
+      token counts when available, otherwise one token per streamed chunk)
+    - text: everything received so far
+    - call_stats: LLMCallStats of the finished stream (LLMQueryLog usage columns)
+    """
+
+    def __init__(self, chunks, on_complete: Callable[[str], None] = None, prompt: str = '',
+                 model_name: str = '', cache_key: str = None):
+        self._chunks = chunks
+        self._on_complete = on_complete
+        self._prompt = prompt
+        self._model_name = model_name
+        self._cache_key = cache_key
+        self.call_stats = None
+        self._parts = []
+        self._started_at = time.monotonic()
+        self._first_token_at = None
+        self._finished_at = None
+        self._chunk_count = 0
+        self.usage = {}
+        self.done = False
+
+    def __iter__(self):
+        for delta, usage in self._chunks:
+            if self._record(delta, usage):
+                yield delta
+        self._finish()
+
+    async def __aiter__(self):
+        async for delta, usage in self._chunks:
+            if self._record(delta, usage):
+                yield delta
+        self._finish()
+
+    def _record(self, delta, usage) -> bool:
+        if usage:
+            self.usage.update({k: v for k, v in usage.items() if v is not None})
+        if not delta:
+            return False
+        if self._first_token_at is None:
+            self._first_token_at = time.monotonic()
+        self._chunk_count += 1
+        self._parts.append(delta)
+        return True
+
+    def _finish(self):
+        self._finished_at = time.monotonic()
+        self.done = True
+        usage = {key: self.usage.get(key) for key in ('prompt_tokens', 'completion_tokens')}
+        self.call_stats = record_call(LLMCallStats(
+            time_to_first_token=self.time_to_first_token, cache_key=self._cache_key,
+        ).finish(
+            self._started_at, self._model_name, self._prompt, self.text, usage
+        ))
+        if self._on_complete is not None:
+            self._on_complete(self.text)
+
+    @property
+    def text(self) -> str:
+        return "".join(self._parts)
+
+    @property
+    def time_to_first_token(self) -> Optional[float]:
+        if self._first_token_at is None:
+            return None
+        return self._first_token_at - self._started_at
+
+    @property
+    def completion_tokens(self) -> int:
+        return self.usage.get('completion_tokens') or self._chunk_count
+
+    @property
+    def tokens_per_second(self) -> Optional[float]:
+        seconds = self.usage.get('eval_seconds')
+        if not seconds and self._first_token_at is not None:
+            seconds = (self._finished_at or time.monotonic()) - self._first_token_at
+        if not seconds:
+            return None
+        return self.completion_tokens / seconds
+
+    def stats(self) -> dict:
+        return {
+            'time_to_first_token': self.time_to_first_token,
+            'tokens_per_second': self.tokens_per_second,
+            'completion_tokens': self.completion_tokens,
+            'prompt_tokens': self.usage.get('prompt_tokens'),
+        }
+
+
+def stream_llm_response(llm_model: LLMModel, user_prompt: str, options: dict = None) -> LLMStream:
+    """
+    Streaming counterpart of get_llm_response.
+    Returns an LLMStream yielding text deltas as the provider produces them;
+    the full text is added to the response cache once the stream is exhausted.
+    """
+    registry = get_client_registry()
+    provider_name = llm_model.provider.name.lower()
+    full_model_name = _full_model_name(llm_model)
+
+    if 'ollama' in provider_name:
+        lease, read_stream = registry.session(llm_model), _iter_ollama_lines
+        open_stream = functools.partial(_open_ollama_stream, full_model_name, user_prompt,
+                                        timeout=registry.request_timeout, options=options,
+                                        url=ollama_url(llm_model.provider))
+    elif 'together' in provider_name:
+        lease, read_stream = registry.together_client(llm_model), _iter_together_chunks
+        open_stream = functools.partial(_open_together_stream, full_model_name, user_prompt, options=options)
+    else:
+        raise exceptions.LLMError(f"Provider '{llm_model.provider.name}' does not support streaming yet.")
+
+    chunks = _guarded_chunks(llm_model.provider, user_prompt, options, lease, open_stream, read_stream)
+    return _stream(chunks, llm_model, user_prompt, options)
+
+
+def _guarded_chunks(provider: LLMProvider, user_prompt: str, options, lease, open_stream, read_stream):
+    """
+    Chunks of a provider stream. Opening it, up to the response headers,
+    goes through the provider's guard like any call (rate limits, retries,
+    circuit breaker); the pooled client stays checked out (see llm_clients)
+    until the stream is exhausted or closed. The token counts the stream
+    ends with settle its reservation.
+    """
+    guard = get_provider_guard(provider)
+    max_tokens = completion_limit(options)
+    usage = {}
+    with lease as client:
+        stream = guard.call(lambda: open_stream(client), user_prompt, max_tokens=max_tokens)
+        for delta, chunk_usage in read_stream(stream):
+            usage.update(chunk_usage or {})
+            yield delta, chunk_usage
+    guard.settle(user_prompt, usage, max_tokens)
+
+
+def _full_model_name(llm_model: LLMModel) -> str:
+    full_model_name = llm_model.model_name
+    if llm_model.version:
+        full_model_name += f":{llm_model.version}"
+    return full_model_name
+
+
+def _stream(chunks, llm_model: LLMModel, user_prompt: str, options: dict = None) -> LLMStream:
+    """
+    LLMStream over provider chunks that stores the finished text in the response cache.
+    """
+    cache = get_response_cache()
+    cache_key = LLMQueryLog.make_cache_key(llm_model, user_prompt, options)
+
+    def store(text):
+        if cache.enabled and text:
+            cache.set(cache_key, text)
+
+    return LLMStream(chunks, on_complete=store, prompt=user_prompt, model_name=llm_model.model_name,
+                     cache_key=cache_key)
+
+
+# ------------------------------------------------------------------------
+# Async provider layer (for async views under ASGI)
+# ------------------------------------------------------------------------
+
+async def acall_ollama(model_name: str, prompt: str, client: httpx.AsyncClient,
+                       options: dict = None, usage: dict = None, url: str = None) -> str:
+    """
+    Async counterpart of call_ollama on a pooled httpx.AsyncClient.
+    """
+    payload = {
+        "model": model_name,
+        "prompt": prompt,
+        "stream": False
+    }
+    if options:
+        payload["options"] = options
+
+    try:
+        response = await client.post(url or DEFAULT_OLLAMA_URL, json=payload)
+        response.raise_for_status()
+    except httpx.HTTPError as e:
+        raise _http_error("Ollama request failed", e, getattr(e, 'response', None),
+                          transient=isinstance(e, httpx.TransportError))
+
+    try:
+        data = response.json()
+    except ValueError:
+        return response.text or ''
+    if usage is not None:
+        usage.update(_ollama_usage(data))
+    return data.get('response', data.get('generated_text', ''))
+
+
+async def astream_ollama(model_name: str, prompt: str, client: httpx.AsyncClient,
+                         options: dict = None, url: str = None):
+    """
+    Async counterpart of stream_ollama: yields (text_delta, usage) tuples.
+    """
+    response = await _aopen_ollama_stream(model_name, prompt, client, options, url)
+    async for item in _aiter_ollama_lines(response):
+        yield item
+
+
+async def _aopen_ollama_stream(model_name: str, prompt: str, client: httpx.AsyncClient,
+                               options: dict = None, url: str = None) -> httpx.Response:
+    """
+    Async counterpart of _open_ollama_stream.
+    """
+    payload = {
+        "model": model_name,
+        "prompt": prompt,
+        "stream": True
+    }
+    if options:
+        payload["options"] = options
+
+    try:
+        request = client.build_request('POST', url or DEFAULT_OLLAMA_URL, json=payload)
+        response = await client.send(request, stream=True)
+    except httpx.HTTPError as e:
+        raise _http_error("Ollama request failed", e, None, transient=isinstance(e, httpx.TransportError))
+    try:
+        response.raise_for_status()
+    except httpx.HTTPStatusError as e:
+        await response.aclose()
+        raise _http_error("Ollama request failed", e, response)
+    return response
+
+
+async def _aiter_ollama_lines(response: httpx.Response):
+    """
+    Async counterpart of _iter_ollama_lines.
+    """
+    try:
+        async for line in response.aiter_lines():
+            if line:
+                yield _parse_ollama_line(line)
+    except httpx.HTTPError as e:
+        raise exceptions.LLMError(f"Ollama stream interrupted: {e}")
+    finally:
+        await response.aclose()
+
+
+async def acall_together_ai(model_name: str, prompt: str, client: AsyncTogether,
+                            options: dict = None, usage: dict = None) -> str:
+    """
+    Async counterpart of call_together_ai.
+    """
+    try:
+        response = await client.chat.completions.create(
+            model=model_name,
+            messages=[{"role": "user", "content": prompt}],
+            **(options or {})
+        )
+    except together.TogetherError as e:
+        raise _together_error(e)
+    if usage is not None:
+        usage.update(_together_usage(response))
+    content = response.choices[0].message.content
+    return content or ''
+
+
+async def astream_together_ai(model_name: str, prompt: str, client: AsyncTogether,
+                              options: dict = None):
+    """
+    Async counterpart of stream_together_ai: yields (text_delta, usage) tuples.
+    """
+    chunks = await _aopen_together_stream(model_name, prompt, client, options)
+    async for item in _aiter_together_chunks(chunks):
+        yield item
+
+
+async def _aopen_together_stream(model_name: str, prompt: str, client: AsyncTogether, options: dict = None):
+    try:
+        return await client.chat.completions.create(
+            model=model_name,
+            messages=[{"role": "user", "content": prompt}],
+            stream=True,
+            **(options or {})
+        )
+    except together.TogetherError as e:
+        raise _together_error(e)
+
+
+async def _aiter_together_chunks(chunks):
+    try:
+        async for chunk in chunks:
+            yield _together_chunk(chunk)
+    except together.TogetherError as e:
+        raise _together_error(e)
+
+
+async def aget_llm_response(llm_model: LLMModel, user_prompt: str, options: dict = None,
+                            use_cache: bool = True) -> str:
+    """
+    Async counterpart of get_llm_response: same caching, non-blocking provider call.
+    The provider call holds no thread while waiting on the network.
+    """
+    started_at = time.monotonic()
+    provider = await sync_to_async(lambda: llm_model.provider)()
+    stats = LLMCallStats(cache_key=LLMQueryLog.make_cache_key(llm_model, user_prompt, options))
+    cache = get_response_cache()
+    cache_key = None
+    if use_cache and cache.enabled:
+        cache_key = stats.cache_key
+        cached = await sync_to_async(cache.get)(cache_key)
+        if cached is not None:
+            stats.cache_hit, stats.wall_time = True, time.monotonic() - started_at
+            record_call(stats)
+            return cached
+
+    guard = get_provider_guard(provider)
+    usage = {}
+    response_text = await guard.acall(
+        lambda: _acall_provider(llm_model, user_prompt, options=options, usage=usage),
+        user_prompt,
+        on_retry=stats.count_retry,
+        max_tokens=completion_limit(options),
+        usage=usage,
+    )
+    record_call(stats.finish(started_at, llm_model.model_name, user_prompt, response_text, usage))
+    if cache_key is not None:
+        cache.set(cache_key, response_text)
+    return response_text
+
+
+async def _acall_provider(llm_model: LLMModel, user_prompt: str, options: dict = None,
+                          usage: dict = None) -> str:
+    """
+    Async counterpart of _call_provider (llm_model.provider must already be loaded).
+    """
+    registry = get_client_registry()
+    provider_name = llm_model.provider.name.lower()
+    full_model_name = _full_model_name(llm_model)
+
+    if 'ollama' in provider_name:
+        return await acall_ollama(full_model_name, user_prompt,
+                                  client=registry.get_async_http_client(llm_model),
+                                  options=options, usage=usage, url=ollama_url(llm_model.provider))
+    elif 'together' in provider_name:
+        return await acall_together_ai(full_model_name, user_prompt,
+                                       client=registry.get_async_together_client(llm_model),
+                                       options=options, usage=usage)
+
+    raise exceptions.LLMError(f"Provider '{llm_model.provider.name}' not supported yet.")
+
+
+async def astream_llm_response(llm_model: LLMModel, user_prompt: str, options: dict = None) -> LLMStream:
+    """
+    Async counterpart of stream_llm_response; iterate the result with `async for`.
+    """
+    provider = await sync_to_async(lambda: llm_model.provider)()
+    registry = get_client_registry()
+    provider_name = provider.name.lower()
+    full_model_name = _full_model_name(llm_model)
+
+    if 'ollama' in provider_name:
+        read_stream = _aiter_ollama_lines
+        open_stream = functools.partial(_aopen_ollama_stream, full_model_name, user_prompt,
+                                        registry.get_async_http_client(llm_model), options=options,
+                                        url=ollama_url(provider))
+    elif 'together' in provider_name:
+        read_stream = _aiter_together_chunks
+        open_stream = functools.partial(_aopen_together_stream, full_model_name, user_prompt,
+                                        registry.get_async_together_client(llm_model), options=options)
+    else:
+        raise exceptions.LLMError(f"Provider '{provider.name}' does not support streaming yet.")
+
+    chunks = _aguarded_chunks(provider, user_prompt, options, open_stream, read_stream)
+    return _stream(chunks, llm_model, user_prompt, options)
+
+
+async def _aguarded_chunks(provider: LLMProvider, user_prompt: str, options, open_stream, read_stream):
+    """
+    Async counterpart of _guarded_chunks (async clients are not checked out,
+    they live as long as their event loop).
+    """
+    guard = get_provider_guard(provider)
+    max_tokens = completion_limit(options)
+    usage = {}
+    stream = await guard.acall(open_stream, user_prompt, max_tokens=max_tokens)
+    async for delta, chunk_usage in read_stream(stream):
+        usage.update(chunk_usage or {})
+        yield delta, chunk_usage
+    guard.settle(user_prompt, usage, max_tokens)
+
+# ------------------------------------------------------------------------
+# Batch execution
+# ------------------------------------------------------------------------
+
+DEFAULT_BATCH_SETTINGS = {
+    # Upper bound of worker threads per provider in get_llm_responses
+    'MAX_WORKERS': 8,
+    # Max in-flight calls per provider, matched against the provider name
+    # the same way get_llm_response does ('ollama' in name, ...).
+    # Providers not listed here are bounded only by MAX_WORKERS.
+    'PROVIDER_CONCURRENCY': {
+        'ollama': 2,
+        'together': 8,
+    },
+}
+
+
+@dataclass
+class LLMBatchResult:
+    """
+    Outcome of one (LLMModel, prompt) pair submitted to get_llm_responses.
+    Exactly one of `response` / `error` is set; `stats` comes with a response.
+    """
+    index: int
+    llm_model: LLMModel
+    prompt: str
+    response: Optional[str] = None
+    error: Optional[Exception] = None
+    stats: Optional[LLMCallStats] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def get_batch_settings() -> dict:
+    options = dict(DEFAULT_BATCH_SETTINGS)
+    options.update(getattr(settings, 'SLRA_LLM_BATCH', {}))
+    return options
+
+
+def _concurrency_limit(provider_name: str, limits: dict) -> Optional[int]:
+    provider_name = provider_name.lower()
+    for key, limit in limits.items():
+        if key.lower() in provider_name:
+            return limit
+    return None
+
+
+def get_llm_responses(
+    items: Iterable[Tuple[LLMModel, str]],
+    max_workers: int = None,
+    provider_concurrency: dict = None,
+    progress_callback: Callable[[int, int, LLMBatchResult], None] = None,
+    use_cache: bool = True,
+) -> List[LLMBatchResult]:
+    """
+    Runs many prompts concurrently, on one bounded thread pool per provider.
+    - items: iterable of (llm_model, prompt) pairs.
+    - max_workers / provider_concurrency: override settings.SLRA_LLM_BATCH.
+    - progress_callback(done, total, result): called after each item finishes,
+      from the calling thread. An exception it raises (e.g. JobCancelled)
+      cancels the items not started yet and is re-raised once the running
+      ones are done.
+    - use_cache: forwarded to get_llm_response.
+    - Returns one LLMBatchResult per item, in input order. A failing item
+      stores its exception in `error` and does not affect the others.
+    """
+    items = list(items)
+    total = len(items)
+    if not total:
+        return []
+
+    options = get_batch_settings()
+    max_workers = max_workers or options['MAX_WORKERS']
+    limits = provider_concurrency if provider_concurrency is not None else options['PROVIDER_CONCURRENCY']
+
+    # Resolve providers up front so worker threads don't hit the DB for them,
+    # and give each provider its own pool so a slow provider can't starve the others.
+    groups = {}
+    for index, (llm_model, prompt) in enumerate(items):
+        provider = llm_model.provider
+        groups.setdefault(provider.pk, (provider, []))[1].append((index, llm_model, prompt))
+
+    results = [None] * total
+
+    def run(index, llm_model, prompt):
+        result = LLMBatchResult(index=index, llm_model=llm_model, prompt=prompt)
+        try:
+            result.response = get_llm_response(llm_model, prompt, use_cache=use_cache)
+            result.stats = last_call_stats()
+        except Exception as e:
+            result.error = e
+        finally:
+            # Worker threads get their own DB connections; don't leak them.
+            connections.close_all()
+        return result
+
+    executors = []
+    futures = []
+    try:
+        for provider, provider_items in groups.values():
+            workers = min(_concurrency_limit(provider.name, limits) or max_workers,
+                          max_workers, len(provider_items))
+            executor = ThreadPoolExecutor(max_workers=workers,
+                                          thread_name_prefix=f"llm-{provider.name}")
+            executors.append(executor)
+            for index, llm_model, prompt in provider_items:
+                futures.append(executor.submit(run, index, llm_model, prompt))
+        for done, future in enumerate(as_completed(futures), 1):
+            result = future.result()
+            results[result.index] = result
+            if progress_callback is not None:
+                progress_callback(done, total, result)
+    finally:
+        for executor in executors:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    return results
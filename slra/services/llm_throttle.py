@@ -0,0 +1,360 @@
+import asyncio
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import exceptions
+
+
+DEFAULT_RETRY_SETTINGS = {
+    # Retries after the first attempt for transient errors (timeouts, 5xx, 429)
+    'MAX_RETRIES': 4,
+    # Exponential backoff: BASE_DELAY * 2**attempt, capped at MAX_DELAY, full jitter
+    'BASE_DELAY': 1.0,
+    'MAX_DELAY': 60.0,
+    # Consecutive failed calls before the provider's circuit opens
+    'CIRCUIT_FAILURE_THRESHOLD': 5,
+    # Seconds the circuit stays open before a trial call is let through
+    'CIRCUIT_RESET_TIMEOUT': 30.0,
+}
+
+
+# Completion tokens reserved for a call that does not set max_tokens,
+# unless its provider's rate limits give COMPLETION_TOKENS
+DEFAULT_COMPLETION_TOKENS = 512
+
+
+def get_retry_settings() -> dict:
+    options = dict(DEFAULT_RETRY_SETTINGS)
+    options.update(getattr(settings, 'SLRA_LLM_RETRY', {}))
+    return options
+
+
+def get_rate_limits(provider_name: str) -> dict:
+    """
+    Rate limits for a provider from settings.SLRA_LLM_RATE_LIMITS, matched
+    against the provider name ('together' in 'together.ai', ...).
+    Returns {} when the provider is not limited.
+    """
+    provider_name = provider_name.lower()
+    for key, limits in getattr(settings, 'SLRA_LLM_RATE_LIMITS', {}).items():
+        if key.lower() in provider_name:
+            return limits
+    return {}
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token estimate (~4 characters per token) used for token-per-minute budgets.
+    """
+    return max(1, len(text) // 4)
+
+
+def completion_limit(options: dict = None) -> Optional[int]:
+    """
+    Completion tokens a call's options allow at most: together.ai's
+    max_tokens or Ollama's num_predict. None when they set no limit.
+    """
+    options = options or {}
+    limit = options.get('max_tokens', options.get('num_predict'))
+    return limit if limit and limit > 0 else None
+
+
+def parse_retry_after(value) -> Optional[float]:
+    """
+    Parses a Retry-After header (delta-seconds or HTTP date) into seconds.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - timezone.now()).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled continuously at `rate` units per second,
+    holding at most `capacity` units.
+    reserve() takes the units immediately (the balance may go negative) and
+    returns how long the caller has to wait before using them, so sync and
+    async callers can share one bucket.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float = 1) -> float:
+        amount = min(amount, self.capacity)
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+            self._tokens -= amount
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def refund(self, amount: float):
+        """
+        Gives back units reserved but not used; a negative amount takes
+        the units used beyond the reservation.
+        """
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + amount)
+
+
+class CircuitBreaker:
+    """
+    Fails fast while a provider is down.
+    - closed: calls pass; `failure_threshold` consecutive failures open it.
+    - open: calls raise LLMCircuitOpenError until `reset_timeout` has elapsed.
+    - half-open: one trial call passes; success closes, failure re-opens.
+    Every call let through must end in record_success(), record_failure()
+    or release() (neither, e.g. rate limited or cancelled).
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return 'closed'
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return 'half-open'
+        return 'open'
+
+    def before_call(self):
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return
+            if state == 'half-open' and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return
+            remaining = max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+        raise exceptions.LLMCircuitOpenError(
+            f"Provider '{self.name}' is unavailable (circuit open, retry in {remaining:.0f}s)."
+        )
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_in_flight or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+    def release(self):
+        """
+        Ends a call that says nothing about the provider's health; a trial
+        call is let through again.
+        """
+        with self._lock:
+            self._trial_in_flight = False
+
+
+class ProviderGuard:
+    """
+    Rate limiter, retry policy and circuit breaker for one LLMProvider.
+    """
+
+    def __init__(self, name: str, requests_per_minute: float = None, tokens_per_minute: float = None,
+                 max_retries: int = 4, base_delay: float = 1.0, max_delay: float = 60.0,
+                 failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 completion_tokens: int = DEFAULT_COMPLETION_TOKENS):
+        self.name = name
+        self.request_bucket = TokenBucket(requests_per_minute / 60.0, requests_per_minute) \
+            if requests_per_minute else None
+        self.token_bucket = TokenBucket(tokens_per_minute / 60.0, tokens_per_minute) \
+            if tokens_per_minute else None
+        self.completion_tokens = completion_tokens
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker = CircuitBreaker(name, failure_threshold, reset_timeout)
+
+    @classmethod
+    def for_provider(cls, provider):
+        limits = get_rate_limits(provider.name)
+        options = get_retry_settings()
+        return cls(
+            name=provider.name,
+            requests_per_minute=limits.get('REQUESTS_PER_MINUTE'),
+            tokens_per_minute=limits.get('TOKENS_PER_MINUTE'),
+            max_retries=options['MAX_RETRIES'],
+            base_delay=options['BASE_DELAY'],
+            max_delay=options['MAX_DELAY'],
+            failure_threshold=options['CIRCUIT_FAILURE_THRESHOLD'],
+            reset_timeout=options['CIRCUIT_RESET_TIMEOUT'],
+            completion_tokens=limits.get('COMPLETION_TOKENS', DEFAULT_COMPLETION_TOKENS),
+        )
+
+    def token_cost(self, prompt: str, max_tokens: int = None) -> int:
+        """
+        Tokens reserved for a call: the prompt's estimate plus its max_tokens,
+        or the provider's completion estimate when the call sets no limit.
+        """
+        return estimate_tokens(prompt) + (self.completion_tokens if max_tokens is None else max_tokens)
+
+    def reserve(self, prompt: str, max_tokens: int = None) -> float:
+        """
+        Takes one request and the call's token_cost from the buckets;
+        returns the seconds to wait before sending.
+        """
+        delay = 0.0
+        if self.request_bucket is not None:
+            delay = max(delay, self.request_bucket.reserve(1))
+        if self.token_bucket is not None:
+            delay = max(delay, self.token_bucket.reserve(self.token_cost(prompt, max_tokens)))
+        return delay
+
+    def settle(self, prompt: str, usage: dict, max_tokens: int = None):
+        """
+        Corrects the token bucket with the token counts a finished call
+        reported: the unused part of its reservation is given back, tokens
+        used beyond it are taken. Calls without reported counts keep the
+        reservation.
+        """
+        if self.token_bucket is None or not usage or usage.get('completion_tokens') is None:
+            return
+        used = (usage.get('prompt_tokens') or estimate_tokens(prompt)) + usage['completion_tokens']
+        reserved = min(self.token_cost(prompt, max_tokens), self.token_bucket.capacity)
+        self.token_bucket.refund(reserved - used)
+
+    def backoff(self, attempt: int, retry_after: float = None) -> float:
+        """
+        Jittered exponential delay before retry number `attempt` (0-based).
+        A provider's Retry-After is honoured as a lower bound.
+        """
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_delay))
+        return delay
+
+    def failed(self, error: Exception, attempt: int) -> Optional[float]:
+        """
+        Books a failed attempt with the circuit breaker and returns the delay
+        before retrying it, or None when it is not retried.
+        - rate limits (429) are retried but say nothing about the provider's health
+        - other transient errors and unexpected exceptions count as failures
+        - non-transient LLMErrors (bad request, unknown model, ...) show the
+          provider is up, and are not retried
+        """
+        if isinstance(error, exceptions.LLMRateLimitError):
+            self.breaker.release()
+        elif isinstance(error, exceptions.LLMTransientError) or not isinstance(error, exceptions.LLMError):
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        if not isinstance(error, exceptions.LLMTransientError) or attempt >= self.max_retries:
+            return None
+        return self.backoff(attempt, error.retry_after)
+
+    def call(self, func, prompt: str, on_retry=None, max_tokens: int = None, usage: dict = None):
+        """
+        Runs func() under the rate limit, retrying transient errors;
+        on_retry(attempt) is called before each retry (usage stats).
+        - max_tokens: the call's completion limit (see completion_limit);
+          0 for calls without a completion (embeddings).
+        - usage: dict func() fills with the provider's token counts, used
+          to settle the reservation.
+        """
+        attempt = 0
+        while True:
+            self.breaker.before_call()
+            try:
+                time.sleep(self.reserve(prompt, max_tokens))
+                result = func()
+            except Exception as e:
+                delay = self.failed(e, attempt)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                attempt += 1
+                if on_retry is not None:
+                    on_retry(attempt)
+                continue
+            except BaseException:
+                self.breaker.release()
+                raise
+            self.breaker.record_success()
+            self.settle(prompt, usage, max_tokens)
+            return result
+
+    async def acall(self, coro_func, prompt: str, on_retry=None, max_tokens: int = None, usage: dict = None):
+        """
+        Async counterpart of call(): coro_func() must return a new awaitable per attempt.
+        """
+        attempt = 0
+        while True:
+            self.breaker.before_call()
+            try:
+                await asyncio.sleep(self.reserve(prompt, max_tokens))
+                result = await coro_func()
+            except Exception as e:
+                delay = self.failed(e, attempt)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                attempt += 1
+                if on_retry is not None:
+                    on_retry(attempt)
+                continue
+            except BaseException:
+                # Cancelled (e.g. the client went away)
+                self.breaker.release()
+                raise
+            self.breaker.record_success()
+            self.settle(prompt, usage, max_tokens)
+            return result
+
+
+_guards = {}
+_guards_lock = threading.Lock()
+
+
+def get_provider_guard(provider) -> ProviderGuard:
+    """
+    Returns the process-wide ProviderGuard for an LLMProvider.
+    """
+    guard = _guards.get(provider.pk)
+    if guard is None:
+        with _guards_lock:
+            guard = _guards.get(provider.pk)
+            if guard is None:
+                guard = _guards[provider.pk] = ProviderGuard.for_provider(provider)
+    return guard
+
+
+def reset_provider_guards():
+    """
+    Drops all guards (limits and breaker state are rebuilt from settings on next use).
+    """
+    with _guards_lock:
+        _guards.clear()
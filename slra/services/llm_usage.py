@@ -0,0 +1,192 @@
+import contextvars
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from django.conf import settings
+from django.db.models import Avg, Count, Max, Q, QuerySet, Sum
+
+from .llm_throttle import estimate_tokens
+
+try:
+    import tiktoken
+except ImportError:  # optional, better local token counts
+    tiktoken = None
+
+
+# --------------------------------------------------------------------
+# Token counts and prices
+# --------------------------------------------------------------------
+
+_encoding = None
+
+
+def count_tokens(text: str) -> int:
+    """
+    Local token count for providers that don't report usage: tiktoken's
+    cl100k_base when installed, otherwise ~4 characters per token.
+    """
+    global _encoding
+    if not text:
+        return 0
+    if tiktoken is not None:
+        if _encoding is None:
+            _encoding = tiktoken.get_encoding('cl100k_base')
+        return len(_encoding.encode(text, disallowed_special=()))
+    return estimate_tokens(text)
+
+
+def get_model_prices(model_name: str) -> dict:
+    """
+    USD per million prompt / completion tokens from settings.SLRA_LLM_PRICING,
+    matched against the model name like the rate limits are against provider
+    names. Returns {} for unpriced (e.g. local) models.
+    """
+    model_name = (model_name or '').lower()
+    for key, prices in getattr(settings, 'SLRA_LLM_PRICING', {}).items():
+        if key.lower() in model_name:
+            return prices
+    return {}
+
+
+# --------------------------------------------------------------------
+# Per-call stats
+# --------------------------------------------------------------------
+
+@dataclass
+class LLMCallStats:
+    """
+    Instrumentation of one get_llm_response / stream call, stored in the
+    LLMQueryLog usage columns.
+    - wall_time: seconds from the call to the full response, rate-limit
+      waits and retries included
+    - time_to_first_token: streamed calls, or as reported by the provider
+    - tokens_estimated: prompt/completion tokens are local counts because
+      the provider gave none
+    - cache hits carry no tokens or cost (nothing was sent)
+    - cache_key: response cache key of the request (model, prompt and options)
+    """
+    wall_time: float = None
+    time_to_first_token: float = None
+    prompt_tokens: int = None
+    completion_tokens: int = None
+    tokens_estimated: bool = False
+    retries: int = 0
+    cache_hit: bool = False
+    cost: float = None
+    cache_key: str = None
+
+    def count_retry(self, attempt: int = None):
+        self.retries += 1
+
+    def finish(self, started_at: float, model_name: str, prompt: str, response: str, usage: dict = None):
+        """
+        Completes the stats of a provider call from its usage metadata
+        (prompt_tokens, completion_tokens, time_to_first_token).
+        """
+        usage = usage or {}
+        self.wall_time = time.monotonic() - started_at
+        if usage.get('time_to_first_token') is not None:
+            self.time_to_first_token = usage['time_to_first_token']
+        self.prompt_tokens = usage.get('prompt_tokens')
+        self.completion_tokens = usage.get('completion_tokens')
+        if self.prompt_tokens is None:
+            self.prompt_tokens, self.tokens_estimated = count_tokens(prompt), True
+        if self.completion_tokens is None:
+            self.completion_tokens, self.tokens_estimated = count_tokens(response), True
+        prices = get_model_prices(model_name)
+        if prices:
+            self.cost = (self.prompt_tokens * prices.get('PROMPT', 0)
+                         + self.completion_tokens * prices.get('COMPLETION', 0)) / 1e6
+        return self
+
+    def log_fields(self) -> dict:
+        return {
+            'wall_time': self.wall_time,
+            'time_to_first_token': self.time_to_first_token,
+            'prompt_tokens': self.prompt_tokens,
+            'completion_tokens': self.completion_tokens,
+            'tokens_estimated': self.tokens_estimated,
+            'retries': self.retries,
+            'cache_hit': self.cache_hit,
+            'cost': self.cost,
+            'cache_key': self.cache_key,
+        }
+
+
+_last_call = contextvars.ContextVar('slra_llm_last_call', default=None)
+
+
+def record_call(stats: LLMCallStats) -> LLMCallStats:
+    _last_call.set(stats)
+    return stats
+
+
+def last_call_stats() -> Optional[LLMCallStats]:
+    """
+    Stats of the latest LLM call made by this thread / async task.
+    """
+    return _last_call.get()
+
+
+def last_call_fields() -> dict:
+    """
+    LLMQueryLog usage columns of the latest call, e.g.
+    LLMQueryLog.objects.create(..., **last_call_fields()).
+    """
+    stats = last_call_stats()
+    return stats.log_fields() if stats is not None else {}
+
+
+def apply_stats(query_log, stats: Optional[LLMCallStats]):
+    """
+    Copies call stats onto an existing LLMQueryLog (not saved).
+    """
+    for name, value in (stats.log_fields() if stats is not None else {}).items():
+        setattr(query_log, name, value)
+    return query_log
+
+
+# --------------------------------------------------------------------
+# Aggregation (/api/llm-usage/)
+# --------------------------------------------------------------------
+
+GROUP_FIELDS = {
+    'review': ('systematic_review_id', 'systematic_review__name'),
+    'model': ('llm_model_id', 'llm_model__model_name'),
+    'phase': ('phase',),
+}
+
+
+def usage_summary(queryset: QuerySet, group_by=('review', 'model', 'phase')) -> list:
+    """
+    Calls, cache hits, retries, tokens, cost and latency of LLMQueryLogs,
+    one row per combination of the group_by keys (review, model, phase).
+    Logs from before the usage columns existed count as calls only.
+    """
+    unknown = set(group_by) - set(GROUP_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown group_by {sorted(unknown)}. Must be among {sorted(GROUP_FIELDS)}.")
+    fields = [field for key in group_by for field in GROUP_FIELDS[key]]
+    provider_calls = Q(cache_hit=False, wall_time__isnull=False)
+    rows = queryset.order_by().values(*fields).annotate(
+        calls=Count('pk'),
+        cache_hits=Count('pk', filter=Q(cache_hit=True)),
+        total_retries=Sum('retries'),
+        total_prompt_tokens=Sum('prompt_tokens'),
+        total_completion_tokens=Sum('completion_tokens'),
+        estimated_calls=Count('pk', filter=Q(tokens_estimated=True)),
+        total_cost=Sum('cost'),
+        avg_wall_time=Avg('wall_time', filter=provider_calls),
+        max_wall_time=Max('wall_time', filter=provider_calls),
+        avg_time_to_first_token=Avg('time_to_first_token', filter=provider_calls),
+        provider_completion_tokens=Sum('completion_tokens', filter=provider_calls),
+        provider_wall_time=Sum('wall_time', filter=provider_calls),
+    ).order_by(*fields)
+    summary = []
+    for row in rows:
+        tokens, seconds = row.pop('provider_completion_tokens'), row.pop('provider_wall_time')
+        row['total_tokens'] = (row['total_prompt_tokens'] or 0) + (row['total_completion_tokens'] or 0)
+        row['completion_tokens_per_second'] = tokens / seconds if tokens and seconds else None
+        summary.append(row)
+    return summary
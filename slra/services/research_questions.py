@@ -0,0 +1,101 @@
+from typing import List
+
+from slra.models import LLMModel, LLMQueryLog, ResearchQuestion, SystematicReview
+from .llm_integration import get_llm_response
+from .llm_usage import last_call_fields
+
+
+PROBLEM_FORMULATION_PHASE = 1  # LLMQueryLog.PHASE_CHOICES: Problem Formulation
+
+# We include an example to guide the LLM's style.
+# We ask the LLM to enumerate the questions with `--1--`, `--2--`, etc.
+EXAMPLE_QUESTIONS = """
+--1-- How do researchers design and conduct AI-related studies in RSE, and what research methods are most commonly used?
+--2-- What ethical issues do researchers face when developing AI software, and how are concerns like bias, explainability, and fairness addressed in RSE practices?
+--3-- How does funding and institutional support influence the development, sustainability, and ethical alignment of AI research software in RSE?
+--4-- What are the common software development practices in AI research within RSE, particularly regarding data management, sustainability, and the use of machine learning tools?
+--5-- How are the FAIR principles (Findable, Accessible, Interoperable, Reusable) implemented in AI-related research software, and what challenges do researchers face in achieving compliance?
+--6-- How do Research Software Engineers (RSEs) make decisions regarding the trade-offs between model performance, interpretability, and ethical considerations in AI development?
+--7-- What are the key challenges and best practices in integrating AI technologies into existing research software infrastructures within different scientific domains?
+--8-- What strategies are employed to manage and mitigate the environmental impact of AI research software, particularly concerning energy consumption and carbon footprint?
+""".strip()
+
+
+def build_prompt(base_topic: str, num_questions: int) -> str:
+    """
+    Asks for `num_questions` research questions on a topic, each prefixed by `--1--`, `--2--`, etc.
+    """
+    return f"""You are an expert in research. 
+Below is an example of the style we would like for the questions:
+--------------------
+{EXAMPLE_QUESTIONS}
+--------------------
+
+Now, please generate {num_questions} possible research questions based on the following topic:
+"{base_topic}"
+
+Use the following format exactly:
+--1-- <Question #1>
+--2-- <Question #2>
+... 
+(Up to --{num_questions}--)
+
+Only output the questions in that format, do not provide extra commentary.
+"""
+
+
+def parse_questions(response_text: str) -> List[str]:
+    """
+    Splits the LLM output on lines that start with `--<number>--`; other
+    lines continue the current question.
+    """
+    lines = [line.strip() for line in (response_text or '').split('\n') if line.strip()]
+    parsed_questions = []
+    current_question_parts = []
+
+    for line in lines:
+        if line.startswith("--") and line.count("--") >= 2:
+            # new question start
+            if current_question_parts:
+                parsed_questions.append(" ".join(current_question_parts).strip())
+                current_question_parts = []
+            # turns "--1-- question text" into "question text"
+            current_question_parts.append(line.replace('--', '', 2).strip())
+        else:
+            # continuation of the current question
+            current_question_parts.append(line)
+
+    # append last question if any
+    if current_question_parts:
+        parsed_questions.append(" ".join(current_question_parts).strip())
+
+    # remove empty or whitespace questions
+    return [q for q in parsed_questions if q.strip()]
+
+
+def generate_questions(review: SystematicReview, llm_model: LLMModel, base_topic: str,
+                       num_questions: int = 10, save: bool = False) -> dict:
+    """
+    Non-interactive generation (background jobs): the whole response is
+    logged (phase 1) and, with `save`, every parsed question is added to the
+    review. Returns the log ID, the questions and the IDs of saved questions.
+    """
+    prompt = build_prompt(base_topic, num_questions)
+    response_text = get_llm_response(llm_model, prompt)
+    questions = parse_questions(response_text)
+
+    query_log = LLMQueryLog.objects.create(
+        systematic_review=review,
+        llm_model=llm_model,
+        phase=PROBLEM_FORMULATION_PHASE,
+        prompt_text=prompt,
+        response_text=response_text,
+        **last_call_fields()
+    )
+    saved = []
+    if save:
+        saved = [
+            ResearchQuestion.objects.create(systematic_review=review, question_text=question).pk
+            for question in questions
+        ]
+    return {'query_log': query_log.pk, 'questions': questions, 'saved': saved}
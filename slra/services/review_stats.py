@@ -0,0 +1,165 @@
+from datetime import timedelta
+from typing import Iterable
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from slra.models import (
+    LLMQueryLog, PrimaryStudy, RelevancyEvaluation, ReviewStatistics, SearchResult, SystematicReview
+)
+
+DEFAULT_REVIEW_STATS_SETTINGS = {
+    # Seconds between two refreshes of the changed reviews' statistics by a `run_jobs` worker
+    'REFRESH_INTERVAL': 60,
+    # Statistics older than this are recomputed by the same refresh even without
+    # a recorded change (deletes are not signalled)
+    'MAX_AGE': 3600,
+    # Rows per upsert
+    'BATCH_SIZE': 500,
+}
+
+# Histogram field -> (model, path to the review ID, path to the key, total field or None).
+# One GROUP BY query per histogram, whatever the number of reviews refreshed.
+HISTOGRAMS = {
+    'studies_by_relevancy': (PrimaryStudy, 'systematic_review_id', 'relevancy_level', 'studies'),
+    'studies_by_year': (PrimaryStudy, 'systematic_review_id', 'publication_year', None),
+    'evaluations_by_evaluator': (RelevancyEvaluation, 'primary_study__systematic_review_id', 'evaluator',
+                                 'evaluations'),
+    'llm_calls_by_phase': (LLMQueryLog, 'systematic_review_id', 'phase', 'llm_calls'),
+    'search_results_by_library': (SearchResult, 'library_search__search_query__systematic_review_id',
+                                  'library_search__library__name', 'search_results'),
+}
+TOTALS = [total for *_, total in HISTOGRAMS.values() if total]
+
+
+def get_review_stats_settings() -> dict:
+    options = dict(DEFAULT_REVIEW_STATS_SETTINGS)
+    options.update(getattr(settings, 'SLRA_REVIEW_STATS', {}))
+    return options
+
+
+def mark_changed(review_ids: Iterable[int] = None, **lookups) -> int:
+    """
+    Records a write to rows counted by the statistics of the given reviews
+    (IDs or a queryset of them), or of the reviews matching ReviewStatistics
+    lookups, e.g. mark_changed(systematic_review__primary_studies=study_id).
+    One UPDATE; the counts are recomputed on the next read or refresh.
+    """
+    queryset = ReviewStatistics.objects.all()
+    if review_ids is not None:
+        queryset = queryset.filter(pk__in=review_ids)
+    return queryset.filter(**lookups).update(changed_at=timezone.now())
+
+
+def review_ids_of(queryset) -> list:
+    """
+    IDs of the reviews whose statistics count the queryset's rows (one
+    query), e.g. to mark_changed() them after a delete, which sends no signal.
+    """
+    review_path = next(path for model, path, *_ in HISTOGRAMS.values() if model is queryset.model)
+    return list(queryset.order_by().values_list(review_path, flat=True).distinct())
+
+
+def refresh(review_ids: Iterable[int] = None) -> int:
+    """
+    Recomputes the statistics of the given reviews (all reviews by default)
+    and upserts them; returns the number of reviews refreshed. The queries
+    are grouped by review, so refreshing many reviews costs the same number
+    of queries as one.
+    """
+    options = get_review_stats_settings()
+    started_at = timezone.now()
+    every_review = review_ids is None
+    if every_review:
+        review_ids = SystematicReview.objects.values_list('pk', flat=True)
+    rows = {}
+    for pk in review_ids:
+        rows[pk] = ReviewStatistics(
+            systematic_review_id=pk, refreshed_at=started_at,
+            studies_by_relevancy={level: 0 for level, _ in PrimaryStudy.RELEVANCY_CHOICES},
+        )
+    if not rows:
+        return 0
+
+    for field, (model, review_path, key_path, total) in HISTOGRAMS.items():
+        queryset = model.objects.order_by()
+        if not every_review:
+            queryset = queryset.filter(**{f'{review_path}__in': list(rows)})
+        for review_id, key, count in queryset.values_list(review_path, key_path).annotate(count=Count('pk')):
+            stats = rows.get(review_id)
+            if stats is None:
+                continue
+            if total:
+                setattr(stats, total, getattr(stats, total) + count)
+            if key is not None:
+                histogram = getattr(stats, field)
+                histogram[str(key)] = histogram.get(str(key), 0) + count
+
+    # MySQL upserts on the primary key without naming it
+    unique_fields = ['systematic_review'] if connection.features.supports_update_conflicts_with_target else None
+    ReviewStatistics.objects.bulk_create(
+        rows.values(), batch_size=options['BATCH_SIZE'], update_conflicts=True, unique_fields=unique_fields,
+        update_fields=[*HISTOGRAMS, *TOTALS, 'refreshed_at'],
+    )
+    return len(rows)
+
+
+def refresh_stale(max_age: float = None) -> int:
+    """
+    Refreshes the reviews without statistics, those changed since their
+    last refresh and, with max_age (seconds), those refreshed longer ago.
+    """
+    condition = Q(statistics__isnull=True) | Q(statistics__changed_at__gte=F('statistics__refreshed_at'))
+    if max_age is not None:
+        condition |= Q(statistics__refreshed_at__lt=timezone.now() - timedelta(seconds=max_age))
+    review_ids = list(SystematicReview.objects.filter(condition).values_list('pk', flat=True))
+    return refresh(review_ids) if review_ids else 0
+
+
+def get_statistics(review: SystematicReview) -> ReviewStatistics:
+    """
+    The review's statistics, recomputed first when missing or stale.
+    """
+    stats = ReviewStatistics.objects.filter(pk=review.pk).first()
+    if stats is None or stats.stale:
+        refresh([review.pk])
+        stats = ReviewStatistics.objects.get(pk=review.pk)
+    return stats
+
+
+def as_dict(stats: ReviewStatistics) -> dict:
+    return {
+        'review': stats.systematic_review_id,
+        'studies': {'total': stats.studies, 'by_relevancy': stats.studies_by_relevancy,
+                    'by_year': dict(sorted(stats.studies_by_year.items()))},
+        'evaluations': {'total': stats.evaluations, 'by_evaluator': stats.evaluations_by_evaluator},
+        'llm_calls': {'total': stats.llm_calls, 'by_phase': stats.llm_calls_by_phase},
+        'search_results': {'total': stats.search_results, 'by_library': stats.search_results_by_library},
+        'refreshed_at': stats.refreshed_at,
+    }
+
+
+def publication_years() -> list:
+    """
+    Publication years present in any review, for the admin year filter, from
+    the stored statistics. Reviews without statistics or changed since their
+    last refresh are recounted first, so the filter doesn't depend on a
+    `run_jobs` worker; one query when every review is current.
+    """
+    rows = SystematicReview.objects.values_list(
+        'pk', 'statistics__studies_by_year', 'statistics__changed_at', 'statistics__refreshed_at')
+    histograms, stale = [], []
+    for pk, histogram, changed_at, refreshed_at in rows:
+        if histogram is None or (changed_at is not None and changed_at >= refreshed_at):
+            stale.append(pk)
+        else:
+            histograms.append(histogram)
+    if stale:
+        refresh(stale)
+        histograms += ReviewStatistics.objects.filter(pk__in=stale).values_list('studies_by_year', flat=True)
+    years = set()
+    for histogram in histograms:
+        years.update(int(year) for year, count in histogram.items() if count)
+    return sorted(years)
@@ -0,0 +1,225 @@
+import re
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+
+from slra.models import LLMModel, LLMQueryLog, PrimaryStudy, RelevancyEvaluation, SystematicReview
+from . import review_stats, search
+from .llm_integration import get_llm_responses
+
+
+DEFAULT_SCREENING_SETTINGS = {
+    # Studies packed into one prompt
+    'STUDIES_PER_PROMPT': 10,
+    # Prompts dispatched (concurrently) per round; each round is written in
+    # one transaction and is the unit of checkpointing
+    'PROMPTS_PER_ROUND': 16,
+    # Abstracts are truncated to keep prompts within the model's context
+    'MAX_ABSTRACT_CHARS': 1500,
+}
+
+SCREENING_PHASE = 6  # LLMQueryLog.PHASE_CHOICES: Relevancy Evaluation
+
+# PrimaryStudy.relevancy_level for each verdict (an exclusion leaves the study
+# "not evaluated", as the manual evaluate endpoints do)
+RELEVANCY_LEVELS = {'H': 'H', 'M': 'M', 'L': 'L', 'X': 'N'}
+
+# "[123] M - reason", "123: X (off-topic)", "ID 123 - High", "1. [123] L"
+VERDICT_RE = re.compile(
+    r'^\W*(?:\d+[.)]\s+\W*)?(?:id\W*)?(\d+)\]?\s*[:\-–|.)]*\s*\(?'
+    r'\b(high|medium|low|exclude[sd]?|[HMLX])\b\)?\s*[:\-–|.]*\s*(.*)$',
+    re.IGNORECASE,
+)
+
+
+def get_screening_settings() -> dict:
+    options = dict(DEFAULT_SCREENING_SETTINGS)
+    options.update(getattr(settings, 'SLRA_SCREENING', {}))
+    return options
+
+
+@dataclass
+class ScreeningStats:
+    """
+    Running totals of a screening run.
+    """
+    rounds: int = 0
+    prompts: int = 0
+    failed_prompts: int = 0   # provider errors; their studies stay unevaluated
+    screened: int = 0         # studies sent to the LLM
+    evaluated: int = 0        # verdicts written
+    unparsed: int = 0         # studies without a usable verdict in the response
+    verdicts: Counter = field(default_factory=Counter)
+    elapsed: float = 0.0
+
+    @property
+    def studies_per_second(self) -> float:
+        return self.evaluated / self.elapsed if self.elapsed else 0.0
+
+
+def default_evaluator(llm_model: LLMModel) -> str:
+    return f"LLM: {llm_model}"[:RelevancyEvaluation._meta.get_field('evaluator').max_length]
+
+
+def pending_studies(review: SystematicReview, evaluator: str):
+    """
+    Studies of the review without an evaluation by `evaluator` (duplicates excluded).
+    Re-evaluated on every round, so a restarted run continues where it stopped.
+    """
+    already_evaluated = RelevancyEvaluation.objects.filter(primary_study=OuterRef('pk'), evaluator=evaluator)
+    return PrimaryStudy.objects.filter(systematic_review=review, duplicate_of__isnull=True) \
+        .filter(~Exists(already_evaluated))
+
+
+def build_prompt(review: SystematicReview, questions: List[str], studies: List[PrimaryStudy],
+                 max_abstract_chars: int) -> str:
+    """
+    One screening prompt for several studies, each tagged with its ID.
+    """
+    lines = [
+        "You are screening primary studies for a systematic literature review.",
+        f"Review: {review.name}",
+    ]
+    if review.problem_statement:
+        lines.append(f"Problem statement: {review.problem_statement}")
+    if questions:
+        lines.append("Research questions:")
+        lines.extend(f"- {question}" for question in questions)
+    lines += [
+        "",
+        "Rate the relevancy of each study below to this review:",
+        "H = high, M = medium, L = low, X = exclude (out of scope).",
+        "Answer with exactly one line per study, in the form:",
+        "[ID] LETTER - one-sentence reason",
+        "",
+    ]
+    for study in studies:
+        abstract = (study.abstract or '').strip()
+        if len(abstract) > max_abstract_chars:
+            abstract = abstract[:max_abstract_chars].rsplit(' ', 1)[0] + '...'
+        lines.append(f"[{study.pk}] Title: {study.title}")
+        if study.keywords:
+            lines.append(f"Keywords: {study.keywords}")
+        lines.append(f"Abstract: {abstract or '(no abstract)'}")
+        lines.append("")
+    return "\n".join(lines)
+
+
+def parse_verdicts(response_text: str, study_ids) -> Dict[int, tuple]:
+    """
+    Maps study ID -> (verdict, reason) for the IDs of the prompt; lines that
+    don't match, or mention other IDs, are ignored. The first verdict per study wins.
+    """
+    study_ids = set(study_ids)
+    verdicts = {}
+    for line in (response_text or '').splitlines():
+        match = VERDICT_RE.match(line.strip())
+        if not match:
+            continue
+        pk = int(match.group(1))
+        if pk in study_ids and pk not in verdicts:
+            verdict = match.group(2).upper()
+            verdicts[pk] = ('X' if verdict.startswith('E') else verdict[0], match.group(3).strip())
+    return verdicts
+
+
+class StudyScreener:
+    """
+    LLM relevancy screening (phase 6) of a review's unevaluated studies.
+    Studies are read in keyset-paginated rounds, packed STUDIES_PER_PROMPT per
+    prompt and the round's prompts dispatched concurrently through
+    get_llm_responses. Each round's verdicts are written in one transaction
+    (RelevancyEvaluation rows, PrimaryStudy.relevancy_level and the phase-6
+    LLMQueryLog entries), so an interrupted run loses at most the round in
+    flight and a new run skips everything this evaluator already rated.
+    A cached response without any usable verdict is asked again uncached,
+    or a re-run would get the same response back for the same prompt.
+    """
+
+    def __init__(self, review: SystematicReview, llm_model: LLMModel, evaluator: str = None,
+                 studies_per_prompt: int = None, prompts_per_round: int = None,
+                 use_cache: bool = True, progress_callback: Callable[[ScreeningStats], None] = None):
+        options = get_screening_settings()
+        self.review = review
+        self.llm_model = llm_model
+        self.evaluator = evaluator or default_evaluator(llm_model)
+        self.studies_per_prompt = studies_per_prompt or options['STUDIES_PER_PROMPT']
+        self.prompts_per_round = prompts_per_round or options['PROMPTS_PER_ROUND']
+        self.max_abstract_chars = options['MAX_ABSTRACT_CHARS']
+        self.use_cache = use_cache
+        self.progress_callback = progress_callback
+        self.stats = ScreeningStats()
+        self._questions = list(review.research_questions.values_list('question_text', flat=True))
+
+    def run(self, limit: int = None) -> ScreeningStats:
+        started_at = time.monotonic()
+        round_size = self.studies_per_prompt * self.prompts_per_round
+        queryset = pending_studies(self.review, self.evaluator) \
+            .only('pk', 'title', 'abstract', 'keywords', 'relevancy_level').order_by('pk')
+        last_pk = 0
+        while limit is None or self.stats.screened < limit:
+            size = round_size if limit is None else min(round_size, limit - self.stats.screened)
+            studies = list(queryset.filter(pk__gt=last_pk)[:size])
+            if not studies:
+                break
+            last_pk = studies[-1].pk
+            self._screen_round(studies)
+            self.stats.elapsed = time.monotonic() - started_at
+            if self.progress_callback is not None:
+                self.progress_callback(self.stats)
+        self.stats.elapsed = time.monotonic() - started_at
+        return self.stats
+
+    def _screen_round(self, studies: List[PrimaryStudy]):
+        batches = [studies[i:i + self.studies_per_prompt]
+                   for i in range(0, len(studies), self.studies_per_prompt)]
+        prompts = [build_prompt(self.review, self._questions, batch, self.max_abstract_chars)
+                   for batch in batches]
+        results = get_llm_responses([(self.llm_model, prompt) for prompt in prompts],
+                                    use_cache=self.use_cache)
+        unparsable = [index for index, (batch, result) in enumerate(zip(batches, results))
+                      if result.ok and result.stats is not None and result.stats.cache_hit
+                      and not parse_verdicts(result.response, [study.pk for study in batch])]
+        if unparsable:
+            retried = get_llm_responses([(self.llm_model, prompts[index]) for index in unparsable], use_cache=False)
+            for index, result in zip(unparsable, retried):
+                results[index] = result
+
+        evaluations, updated, logs = [], [], []
+        for batch, result in zip(batches, results):
+            self.stats.prompts += 1
+            self.stats.screened += len(batch)
+            if not result.ok:
+                self.stats.failed_prompts += 1
+                continue
+            logs.append(LLMQueryLog(
+                systematic_review=self.review, llm_model=self.llm_model, phase=SCREENING_PHASE,
+                prompt_text=result.prompt, response_text=result.response,
+                **(result.stats.log_fields() if result.stats else {}),
+            ))
+            verdicts = parse_verdicts(result.response, [study.pk for study in batch])
+            self.stats.unparsed += len(batch) - len(verdicts)
+            for study in batch:
+                if study.pk not in verdicts:
+                    continue
+                verdict, reason = verdicts[study.pk]
+                evaluations.append(RelevancyEvaluation(
+                    primary_study=study, evaluator=self.evaluator, relevancy=verdict, notes=reason or None,
+                ))
+                study.relevancy_level = RELEVANCY_LEVELS[verdict]
+                updated.append(study)
+                self.stats.verdicts[verdict] += 1
+
+        with transaction.atomic():
+            RelevancyEvaluation.objects.bulk_create(evaluations)
+            PrimaryStudy.objects.bulk_update(updated, ['relevancy_level'])
+            # bulk_create skips save()/post_save: cache_key is set above, index here
+            search.index_objects('logs', LLMQueryLog.objects.bulk_create(logs))
+        review_stats.mark_changed([self.review.pk])
+        self.stats.evaluated += len(evaluations)
+        self.stats.rounds += 1
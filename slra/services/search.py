@@ -0,0 +1,365 @@
+import math
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Tuple
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, Count, F, FloatField, Sum, Value, When
+from django.db.models.expressions import RawSQL
+
+from slra.fingerprints import normalize_text
+from slra.models import LLMQueryLog, PrimaryStudy, SearchIndexEntry, SearchResult
+
+
+DEFAULT_SEARCH_SETTINGS = {
+    # 'auto': MySQL FULLTEXT indexes on MySQL, the local inverted index elsewhere.
+    # 'fulltext' / 'index' force one of them.
+    'BACKEND': 'auto',
+    'MAX_RESULTS': 100,
+    'INDEX_BATCH_SIZE': 1000,
+    # BM25 parameters of the local index
+    'BM25_K1': 1.2,
+    'BM25_B': 0.75,
+    # Seconds the object count of a target (the N of the IDF) is reused by
+    # other processes; the process writing the index refreshes it at once
+    'DOCUMENT_COUNT_TTL': 300,
+}
+
+MAX_TERM_LENGTH = SearchIndexEntry._meta.get_field('term').max_length
+
+STOP_WORDS = frozenset("""
+    a an and are as at be by for from has have in is it its of on or that the
+    this to was were which with we our their these those than then into can
+""".split())
+
+
+# target name -> (expiry, number of objects)
+_document_counts = {}
+
+
+def get_search_settings() -> dict:
+    options = dict(DEFAULT_SEARCH_SETTINGS)
+    options.update(getattr(settings, 'SLRA_SEARCH', {}))
+    return options
+
+
+# --------------------------------------------------------------------
+# Search targets
+# --------------------------------------------------------------------
+
+@dataclass(frozen=True)
+class SearchTarget:
+    """
+    A searchable model.
+    - fields: (field name, boost) pairs; boosts only apply to the local index.
+    - review_lookup: ORM path from the model to its SystematicReview.
+    - average_length: typical document length in terms (BM25 length normalization).
+    """
+    name: str
+    model: type
+    fields: Tuple[Tuple[str, float], ...]
+    review_lookup: str
+    average_length: int
+
+    @property
+    def field_names(self) -> List[str]:
+        return [name for name, _ in self.fields]
+
+
+TARGETS = {
+    'studies': SearchTarget(
+        'studies', PrimaryStudy,
+        (('title', 3.0), ('keywords', 2.0), ('abstract', 1.0)),
+        'systematic_review', 200,
+    ),
+    'results': SearchTarget(
+        'results', SearchResult,
+        (('title', 3.0), ('authors', 1.0), ('abstract', 1.0)),
+        'library_search__search_query__systematic_review', 200,
+    ),
+    'logs': SearchTarget(
+        'logs', LLMQueryLog,
+        (('prompt_text', 1.0), ('response_text', 1.0)),
+        'systematic_review', 500,
+    ),
+}
+
+
+def get_target(name) -> SearchTarget:
+    if isinstance(name, SearchTarget):
+        return name
+    try:
+        return TARGETS[name]
+    except KeyError:
+        raise ValueError(f"Unknown search target '{name}'. Must be one of {sorted(TARGETS)}.")
+
+
+def target_for_model(model) -> SearchTarget:
+    for target in TARGETS.values():
+        if target.model is model:
+            return target
+    return None
+
+
+def uses_fulltext() -> bool:
+    """
+    True when searches run on the database's FULLTEXT indexes (created by
+    migration 0006 on MySQL) rather than the local inverted index.
+    """
+    backend = get_search_settings()['BACKEND']
+    if backend == 'auto':
+        return connection.vendor == 'mysql'
+    return backend == 'fulltext'
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Normalized terms of a text, without stop words and one-character tokens.
+    """
+    return [term[:MAX_TERM_LENGTH] for term in normalize_text(text).split()
+            if len(term) > 1 and term not in STOP_WORDS]
+
+
+def _query_terms(query: str) -> List[str]:
+    return list(dict.fromkeys(tokenize(query)))
+
+
+# --------------------------------------------------------------------
+# Local inverted index
+# --------------------------------------------------------------------
+
+def document_weights(target: SearchTarget, values: Dict[str, str], options: dict = None) -> Dict[str, float]:
+    """
+    term -> BM25 term-frequency component for one object, with field boosts
+    applied to the raw counts. The IDF part is computed at query time.
+    """
+    options = options or get_search_settings()
+    k1, b = options['BM25_K1'], options['BM25_B']
+    frequencies = Counter()
+    length = 0
+    for name, boost in target.fields:
+        terms = tokenize(values.get(name) or '')
+        length += len(terms)
+        for term in terms:
+            frequencies[term] += boost
+    if not frequencies:
+        return {}
+    norm = k1 * (1 - b + b * length / target.average_length)
+    return {term: tf * (k1 + 1) / (tf + norm) for term, tf in frequencies.items()}
+
+
+def index_objects(target, objects: Iterable) -> int:
+    """
+    (Re-)indexes model instances in the local inverted index; returns the
+    number of entries written. A no-op when FULLTEXT indexes are in use.
+    Objects without a primary key (bulk_create on MySQL) are skipped.
+    """
+    if uses_fulltext():
+        return 0
+    target = get_target(target)
+    options = get_search_settings()
+    objects = [obj for obj in objects if obj.pk is not None]
+    if not objects:
+        return 0
+
+    rows = []
+    for obj in objects:
+        values = {name: getattr(obj, name) for name in target.field_names}
+        for term, weight in document_weights(target, values, options).items():
+            rows.append((target.name, obj.pk, term, weight))
+    with transaction.atomic():
+        SearchIndexEntry.objects.filter(target=target.name, object_id__in=[obj.pk for obj in objects]).delete()
+        _insert_entries(rows)
+    _document_counts.pop(target.name, None)
+    return len(rows)
+
+
+def remove_objects(target, pks: Iterable[int]) -> int:
+    """
+    Drops the entries of deleted objects from the local index; returns the
+    number of entries deleted. For bulk deletes, which send no signal.
+    """
+    if uses_fulltext():
+        return 0
+    target = get_target(target)
+    deleted, _ = SearchIndexEntry.objects.filter(target=target.name, object_id__in=list(pks)).delete()
+    _document_counts.pop(target.name, None)
+    return deleted
+
+
+def _insert_entries(rows: List[Tuple[str, int, str, float]]):
+    """
+    Plain executemany INSERT: an object has ~100 terms, so building a model
+    instance per entry for bulk_create would dominate indexing time.
+    """
+    quote = connection.ops.quote_name
+    meta = SearchIndexEntry._meta
+    columns = ', '.join(quote(meta.get_field(name).column) for name in ('target', 'object_id', 'term', 'weight'))
+    sql = f"INSERT INTO {quote(meta.db_table)} ({columns}) VALUES (%s, %s, %s, %s)"
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+
+
+def rebuild_index(target, queryset=None, progress_callback=None) -> int:
+    """
+    Re-indexes every object of a target (or of the given queryset) in chunks.
+    Without a queryset, entries of deleted objects are dropped as well.
+    """
+    target = get_target(target)
+    batch_size = get_search_settings()['INDEX_BATCH_SIZE']
+    if queryset is None:
+        queryset = target.model._default_manager.all()
+        SearchIndexEntry.objects.filter(target=target.name).delete()
+
+    indexed = 0
+    chunk = []
+    for obj in queryset.only('pk', *target.field_names).order_by('pk').iterator(chunk_size=batch_size):
+        chunk.append(obj)
+        if len(chunk) >= batch_size:
+            index_objects(target, chunk)
+            indexed += len(chunk)
+            chunk = []
+            if progress_callback is not None:
+                progress_callback(indexed)
+    if chunk:
+        index_objects(target, chunk)
+        indexed += len(chunk)
+    _analyze()
+    return indexed
+
+
+def _analyze():
+    """
+    Refreshes the planner statistics of the index table. Without them SQLite
+    groups postings through search_object_idx (a scan of the whole target)
+    instead of looking the terms up in search_term_idx.
+    """
+    if connection.vendor in ('sqlite', 'postgresql'):
+        with connection.cursor() as cursor:
+            cursor.execute(f"ANALYZE {connection.ops.quote_name(SearchIndexEntry._meta.db_table)}")
+
+
+def _document_count(target: SearchTarget, options: dict) -> int:
+    """
+    Number of objects of a target, counted once per DOCUMENT_COUNT_TTL
+    rather than on every query (COUNT(*) scans the table on InnoDB).
+    """
+    expiry, count = _document_counts.get(target.name, (0.0, 0))
+    if time.monotonic() >= expiry:
+        count = target.model._default_manager.count()
+        _document_counts[target.name] = (time.monotonic() + options['DOCUMENT_COUNT_TTL'], count)
+    return count
+
+
+def _index_scores(target: SearchTarget, terms: List[str], queryset):
+    """
+    object_id/score rows of the local index ranked by BM25, restricted to the queryset.
+    """
+    postings = SearchIndexEntry.objects.filter(target=target.name, term__in=terms)
+    # Entries of deleted objects (not signalled) don't count towards the document frequency
+    live = postings.filter(object_id__in=target.model._default_manager.values('pk'))
+    document_frequency = dict(live.values('term').annotate(n=Count('object_id'))
+                              .values_list('term', 'n').order_by())
+    if not document_frequency:
+        return None
+
+    total = max(_document_count(target, get_search_settings()), 1)
+    idf = {term: math.log(1 + (total - df + 0.5) / (df + 0.5)) for term, df in document_frequency.items()}
+    score = Sum(
+        F('weight') * Case(*[When(term=term, then=Value(value)) for term, value in idf.items()],
+                           default=Value(0.0), output_field=FloatField()),
+        output_field=FloatField(),
+    )
+    postings = postings.filter(term__in=list(idf))
+    if queryset.query.has_filters():
+        postings = postings.filter(object_id__in=queryset.values('pk'))
+    return postings.values('object_id').annotate(score=score).order_by('-score', 'object_id')
+
+
+# --------------------------------------------------------------------
+# MySQL FULLTEXT
+# --------------------------------------------------------------------
+
+def _match_sql(target: SearchTarget, mode: str) -> str:
+    """
+    MATCH ... AGAINST over the columns of the target's FULLTEXT index.
+    """
+    quote = connection.ops.quote_name
+    table = quote(target.model._meta.db_table)
+    columns = ', '.join(f"{table}.{quote(target.model._meta.get_field(name).column)}"
+                        for name in target.field_names)
+    return f"MATCH ({columns}) AGAINST (%s IN {mode} MODE)"
+
+
+def _boolean_query(terms: List[str]) -> str:
+    """
+    Every term required, the last one as a prefix (search-as-you-type):
+    'deep learn' -> '+deep +learn*'.
+    """
+    return ' '.join(f"+{term}" for term in terms[:-1]) + f" +{terms[-1]}*"
+
+
+# --------------------------------------------------------------------
+# Public API
+# --------------------------------------------------------------------
+
+@dataclass
+class SearchHit:
+    object: object
+    score: float
+
+
+def search(target, query: str, review=None, limit: int = None) -> List[SearchHit]:
+    """
+    Ranked full-text search over a target (best match first), optionally
+    restricted to one systematic review. Any term may match (natural language).
+    """
+    target = get_target(target)
+    limit = min(limit or get_search_settings()['MAX_RESULTS'], get_search_settings()['MAX_RESULTS'])
+    queryset = target.model._default_manager.all()
+    if review is not None:
+        queryset = queryset.filter(**{target.review_lookup: review})
+
+    if uses_fulltext():
+        if not query.strip():
+            return []
+        ranked = queryset.annotate(search_rank=RawSQL(_match_sql(target, 'NATURAL LANGUAGE'), [query])) \
+            .filter(search_rank__gt=0).order_by('-search_rank', 'pk')[:limit]
+        return [SearchHit(obj, obj.search_rank) for obj in ranked]
+
+    terms = _query_terms(query)
+    scores = _index_scores(target, terms, queryset) if terms else None
+    if scores is None:
+        return []
+    # Over-fetch a little: entries of deleted objects are dropped by in_bulk,
+    # then from the index
+    top = list(scores[:limit * 2])
+    objects = queryset.in_bulk([row['object_id'] for row in top])
+    deleted = [row['object_id'] for row in top if row['object_id'] not in objects]
+    if deleted:
+        remove_objects(target, deleted)
+    hits = [SearchHit(objects[row['object_id']], row['score']) for row in top if row['object_id'] in objects]
+    return hits[:limit]
+
+
+def filter_queryset(queryset, target, query: str):
+    """
+    Restricts a queryset to objects containing every term of the query (the
+    last one as a prefix), e.g. for the admin search box.
+    """
+    target = get_target(target)
+    terms = _query_terms(query)
+    if not terms:
+        return queryset
+
+    if uses_fulltext():
+        return queryset.alias(
+            search_match=RawSQL(_match_sql(target, 'BOOLEAN'), [_boolean_query(terms)])
+        ).filter(search_match__gt=0)
+
+    postings = SearchIndexEntry.objects.filter(target=target.name)
+    for term in terms[:-1]:
+        queryset = queryset.filter(pk__in=postings.filter(term=term).values('object_id'))
+    return queryset.filter(pk__in=postings.filter(term__startswith=terms[-1]).values('object_id'))
@@ -0,0 +1,296 @@
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import asdict, dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import transaction
+
+from slra.fingerprints import extract_doi, title_fingerprint
+from slra.models import CitationEdge, DigitalLibrary, PrimaryStudy, SystematicReview
+from . import review_stats, search
+from .exceptions import LibrarySearchError
+from .library_adapters import BACKWARD, FORWARD, SearchRecord, get_adapter_class, get_http_client
+
+URL_MAX_LENGTH = PrimaryStudy._meta.get_field('url').max_length
+SOURCE_MAX_LENGTH = PrimaryStudy._meta.get_field('source').max_length
+
+DIRECTIONS = {
+    BACKWARD: (BACKWARD,),
+    FORWARD: (FORWARD,),
+    'both': (BACKWARD, FORWARD),
+}
+
+DEFAULT_SNOWBALLING_SETTINGS = {
+    # Libraries asked for reference / citation lists (adapters with supports_snowballing)
+    'LIBRARIES': ['OpenAlex', 'Semantic Scholar'],
+    # 'backward' (references), 'forward' (citing papers) or 'both'
+    'DIRECTION': 'both',
+    # Iterations of a run: the first expands the included studies, each next
+    # one the studies found by the previous iteration
+    'ITERATIONS': 1,
+    # PrimaryStudy.relevancy_level of the included studies (first iteration seeds)
+    'INCLUDED_LEVELS': ('H', 'M'),
+    # References / citations fetched per study, library and direction
+    'MAX_RELATED': 200,
+    # Breadth limit: new studies added per iteration, best connected first
+    'MAX_NEW_STUDIES': 5000,
+    # Threads fetching reference / citation lists (per-host limits still apply)
+    'WORKERS': 8,
+    # Rows per INSERT for new studies and edges
+    'BATCH_SIZE': 2000,
+}
+
+
+def get_snowballing_settings() -> dict:
+    options = dict(DEFAULT_SNOWBALLING_SETTINGS)
+    options.update(getattr(settings, 'SLRA_SNOWBALLING', {}))
+    return options
+
+
+@dataclass
+class IterationOutcome:
+    """
+    Result of one snowballing iteration.
+    """
+    iteration: int
+    seeds: int = 0              # studies expanded (those with a DOI)
+    requests: int = 0           # reference / citation lists fetched
+    failed_requests: int = 0    # lists a library couldn't provide; their links are missing
+    records: int = 0            # papers listed
+    matched: int = 0            # listed papers that already were studies of the review
+    new_studies: List[int] = field(default_factory=list)
+    dropped: int = 0            # candidates beyond MAX_NEW_STUDIES
+    edges: int = 0              # citation edges added to the graph
+    elapsed: float = 0.0
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+class StudyIndex:
+    """
+    DOI / title fingerprint -> ID of the review's studies (duplicates
+    resolve to their canonical study), loaded in one query, so listed
+    papers are matched without a query per record.
+    """
+
+    def __init__(self, review: SystematicReview):
+        self._keys = {}
+        rows = PrimaryStudy.objects.filter(systematic_review=review) \
+            .values_list('pk', 'doi', 'fingerprint', 'duplicate_of_id').iterator(chunk_size=5000)
+        for pk, doi, fingerprint, duplicate_of_id in rows:
+            self.add(duplicate_of_id or pk, doi, fingerprint)
+
+    def add(self, pk: int, doi: str, fingerprint: str):
+        if doi:
+            self._keys.setdefault(('d', doi), pk)
+        if fingerprint:
+            self._keys.setdefault(('f', fingerprint), pk)
+
+    def get(self, doi: str, fingerprint: str) -> Optional[int]:
+        for key in (('d', doi), ('f', fingerprint)):
+            if key[1] and key in self._keys:
+                return self._keys[key]
+        return None
+
+
+class SnowballingEngine:
+    """
+    Forward / backward snowballing of a review's studies.
+    - Reference and citation lists of every seed study (by DOI) are fetched
+      concurrently from the snowballing-capable library adapters, within
+      the per-host limits of LibraryHttpClient.
+    - Listed papers are matched against the review's studies by DOI and
+      title fingerprint in memory; unknown ones become candidate studies.
+      Links are kept as pairs of study IDs (negative IDs for candidates)
+      until the iteration is written.
+    - Each iteration is written in one transaction: one bulk_create per
+      batch of new studies and of CitationEdges, never a query per edge.
+    - An iteration adds at most MAX_NEW_STUDIES studies, those linked to
+      the most seeds first.
+    """
+
+    def __init__(self, review: SystematicReview, libraries: List[str] = None, direction: str = None,
+                 max_related: int = None, max_new_studies: int = None, workers: int = None):
+        options = get_snowballing_settings()
+        self.review = review
+        self.library_names = list(dict.fromkeys(name.strip() for name in libraries or options['LIBRARIES']
+                                                if name.strip()))
+        self.direction = direction or options['DIRECTION']
+        self.iterations = options['ITERATIONS']
+        self.included_levels = options['INCLUDED_LEVELS']
+        self.max_related = max_related or options['MAX_RELATED']
+        self.max_new_studies = max_new_studies or options['MAX_NEW_STUDIES']
+        self.workers = workers or options['WORKERS']
+        self.batch_size = options['BATCH_SIZE']
+        if self.direction not in DIRECTIONS:
+            raise LibrarySearchError(f"Invalid direction '{self.direction}'. Must be one of {sorted(DIRECTIONS)}.")
+        if not self.library_names:
+            raise LibrarySearchError("No digital library given.")
+        # Unknown or unsuitable libraries fail before anything is fetched
+        self._adapter_classes = [get_adapter_class(name) for name in self.library_names]
+        for adapter_class in self._adapter_classes:
+            if not adapter_class.supports_snowballing:
+                raise LibrarySearchError(f"{adapter_class.name} doesn't provide reference or citation lists.")
+
+    def included_study_ids(self) -> List[int]:
+        """
+        Seeds of the first iteration: the review's included studies.
+        """
+        return list(PrimaryStudy.objects.filter(
+            systematic_review=self.review, relevancy_level__in=self.included_levels, duplicate_of__isnull=True,
+        ).values_list('pk', flat=True))
+
+    def run(self, iterations: int = None, progress_callback=None) -> List[IterationOutcome]:
+        seed_ids = self.included_study_ids()
+        outcomes = []
+        for number in range(1, (iterations or self.iterations) + 1):
+            outcome = self.iteration(seed_ids, number, progress_callback=progress_callback)
+            outcomes.append(outcome)
+            seed_ids = outcome.new_studies
+            if not seed_ids:
+                break
+        return outcomes
+
+    def iteration(self, seed_ids: List[int], number: int = 1,
+                  progress_callback: Callable[[IterationOutcome, int, int], None] = None) -> IterationOutcome:
+        """
+        Expands the given studies by one level of references / citations.
+        progress_callback(outcome, lists fetched, lists requested) is called
+        from the calling thread as lists arrive.
+        """
+        started_at = time.monotonic()
+        outcome = IterationOutcome(number)
+        seeds = []
+        for start in range(0, len(seed_ids), self.batch_size):
+            seeds += PrimaryStudy.objects.filter(
+                systematic_review=self.review, pk__in=seed_ids[start:start + self.batch_size], doi__isnull=False,
+            ).exclude(doi='').values_list('pk', 'doi')
+        outcome.seeds = len(seeds)
+
+        index = StudyIndex(self.review)
+        candidates: Dict[Tuple[str, str], int] = {}   # ('d', doi) / ('f', fingerprint) -> negative candidate ID
+        records: Dict[int, Tuple[SearchRecord, str]] = {}  # candidate ID -> (record, library)
+        edges = set()  # (citing ID, cited ID)
+
+        http = get_http_client()
+        libraries = [DigitalLibrary.objects.filter(name__iexact=name).first() or DigitalLibrary(name=name)
+                     for name in self.library_names]
+        pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='slra-snowball')
+        try:
+            futures = {}
+            for pk, doi in seeds:
+                for library, adapter_class in zip(libraries, self._adapter_classes):
+                    for direction in DIRECTIONS[self.direction]:
+                        future = pool.submit(self._fetch, adapter_class, library, http, doi, direction)
+                        futures[future] = (pk, direction, library.name)
+            for future in as_completed(futures):
+                seed_pk, direction, library_name = futures[future]
+                outcome.requests += 1
+                try:
+                    listed = future.result()
+                except LibrarySearchError:
+                    outcome.failed_requests += 1
+                    listed = []
+                for record in listed:
+                    doi = extract_doi(record.doi, record.url)[:255]
+                    fingerprint = title_fingerprint(record.title)
+                    if not fingerprint:
+                        continue
+                    outcome.records += 1
+                    pk = index.get(doi, fingerprint)
+                    if pk is None:
+                        pk = (doi and candidates.get(('d', doi))) or candidates.get(('f', fingerprint))
+                    if pk is None:
+                        pk = -(len(records) + 1)
+                        records[pk] = (record, library_name)
+                        candidates[('f', fingerprint)] = pk
+                        if doi:
+                            candidates.setdefault(('d', doi), pk)
+                    elif pk > 0:
+                        outcome.matched += 1
+                    if pk != seed_pk:
+                        edges.add((seed_pk, pk) if direction == BACKWARD else (pk, seed_pk))
+                if progress_callback is not None:
+                    progress_callback(outcome, outcome.requests, len(futures))
+        finally:
+            # On an error or cancellation, pending lists are not fetched
+            pool.shutdown(wait=True, cancel_futures=True)
+
+        kept = self._select_candidates(records, edges)
+        outcome.dropped = len(records) - len(kept)
+        with transaction.atomic():
+            ids = self._create_studies(kept, records)
+            rows = []
+            for citing, cited in edges:
+                citing, cited = ids.get(citing, citing), ids.get(cited, cited)
+                if citing > 0 and cited > 0:
+                    rows.append(CitationEdge(systematic_review=self.review, citing_id=citing, cited_id=cited))
+            before = CitationEdge.objects.filter(systematic_review=self.review).count()
+            CitationEdge.objects.bulk_create(rows, batch_size=self.batch_size, ignore_conflicts=True)
+            outcome.edges = CitationEdge.objects.filter(systematic_review=self.review).count() - before
+        outcome.new_studies = sorted(ids.values())
+        outcome.elapsed = time.monotonic() - started_at
+        return outcome
+
+    def _fetch(self, adapter_class, library: DigitalLibrary, http, doi: str, direction: str) -> List[SearchRecord]:
+        # One adapter per list: adapters keep paging state
+        return adapter_class(library, http).related(doi, direction, self.max_related)
+
+    def _select_candidates(self, records: Dict[int, tuple], edges) -> List[int]:
+        """
+        Candidate IDs within the breadth limit, most linked to the seeds first.
+        """
+        degree = Counter()
+        for citing, cited in edges:
+            for key in (citing, cited):
+                if key < 0:
+                    degree[key] += 1
+        ranked = sorted(records, key=lambda key: (-degree[key], -key))
+        return ranked[:self.max_new_studies]
+
+    def _create_studies(self, kept: List[int], records: Dict[int, tuple]) -> Dict[int, int]:
+        """
+        Inserts the kept candidates; returns candidate ID -> study ID.
+        """
+        studies = []
+        for key in kept:
+            record, library_name = records[key]
+            study = PrimaryStudy(
+                systematic_review=self.review,
+                source=f"Snowballing ({library_name})"[:SOURCE_MAX_LENGTH],
+                title=record.title,
+                abstract=record.abstract or None,
+                url=record.url[:URL_MAX_LENGTH] or None,
+                doi=record.doi or None,
+            )
+            study.refresh_fingerprint()  # bulk_create skips save()
+            studies.append(study)
+        created = PrimaryStudy.objects.bulk_create(studies, batch_size=self.batch_size)
+        if created and created[0].pk is None:
+            # Backends without RETURNING: new studies are unique by fingerprint in the review
+            pks = {}
+            fingerprints = [study.fingerprint for study in created]
+            for start in range(0, len(fingerprints), self.batch_size):
+                pks.update(PrimaryStudy.objects.filter(
+                    systematic_review=self.review, fingerprint__in=fingerprints[start:start + self.batch_size],
+                    duplicate_of__isnull=True,
+                ).values_list('fingerprint', 'pk'))
+            for study in created:
+                study.pk = pks[study.fingerprint]
+        # bulk_create skips post_save as well: index the new studies and mark the review's statistics here
+        search.index_objects('studies', created)
+        review_stats.mark_changed([self.review.pk])
+        return {key: study.pk for key, study in zip(kept, created)}
+
+
+def snowball(review: SystematicReview, iterations: int = None, libraries: List[str] = None, direction: str = None,
+             progress_callback=None) -> List[IterationOutcome]:
+    """
+    Expands the included studies of a review through their references
+    and/or citations, adding new studies and CitationEdges.
+    """
+    engine = SnowballingEngine(review, libraries=libraries, direction=direction)
+    return engine.run(iterations, progress_callback=progress_callback)
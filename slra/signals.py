@@ -0,0 +1,40 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import LLMQueryLog, PrimaryStudy, RelevancyEvaluation, SearchResult
+from .services import review_stats, search
+
+
+@receiver(post_save, sender=PrimaryStudy)
+@receiver(post_save, sender=SearchResult)
+@receiver(post_save, sender=LLMQueryLog)
+def update_search_index(sender, instance, **kwargs):
+    """
+    Keeps the local inverted index in sync with single saves (a no-op with
+    FULLTEXT indexes). Bulk writes index their rows explicitly. Deletes from
+    the admin and deduplication drop their entries; others (cascades) leave
+    entries that searches ignore and drop when they come across them, so
+    there is no post_delete receiver (it would disable fast cascade deletes).
+    """
+    search.index_objects(search.target_for_model(sender), [instance])
+
+
+@receiver(post_save, sender=PrimaryStudy)
+@receiver(post_save, sender=LLMQueryLog)
+def mark_review_statistics_changed(sender, instance, **kwargs):
+    """
+    Marks the review's statistics as stale after a single save (one UPDATE);
+    they are recomputed when next read. Bulk writes mark their reviews
+    explicitly, deletes are caught up by the periodic refresh (MAX_AGE).
+    """
+    review_stats.mark_changed([instance.systematic_review_id])
+
+
+@receiver(post_save, sender=RelevancyEvaluation)
+def mark_evaluation_statistics_changed(sender, instance, **kwargs):
+    review_stats.mark_changed(systematic_review__primary_studies=instance.primary_study_id)
+
+
+@receiver(post_save, sender=SearchResult)
+def mark_search_result_statistics_changed(sender, instance, **kwargs):
+    review_stats.mark_changed(systematic_review__search_queries__library_searches=instance.library_search_id)
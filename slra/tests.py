@@ -1,3 +1,1802 @@
-from django.test import TestCase
+import asyncio
+import csv
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import httpx
+import numpy as np
+import requests
+import together
+
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import F
+from django.test import AsyncClient, Client, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import (
+    CitationEdge, CitationGraphSnapshot, DigitalLibrary, DigitalLibrarySearch, HypothesisKeyword, Job, LLMModel,
+    LLMProvider, LLMQueryLog, PrimaryStudy, RelevancyEvaluation, ResearchQuestion, SearchQuery,
+    ReviewStatistics, SearchIndexEntry, SearchResult, StudyCentrality, StudyEmbedding, SystematicReview, Venue
+)
+from .services import (
+    abstracts, dedup, embeddings, evaluations, exporters, importers, jobs, library_adapters, llm_cache, llm_clients,
+    llm_integration, llm_throttle, review_stats, screening, search, snowballing
+)
+from .services.citation_graph import CitationGraph, update_citation_graph
+from .services.exceptions import (
+    LibrarySearchError, LLMCircuitOpenError, LLMError, LLMRateLimitError, LLMTransientError
+)
+from .services.http_cache import HttpCache
+from .services.library_adapters import ArxivAdapter, LibraryAdapter, LibraryHttpClient, SearchRecord
+from .services.library_search import run_library_search
+from .services.llm_cache import LLMResponseCache, get_response_cache, reset_response_cache
+from .services.llm_throttle import CircuitBreaker, ProviderGuard, TokenBucket, reset_provider_guards
+from .services.llm_usage import LLMCallStats, last_call_stats
+
+
+class ReviewScopedIndexTests(TestCase):
+    """
+    Query-plan regressions for the hot review-scoped lookups: each query must
+    be answered through its composite index rather than a scan or the plain
+    foreign key index.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.review = SystematicReview.objects.create(name='Index review')
+        other = SystematicReview.objects.create(name='Other review')
+        studies = []
+        for i in range(200):
+            studies.append(PrimaryStudy(
+                systematic_review=cls.review if i % 2 else other,
+                title=f'Study {i}',
+                publication_year=2000 + i % 25,
+                relevancy_level='HMLX'[i % 4],
+                citations=i,
+            ))
+        PrimaryStudy.objects.bulk_create(studies)
+        LLMQueryLog.objects.bulk_create([
+            LLMQueryLog(systematic_review=cls.review if i % 2 else other, phase=1 + i % 6,
+                        prompt_text=f'Prompt {i}')
+            for i in range(200)
+        ])
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(index_name, plan, msg=f'{index_name} not used:\n{plan}')
+
+    def test_studies_by_relevancy(self):
+        self.assertUsesIndex(
+            PrimaryStudy.objects.filter(systematic_review=self.review, relevancy_level='H'),
+            'study_review_relevancy_idx',
+        )
+
+    def test_studies_by_publication_year(self):
+        self.assertUsesIndex(
+            PrimaryStudy.objects.filter(systematic_review=self.review, publication_year__gte=2015),
+            'study_review_year_idx',
+        )
+
+    def test_studies_by_citations(self):
+        self.assertUsesIndex(PrimaryStudy.objects.filter(citations__gt=150), 'study_citations_idx')
+
+    def test_query_logs_by_phase(self):
+        self.assertUsesIndex(
+            LLMQueryLog.objects.filter(systematic_review=self.review, phase=6).order_by('-created_at'),
+            'llmlog_review_phase_idx',
+        )
+
+
+class QueryBudgetTests(TestCase):
+    """
+    Query-count budgets for the API list endpoints and the admin changelists.
+    Each page is rendered, the data is tripled and the page is rendered again:
+    both runs must stay within the budget and issue the same number of
+    queries, so a relation walked per row (N+1) fails the test.
+    """
+    # URL name -> maximum number of queries
+    API_BUDGETS = {
+        'systematicreview-list': 1,
+        'researchquestion-list': 1,
+        'hypothesiskeyword-list': 1,
+        'primarystudy-list': 1,
+        'searchquery-list': 1,
+        'digitallibrarysearch-list': 1,
+        'searchresult-list': 1,
+        'relevancyevaluation-list': 1,
+        'llmprovider-list': 1,
+        'llmmodel-list': 1,
+        'llmquerylog-list': 1,
+        'job-list': 1,
+    }
+    # Changelists also load the session and user, count the rows and fill the filters
+    ADMIN_BUDGETS = {
+        'systematicreview': 5,
+        'primarystudy': 7,
+        'searchquery': 5,
+        'digitallibrarysearch': 5,
+        'searchresult': 5,
+        'relevancyevaluation': 6,
+        'llmmodel': 5,
+        'llmquerylog': 6,
+        'job': 6,
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser('admin', 'admin@example.com', 'admin')
+        cls.rows = 0
+
+    def create_rows(self, count):
+        for _ in range(count):
+            self.rows += 1
+            n = self.rows
+            review = SystematicReview.objects.create(name=f'Review {n}')
+            ResearchQuestion.objects.create(systematic_review=review, question_text=f'Question {n}')
+            HypothesisKeyword.objects.create(systematic_review=review, keyword=f'keyword {n}')
+            venue = Venue.objects.create(name=f'Venue {n}')
+            study = PrimaryStudy.objects.create(systematic_review=review, title=f'Study {n}',
+                                                venue=venue, publication_year=2000 + n)
+            RelevancyEvaluation.objects.create(primary_study=study, evaluator=f'reviewer {n}', relevancy='H')
+            query = SearchQuery.objects.create(systematic_review=review, query_string=f'query {n}')
+            library = DigitalLibrary.objects.create(name=f'Library {n}')
+            library_search = DigitalLibrarySearch.objects.create(search_query=query, library=library)
+            SearchResult.objects.create(library_search=library_search, title=f'Result {n}')
+            provider = LLMProvider.objects.create(name=f'Provider {n}')
+            llm_model = LLMModel.objects.create(provider=provider, model_name=f'model-{n}')
+            LLMQueryLog.objects.create(systematic_review=review, llm_model=llm_model, phase=1,
+                                       prompt_text=f'Prompt {n}', response_text=f'Response {n}')
+            Job.objects.create(kind='screen_studies', params={'review_id': review.pk}, systematic_review=review)
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 200, url)
+        return len(context.captured_queries)
+
+    def assertQueryBudget(self, urls_and_budgets):
+        # Budgets assume current review statistics, as kept by a run_jobs worker
+        # (the year filter recounts stale ones itself)
+        self.create_rows(2)
+        review_stats.refresh()
+        first = {url: self.count_queries(url) for url in urls_and_budgets}
+        self.create_rows(4)
+        review_stats.refresh()
+        for url, budget in urls_and_budgets.items():
+            with self.subTest(url=url):
+                second = self.count_queries(url)
+                self.assertLessEqual(second, budget, f'{url} ran {second} queries (budget {budget})')
+                self.assertEqual(first[url], second, f'{url}: query count grows with the number of rows')
+
+    def test_api_list_endpoints(self):
+        self.assertQueryBudget({reverse(name): budget for name, budget in self.API_BUDGETS.items()})
+
+    def test_admin_changelists(self):
+        self.client.force_login(self.user)
+        self.assertQueryBudget({
+            reverse(f'admin:slra_{model}_changelist'): budget for model, budget in self.ADMIN_BUDGETS.items()
+        })
+
+
+class SparseFieldsetTests(TestCase):
+    """
+    ?fields= / ?omit= narrow both the API output and the SELECT, and list
+    endpoints are paged by a primary key cursor unless asked otherwise.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        review = SystematicReview.objects.create(name='API review')
+        query = SearchQuery.objects.create(systematic_review=review, query_string='deep learning')
+        cls.library_search = DigitalLibrarySearch.objects.create(
+            search_query=query, library=DigitalLibrary.objects.create(name='arXiv'))
+        SearchResult.objects.bulk_create([
+            SearchResult(library_search=cls.library_search, title=f'Result {i}', abstract=f'Abstract {i}')
+            for i in range(5)
+        ])
+        cls.url = reverse('searchresult-list')
+
+    def get(self, query):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(f'{self.url}?{query}', HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 200, query)
+        [select] = context.captured_queries
+        return response.json()['results'], select['sql']
+
+    def test_fields_and_omit(self):
+        abstract, title = connection.ops.quote_name('abstract'), connection.ops.quote_name('title')
+        results, sql = self.get('fields=id,title')
+        self.assertEqual({tuple(result) for result in results}, {('id', 'title')})
+        self.assertNotIn(abstract, sql)
+
+        results, sql = self.get('omit=abstract,authors')
+        self.assertNotIn('abstract', results[0])
+        self.assertIn('title', results[0])
+        self.assertNotIn(abstract, sql)
+        self.assertIn(title, sql)
+
+        results, sql = self.get('fields=id,title,abstract&omit=abstract')
+        self.assertEqual(set(results[0]), {'id', 'title'})
+
+        results, sql = self.get('page_size=5')
+        self.assertEqual(results[0]['abstract'], 'Abstract 4')
+        self.assertIn(abstract, sql)
+
+    def test_unknown_field(self):
+        response = self.client.get(f'{self.url}?fields=id,titel', HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('titel', response.json()['fields'])
+        response = self.client.get(f'{self.url}?omit=summary', HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_cursor_pagination_is_the_default(self):
+        response = self.client.get(f'{self.url}?page_size=2', HTTP_ACCEPT='application/json')
+        page = response.json()
+        self.assertEqual(set(page), {'next', 'previous', 'results'})  # no COUNT(*)
+        self.assertIn('cursor=', page['next'])
+        self.assertEqual([result['title'] for result in page['results']], ['Result 4', 'Result 3'])
+
+    def test_cursor_is_stable_across_inserts(self):
+        page = self.client.get(f'{self.url}?page_size=2', HTTP_ACCEPT='application/json').json()
+        SearchResult.objects.create(library_search=self.library_search, title='Result 5')
+        titles = []
+        while page['next']:
+            page = self.client.get(page['next'], HTTP_ACCEPT='application/json').json()
+            titles += [result['title'] for result in page['results']]
+        # The new row is before the cursor: nothing shifts into the following pages
+        self.assertEqual(titles, ['Result 2', 'Result 1', 'Result 0'])
+
+class FakeLibraryAdapter(LibraryAdapter):
+    """
+    Offline library: PAGES pages of PAGE_SIZE records, each page taking DELAY
+    seconds; records without an abstract are enriched from their "landing page".
+    Incremental searches are accepted but return the same records. With a
+    barrier set, every search waits on it before its first page.
+    """
+    name = 'Fake Library'
+    aliases = ('fakelibrary', 'slowlibrary')
+    supports_since = True
+    PAGES, PAGE_SIZE, DELAY = 3, 4, 0.15
+    barrier = None
+
+    def pages(self, query, max_results):
+        self.total_found = 1000
+        if self.barrier is not None:
+            self.barrier.wait()
+        for page in range(self.PAGES):
+            time.sleep(self.DELAY)
+            yield [SearchRecord(title=f'{self.library.name} {query} {page}-{i}',
+                                url=f'https://example.org/{self.library.pk}/{page}/{i}',
+                                abstract='' if i % 2 else 'Listed abstract')
+                   for i in range(self.PAGE_SIZE)]
+
+    def enrich(self, record):
+        time.sleep(self.DELAY / 4)
+        record.abstract = 'Abstract from the landing page'
+        return record
+
+
+class BrokenLibraryAdapter(FakeLibraryAdapter):
+    name = 'Broken Library'
+    aliases = ('brokenlibrary',)
+
+    def pages(self, query, max_results):
+        yield from super().pages(query, max_results)
+        raise LibrarySearchError('example.org returned HTTP 503.')
+
+
+@mock.patch.object(library_adapters, 'ADAPTERS', [FakeLibraryAdapter, BrokenLibraryAdapter])
+class LibrarySearchEngineTests(TestCase):
+    """
+    Libraries are searched concurrently and their pages stored as they arrive.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        review = SystematicReview.objects.create(name='Library review')
+        cls.search_query = SearchQuery.objects.create(systematic_review=review, query_string='deep learning')
+
+    def test_libraries_run_in_parallel(self):
+        # The three searches must be in flight at once, or the barrier breaks and they fail
+        with mock.patch.object(FakeLibraryAdapter, 'barrier', threading.Barrier(3, timeout=5)):
+            outcomes = run_library_search(self.search_query, ['Fake Library', 'Slow Library', 'FAKE LIBRARY'])
+
+        self.assertEqual([outcome.ok for outcome in outcomes], [True, True, True])
+        self.assertEqual([outcome.results for outcome in outcomes], [12, 12, 12])
+        self.assertEqual([outcome.enriched for outcome in outcomes], [6, 6, 6])
+        self.assertEqual(SearchResult.objects.filter(abstract='Abstract from the landing page').count(), 18)
+        self.assertEqual(set(DigitalLibrarySearch.objects.values_list('total_results_found', flat=True)), {1000})
+        # Library names are matched case-insensitively
+        self.assertEqual(DigitalLibrary.objects.count(), 2)
+
+    def test_failing_library_keeps_its_results(self):
+        outcomes = run_library_search(self.search_query, ['Fake Library', 'Broken Library'], enrich=False)
+        self.assertEqual([outcome.ok for outcome in outcomes], [True, False])
+        self.assertIn('HTTP 503', outcomes[1].error)
+        self.assertEqual(SearchResult.objects.count(), 24)
+
+    def test_unknown_library(self):
+        with self.assertRaises(LibrarySearchError):
+            run_library_search(self.search_query, ['Fake Library', 'ACM'])
+        self.assertFalse(DigitalLibrarySearch.objects.exists())
+
+    def test_re_run_updates_known_results(self):
+        run_library_search(self.search_query, ['Fake Library'], enrich=False)
+        changed = SearchResult.objects.filter(abstract='Listed abstract').first()
+        SearchResult.objects.filter(pk=changed.pk).update(abstract='Outdated abstract')
+
+        [outcome] = run_library_search(self.search_query, ['Fake Library'], enrich=False)
+        self.assertEqual((outcome.results, outcome.updated, outcome.unchanged), (0, 1, 11))
+        self.assertEqual(SearchResult.objects.count(), 12)
+        changed.refresh_from_db()
+        self.assertEqual(changed.abstract, 'Listed abstract')
+        library_search = outcome.library_search
+        self.assertEqual((library_search.new_results, library_search.updated_results), (0, 1))
+
+    def test_incremental_search(self):
+        [outcome] = run_library_search(self.search_query, ['Fake Library'], enrich=False, incremental=True)
+        first = outcome.library_search
+        self.assertIsNone(first.since)  # never searched: full search
+        self.assertIsNotNone(first.high_water_mark)
+
+        outcomes = run_library_search(self.search_query, ['Fake Library', 'Broken Library'], enrich=False,
+                                      incremental=True)
+        self.assertEqual(outcomes[0].library_search.since, first.high_water_mark - timedelta(days=30))
+        self.assertIsNone(outcomes[1].library_search.since)
+        # The failed library gets no mark: its next search is a full one again
+        self.assertIsNone(outcomes[1].library_search.high_water_mark)
+
+    def test_truncated_search_keeps_the_mark(self):
+        [outcome] = run_library_search(self.search_query, ['Fake Library'], enrich=False)
+        first = outcome.library_search
+        self.assertTrue(outcome.exhausted)
+
+        # Stopped at max_results: results older than the first 10 were not seen
+        [outcome] = run_library_search(self.search_query, ['Fake Library'], max_results=10, enrich=False,
+                                       incremental=True)
+        self.assertEqual(outcome.fetched, 10)
+        self.assertFalse(outcome.exhausted)
+        self.assertIsNone(outcome.library_search.high_water_mark)
+
+        [outcome] = run_library_search(self.search_query, ['Fake Library'], enrich=False, incremental=True)
+        self.assertEqual(outcome.library_search.since, first.high_water_mark - timedelta(days=30))
+        self.assertGreater(outcome.library_search.high_water_mark, first.high_water_mark)
+
+    def test_admin_re_run(self):
+        run_library_search(self.search_query, ['Fake Library', 'Broken Library'], enrich=False)
+        unsearched = SearchQuery.objects.create(systematic_review=self.search_query.systematic_review,
+                                                query_string='transformers')
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'admin'))
+        self.client.post(reverse('admin:slra_searchquery_changelist'), {
+            'action': 're_run_library_search', '_selected_action': [self.search_query.pk, unsearched.pk],
+        })
+        [job] = Job.objects.all()
+        self.assertEqual(job.params, {'search_query_id': self.search_query.pk, 'incremental': True,
+                                      'libraries': ['Broken Library', 'Fake Library']})
+
+
+@mock.patch.object(library_adapters, 'ADAPTERS', [FakeLibraryAdapter, BrokenLibraryAdapter])
+class LibrarySearchEndpointTests(TransactionTestCase):
+    """
+    The search endpoint runs its search on a worker thread, outside the one
+    the other async views make their ORM calls on.
+    """
+
+    def setUp(self):
+        review = SystematicReview.objects.create(name='Library review')
+        self.study = PrimaryStudy.objects.create(systematic_review=review, title='A study')
+        search_query = SearchQuery.objects.create(systematic_review=review, query_string='deep learning')
+        self.url = reverse('searchquery-search-libraries', args=[search_query.pk])
+
+    def test_endpoint(self):
+        response = self.client.post(self.url, {'libraries': 'Fake Library,Broken Library', 'max_results': 10},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        library_searches = response.json()['library_searches']
+        # Both stop at max_results, before the broken library's failing third page
+        self.assertEqual([item['results_stored'] for item in library_searches], [10, 10])
+        self.assertEqual([item['error'] for item in library_searches], [None, None])
+
+        response = self.client.post(self.url, {'library_name': 'ACM'}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_other_views_run_during_a_search(self):
+        # The search waits on the barrier until the evaluation has been answered. Were
+        # it holding the ORM thread, the evaluation would queue behind it and the barrier break
+        barrier = threading.Barrier(2, timeout=5)
+        client = AsyncClient()
+
+        async def evaluate_during_search():
+            search = asyncio.ensure_future(client.post(self.url, {'libraries': 'Fake Library', 'max_results': 4},
+                                                       content_type='application/json'))
+            while not barrier.n_waiting and not search.done():
+                await asyncio.sleep(0.01)
+            evaluation = await client.post(reverse('primarystudy-evaluate', args=[self.study.pk]),
+                                           {'relevancy': 'H'}, content_type='application/json')
+            await asyncio.to_thread(barrier.wait)
+            return evaluation, await search
+
+        with mock.patch.object(FakeLibraryAdapter, 'barrier', barrier):
+            evaluation, search = asyncio.run(evaluate_during_search())
+        self.assertEqual(evaluation.status_code, 201)
+        self.assertEqual(search.status_code, 201)
+        self.assertEqual(search.json()['library_searches'][0]['results_stored'], 4)
+
+
+class StudyImporterTests(TestCase):
+    """
+    CSV import: value coercion, duplicate rows, chunked writes and venue resolution.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.review = SystematicReview.objects.create(name='Import review')
+        PrimaryStudy.objects.create(systematic_review=cls.review, title='A Known Study')
+        cls.icse = Venue.objects.create(name='ICSE')
+
+    def test_coercion(self):
+        rows = [
+            {'title': 'Years', 'publication_year': ' 2019.0 ', 'citations': '1,204'},
+            {'title': 'Bad numbers', 'publication_year': 'n/a', 'citations': '-3'},
+            {'title': 'Long values', 'source': 's' * 300, 'publication_type': ' Journal ',
+             'url': 'https://x.org/' + 'a' * 2000},
+            {'title': '  '},
+        ]
+        stats = importers.StudyImporter(self.review).import_rows(rows)
+        self.assertEqual((stats.rows_read, stats.created, stats.skipped), (4, 3, 1))
+        self.assertEqual((stats.coerced, stats.truncated), (2, 2))
+        studies = {study.title: study for study in PrimaryStudy.objects.filter(systematic_review=self.review)}
+        self.assertEqual((studies['Years'].publication_year, studies['Years'].citations), (2019, 1204))
+        self.assertIsNone(studies['Bad numbers'].publication_year)
+        self.assertEqual(len(studies['Long values'].source), 255)
+        self.assertEqual(studies['Long values'].publication_type, 'Journal')
+        self.assertIsNone(studies['Long values'].url)
+
+    def test_duplicates(self):
+        rows = [{'title': 'a known study.'}, {'title': 'New study', 'url': 'https://doi.org/10.1234/x'},
+                {'title': 'New study, again', 'url': 'https://doi.org/10.1234/X'}, {'title': 'Other study'}]
+        stats = importers.StudyImporter(self.review, skip_duplicates=True).import_rows(rows)
+        self.assertEqual((stats.created, stats.duplicates), (2, 2))
+
+    def test_chunks_and_venues(self):
+        rows = [{'title': f'Study {i}', 'venue': ['ICSE', 'New venue', ''][i % 3]} for i in range(5)]
+        progress = []
+        importer = importers.StudyImporter(self.review, batch_size=2,
+                                           progress_callback=lambda stats: progress.append(stats.created))
+        with CaptureQueriesContext(connection) as queries:
+            stats = importer.import_rows(rows)
+        self.assertEqual(progress, [2, 4, 5])
+        self.assertEqual(stats.venues_created, 1)
+        # Only the chunk's venue names are looked up, each name once
+        venue_queries = [q['sql'] for q in queries if q['sql'].startswith('SELECT') and 'slra_venue' in q['sql']]
+        self.assertEqual(len(venue_queries), 2)
+        self.assertTrue(all('IN' in sql for sql in venue_queries))
+        venues = dict(PrimaryStudy.objects.filter(title__startswith='Study ').values_list('title', 'venue__name'))
+        self.assertEqual(venues, {'Study 0': 'ICSE', 'Study 1': 'New venue', 'Study 2': None,
+                                  'Study 3': 'ICSE', 'Study 4': 'New venue'})
+
+
+class DeduplicationTests(TestCase):
+    """
+    MinHash/LSH near-duplicate detection, duplicate links and merges.
+    """
+    ABSTRACT = ("We study how large language models screen primary studies for systematic "
+                "literature reviews and compare their verdicts against two human reviewers.")
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.review = SystematicReview.objects.create(name='Dedup review')
+
+    def test_minhash_candidates(self):
+        lsh = dedup.MinHashLSH(threshold=0.8)
+        lsh.add(1, dedup.minhash_signature('LLM screening. ' + self.ABSTRACT))
+        lsh.add(2, dedup.minhash_signature('LLM screening: ' + self.ABSTRACT.replace('two', '2')))
+        lsh.add(3, dedup.minhash_signature('Graph databases for provenance tracking in scientific workflows'))
+        self.assertIn((1, 2), set(lsh.candidate_pairs()))
+        self.assertEqual(list(lsh.duplicate_pairs()), [(1, 2)])
+        self.assertLess(lsh.similarity(1, 3), 0.2)
+
+        report = dedup.find_duplicates([
+            (1, 'f1', None, 'A', self.ABSTRACT), (2, 'f1', None, 'A.', ''), (3, 'f3', '10.1/x', 'B', ''),
+            (4, 'f4', '10.1/x', 'C', ''), (5, 'f5', None, 'A.', self.ABSTRACT),
+        ])
+        self.assertEqual(report.duplicate_map, {2: 1, 4: 3, 5: 1})
+        self.assertEqual((report.exact_duplicates, report.near_duplicates), (2, 1))
+
+    def test_stale_links_are_cleared(self):
+        first = PrimaryStudy.objects.create(systematic_review=self.review, title='Same title')
+        second = PrimaryStudy.objects.create(systematic_review=self.review, title='Same title!')
+        report = dedup.deduplicate_studies(self.review, near=False)
+        self.assertEqual((report.linked, report.unlinked), (1, 0))
+        second.refresh_from_db()
+        self.assertEqual(second.duplicate_of_id, first.pk)
+
+        second.title = 'A different title'
+        second.save()
+        report = dedup.deduplicate_studies(self.review, near=False)
+        self.assertEqual((report.linked, report.unlinked), (0, 1))
+        second.refresh_from_db()
+        self.assertIsNone(second.duplicate_of_id)
+
+    def test_merge_keeps_screening(self):
+        canonical = PrimaryStudy.objects.create(systematic_review=self.review, title='Merged study')
+        duplicate = PrimaryStudy.objects.create(systematic_review=self.review, title='Merged Study',
+                                                abstract=self.ABSTRACT, relevancy_level='H')
+        RelevancyEvaluation.objects.create(primary_study=duplicate, evaluator='me', relevancy='H')
+        report = dedup.deduplicate_studies(self.review, near=False, merge=True)
+        self.assertEqual(report.merged, 1)
+        self.assertFalse(PrimaryStudy.objects.filter(pk=duplicate.pk).exists())
+        canonical.refresh_from_db()
+        self.assertEqual((canonical.relevancy_level, canonical.abstract), ('H', self.ABSTRACT))
+        self.assertEqual(list(canonical.relevancy_evaluations.values_list('relevancy', flat=True)), ['H'])
+
+
+class SearchTests(TestCase):
+    """
+    Local inverted index (BM25) and the admin search on both backends.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser('admin', 'admin@example.com', 'admin')
+        cls.review = SystematicReview.objects.create(name='Search review')
+        venue = Venue.objects.create(name='Empirical Software Engineering')
+        cls.studies = [
+            PrimaryStudy.objects.create(systematic_review=cls.review, title=title, venue=venue)
+            for title in ['Screening with language models', 'Language models for code review',
+                          'Mutation testing at scale', 'Flaky test detection']
+        ]
+        query = SearchQuery.objects.create(systematic_review=cls.review, query_string='testing')
+        library_search = DigitalLibrarySearch.objects.create(
+            search_query=query, library=DigitalLibrary.objects.create(name='Library'))
+        cls.result = SearchResult.objects.create(library_search=library_search, title='Mutation testing',
+                                                 url='https://doi.org/10.1145/123')
+
+    def setUp(self):
+        search._document_counts.clear()
+
+    def test_deleted_rows_are_ignored(self):
+        hits = search.search('studies', 'language models', review=self.review)
+        self.assertEqual({hit.object for hit in hits}, set(self.studies[:2]))
+
+        # Bulk deletes send no signal: their entries must not count as documents
+        PrimaryStudy.objects.filter(pk=self.studies[0].pk).delete()
+        with CaptureQueriesContext(connection) as context:
+            hits = search.search('studies', 'language models')
+        self.assertEqual([hit.object for hit in hits], [self.studies[1]])
+        self.assertFalse(SearchIndexEntry.objects.filter(target='studies', object_id=self.studies[0].pk).exists())
+        # The document count is not re-read on every query
+        self.assertFalse(any('COUNT(*)' in query['sql'] for query in context.captured_queries))
+
+    def test_admin_search(self):
+        self.client.force_login(self.user)
+        for model, term, expected in [
+            ('primarystudy', 'mutation test', [self.studies[2]]),
+            ('primarystudy', 'empirical soft', self.studies),
+            ('searchresult', 'https://doi.org/10.1145', [self.result]),
+            ('searchresult', 'nothing', []),
+        ]:
+            with self.subTest(model=model, term=term):
+                response = self.client.get(reverse(f'admin:slra_{model}_changelist'), {'q': term})
+                self.assertEqual(set(response.context['cl'].result_list), set(expected))
+
+    def test_admin_delete_drops_entries(self):
+        model_admin = admin.site._registry[PrimaryStudy]
+        request = mock.Mock(user=self.user)
+        model_admin.delete_queryset(request, PrimaryStudy.objects.filter(pk__in=[s.pk for s in self.studies[:2]]))
+        model_admin.delete_model(request, self.studies[3])
+        self.assertEqual(set(SearchIndexEntry.objects.filter(target='studies').values_list('object_id', flat=True)),
+                         {self.studies[2].pk})
+
+    @override_settings(SLRA_SEARCH={'BACKEND': 'fulltext'})
+    def test_fulltext_backend(self):
+        # SQLite has no MATCH ... AGAINST: only the generated SQL is checked
+        model_admin = admin.site._registry[PrimaryStudy]
+        queryset, _ = model_admin.get_search_results(mock.Mock(user=self.user), PrimaryStudy.objects.all(),
+                                                     'language mod')
+        sql = str(queryset.query)
+        self.assertIn('MATCH (', sql)
+        self.assertIn('IN BOOLEAN MODE', sql)
+        self.assertIn('LIKE', sql)
+        self.assertEqual(queryset.query.where.children[0].connector, 'OR')
+        self.assertEqual(search.index_objects('studies', self.studies), 0)
+        self.assertEqual(search.remove_objects('studies', [self.studies[0].pk]), 0)
+
+
+class AbstractExtractionTests(TestCase):
+    """
+    Landing page abstracts come from publisher rules, meta tags, JSON-LD or a
+    generic container, parsing only the matched fragment.
+    """
+    FILLER = '<p>Related <a href="/x">article</a></p>' * 20000
+
+    def page(self, head='', body=''):
+        return f'<html><head><title>Paper</title>{head}</head><body>{self.FILLER}{body}</body></html>'
+
+    def test_rule_order(self):
+        container = '<div class="c abstract" id="a"><h2>Abstract</h2><p>From the container.</p></div>'
+        self.assertEqual(abstracts.extract_abstract(self.page(body=container)), 'From the container.')
+        self.assertEqual(abstracts.extract_abstract(self.page(
+            head='<meta name="citation_abstract" content="From &quot;citation&quot; meta">', body=container,
+        )), 'From "citation" meta')
+        self.assertEqual(abstracts.extract_abstract(self.page(
+            head='<script type="application/ld+json">{"@type": "ScholarlyArticle", "abstract": "From JSON-LD"}'
+                 '</script><meta property="og:description" content="Shortened">',
+            body='<div class="abstract-text">Not an abstract container</div>',
+        )), 'From JSON-LD')
+        self.assertEqual(abstracts.extract_abstract(self.page(
+            head="<meta property='og:description' content='Shortened'>")), 'Shortened')
+        self.assertEqual(abstracts.extract_abstract(self.page()), '')
+
+    def test_publisher_rules(self):
+        page = self.page(head='<meta name="description" content="Listing">',
+                         body='<div class="u-mb-1 abstract-text"><h2>Abstract:</h2> Attention.</div>')
+        self.assertEqual(abstracts.extract_abstract(page, 'https://ieeexplore.ieee.org/document/1'), 'Attention.')
+        self.assertEqual(abstracts.extract_abstract(page, 'https://example.org/paper'), 'Listing')
+
+    def test_parsers(self):
+        self.assertIn('bs4', abstracts.available_parsers())
+        page = self.page(body='<section id="abstract">Section abstract</section>')
+        for name in abstracts.available_parsers():
+            self.assertEqual(abstracts.extract_abstract(page, parser=name), 'Section abstract')
+        with self.assertRaises(ValueError):
+            abstracts.get_parser('html5lib')
+
+
+class ExportTests(TestCase):
+    """
+    Exports stream keyset batches, so queries grow with rows / BATCH_SIZE
+    and nothing holds the whole dataset.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.review = SystematicReview.objects.create(name='Export review')
+        other = SystematicReview.objects.create(name='Other review')
+        venue = Venue.objects.create(name='ICSE')
+        PrimaryStudy.objects.bulk_create(
+            [PrimaryStudy(systematic_review=cls.review, title=f'Study, "{i}"', venue=venue if i % 2 else None,
+                          publication_year=2000 + i) for i in range(25)]
+            + [PrimaryStudy(systematic_review=other, title='Elsewhere')]
+        )
+        RelevancyEvaluation.objects.create(primary_study=PrimaryStudy.objects.first(), evaluator='llm',
+                                           relevancy='M')
+
+    def export(self, dataset, **params):
+        response = self.client.get(reverse('export', args=[dataset]), params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content)
+
+    def test_csv_and_jsonl(self):
+        with override_settings(SLRA_EXPORT={'BATCH_SIZE': 10}), CaptureQueriesContext(connection) as queries:
+            response, content = self.export('studies', review=self.review.pk)
+        # Review lookup + three batches of at most 10 rows
+        self.assertEqual(len(queries), 4)
+        self.assertEqual(response['Content-Disposition'],
+                         f'attachment; filename="studies-review-{self.review.pk}.csv"')
+        rows = list(csv.DictReader(io.StringIO(content.decode())))
+        self.assertEqual(len(rows), 25)
+        self.assertEqual((rows[0]['title'], rows[0]['venue__name'], rows[1]['venue__name']),
+                         ('Study, "0"', '', 'ICSE'))
+
+        response, content = self.export('evaluations', format='jsonl')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        [evaluation] = [json.loads(line) for line in content.decode().splitlines()]
+        self.assertEqual((evaluation['evaluator'], evaluation['relevancy']), ('llm', 'M'))
+
+    def test_errors(self):
+        self.assertEqual(self.client.get(reverse('export', args=['reviews'])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('export', args=['logs']), {'format': 'xlsx'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('export', args=['logs']), {'review': 0}).status_code, 404)
+
+    def test_parquet(self):
+        if exporters.pyarrow is None:
+            self.skipTest("pyarrow is not installed")
+        import pyarrow.parquet
+        with override_settings(SLRA_EXPORT={'BATCH_SIZE': 4, 'ROW_GROUP_SIZE': 10}):
+            _, content = self.export('studies', format='parquet', review=self.review.pk)
+        parquet = pyarrow.parquet.ParquetFile(io.BytesIO(content))
+        self.assertEqual((parquet.metadata.num_rows, parquet.num_row_groups), (25, 3))
+        table = parquet.read()
+        self.assertEqual(str(table.schema.field('publication_year').type), 'int64')
+        self.assertEqual(table.column('publication_year').to_pylist()[-1], 2024)
+
+
+ARXIV_FEED = b"""<?xml version="1.0" encoding="UTF-8"?>
+<feed xmlns="http://www.w3.org/2005/Atom" xmlns:opensearch="http://a9.com/-/spec/opensearch/1.1/">
+  <opensearch:totalResults>1</opensearch:totalResults>
+  <entry>
+    <id>http://arxiv.org/abs/1706.03762v7</id>
+    <title>Attention Is All You Need</title>
+    <summary>The dominant sequence transduction models are based on recurrent networks.</summary>
+    <author><name>Ashish Vaswani</name></author>
+  </entry>
+</feed>"""
+
+
+def http_response(status=200, content=b'', headers=None, url=''):
+    response = requests.Response()
+    response.status_code = status
+    response._content = content
+    response.headers.update(headers or {})
+    response.url = url
+    return response
+
+
+class HttpCacheTests(TestCase):
+    """
+    Library responses are cached on disk, revalidated and replayed offline.
+    """
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'http_cache.sqlite3')
+        self.cache = HttpCache(self.path)
+        self.addCleanup(self.cache.close)
+        self.http = LibraryHttpClient(cache=self.cache)
+
+    def test_fresh_responses_come_from_the_cache(self):
+        with mock.patch.object(self.http.session, 'get', return_value=http_response(
+                content=b'{"hits": 1}', headers={'Content-Type': 'application/json'})) as get:
+            first = self.http.get_json('https://api.example.org/works', params={'q': 'llm'})
+            second = self.http.get('https://api.example.org/works', params={'q': 'llm'})
+            self.http.get('https://api.example.org/works', params={'q': 'llm'}, headers={'Accept': 'text/csv'})
+        self.assertEqual(first, {'hits': 1})
+        self.assertTrue(second.from_cache)
+        self.assertEqual(second.json(), {'hits': 1})
+        # The query string and the Accept header select different entries
+        self.assertEqual(get.call_count, 2)
+        self.assertEqual(self.cache.stats()['entries'], 2)
+
+    def test_stale_entries_are_revalidated(self):
+        url = 'https://example.org/paper'
+        with mock.patch.object(self.http.session, 'get', side_effect=[
+            http_response(content=b'<html>v1</html>', headers={'ETag': '"v1"', 'Cache-Control': 'max-age=0'}),
+            http_response(304, headers={'Cache-Control': 'max-age=60'}),
+        ]) as get:
+            self.http.get(url)
+            response = self.http.get(url)
+            self.http.get(url)  # fresh again after the 304
+        self.assertEqual(get.call_count, 2)
+        self.assertEqual(get.call_args.kwargs['headers'], {'If-None-Match': '"v1"'})
+        self.assertEqual(response.content, b'<html>v1</html>')
+
+        with mock.patch.object(self.http.session, 'get', return_value=http_response(
+                content=b'secret', headers={'Cache-Control': 'no-store'})):
+            self.http.get('https://example.org/private')
+        self.assertEqual(self.cache.stats()['entries'], 1)
+
+    def test_listings_expire_within_minutes(self):
+        url = 'https://api.example.org/works'
+        with mock.patch.object(self.http.session, 'get', return_value=http_response(
+                content=b'{"hits": 1}', headers={'Cache-Control': 'max-age=86400'})):
+            self.http.get_json(url, params={'q': 'llm'}, listing=True)
+            self.http.get_json(url, params={'q': 'landing'})
+        listing = self.cache.get(self.cache.make_key(f'{url}?q=llm'))
+        page = self.cache.get(self.cache.make_key(f'{url}?q=landing'))
+        self.assertLessEqual(listing.expires_at - time.time(), self.cache.listing_ttl)
+        self.assertGreater(page.expires_at - time.time(), 86000)
+
+        with mock.patch.object(time, 'time', return_value=time.time() + self.cache.listing_ttl + 1), \
+                mock.patch.object(self.http.session, 'get', return_value=http_response(
+                    content=b'{"hits": 2}')) as get:
+            self.assertEqual(self.http.get_json(url, params={'q': 'llm'}, listing=True), {'hits': 2})
+            self.assertTrue(self.http.get(url, params={'q': 'landing'}).from_cache)
+        self.assertEqual(get.call_count, 1)
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = HttpCache(os.path.join(os.path.dirname(self.path), 'small.sqlite3'), max_size=3000,
+                          compression_level=0)
+        self.addCleanup(cache.close)
+        for name in 'abcd':
+            cache.store(cache.make_key(name), http_response(content=os.urandom(1000), url=name))
+            cache.get(cache.make_key('a'))
+        self.assertIsNotNone(cache.get(cache.make_key('a')))
+        self.assertIsNone(cache.get(cache.make_key('b')))
+        self.assertLessEqual(cache.stats()['size'], 3000)
+
+    def test_offline_replay_of_recorded_responses(self):
+        library = DigitalLibrary.objects.create(name='arXiv')
+        with mock.patch.object(self.http.session, 'get', return_value=http_response(content=ARXIV_FEED)):
+            recorded = list(ArxivAdapter(library, self.http).pages('transformers', 10))
+
+        offline = HttpCache(self.path, offline=True)
+        self.addCleanup(offline.close)
+        http = LibraryHttpClient(cache=offline)
+        with mock.patch.object(http.session, 'get', side_effect=AssertionError('network used')):
+            replayed = list(ArxivAdapter(library, http).pages('transformers', 10))
+            with self.assertRaises(LibrarySearchError):
+                http.get('http://export.arxiv.org/api/query', params={'search_query': 'all:other'})
+        self.assertEqual(replayed, recorded)
+        self.assertEqual(replayed[0][0].title, 'Attention Is All You Need')
+
+
+@mock.patch.object(library_adapters, 'ADAPTERS', [FakeLibraryAdapter])
+class JobQueueTests(TestCase):
+    """
+    Claiming, running, retrying and cancelling background jobs, and the 202
+    responses of the endpoints that can run in the background.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.review = SystematicReview.objects.create(name='Job review')
+        cls.search_query = SearchQuery.objects.create(systematic_review=cls.review, query_string='deep learning')
+
+    def run_next(self):
+        job = jobs.claim_next('test-worker')
+        self.assertIsNotNone(job)
+        return jobs.run_job(job)
+
+    def test_job_runs_once_per_step(self):
+        job = jobs.enqueue('library_search', {'search_query_id': self.search_query.pk, 'libraries': ['Fake Library']},
+                           review=self.review)
+        self.run_next()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.SUCCEEDED)
+        self.assertEqual(job.progress, 100.0)
+        self.assertEqual(job.result['Fake Library']['library_search'], DigitalLibrarySearch.objects.get().pk)
+        self.assertEqual(job.result['Fake Library']['results'], 12)
+
+        # A rerun (e.g. after a crash before the job was marked done) skips the completed step
+        Job.objects.filter(pk=job.pk).update(status=Job.QUEUED)
+        self.run_next()
+        self.assertEqual(DigitalLibrarySearch.objects.count(), 1)
+        self.assertIsNone(jobs.claim_next('test-worker'))
+
+    def test_permanent_failure_is_not_retried(self):
+        job = jobs.enqueue('library_search', {'search_query_id': 0})
+        self.run_next()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 1))
+        self.assertIn('not found', job.error)
+
+    def test_cancel(self):
+        params = {'search_query_id': self.search_query.pk, 'libraries': ['Fake Library']}
+        queued = jobs.enqueue('library_search', params)
+        self.assertEqual(jobs.cancel(queued).status, Job.CANCELLED)
+        self.assertIsNone(jobs.claim_next('test-worker'))
+
+        running = jobs.enqueue('library_search', params)
+        jobs.claim_next('test-worker')
+        self.assertTrue(jobs.cancel(running).cancel_requested)
+        jobs.run_job(running)
+        self.assertEqual(running.status, Job.CANCELLED)
+        self.assertFalse(DigitalLibrarySearch.objects.exists())
+
+    def test_background_endpoint(self):
+        url = reverse('searchquery-search-libraries', args=[self.search_query.pk])
+        response = self.client.post(url, {'libraries': ['Fake Library'], 'background': True},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 202)
+        self.assertFalse(DigitalLibrarySearch.objects.exists())
+
+        self.run_next()
+        job = self.client.get(response['Location'], HTTP_ACCEPT='application/json').json()
+        self.assertEqual(job['status'], Job.SUCCEEDED)
+        self.assertEqual(job['systematic_review'], self.review.pk)
+
+    def test_review_filter_must_be_an_integer(self):
+        jobs.enqueue('snowballing', {'review_id': self.review.pk}, review=self.review)
+        for name in ['job-list', 'primarystudy-list']:
+            with self.subTest(name=name):
+                url = reverse(name)
+                response = self.client.get(url, {'review': 'abc'}, HTTP_ACCEPT='application/json')
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json(), ['review must be an integer.'])
+                response = self.client.get(url, {'review': self.review.pk + 1}, HTTP_ACCEPT='application/json')
+                self.assertEqual(response.json()['results'], [])
+        self.assertEqual(len(self.client.get(reverse('job-list'), {'review': self.review.pk},
+                                             HTTP_ACCEPT='application/json').json()['results']), 1)
+        response = self.client.get(reverse('search'), {'q': 'deep', 'review': '1 OR 1'},
+                                   HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 400)
+
+
+class ProviderClientRegistryTests(TestCase):
+    """
+    Pooled provider clients: idle eviction spares checked out clients, and
+    Ollama calls go to the provider's own server.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        provider = LLMProvider.objects.create(name='Ollama', base_url='http://gpu-box:11434/')
+        cls.llm_model = LLMModel.objects.create(provider=provider, model_name='llama3', version='8b')
+
+    def test_checked_out_clients_are_not_evicted(self):
+        registry = llm_clients.ProviderClientRegistry(idle_timeout=60)
+        clock = mock.patch.object(llm_clients.time, 'monotonic')
+        with clock as monotonic:
+            monotonic.return_value = 1000.0
+            with registry.session(self.llm_model) as session:
+                monotonic.return_value = 2000.0
+                self.assertEqual(registry.evict_idle(), 0)
+                self.assertIs(registry.get_session(self.llm_model), session)
+            # Idle time counts from the release, not the checkout
+            monotonic.return_value = 2030.0
+            self.assertEqual(registry.evict_idle(), 0)
+            monotonic.return_value = 2100.0
+            self.assertEqual(registry.evict_idle(), 1)
+        self.assertEqual(len(registry), 0)
+
+    def test_ollama_uses_the_provider_base_url(self):
+        self.assertEqual(llm_integration.ollama_url(self.llm_model.provider), 'http://gpu-box:11434/api/generate')
+        self.assertEqual(llm_integration.ollama_url(LLMProvider(base_url='http://h:1/api/generate'), '/api/embed'),
+                         'http://h:1/api/embed')
+        self.assertEqual(llm_integration.ollama_url(LLMProvider()), llm_integration.DEFAULT_OLLAMA_URL)
+
+        self.addCleanup(llm_clients.reset_client_registry)
+        response = mock.Mock(**{'json.return_value': {'response': 'hi'}})
+        with mock.patch.object(requests.Session, 'post', return_value=response) as post:
+            self.assertEqual(llm_integration._call_provider(self.llm_model, 'prompt'), 'hi')
+        self.assertEqual(post.call_args.args[0], 'http://gpu-box:11434/api/generate')
+        self.assertEqual(post.call_args.kwargs['json']['model'], 'llama3:8b')
+
+
+class LLMResponseCacheTests(TestCase):
+    """
+    LLMResponseCache: an in-process LRU with a TTL in front of the responses
+    logged in LLMQueryLog.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.review = SystematicReview.objects.create(name='Cache review')
+        cls.llm_model = LLMModel.objects.create(provider=LLMProvider.objects.create(name='Ollama'),
+                                                model_name='llama3')
+        cls.key = LLMQueryLog.make_cache_key(cls.llm_model, 'prompt')
+        LLMQueryLog.objects.create(systematic_review=cls.review, llm_model=cls.llm_model, phase=1,
+                                   prompt_text='prompt', response_text='logged answer')
+
+    def setUp(self):
+        clock = mock.patch.object(llm_cache.time, 'monotonic', return_value=1000.0)
+        self.clock = clock.start()
+        self.addCleanup(clock.stop)
+        reset_response_cache()
+        self.addCleanup(reset_response_cache)
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = LLMResponseCache(max_entries=2, use_query_log=False)
+        cache.set('a', 'A')
+        cache.set('b', 'B')
+        self.assertEqual(cache.get('a'), 'A')  # 'b' is now the least recently used
+        cache.set('c', 'C')
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual((cache.get('a'), cache.get('c')), ('A', 'C'))
+        self.assertEqual((cache.hits, cache.misses), (3, 1))
+
+    def test_entries_expire(self):
+        cache = LLMResponseCache(ttl=60, use_query_log=False)
+        cache.set('a', 'A')
+        self.clock.return_value += 60
+        self.assertEqual(cache.get('a'), 'A')
+        self.clock.return_value += 1
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(len(cache), 0)
+
+    def test_query_log_fallback(self):
+        cache = LLMResponseCache(ttl=60)
+        with self.assertNumQueries(1):
+            self.assertEqual(cache.get(self.key), 'logged answer')
+        # The logged response is kept in memory from then on
+        with self.assertNumQueries(0):
+            self.assertEqual(cache.get(self.key), 'logged answer')
+
+        # Logged responses expire with the TTL as well
+        LLMQueryLog.objects.update(created_at=timezone.now() - timedelta(seconds=61))
+        self.clock.return_value += 61
+        self.assertIsNone(cache.get(self.key))
+        self.assertIsNone(LLMResponseCache(use_query_log=False).get(self.key))
+
+    def test_use_cache_false_skips_both_tiers(self):
+        cache = get_response_cache()
+        other_key = LLMQueryLog.make_cache_key(self.llm_model, 'other prompt')
+        cache.set(other_key, 'cached answer')
+        with mock.patch.object(llm_integration, '_call_provider', return_value='fresh answer') as call, \
+                self.assertNumQueries(0):
+            self.assertEqual(llm_integration.get_llm_response(self.llm_model, 'prompt', use_cache=False),
+                             'fresh answer')
+            self.assertEqual(llm_integration.get_llm_response(self.llm_model, 'other prompt', use_cache=False),
+                             'fresh answer')
+        self.assertEqual(call.call_count, 2)
+
+        with mock.patch.object(llm_integration, '_acall_provider', return_value='fresh answer') as acall:
+            self.assertEqual(asyncio.run(llm_integration.aget_llm_response(self.llm_model, 'prompt',
+                                                                           use_cache=False)), 'fresh answer')
+        acall.assert_called_once()
+        self.assertEqual((cache.hits, cache.misses), (0, 0))
+        # Nor is the cached response replaced
+        self.assertEqual(cache.get(other_key), 'cached answer')
+
+class AsyncEndpointTests(TestCase):
+    """
+    The async endpoints go through DRF's request handling, and async provider
+    clients live as long as their event loop.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        review = SystematicReview.objects.create(name='Async review')
+        cls.study = PrimaryStudy.objects.create(systematic_review=review, title='A study')
+        cls.url = reverse('primarystudy-evaluate', args=[cls.study.pk])
+
+    def test_request_parsing(self):
+        response = self.client.post(self.url, {'relevancy': 'H', 'evaluator': 'me'}, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['relevancy'], 'H')
+        # Form data is parsed the same way
+        self.assertEqual(self.client.post(self.url, {'relevancy': 'M'}).status_code, 201)
+
+        response = self.client.post(self.url, ['H'], content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.post(self.url, '{', content_type='application/json').status_code, 400)
+        self.assertEqual(self.client.post(reverse('primarystudy-evaluate', args=[0]), {}).status_code, 404)
+        self.assertEqual(self.client.get(self.url, HTTP_ACCEPT='application/json').status_code, 405)
+        self.assertContains(self.client.get(self.url, HTTP_ACCEPT='text/html'), 'Evaluate study', status_code=405)
+
+    def test_csrf_applies_to_session_users(self):
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(User.objects.create_user('reviewer'))
+        self.assertEqual(client.post(self.url, {'relevancy': 'H'}).status_code, 403)
+
+    def test_async_clients_are_closed_with_their_loop(self):
+        registry = llm_clients.ProviderClientRegistry()
+        llm_model = LLMModel(provider=LLMProvider(pk=1, name='Ollama'), model_name='llama3')
+
+        async def lookup():
+            client = registry.get_async_http_client(llm_model)
+            self.assertIs(registry.get_async_http_client(llm_model), client)
+            return client
+
+        first = asyncio.run(lookup())
+        self.assertTrue(first.is_closed)
+        second = asyncio.run(lookup())
+        self.assertIsNot(second, first)
+
+
+class ProviderGuardTests(TestCase):
+    """
+    Rate limiting, retries and the circuit breaker of llm_throttle.
+    """
+
+    def setUp(self):
+        clock = mock.patch.object(llm_throttle.time, 'monotonic', return_value=1000.0)
+        self.clock = clock.start()
+        self.addCleanup(clock.stop)
+
+    def test_token_bucket(self):
+        bucket = TokenBucket(rate=2.0, capacity=4)
+        self.assertEqual([bucket.reserve(2), bucket.reserve(2)], [0.0, 0.0])
+        self.assertEqual(bucket.reserve(1), 0.5)  # in debt: wait for the refill
+        self.clock.return_value += 1.5
+        self.assertEqual(bucket.reserve(2), 0.0)
+        self.assertEqual(bucket.reserve(10), 2.0)  # capped at the capacity
+
+    def test_completions_count_against_the_token_budget(self):
+        prompt = 'x' * 40  # estimated at 10 tokens
+        guard = ProviderGuard('together.ai', tokens_per_minute=600, completion_tokens=100)
+        # A call's max_tokens is reserved up front: two such calls use up the minute
+        self.assertEqual(guard.reserve(prompt, max_tokens=290), 0.0)
+        self.assertEqual(guard.reserve(prompt, max_tokens=290), 0.0)
+        self.assertEqual(guard.reserve(prompt, max_tokens=290), 30.0)
+
+        # Without one, COMPLETION_TOKENS is reserved and the reported usage settles the rest
+        guard = ProviderGuard('together.ai', tokens_per_minute=600, completion_tokens=100)
+        usage = {}
+
+        def long_answer():
+            usage.update(prompt_tokens=10, completion_tokens=490)
+            return 'answer'
+
+        self.assertEqual(guard.call(long_answer, prompt, usage=usage), 'answer')
+        self.assertEqual(guard.reserve(prompt), 1.0)  # 100 of 600 left for 110
+
+        # Unused reservations are given back
+        guard = ProviderGuard('together.ai', tokens_per_minute=600, completion_tokens=100)
+        usage = {}
+
+        def short_answer():
+            usage.update(prompt_tokens=10, completion_tokens=10)
+            return 'answer'
+
+        guard.call(short_answer, prompt, max_tokens=500, usage=usage)
+        self.assertEqual(guard.reserve(prompt, max_tokens=560), 0.0)
+        self.assertEqual(llm_throttle.completion_limit({'num_predict': 64}), 64)
+        self.assertIsNone(llm_throttle.completion_limit({'num_predict': -1}))
+
+    def test_retries(self):
+        guard = ProviderGuard('together.ai', max_retries=2, base_delay=0.0)
+        outcomes = [LLMTransientError('timed out'), LLMRateLimitError('slow down'), 'answer']
+
+        def func():
+            outcome = outcomes.pop(0)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+
+        retries = []
+        self.assertEqual(guard.call(func, 'prompt', on_retry=retries.append), 'answer')
+        self.assertEqual(retries, [1, 2])
+
+        calls = mock.Mock(side_effect=LLMTransientError('timed out'))
+        with self.assertRaises(LLMTransientError):
+            guard.call(calls, 'prompt')
+        self.assertEqual(calls.call_count, 3)
+
+        calls = mock.Mock(side_effect=LLMError('unknown model'))
+        with self.assertRaises(LLMError):
+            guard.call(calls, 'prompt')
+        self.assertEqual(calls.call_count, 1)
+
+    def test_rate_limits_do_not_open_the_circuit(self):
+        guard = ProviderGuard('together.ai', max_retries=5, base_delay=0.0, failure_threshold=2)
+        with self.assertRaises(LLMRateLimitError):
+            guard.call(mock.Mock(side_effect=LLMRateLimitError('slow down')), 'prompt')
+        self.assertEqual(guard.breaker.state, 'closed')
+
+    def test_circuit_breaker(self):
+        breaker = CircuitBreaker('Ollama', failure_threshold=2, reset_timeout=30)
+        guard = ProviderGuard('Ollama', max_retries=0)
+        guard.breaker = breaker
+        for _ in range(2):
+            with self.assertRaises(LLMTransientError):
+                guard.call(mock.Mock(side_effect=LLMTransientError('down')), 'prompt')
+        self.assertEqual(breaker.state, 'open')
+        calls = mock.Mock(return_value='answer')
+        with self.assertRaises(LLMCircuitOpenError):
+            guard.call(calls, 'prompt')
+        calls.assert_not_called()
+
+        # Half-open: one trial at a time; an unexpected error re-opens the circuit
+        self.clock.return_value += 30
+        self.assertEqual(breaker.state, 'half-open')
+        with self.assertRaises(ValueError):
+            guard.call(mock.Mock(side_effect=ValueError('bad payload')), 'prompt')
+        self.assertEqual(breaker.state, 'open')
+
+        self.clock.return_value += 30
+        breaker.before_call()
+        with self.assertRaises(LLMCircuitOpenError):
+            breaker.before_call()
+        breaker.release()  # e.g. the trial was rate limited
+        self.assertEqual(guard.call(calls, 'prompt'), 'answer')
+        self.assertEqual(breaker.state, 'closed')
+
+    @override_settings(SLRA_LLM_RETRY={'BASE_DELAY': 0.0, 'MAX_DELAY': 0.0})
+    def test_streams_go_through_the_guard(self):
+        reset_provider_guards()
+        self.addCleanup(reset_provider_guards)
+        self.addCleanup(llm_clients.reset_client_registry)
+        llm_model = LLMModel.objects.create(provider=LLMProvider.objects.create(name='Ollama'), model_name='llama3')
+        response = mock.Mock(**{'iter_lines.return_value': ['{"response": "Hi", "done": true}']})
+        failures = [requests.ConnectionError('refused')]
+
+        def post(*args, **kwargs):
+            if failures:
+                raise failures.pop()
+            return response
+
+        with mock.patch.object(requests.Session, 'post', side_effect=post) as sent:
+            self.assertEqual(''.join(llm_integration.stream_llm_response(llm_model, 'Say hi')), 'Hi')
+        self.assertEqual(sent.call_count, 2)
+
+
+class BatchResponseTests(TestCase):
+    """
+    get_llm_responses: one bounded pool per provider, results in input order,
+    progress reported from the calling thread.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.ollama = LLMModel.objects.create(provider=LLMProvider.objects.create(name='Ollama'),
+                                             model_name='llama3')
+        cls.together = LLMModel.objects.create(provider=LLMProvider.objects.create(name='together.ai'),
+                                               model_name='Llama-3.3-70B')
+
+    def test_providers_run_on_bounded_pools_in_input_order(self):
+        lock = threading.Lock()
+        in_flight, peak, threads = {}, {}, {}
+        # Both Ollama workers must be busy at once, or the barrier breaks
+        both_ollama_workers = threading.Barrier(2, timeout=5)
+
+        def respond(llm_model, prompt, use_cache=True):
+            name = llm_model.provider.name
+            with lock:
+                in_flight[name] = in_flight.get(name, 0) + 1
+                peak[name] = max(peak.get(name, 0), in_flight[name])
+                threads.setdefault(name, set()).add(threading.current_thread().name)
+            if name == 'Ollama' and prompt in ('o0', 'o1'):
+                both_ollama_workers.wait()
+            with lock:
+                in_flight[name] -= 1
+            return prompt.upper()
+
+        items = [(self.ollama if i % 2 else self.together, f"{'o' if i % 2 else 't'}{i // 2}") for i in range(12)]
+        progress = []
+        with mock.patch.object(llm_integration, 'get_llm_response', side_effect=respond):
+            results = llm_integration.get_llm_responses(
+                items, provider_concurrency={'ollama': 2},
+                progress_callback=lambda done, total, result: progress.append(
+                    (done, total, threading.current_thread() is threading.main_thread())),
+            )
+
+        self.assertTrue(all(result.ok for result in results))
+        self.assertEqual([result.index for result in results], list(range(12)))
+        self.assertEqual([result.response for result in results], [prompt.upper() for _, prompt in items])
+        self.assertEqual(peak['Ollama'], 2)
+        self.assertTrue(all(name.startswith('llm-Ollama') for name in threads['Ollama']))
+        self.assertTrue(all(name.startswith('llm-together.ai') for name in threads['together.ai']))
+        self.assertEqual(progress, [(done, 12, True) for done in range(1, 13)])
+
+    def test_progress_callback_errors_stop_the_batch(self):
+        calls = []
+        release = threading.Event()
+        self.addCleanup(release.set)
+
+        def respond(llm_model, prompt, use_cache=True):
+            calls.append(prompt)
+            if prompt != 'p0':
+                release.wait(0.2)
+            return prompt
+
+        def cancel(done, total, result):
+            raise jobs.JobCancelled()
+
+        with mock.patch.object(llm_integration, 'get_llm_response', side_effect=respond):
+            with self.assertRaises(jobs.JobCancelled):
+                llm_integration.get_llm_responses([(self.ollama, f'p{i}') for i in range(4)],
+                                                  provider_concurrency={'ollama': 1}, progress_callback=cancel)
+        # The queued items were cancelled
+        self.assertLess(len(calls), 4)
+
+
+@override_settings(SLRA_LLM_RETRY={'BASE_DELAY': 0.0, 'MAX_DELAY': 0.0},
+                   SLRA_LLM_PRICING={'llama-3.3': {'PROMPT': 1.0, 'COMPLETION': 2.0}})
+class LLMUsageTests(TestCase):
+    """
+    Wall time, tokens, retries, cache hits and cost recorded for LLM calls,
+    and their aggregation by /api/llm-usage/.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.review = SystematicReview.objects.create(name='Usage review')
+        provider = LLMProvider.objects.create(name='together.ai')
+        cls.llm_model = LLMModel.objects.create(provider=provider, model_name='Llama-3.3-70B')
+
+    def setUp(self):
+        reset_response_cache()
+        reset_provider_guards()
+        self.addCleanup(reset_response_cache)
+        self.addCleanup(reset_provider_guards)
+
+    def test_provider_call_stats(self):
+        calls = []
+
+        def provider(llm_model, prompt, stream=False, options=None, usage=None):
+            calls.append(prompt)
+            if len(calls) == 1:
+                raise LLMTransientError('timed out')
+            usage.update(prompt_tokens=1000, completion_tokens=500)
+            return 'answer'
+
+        with mock.patch.object(llm_integration, '_call_provider', side_effect=provider):
+            self.assertEqual(llm_integration.get_llm_response(self.llm_model, 'prompt'), 'answer')
+            stats = last_call_stats()
+            self.assertEqual((stats.retries, stats.prompt_tokens, stats.completion_tokens), (1, 1000, 500))
+            self.assertFalse(stats.tokens_estimated or stats.cache_hit)
+            self.assertAlmostEqual(stats.cost, 0.002)
+            self.assertGreaterEqual(stats.wall_time, 0)
+
+            # The same prompt again is a cache hit: nothing sent, no tokens or cost
+            llm_integration.get_llm_response(self.llm_model, 'prompt')
+            stats = last_call_stats()
+            self.assertEqual(len(calls), 2)
+            self.assertTrue(stats.cache_hit)
+            self.assertIsNone(stats.prompt_tokens)
+            self.assertIsNone(stats.cost)
+
+    def test_query_log_keeps_the_request_cache_key(self):
+        options = {'temperature': 0.0}
+        with mock.patch.object(llm_integration, '_call_provider', return_value='answer'):
+            llm_integration.get_llm_response(self.llm_model, 'prompt', options=options)
+        log = LLMQueryLog.objects.create(systematic_review=self.review, llm_model=self.llm_model, phase=1,
+                                         prompt_text='prompt', response_text='answer',
+                                         **llm_integration.last_call_stats().log_fields())
+        key = LLMQueryLog.make_cache_key(self.llm_model, 'prompt', options)
+        self.assertEqual(log.cache_key, key)
+
+        # A fresh process answers the same request from the logged response
+        reset_response_cache()
+        with mock.patch.object(llm_integration, '_call_provider') as call:
+            self.assertEqual(llm_integration.get_llm_response(self.llm_model, 'prompt', options=options), 'answer')
+        call.assert_not_called()
+
+        # Logs saved without a key get the option-less one, in a single extra query
+        log = LLMQueryLog(systematic_review=self.review, llm_model_id=self.llm_model.pk, phase=1, prompt_text='p')
+        with CaptureQueriesContext(connection) as queries:
+            log.save()
+        self.assertEqual(len([q for q in queries if 'FROM "slra_llm' in q['sql']]), 1)
+        self.assertEqual(log.cache_key, LLMQueryLog.make_cache_key(self.llm_model, 'p'))
+
+    def test_estimated_tokens(self):
+        with mock.patch.object(llm_integration, '_call_provider', return_value='a' * 400):
+            llm_integration.get_llm_response(self.llm_model, 'b' * 800, use_cache=False)
+        stats = last_call_stats()
+        self.assertTrue(stats.tokens_estimated)
+        self.assertGreater(stats.prompt_tokens, 0)
+        self.assertGreater(stats.completion_tokens, 0)
+
+    def test_stream_stats(self):
+        stream = llm_integration.LLMStream(iter([('Hel', None), ('lo', {'prompt_tokens': 3, 'completion_tokens': 2})]),
+                                           prompt='Say hello', model_name='llama3')
+        self.assertEqual(''.join(stream), 'Hello')
+        self.assertEqual((stream.call_stats.prompt_tokens, stream.call_stats.completion_tokens), (3, 2))
+        self.assertIsNotNone(stream.call_stats.time_to_first_token)
+        self.assertIsNone(stream.call_stats.cost)
+        self.assertIs(last_call_stats(), stream.call_stats)
+
+    def test_together_stream_errors(self):
+        request = httpx.Request('POST', 'https://api.together.xyz/v1/chat/completions')
+
+        def chunks():
+            yield mock.Mock(choices=[mock.Mock(delta=mock.Mock(content='Hel'))], usage=None)
+            raise together.APIConnectionError(request=request)
+
+        client = mock.Mock()
+        client.chat.completions.create.return_value = chunks()
+        stream = llm_integration.stream_together_ai('Llama-3.3-70B', 'Say hello', client=client)
+        self.assertEqual(next(stream), ('Hel', None))
+        with self.assertRaises(LLMTransientError):
+            next(stream)
+
+        client.chat.completions.create.side_effect = together.AuthenticationError(
+            'invalid key', response=httpx.Response(401, request=request), body=None)
+        with self.assertRaises(LLMError) as raised:
+            list(llm_integration.stream_together_ai('Llama-3.3-70B', 'Say hello', client=client))
+        self.assertNotIsInstance(raised.exception, LLMTransientError)
+
+    def test_usage_endpoint(self):
+        common = {'systematic_review': self.review, 'llm_model': self.llm_model, 'prompt_text': 'p'}
+        LLMQueryLog.objects.create(phase=1, wall_time=2.0, prompt_tokens=100, completion_tokens=50,
+                                   retries=2, cost=0.5, **common)
+        LLMQueryLog.objects.create(phase=1, wall_time=4.0, prompt_tokens=200, completion_tokens=150, cost=1.0,
+                                   **common)
+        LLMQueryLog.objects.create(phase=1, wall_time=0.001, cache_hit=True, **common)
+        LLMQueryLog.objects.create(phase=6, wall_time=1.0, prompt_tokens=10, completion_tokens=10,
+                                   tokens_estimated=True, **common)
+
+        response = self.client.get(reverse('llm-usage'), {'group_by': 'model,phase'},
+                                   HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 200)
+        rows = {row['phase']: row for row in response.json()['results']}
+        self.assertEqual(sorted(rows), [1, 6])
+        self.assertEqual((rows[1]['calls'], rows[1]['cache_hits'], rows[1]['total_retries']), (3, 1, 2))
+        self.assertEqual((rows[1]['total_tokens'], rows[1]['total_cost']), (500, 1.5))
+        self.assertEqual(rows[1]['avg_wall_time'], 3.0)  # cache hits don't count towards latency
+        self.assertEqual(rows[1]['completion_tokens_per_second'], 200 / 6.0)
+        self.assertEqual(rows[6]['estimated_calls'], 1)
+
+        response = self.client.get(reverse('llm-usage'), {'group_by': 'review', 'phase': 6},
+                                   HTTP_ACCEPT='application/json')
+        self.assertEqual(response.json()['results'][0]['calls'], 1)
+        self.assertEqual(self.client.get(reverse('llm-usage'), {'group_by': 'user'}).status_code, 400)
+
+
+class BulkEvaluationTests(TestCase):
+    """
+    POST /api/primary-studies/bulk-evaluate/: per-decision results, the
+    evaluate endpoint's H/M/L/X semantics, and a constant number of queries.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.review = SystematicReview.objects.create(name='Bulk evaluation review')
+        cls.studies = PrimaryStudy.objects.bulk_create(
+            PrimaryStudy(systematic_review=cls.review, title=f'Study {i}') for i in range(40)
+        )
+        if cls.studies[0].pk is None:  # backends without RETURNING
+            cls.studies = list(PrimaryStudy.objects.order_by('pk'))
+
+    def evaluate(self, payload):
+        return self.client.post(reverse('primarystudy-bulk-evaluate'), payload, content_type='application/json')
+
+    def test_decisions(self):
+        first, second, third = self.studies[:3]
+        response = self.evaluate({'evaluator': 'Alice', 'decisions': [
+            {'study': first.pk, 'relevancy': 'H'},
+            {'study': second.pk, 'relevancy': 'X', 'notes': 'Out of scope'},
+            {'study': third.pk, 'relevancy': 'Q'},
+            {'study': 0, 'relevancy': 'M'},
+            {'study': third.pk, 'relevancy': 'M', 'evaluator': 'Bob'},
+        ]})
+        self.assertEqual(response.status_code, 207)
+        body = response.json()
+        self.assertEqual((body['created'], body['failed']), (3, 2))
+        self.assertEqual([result['status'] for result in body['results']],
+                         ['created', 'created', 'error', 'error', 'created'])
+        self.assertIn('Invalid relevancy', body['results'][2]['error'])
+
+        levels = dict(PrimaryStudy.objects.filter(pk__in=[first.pk, second.pk, third.pk])
+                      .values_list('pk', 'relevancy_level'))
+        self.assertEqual(levels, {first.pk: 'H', second.pk: 'N', third.pk: 'M'})
+        self.assertEqual(sorted(RelevancyEvaluation.objects.values_list('evaluator', flat=True)),
+                         ['Alice', 'Alice', 'Bob'])
+
+        self.assertEqual(self.evaluate({'decisions': [{'study': 0, 'relevancy': 'H'}]}).status_code, 400)
+        self.assertEqual(self.evaluate({'decisions': []}).status_code, 400)
+
+    def test_query_count_does_not_grow(self):
+        def count_queries(studies):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.evaluate([{'study': study.pk, 'relevancy': 'L'} for study in studies])
+            self.assertEqual(response.status_code, 201)
+            return len(queries)
+
+        self.assertEqual(count_queries(self.studies[:5]), count_queries(self.studies[5:]))
+        self.assertEqual(PrimaryStudy.objects.filter(relevancy_level='L').count(), 40)
+
+
+class ScreeningTests(TestCase):
+    """
+    LLM screening: verdict parsing and a screening round with a fake LLM.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.review = SystematicReview.objects.create(name='Screening review')
+        cls.llm_model = LLMModel.objects.create(provider=LLMProvider.objects.create(name='Ollama'),
+                                                model_name='llama3')
+        cls.studies = [PrimaryStudy.objects.create(systematic_review=cls.review, title=f'Study {i}')
+                       for i in range(3)]
+
+    def test_parse_verdicts(self):
+        text = "\n".join([
+            "Here are my ratings:",
+            "[11] H - directly addresses RQ1",
+            "12: exclude (off-topic)",
+            "3. [13] Medium | partly relevant",
+            "ID 14 - low",
+            "[11] L - a second verdict is ignored",
+            "[99] H - not a study of the prompt",
+            "[15] maybe",
+        ])
+        self.assertEqual(screening.parse_verdicts(text, [11, 12, 13, 14, 15]), {
+            11: ('H', 'directly addresses RQ1'), 12: ('X', '(off-topic)'), 13: ('M', 'partly relevant'),
+            14: ('L', ''),
+        })
+        self.assertIsNone(screening.VERDICT_RE.match('[12] Highly relevant'))
+        self.assertEqual(screening.parse_verdicts(None, [11]), {})
+
+    def test_round(self):
+        first, second, third = self.studies
+        calls = []
+
+        def respond(items, use_cache=True):
+            calls.append(use_cache)
+            results = []
+            for index, (llm_model, prompt) in enumerate(items):
+                if use_cache and f"[{third.pk}]" in prompt:
+                    # An unparsable response served from the cache
+                    response, stats = 'I cannot rate these.', LLMCallStats(cache_hit=True)
+                else:
+                    response = "\n".join(f"[{pk}] H - relevant" for pk in (first.pk, second.pk, third.pk)
+                                         if f"[{pk}]" in prompt)
+                    stats = LLMCallStats()
+                results.append(llm_integration.LLMBatchResult(index, llm_model, prompt, response=response,
+                                                              stats=stats))
+            return results
+
+        with mock.patch.object(screening, 'get_llm_responses', side_effect=respond):
+            stats = screening.StudyScreener(self.review, self.llm_model, studies_per_prompt=2).run()
+        # The cached unparsable batch was asked again, uncached
+        self.assertEqual(calls, [True, False])
+        self.assertEqual((stats.prompts, stats.screened, stats.evaluated, stats.unparsed), (2, 3, 3, 0))
+        self.assertEqual(set(PrimaryStudy.objects.filter(systematic_review=self.review)
+                             .values_list('relevancy_level', flat=True)), {'H'})
+        self.assertEqual(LLMQueryLog.objects.filter(systematic_review=self.review, phase=6).count(), 2)
+        self.assertFalse(screening.pending_studies(self.review, screening.default_evaluator(self.llm_model)).exists())
+
+
+class EmbeddingTests(TestCase):
+    """
+    Study embeddings: incremental indexing, float16 storage and ranking helpers.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.review = SystematicReview.objects.create(name='Embedding review')
+        cls.studies = [PrimaryStudy.objects.create(systematic_review=cls.review, title=title)
+                       for title in ['Mutation testing', 'Flaky tests in CI', 'Code review bots']]
+
+    def test_changed_text_is_re_embedded(self):
+        embedder = embeddings.HashingEmbedder(64)
+        stats = embeddings.embed_studies(self.review, embedder, batch_size=2)
+        self.assertEqual((stats.embedded, stats.unchanged), (3, 0))
+        before = StudyEmbedding.objects.get(primary_study=self.studies[0])
+
+        PrimaryStudy.objects.filter(pk=self.studies[0].pk).update(abstract='Mutants of Java programs')
+        stats = embeddings.embed_studies(self.review, embedder, batch_size=2)
+        self.assertEqual((stats.embedded, stats.unchanged), (1, 2))
+        after = StudyEmbedding.objects.get(primary_study=self.studies[0])
+        self.assertEqual(after.pk, before.pk)
+        self.assertNotEqual(after.content_hash, before.content_hash)
+        self.assertGreaterEqual(after.updated_at, before.updated_at)
+        self.assertEqual(StudyEmbedding.objects.count(), 3)
+
+        matches = embeddings.rank_studies(self.review, embedder, query='mutation testing', k=1)
+        self.assertEqual([match.study_id for match in matches], [self.studies[0].pk])
+
+    def test_vector_helpers(self):
+        vectors = embeddings.normalize_rows(np.array([[3.0, 4.0], [1.0, 0.0], [0.0, 0.0]], dtype=np.float32))
+        matrix = embeddings.decode_vectors([embeddings.encode_vector(vector) for vector in vectors], 2)
+        self.assertEqual(matrix.dtype, np.float16)
+        np.testing.assert_allclose(matrix, vectors, atol=1e-3)
+        self.assertEqual(embeddings.decode_vectors([], 2).shape, (0, 2))
+
+        scores = embeddings.cosine_scores(matrix, np.array([[1.0, 0.0], [0.0, 1.0]]), block_size=2)
+        np.testing.assert_allclose(scores, [[0.6, 0.8], [1.0, 0.0], [0.0, 0.0]], atol=1e-3)
+        self.assertEqual(scores.dtype, np.float32)
+
+        self.assertEqual(list(embeddings.top_k(np.array([0.1, 0.9, 0.5, 0.9]), 3)), [1, 3, 2])
+        self.assertEqual(list(embeddings.top_k(np.array([0.1, 0.9]), 5)), [1, 0])
+        self.assertEqual(len(embeddings.top_k(np.array([0.1]), 0)), 0)
+
+
+class FakeCitationAdapter(LibraryAdapter):
+    """
+    Offline citation graph: REFERENCES maps a paper key to the keys it
+    cites; the DOI of key k is 10.1000/k. Keys starting with '~' are listed
+    without a DOI (matched by title only).
+    """
+    name = 'Fake Citations'
+    aliases = ('fakecitations',)
+    supports_snowballing = True
+    REFERENCES = {'a': ['b', 'x', 'y', '~c'], 'b': ['y', 'z'], 'w': ['a'], 'x': ['q']}
+
+    def related(self, doi, direction, max_results):
+        key = doi.rsplit('/', 1)[-1]
+        if direction == library_adapters.BACKWARD:
+            keys = self.REFERENCES.get(key, [])
+        else:
+            keys = [citing for citing, cited in self.REFERENCES.items() if key in cited]
+        return [SearchRecord(title=f"Paper {key.lstrip('~')}", doi='' if key.startswith('~') else f'10.1000/{key}')
+                for key in keys[:max_results]]
+
+
+@mock.patch.object(library_adapters, 'ADAPTERS', [FakeCitationAdapter, FakeLibraryAdapter])
+@override_settings(SLRA_SNOWBALLING={'LIBRARIES': ['Fake Citations'], 'WORKERS': 4})
+class SnowballingTests(TestCase):
+    """
+    Backward / forward snowballing from the included studies, deduplicated
+    against the review and written as studies plus citation edges.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.review = SystematicReview.objects.create(name='Snowballing review')
+        cls.a = PrimaryStudy.objects.create(systematic_review=cls.review, title='Paper a', doi='10.1000/a',
+                                            relevancy_level='H')
+        cls.b = PrimaryStudy.objects.create(systematic_review=cls.review, title='Paper b', doi='10.1000/b',
+                                            relevancy_level='M')
+        cls.c = PrimaryStudy.objects.create(systematic_review=cls.review, title='Paper c', doi='10.1000/c')
+
+    def edges(self):
+        titles = dict(PrimaryStudy.objects.values_list('pk', 'title'))
+        return {(titles[citing][-1], titles[cited][-1])
+                for citing, cited in CitationEdge.objects.values_list('citing_id', 'cited_id')}
+
+    def test_iteration(self):
+        [outcome] = snowballing.snowball(self.review)
+        self.assertEqual((outcome.seeds, outcome.requests, outcome.failed_requests), (2, 4, 0))
+        self.assertEqual(outcome.matched, 3)  # b and c (by title) in a's references, a citing b
+        self.assertEqual(len(outcome.new_studies), 4)
+        self.assertEqual(outcome.edges, 7)
+        self.assertEqual(self.edges(), {('a', 'b'), ('a', 'x'), ('a', 'y'), ('a', 'c'), ('w', 'a'),
+                                        ('b', 'y'), ('b', 'z')})
+        self.assertEqual(PrimaryStudy.objects.filter(source='Snowballing (Fake Citations)').count(), 4)
+
+        # Running again finds nothing new
+        [outcome] = snowballing.snowball(self.review)
+        self.assertEqual((len(outcome.new_studies), outcome.edges), (0, 0))
+
+    def test_breadth_limit(self):
+        engine = snowballing.SnowballingEngine(self.review, max_new_studies=2)
+        outcome = engine.iteration(engine.included_study_ids())
+        self.assertEqual((len(outcome.new_studies), outcome.dropped), (2, 2))
+        # y is cited by both seeds
+        self.assertIn('Paper y', PrimaryStudy.objects.filter(pk__in=outcome.new_studies).values_list('title', flat=True))
+
+    def test_job(self):
+        job = jobs.enqueue('snowballing', {'review_id': self.review.pk, 'iterations': 3}, review=self.review)
+        jobs.run_job(jobs.claim_next('test-worker'))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.SUCCEEDED)
+        # The second iteration expands x, y, z and w: only q is new; q cites nothing
+        self.assertEqual([item['new_studies'] for item in job.result['iterations']], [4, 1, 0])
+        self.assertIn(('x', 'q'), self.edges())
+        self.assertEqual(CitationEdge.objects.count(), 8)
+
+    def test_libraries_without_citations(self):
+        with self.assertRaises(LibrarySearchError):
+            snowballing.SnowballingEngine(self.review, libraries=['Fake Library'])
+
+
+class CitationGraphTests(TestCase):
+    """
+    CSR citation graph: scores, binary round trip, incremental updates and
+    the ordering of the studies API by centrality.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.review = SystematicReview.objects.create(name='Citation graph review')
+        cls.a, cls.b, cls.c, cls.d = [PrimaryStudy.objects.create(systematic_review=cls.review, title=f'Paper {name}')
+                                      for name in 'abcd']
+        CitationEdge.objects.bulk_create([
+            CitationEdge(systematic_review=cls.review, citing=citing, cited=cited)
+            for citing, cited in [(cls.a, cls.b), (cls.a, cls.c), (cls.b, cls.c), (cls.d, cls.c)]
+        ])
+
+    def test_scores(self):
+        # The duplicate edge and the self-citation are dropped
+        graph = CitationGraph.from_edges([5], [1, 1, 2, 4, 1, 3], [2, 3, 3, 3, 2, 3])
+        self.assertEqual((graph.node_count, graph.edge_count), (5, 4))
+        self.assertEqual(list(graph.in_degree()), [0, 1, 3, 0, 0])
+        self.assertEqual(list(graph.out_degree()), [2, 1, 0, 1, 0])
+        self.assertEqual(list(graph.co_citations()), [0, 1, 1, 0, 0])
+        pagerank = graph.pagerank()
+        self.assertAlmostEqual(pagerank.sum(), 1.0)
+        self.assertEqual(list(graph.study_ids[pagerank.argsort()[::-1][:2]]), [3, 2])
+
+        copy = CitationGraph.from_bytes(graph.to_bytes())
+        self.assertEqual(list(copy.study_ids), list(graph.study_ids))
+        self.assertEqual(list(copy.indptr), list(graph.indptr))
+        self.assertEqual(list(copy.indices), list(graph.indices))
+        data = bytearray(graph.to_bytes())
+        data[4] = 99  # format version
+        with self.assertRaises(ValueError):
+            CitationGraph.from_bytes(bytes(data))
+
+    def test_incremental_update(self):
+        update = update_citation_graph(self.review)
+        self.assertEqual((update.nodes, update.edges, update.new_edges, update.rebuilt), (4, 4, 4, True))
+        self.assertEqual(StudyCentrality.objects.get(pk=self.c.pk).in_degree, 3)
+
+        e = PrimaryStudy.objects.create(systematic_review=self.review, title='Paper e')
+        CitationEdge.objects.create(systematic_review=self.review, citing=e, cited=self.a)
+        update = update_citation_graph(self.review)
+        self.assertEqual((update.nodes, update.edges, update.new_edges, update.rebuilt), (5, 5, 1, False))
+        incremental = dict(StudyCentrality.objects.values_list('pk', 'pagerank'))
+        update_citation_graph(self.review, full=True)
+        for pk, pagerank in StudyCentrality.objects.values_list('pk', 'pagerank'):
+            self.assertAlmostEqual(incremental[pk], pagerank)
+        self.assertEqual(CitationGraphSnapshot.objects.get(systematic_review=self.review).node_count, 5)
+
+        # Removed edges are only seen by a rebuild
+        CitationEdge.objects.filter(citing=self.d).delete()
+        update = update_citation_graph(self.review)
+        self.assertEqual((update.edges, update.rebuilt), (4, True))
+
+    def test_api_ordering(self):
+        update_citation_graph(self.review)
+        url = reverse('primarystudy-list')
+        response = self.client.get(url, {'review': self.review.pk, 'ordering': '-pagerank'},
+                                   HTTP_ACCEPT='application/json')
+        results = response.json()['results']
+        self.assertEqual([study['id'] for study in results[:2]], [self.c.pk, self.b.pk])
+        self.assertEqual(results[0]['in_degree'], 3)
+        response = self.client.get(url, {'ordering': '-co_citations', 'page_size': 1}, HTTP_ACCEPT='application/json')
+        self.assertIn(response.json()['results'][0]['id'], [self.b.pk, self.c.pk])
+        self.assertIsNotNone(response.json()['next'])
+
+    def test_ordered_pages_keep_ties_and_nulls(self):
+        # Scores not computed yet (all 0) and NULL citations: every study is on exactly one page
+        PrimaryStudy.objects.filter(pk__in=[self.a.pk, self.b.pk]).update(citations=5)
+        url = reverse('primarystudy-list')
+        for ordering in ['-pagerank', 'citations', '-citations']:
+            with self.subTest(ordering=ordering):
+                seen, params = [], {'review': self.review.pk, 'ordering': ordering, 'page_size': 1}
+                while url and len(seen) < 10:
+                    data = self.client.get(url, params, HTTP_ACCEPT='application/json').json()
+                    seen += [study['id'] for study in data['results']]
+                    url, params = data['next'], None
+                url = reverse('primarystudy-list')
+                # Ties in primary key order, NULLs last
+                self.assertEqual(seen, [self.a.pk, self.b.pk, self.c.pk, self.d.pk])
+
+
+class ReviewStatisticsTests(TestCase):
+    """
+    Stored per-review counts: recomputed only after a change, grouped by
+    review, and served by /api/reviews/{id}/stats/ and the admin year filter.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.review = SystematicReview.objects.create(name='Statistics review')
+        cls.other = SystematicReview.objects.create(name='Other review')
+        cls.studies = [
+            PrimaryStudy.objects.create(systematic_review=cls.review, title=f'Study {year}', publication_year=year)
+            for year in (2019, 2020, 2020, None)
+        ]
+        PrimaryStudy.objects.create(systematic_review=cls.other, title='Other study', publication_year=2001)
+        RelevancyEvaluation.objects.create(primary_study=cls.studies[0], evaluator='Alice', relevancy='H')
+        provider = LLMProvider.objects.create(name='Ollama')
+        llm_model = LLMModel.objects.create(provider=provider, model_name='llama3')
+        LLMQueryLog.objects.create(systematic_review=cls.review, llm_model=llm_model, phase=6,
+                                   prompt_text='Prompt', response_text='Response')
+        query = SearchQuery.objects.create(systematic_review=cls.review, query_string='query')
+        library_search = DigitalLibrarySearch.objects.create(
+            search_query=query, library=DigitalLibrary.objects.create(name='arXiv'))
+        SearchResult.objects.create(library_search=library_search, title='Result', url='https://example.org/1')
+
+    def test_stats_endpoint(self):
+        url = reverse('systematicreview-stats', args=[self.review.pk])
+        data = self.client.get(url, HTTP_ACCEPT='application/json').json()
+        self.assertEqual(data['studies'], {'total': 4, 'by_relevancy': {'H': 0, 'M': 0, 'L': 0, 'N': 4},
+                                           'by_year': {'2019': 1, '2020': 2}})
+        self.assertEqual(data['evaluations'], {'total': 1, 'by_evaluator': {'Alice': 1}})
+        self.assertEqual(data['llm_calls'], {'total': 1, 'by_phase': {'6': 1}})
+        self.assertEqual(data['search_results'], {'total': 1, 'by_library': {'arXiv': 1}})
+
+        # Unchanged: read from the table (review + statistics), no counting
+        with self.assertNumQueries(2):
+            self.client.get(url, HTTP_ACCEPT='application/json')
+
+        # A single save marks the review changed; the next read recounts it
+        PrimaryStudy.objects.create(systematic_review=self.review, title='Study 2021', publication_year=2021)
+        data = self.client.get(url, HTTP_ACCEPT='application/json').json()
+        self.assertEqual(data['studies']['total'], 5)
+        self.assertEqual(data['studies']['by_year']['2021'], 1)
+
+    def test_bulk_writes_mark_changed(self):
+        review_stats.refresh()
+        self.assertFalse(ReviewStatistics.objects.filter(changed_at__gte=F('refreshed_at')).exists())
+        evaluations.bulk_evaluate([{'study': self.studies[1].pk, 'relevancy': 'M'}], evaluator='Bob')
+        self.assertEqual(review_stats.refresh_stale(), 1)  # only the evaluated study's review
+        stats = review_stats.get_statistics(self.review)
+        self.assertEqual(stats.studies_by_relevancy['M'], 1)
+        self.assertEqual(stats.evaluations_by_evaluator, {'Alice': 1, 'Bob': 1})
+
+    def test_refresh_is_grouped_by_review(self):
+        with self.assertNumQueries(7):  # review IDs, one query per histogram, the upsert
+            self.assertEqual(review_stats.refresh(), 2)
+        self.assertEqual(review_stats.publication_years(), [2001, 2019, 2020])
+        job = jobs.enqueue('review_stats', {'review_id': self.other.pk})
+        jobs.run_job(jobs.claim_next('test-worker'))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.result), (Job.SUCCEEDED, {'refreshed': 1}))
+
+    def test_year_filter_without_a_worker(self):
+        # No statistics yet: recounted on read
+        self.assertEqual(review_stats.publication_years(), [2001, 2019, 2020])
+        with self.assertNumQueries(1):
+            review_stats.publication_years()
+
+        # Deletes from the admin mark the reviews changed
+        user = User.objects.create_superuser('admin', 'admin@example.com', 'admin')
+        admin.site._registry[PrimaryStudy].delete_queryset(
+            mock.Mock(user=user), PrimaryStudy.objects.filter(publication_year=2020))
+        self.assertEqual(review_stats.publication_years(), [2001, 2019])
+
+        self.client.force_login(user)
+        response = self.client.get(reverse('admin:slra_primarystudy_changelist'))
+        year_filter = next(spec for spec in response.context['cl'].filter_specs
+                           if spec.parameter_name == 'publication_year')
+        self.assertEqual([value for value, _ in year_filter.lookup_choices], [2001, 2019])
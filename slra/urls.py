@@ -4,7 +4,8 @@ from .views import (
     SystematicReviewViewSet, ResearchQuestionViewSet, HypothesisKeywordViewSet,
     PrimaryStudyViewSet, SearchQueryViewSet, DigitalLibrarySearchViewSet,
     SearchResultViewSet, RelevancyEvaluationViewSet, LLMProviderViewSet,
-    LLMModelViewSet, LLMQueryLogViewSet
+    LLMModelViewSet, LLMQueryLogViewSet, JobViewSet,
+    evaluate_study, export_data, llm_usage, perform_library_search, send_prompt_to_llm, search
 )
 
 router = DefaultRouter()
@@ -20,7 +21,18 @@ router.register(r'relevancy-evaluations', RelevancyEvaluationViewSet, basename='
 router.register(r'llm-providers', LLMProviderViewSet, basename='llmprovider')
 router.register(r'llm-models', LLMModelViewSet, basename='llmmodel')
 router.register(r'llm-query-logs', LLMQueryLogViewSet, basename='llmquerylog')
+router.register(r'jobs', JobViewSet, basename='job')
 
 urlpatterns = [
+    # Async (long-running) endpoints, matched before the router
+    path('api/primary-studies/<int:pk>/evaluate/', evaluate_study, name='primarystudy-evaluate'),
+    path('api/search-queries/<int:pk>/search-libraries/', perform_library_search, name='searchquery-search-libraries'),
+    path('api/llm-query-logs/<int:pk>/send-prompt/', send_prompt_to_llm, name='llmquerylog-send-prompt'),
+    # Ranked full-text search
+    path('api/search/', search, name='search'),
+    # Streaming CSV / JSONL / Parquet exports
+    path('api/export/<str:dataset>/', export_data, name='export'),
+    # Token / cost / latency accounting of the logged LLM calls
+    path('api/llm-usage/', llm_usage, name='llm-usage'),
     path('api/', include(router.urls)),
 ]
\ No newline at end of file
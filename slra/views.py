@@ -1,27 +1,83 @@
-from rest_framework import viewsets, status
-from rest_framework.decorators import action
+import functools
+import json
+from collections.abc import Mapping
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import close_old_connections
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET
+from django.urls import reverse
+from rest_framework import mixins, viewsets, status
+from rest_framework.decorators import action, api_view
 from rest_framework.response import Response
 from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.views import APIView
 from django.shortcuts import get_object_or_404
 
 from .models import (
     SystematicReview, ResearchQuestion, HypothesisKeyword,
     PrimaryStudy, SearchQuery, DigitalLibrarySearch,
     SearchResult, RelevancyEvaluation, LLMProvider,
-    LLMModel, LLMQueryLog
+    LLMModel, LLMQueryLog, Job
 )
+from .services import embeddings, evaluations, exporters, jobs, review_stats
+from .services import llm_usage as usage_service
+from .services import search as search_service
+from .services.exceptions import LibrarySearchError, LLMError
+from .services.library_adapters import get_adapter_class, supported_libraries
+from .services.library_search import run_library_search
+from .services.llm_integration import aget_llm_response, astream_llm_response
 from .serializers import (
+    get_sparse_fieldset,
     SystematicReviewSerializer, ResearchQuestionSerializer, HypothesisKeywordSerializer,
     PrimaryStudySerializer, SearchQuerySerializer, DigitalLibrarySearchSerializer,
     SearchResultSerializer, RelevancyEvaluationSerializer, LLMProviderSerializer,
-    LLMModelSerializer, LLMQueryLogSerializer
+    LLMModelSerializer, LLMQueryLogSerializer, JobSerializer
 )
+from .pagination import OrderedPageNumberPagination, StableOrderingFilter
+
+
+# --------------------------------------------------------------------
+# Shared viewset behaviour
+# --------------------------------------------------------------------
+class SparseFieldsetMixin:
+    """
+    Loads only the columns a ?fields= / ?omit= request will serialize
+    (only()), so large text columns such as abstract or response_text are
+    not read from the database when they are not returned.
+    """
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        field_names = self.get_serializer_class()().fields
+        selected = get_sparse_fieldset(self.request, field_names)
+        if selected is None:
+            return queryset
+        concrete = {field.name for field in queryset.model._meta.concrete_fields}
+        return queryset.only('pk', *[name for name in selected if name in concrete])
+
+
+def _int_param(request, name: str):
+    """
+    Value of an integer query parameter (e.g. ?review=3), None when absent;
+    400 instead of a database error for anything but digits.
+    """
+    value = request.query_params.get(name, '')
+    if not value:
+        return None
+    if not value.isdigit():
+        raise ValidationError(f"{name} must be an integer.")
+    return int(value)
 
 
 # --------------------------------------------------------------------
 # SystematicReview (covers 5 of the 30 endpoints)
 # --------------------------------------------------------------------
-class SystematicReviewViewSet(viewsets.ModelViewSet):
+class SystematicReviewViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     """
     CRUD for Systematic Reviews.
     Endpoints:
@@ -34,11 +90,68 @@ class SystematicReviewViewSet(viewsets.ModelViewSet):
     queryset = SystematicReview.objects.all()
     serializer_class = SystematicReviewSerializer
 
+    @action(detail=True, methods=['get'], url_path='similar-studies')
+    def similar_studies(self, request, pk=None):
+        """
+        Ranks the review's studies by embedding similarity to its research
+        questions (or to ?q=free text), so screening can start with the
+        likely-relevant ones. Studies must be embedded first (embed_studies).
+        GET /api/reviews/{id}/similar-studies/?top_k=50&unevaluated=1&model=<llm model id>
+        - model: embedding LLMModel (default: local hashing embedder)
+        - unevaluated=1: skip studies that already have a relevancy evaluation
+        """
+        review = self.get_object()
+        params = request.query_params
+        try:
+            top_k = min(max(int(params.get('top_k', 50)), 1), 1000)
+        except ValueError:
+            raise ValidationError("top_k must be an integer.")
+
+        llm_model = None
+        if params.get('model'):
+            llm_model = get_object_or_404(LLMModel.objects.select_related('provider'), pk=params['model'])
+        try:
+            embedder = embeddings.get_embedder(llm_model)
+            exclude_ids = None
+            if _is_true(params.get('unevaluated')):
+                exclude_ids = RelevancyEvaluation.objects.filter(
+                    primary_study__systematic_review=review
+                ).values_list('primary_study_id', flat=True).distinct()
+            matches = embeddings.rank_studies(review, embedder, query=params.get('q'), k=top_k,
+                                              exclude_ids=exclude_ids)
+        except LLMError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_502_BAD_GATEWAY)
+
+        titles = dict(PrimaryStudy.objects.filter(pk__in=[m.study_id for m in matches]).values_list('pk', 'title'))
+        return Response({
+            'embedding_model': embedder.name,
+            **embeddings.embedded_counts(review, embedder.name),
+            'results': [
+                {'study': m.study_id, 'title': titles.get(m.study_id), 'score': round(m.score, 4),
+                 'research_question': m.question_id}
+                for m in matches
+            ],
+        })
+
+    @action(detail=True, methods=['get'])
+    def stats(self, request, pk=None):
+        """
+        Dashboard counts of the review from its stored statistics: studies per
+        relevancy level and year, evaluations per evaluator, LLM calls per
+        phase and search results per library. Recomputed (one grouped query
+        per count) only when the review changed since the last refresh.
+        GET /api/reviews/{id}/stats/?refresh=1   (refresh=1 forces a recount)
+        """
+        review = self.get_object()
+        if _is_true(request.query_params.get('refresh')):
+            review_stats.refresh([review.pk])
+        return Response(review_stats.as_dict(review_stats.get_statistics(review)))
+
 
 # --------------------------------------------------------------------
 # ResearchQuestion endpoints
 # --------------------------------------------------------------------
-class ResearchQuestionViewSet(viewsets.ModelViewSet):
+class ResearchQuestionViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     """
     Manage research questions within a systematic review.
     Endpoints:
@@ -65,7 +178,7 @@ class ResearchQuestionViewSet(viewsets.ModelViewSet):
 # --------------------------------------------------------------------
 # HypothesisKeyword endpoints
 # --------------------------------------------------------------------
-class HypothesisKeywordViewSet(viewsets.ModelViewSet):
+class HypothesisKeywordViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     """
     Manage hypothesis keywords for each review.
     """
@@ -76,44 +189,82 @@ class HypothesisKeywordViewSet(viewsets.ModelViewSet):
 # --------------------------------------------------------------------
 # PrimaryStudy endpoints
 # --------------------------------------------------------------------
-class PrimaryStudyViewSet(viewsets.ModelViewSet):
+class PrimaryStudyViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     """
     Manage primary studies collected for a systematic review.
+    POST /api/primary-studies/{pk}/evaluate/ is served by the async evaluate_study view below.
+    Citation graph scores (update_citation_graph) are returned with each study,
+    0 until computed, and can order the list to screen central studies first:
+    GET /api/primary-studies/?review=3&ordering=-pagerank
+    Ordered lists are paged by page number (&page=2) rather than by cursor.
     """
     queryset = PrimaryStudy.objects.all()
     serializer_class = PrimaryStudySerializer
+    filter_backends = [StableOrderingFilter]
+    ordering_fields = ('pagerank', 'in_degree', 'co_citations', 'citations', 'publication_year')
+    ordering = '-pk'
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            if StableOrderingFilter().orders_by_request(self.request, self):
+                self._paginator = OrderedPageNumberPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
+    def get_queryset(self):
+        queryset = super().get_queryset().annotate(
+            pagerank=Coalesce(F('centrality__pagerank'), Value(0.0)),
+            in_degree=Coalesce(F('centrality__in_degree'), Value(0)),
+            co_citations=Coalesce(F('centrality__co_citations'), Value(0)),
+        )
+        review_id = _int_param(self.request, 'review')
+        if review_id is not None:
+            queryset = queryset.filter(systematic_review=review_id)
+        return queryset
 
-    @action(detail=True, methods=['post'], url_path='evaluate')
-    def evaluate_study(self, request, pk=None):
+    @action(detail=False, methods=['post'], url_path='bulk-evaluate')
+    def bulk_evaluate(self, request):
         """
-        Custom endpoint to set relevancy (H/M/L/X) for a specific PrimaryStudy.
-        e.g., POST /api/primary-studies/{pk}/evaluate/ { "relevancy": "H" }
+        Sets the relevancy (H/M/L/X) of many studies in one transaction.
+        e.g., POST /api/primary-studies/bulk-evaluate/
+        {
+            "evaluator": "Alice",
+            "decisions": [
+                {"study": 12, "relevancy": "H"},
+                {"study": 13, "relevancy": "X", "notes": "Out of scope"}
+            ]
+        }
+        A bare list of decisions is accepted too. Returns one result per
+        decision, in order; invalid decisions are reported without stopping
+        the others (201 when all were recorded, 207 when some failed,
+        400 when none could be).
         """
-        study = self.get_object()  # Raises 404 if not found
-        relevancy = request.data.get('relevancy')
-
-        valid_choices = [c[0] for c in RelevancyEvaluation.RELEVANCY_CHOICES]
-        if relevancy not in valid_choices:
-            raise ValidationError(f"Invalid relevancy. Must be one of {valid_choices}.")
-
-        # Create a RelevancyEvaluation record
-        evaluation = RelevancyEvaluation.objects.create(
-            primary_study=study,
-            evaluator=request.data.get('evaluator', 'Unknown'),
-            relevancy=relevancy,
-            notes=request.data.get('notes', '')
-        )
-        # Also update the PrimaryStudy's relevancy_level if you wish
-        if relevancy == 'X':
-            study.relevancy_level = 'N'  # Or keep it as is
+        data = request.data
+        decisions = data.get('decisions') if isinstance(data, dict) else data
+        if not isinstance(decisions, list) or not decisions:
+            raise ValidationError("Give a non-empty list of decisions.")
+        evaluator = (data.get('evaluator') if isinstance(data, dict) else None) or 'Unknown'
+
+        outcomes = evaluations.bulk_evaluate(decisions, evaluator=evaluator)
+        results = []
+        for outcome in outcomes:
+            if outcome.ok:
+                results.append({'index': outcome.index, 'study': outcome.study_id, 'status': 'created',
+                                'evaluation': RelevancyEvaluationSerializer(outcome.evaluation).data})
+            else:
+                results.append({'index': outcome.index, 'study': outcome.study_id, 'status': 'error',
+                                'error': outcome.error})
+        created = sum(outcome.ok for outcome in outcomes)
+        if created == len(outcomes):
+            response_status = status.HTTP_201_CREATED
+        elif created:
+            response_status = status.HTTP_207_MULTI_STATUS
         else:
-            # If it's not excluded, set the study's main relevancy
-            # It's up to your business logic whether you do this or not
-            study.relevancy_level = relevancy
-        study.save()
-
-        serializer = RelevancyEvaluationSerializer(evaluation)
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+            response_status = status.HTTP_400_BAD_REQUEST
+        return Response({'created': created, 'failed': len(outcomes) - created, 'results': results},
+                        status=response_status)
 
     @action(detail=False, methods=['get'], url_path='quality-check')
     def perform_quality_check(self, request):
@@ -122,63 +273,29 @@ class PrimaryStudyViewSet(viewsets.ModelViewSet):
         GET /api/primary-studies/quality-check/
         """
         # Add your own logic: e.g., select only those with citations > 50
-        high_quality_studies = PrimaryStudy.objects.filter(citations__gt=50)
-        serializer = self.get_serializer(high_quality_studies, many=True)
-        return Response(serializer.data)
+        high_quality_studies = self.get_queryset().filter(citations__gt=50)
+        page = self.paginate_queryset(high_quality_studies)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
 
 
 # --------------------------------------------------------------------
 # SearchQuery endpoints
 # --------------------------------------------------------------------
-class SearchQueryViewSet(viewsets.ModelViewSet):
+class SearchQueryViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     """
     Manage search queries used in the systematic review.
+    POST /api/search-queries/{pk}/search-libraries/ is served by the async
+    perform_library_search view below.
     """
     queryset = SearchQuery.objects.all()
     serializer_class = SearchQuerySerializer
 
-    @action(detail=True, methods=['post'], url_path='search-libraries')
-    def perform_library_search(self, request, pk=None):
-        """
-        Custom endpoint to perform an actual search on external libraries
-        using the query_string. For demonstration only.
-        e.g., POST /api/search-queries/{pk}/search-libraries/
-        """
-        search_query = self.get_object()
-        # Pretend we search external libraries here...
-        # This is where you'd integrate with real external APIs (ACM, etc.).
-
-        library_name = request.data.get('library_name', 'Unknown Library')
-        # Let's pretend we found 10 results:
-        found_count = 10
-
-        # Create a DigitalLibrarySearch record
-        library_search = DigitalLibrarySearch.objects.create(
-            search_query=search_query,
-            library_name=library_name,
-            total_results_found=found_count
-        )
-
-        # Possibly create some SearchResult entries
-        # For demonstration, we just create a couple of dummy ones:
-        for i in range(1, 3):
-            SearchResult.objects.create(
-                library_search=library_search,
-                url=f"https://example.com/dummy-{i}",
-                title=f"Sample Title {i}",
-                authors="Doe, J; Roe, R",
-                abstract="A dummy abstract..."
-            )
-
-        # Return the newly created DigitalLibrarySearch and results
-        dl_serializer = DigitalLibrarySearchSerializer(library_search)
-        return Response(dl_serializer.data, status=status.HTTP_201_CREATED)
-
 
 # --------------------------------------------------------------------
 # DigitalLibrarySearch endpoints
 # --------------------------------------------------------------------
-class DigitalLibrarySearchViewSet(viewsets.ModelViewSet):
+class DigitalLibrarySearchViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     """
     Manage records of actual searches performed.
     """
@@ -189,7 +306,7 @@ class DigitalLibrarySearchViewSet(viewsets.ModelViewSet):
 # --------------------------------------------------------------------
 # SearchResult endpoints
 # --------------------------------------------------------------------
-class SearchResultViewSet(viewsets.ModelViewSet):
+class SearchResultViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     """
     Manage individual search results from digital libraries.
     """
@@ -200,7 +317,7 @@ class SearchResultViewSet(viewsets.ModelViewSet):
 # --------------------------------------------------------------------
 # RelevancyEvaluation endpoints
 # --------------------------------------------------------------------
-class RelevancyEvaluationViewSet(viewsets.ModelViewSet):
+class RelevancyEvaluationViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     """
     Manage explicit relevancy evaluations for each PrimaryStudy.
     """
@@ -211,41 +328,427 @@ class RelevancyEvaluationViewSet(viewsets.ModelViewSet):
 # --------------------------------------------------------------------
 # LLM Provider / Model / Query Log endpoints
 # --------------------------------------------------------------------
-class LLMProviderViewSet(viewsets.ModelViewSet):
+class LLMProviderViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     queryset = LLMProvider.objects.all()
     serializer_class = LLMProviderSerializer
 
 
-class LLMModelViewSet(viewsets.ModelViewSet):
+class LLMModelViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     queryset = LLMModel.objects.all()
     serializer_class = LLMModelSerializer
 
 
-class LLMQueryLogViewSet(viewsets.ModelViewSet):
+class LLMQueryLogViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
+    """
+    POST /api/llm-query-logs/{pk}/send-prompt/ is served by the async
+    send_prompt_to_llm view below.
+    """
     queryset = LLMQueryLog.objects.all()
     serializer_class = LLMQueryLogSerializer
 
-    @action(detail=True, methods=['post'], url_path='send-prompt')
-    def send_prompt_to_llm(self, request, pk=None):
-        """
-        Demonstration of sending a prompt to this LLM and storing the response.
-        e.g., POST /api/llm-query-logs/{pk}/send-prompt/
-        {
-            "prompt_override": "Some text to override the existing prompt..."
-        }
-        """
-        query_log = self.get_object()
-        # If the user wants to override the stored prompt:
-        prompt_text = request.data.get('prompt_override') or query_log.prompt_text
-        # Pretend we call the LLM provider's API or local inference here...
 
-        # Fake LLM response:
-        response_text = f"Simulated LLM response to prompt: {prompt_text[:50]}..."
+# --------------------------------------------------------------------
+# Background jobs
+# --------------------------------------------------------------------
+class JobViewSet(SparseFieldsetMixin, mixins.CreateModelMixin, mixins.RetrieveModelMixin,
+                 mixins.ListModelMixin, viewsets.GenericViewSet):
+    """
+    Long-running operations queued for the `run_jobs` worker.
+    Endpoints:
+      - list (GET)      -> /api/jobs/?status=running&review=1
+      - retrieve (GET)  -> /api/jobs/{id}/ (status, progress, message, result, error)
+      - create (POST)   -> /api/jobs/ { "kind": "screen_studies", "params": {...} } -> 202
+      - cancel (POST)   -> /api/jobs/{id}/cancel/
+    Kinds: library_search, send_prompt, generate_research_questions,
+    screen_studies, embed_studies, snowballing, citation_graph, review_stats
+    (see slra.services.jobs for their params).
+    """
+    queryset = Job.objects.all()
+    serializer_class = JobSerializer
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        params = self.request.query_params
+        if params.get('status'):
+            queryset = queryset.filter(status=params['status'])
+        review_id = _int_param(self.request, 'review')
+        if review_id is not None:
+            queryset = queryset.filter(systematic_review=review_id)
+        return queryset
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        job = jobs.enqueue(serializer.validated_data['kind'], serializer.validated_data.get('params'),
+                           review=serializer.validated_data.get('systematic_review'))
+        return Response(self.get_serializer(job).data, status=status.HTTP_202_ACCEPTED,
+                        headers={'Location': reverse('job-detail', args=[job.pk])})
+
+    @action(detail=True, methods=['post'])
+    def cancel(self, request, pk=None):
+        job = jobs.cancel(self.get_object())
+        return Response(self.get_serializer(job).data)
+
+
+# --------------------------------------------------------------------
+# Full-text search
+# --------------------------------------------------------------------
+SEARCH_SERIALIZERS = {
+    'studies': PrimaryStudySerializer,
+    'results': SearchResultSerializer,
+    'logs': LLMQueryLogSerializer,
+}
+
+
+@api_view(['GET'])
+def search(request):
+    """
+    Ranked full-text search (MySQL FULLTEXT or the local inverted index).
+    GET /api/search/?q=deep+learning&target=studies&review=1&limit=20
+    - target: studies (default), results or logs
+    - review: optional SystematicReview id
+    """
+    query = request.query_params.get('q', '').strip()
+    target = request.query_params.get('target', 'studies')
+    if not query:
+        raise ValidationError("Query parameter 'q' is required.")
+    if target not in SEARCH_SERIALIZERS:
+        raise ValidationError(f"Invalid target. Must be one of {sorted(SEARCH_SERIALIZERS)}.")
+
+    review, review_id = None, _int_param(request, 'review')
+    if review_id is not None:
+        review = get_object_or_404(SystematicReview, pk=review_id)
+    try:
+        limit = int(request.query_params.get('limit', 20))
+    except ValueError:
+        raise ValidationError("limit must be an integer.")
+
+    hits = search_service.search(target, query, review=review, limit=max(limit, 1))
+    serializer_class = SEARCH_SERIALIZERS[target]
+    results = [dict(serializer_class(hit.object, context={'request': request}).data, score=hit.score)
+               for hit in hits]
+    return Response({
+        'query': query,
+        'target': target,
+        'backend': 'fulltext' if search_service.uses_fulltext() else 'index',
+        'count': len(results),
+        'results': results,
+    })
+
+
+# --------------------------------------------------------------------
+# Streaming exports
+# --------------------------------------------------------------------
 
-        # Update the query log
-        query_log.response_text = response_text
-        query_log.save()
+@require_GET
+def export_data(request, dataset):
+    """
+    Streams a dataset as CSV, JSONL or Parquet, a few thousand rows at a time.
+    GET /api/export/studies/?format=csv&review=1
+    - dataset: studies, results, evaluations or logs
+    - format: csv (default), jsonl or parquet (needs pyarrow)
+    - review: optional SystematicReview id
+    A plain Django view because DRF reserves ?format= for its renderers.
+    """
+    export_format = request.GET.get('format', 'csv')
+    if dataset not in exporters.DATASETS:
+        return JsonResponse({'detail': f"Unknown dataset. Must be one of {sorted(exporters.DATASETS)}."},
+                            status=status.HTTP_404_NOT_FOUND)
+    if export_format not in exporters.FORMATS:
+        return JsonResponse({'detail': f"Invalid format. Must be one of {list(exporters.FORMATS)}."},
+                            status=status.HTTP_400_BAD_REQUEST)
+    review, review_id = None, request.GET.get('review', '')
+    if review_id:
+        review = SystematicReview.objects.filter(pk=review_id).first() if review_id.isdigit() else None
+        if review is None:
+            return JsonResponse({'detail': "No SystematicReview matches the given query."},
+                                status=status.HTTP_404_NOT_FOUND)
+    try:
+        chunks = exporters.stream_export(dataset, export_format, review=review)
+    except ImportError as e:
+        return JsonResponse({'detail': str(e)}, status=status.HTTP_501_NOT_IMPLEMENTED)
+
+    response = StreamingHttpResponse(chunks, content_type=exporters.CONTENT_TYPES[export_format])
+    filename = f"{dataset}-review-{review.pk}" if review else dataset
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{export_format}"'
+    return response
 
-        serializer = self.get_serializer(query_log)
-        return Response(serializer.data, status=status.HTTP_200_OK)
 
+# --------------------------------------------------------------------
+# LLM usage
+# --------------------------------------------------------------------
+
+@api_view(['GET'])
+def llm_usage(request):
+    """
+    Calls, cache hits, retries, tokens, cost and latency of the logged LLM calls.
+    GET /api/llm-usage/?group_by=review,model&review=1&phase=6
+    - group_by: comma-separated review, model and/or phase (default: all three)
+    - review, model, phase: optional filters
+    """
+    group_by = [key.strip() for key in request.query_params.get('group_by', 'review,model,phase').split(',')
+                if key.strip()]
+    queryset = LLMQueryLog.objects.all()
+    for param, lookup in (('review', 'systematic_review'), ('model', 'llm_model'), ('phase', 'phase')):
+        value = _int_param(request, param)
+        if value is not None:
+            queryset = queryset.filter(**{lookup: value})
+    try:
+        rows = usage_service.usage_summary(queryset, group_by)
+    except ValueError as e:
+        raise ValidationError(str(e))
+    return Response({'group_by': group_by, 'count': len(rows), 'results': rows})
+
+
+# --------------------------------------------------------------------
+# Async endpoints
+# --------------------------------------------------------------------
+# Long-running endpoints are async views so that, under ASGI, a request
+# waiting on an LLM or a digital library doesn't hold a worker thread.
+# They are routed in urls.py ahead of the router, at the same paths the
+# viewset actions used to have.
+
+def _request_data(request) -> Mapping:
+    """
+    The parsed request body (JSON or form data); 400 unless it is an object.
+    """
+    data = request.data
+    if not isinstance(data, Mapping):
+        raise ValidationError("Expected an object in the request body.")
+    return data
+
+
+def _is_true(value) -> bool:
+    return str(value).lower() in ('1', 'true', 'yes')
+
+
+def async_endpoint(view):
+    """
+    Runs an async view like a POST-only DRF APIView: parsers, authentication
+    and permissions (CSRF included for session auth), content negotiation,
+    exception handling and renderers (browsable API) all apply. The view gets
+    the DRF Request; the steps that may hit the database run in a thread.
+    """
+    class Endpoint(APIView):
+        http_method_names = ['post', 'options']
+
+        def get_view_name(self):
+            return view.__name__.replace('_', ' ').capitalize()
+
+    Endpoint.__doc__ = view.__doc__  # browsable API description
+
+    @csrf_exempt  # like APIView.as_view(); SessionAuthentication enforces CSRF
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        endpoint = Endpoint(args=args, kwargs=kwargs)
+        request = endpoint.initialize_request(request, *args, **kwargs)
+        endpoint.request = request
+        endpoint.headers = endpoint.default_response_headers
+        try:
+            await sync_to_async(endpoint.initial)(request, *args, **kwargs)
+            if request.method == 'POST':
+                response = await view(request, *args, **kwargs)
+            elif request.method == 'OPTIONS':
+                response = endpoint.options(request, *args, **kwargs)
+            else:
+                response = endpoint.http_method_not_allowed(request, *args, **kwargs)
+        except Exception as exc:
+            response = endpoint.handle_exception(exc)
+        response = endpoint.finalize_response(request, response, *args, **kwargs)
+        if isinstance(response, Response):
+            await sync_to_async(response.render)()
+        return response
+    return wrapper
+
+
+async def _aget_or_404(queryset, **lookup):
+    try:
+        return await queryset.aget(**lookup)
+    except ObjectDoesNotExist:
+        raise NotFound(f"No {queryset.model.__name__} matches the given query.")
+
+
+def _wants_background(request, data) -> bool:
+    return _is_true(data.get('background') or request.query_params.get('background'))
+
+
+def _run_library_search(*args, **kwargs):
+    """
+    run_library_search on a worker thread of its own. A search waits on its
+    libraries for as long as they take to answer, so it must not hold the
+    thread every other async view runs its ORM calls on. The worker's
+    connection is closed when it finishes, as at the end of a request.
+    """
+    try:
+        return run_library_search(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+async def _enqueue_job(kind, params, review_id=None):
+    """
+    Queues a job for the `run_jobs` worker and answers 202 Accepted with the
+    job; clients poll its Location (/api/jobs/{id}/) for progress.
+    """
+    job = await Job.objects.acreate(kind=kind, params=params, systematic_review_id=review_id)
+    return Response(JobSerializer(job).data, status=status.HTTP_202_ACCEPTED,
+                    headers={'Location': reverse('job-detail', args=[job.pk])})
+
+
+@async_endpoint
+async def evaluate_study(request, pk):
+    """
+    Custom endpoint to set relevancy (H/M/L/X) for a specific PrimaryStudy.
+    e.g., POST /api/primary-studies/{pk}/evaluate/ { "relevancy": "H" }
+    """
+    study = await _aget_or_404(PrimaryStudy.objects.all(), pk=pk)
+    data = _request_data(request)
+    relevancy = data.get('relevancy')
+
+    valid_choices = [c[0] for c in RelevancyEvaluation.RELEVANCY_CHOICES]
+    if relevancy not in valid_choices:
+        raise ValidationError(f"Invalid relevancy. Must be one of {valid_choices}.")
+
+    # Create a RelevancyEvaluation record
+    evaluation = await RelevancyEvaluation.objects.acreate(
+        primary_study=study,
+        evaluator=data.get('evaluator', 'Unknown'),
+        relevancy=relevancy,
+        notes=data.get('notes', '')
+    )
+    # Also update the PrimaryStudy's relevancy_level if you wish
+    if relevancy == 'X':
+        study.relevancy_level = 'N'  # Or keep it as is
+    else:
+        # If it's not excluded, set the study's main relevancy
+        study.relevancy_level = relevancy
+    await study.asave(update_fields=['relevancy_level'])
+
+    serializer = RelevancyEvaluationSerializer(evaluation)
+    return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+@async_endpoint
+async def perform_library_search(request, pk):
+    """
+    Searches digital libraries with the query_string, all libraries in
+    parallel, and stores a DigitalLibrarySearch with its SearchResults for each.
+    e.g., POST /api/search-queries/{pk}/search-libraries/
+    {
+        "libraries": ["arXiv", "Crossref", "OpenAlex"],   (or "library_name": "arXiv")
+        "max_results": 100,
+        "enrich": true,         (fetch landing pages for missing abstracts)
+        "incremental": false    (only results newer than the query's previous searches)
+    }
+    Results the query already has from a library are updated, not stored again.
+    With "background": true (or ?background=1) the search is queued as a
+    job and the response is 202 with the job (see /api/jobs/{id}/).
+    """
+    search_query = await _aget_or_404(SearchQuery.objects.all(), pk=pk)
+    data = _request_data(request)
+    libraries = data.get('libraries') or data.get('library_name') or []
+    if isinstance(libraries, str):
+        libraries = libraries.split(',')
+    libraries = [name.strip() for name in libraries if name.strip()]
+    if not libraries:
+        raise ValidationError(f"Give one or more libraries. Supported: {', '.join(supported_libraries())}.")
+    try:
+        for name in libraries:
+            get_adapter_class(name)
+        max_results = int(data['max_results']) if data.get('max_results') else None
+    except LibrarySearchError as e:
+        raise ValidationError(str(e))
+    except ValueError:
+        raise ValidationError("max_results must be an integer.")
+    enrich = _is_true(data.get('enrich', True))
+    incremental = _is_true(data.get('incremental', False))
+
+    if _wants_background(request, data):
+        params = {'search_query_id': search_query.pk, 'libraries': libraries,
+                  'max_results': max_results, 'enrich': enrich, 'incremental': incremental}
+        return await _enqueue_job('library_search', params, review_id=search_query.systematic_review_id)
+
+    outcomes = await sync_to_async(_run_library_search, thread_sensitive=False)(
+        search_query, libraries, max_results=max_results, enrich=enrich, incremental=incremental)
+    library_searches = [
+        dict(DigitalLibrarySearchSerializer(outcome.library_search).data,
+             results_stored=outcome.results, results_updated=outcome.updated, results_unchanged=outcome.unchanged,
+             enriched=outcome.enriched, error=outcome.error or None)
+        for outcome in outcomes
+    ]
+    any_ok = any(outcome.ok for outcome in outcomes)
+    return Response({'library_searches': library_searches},
+                    status=status.HTTP_201_CREATED if any_ok else status.HTTP_502_BAD_GATEWAY)
+
+
+@async_endpoint
+async def send_prompt_to_llm(request, pk):
+    """
+    Sends the stored (or overridden) prompt to this log's LLM model and stores the response.
+    e.g., POST /api/llm-query-logs/{pk}/send-prompt/
+    {
+        "prompt_override": "Some text to override the existing prompt...",
+        "stream": true
+    }
+    With "stream": true (or ?stream=1) the response is NDJSON, one
+    {"delta": "..."} object per generated chunk, ending with
+    {"done": true, "time_to_first_token": ..., "tokens_per_second": ...}.
+    With "background": true (or ?background=1) the call is queued as a job
+    and the response is 202 with the job (see /api/jobs/{id}/).
+    """
+    query_log = await _aget_or_404(
+        LLMQueryLog.objects.select_related('llm_model__provider'), pk=pk
+    )
+    if query_log.llm_model is None:
+        raise ValidationError("This query log has no LLM model to send the prompt to.")
+
+    data = _request_data(request)
+    # If the user wants to override the stored prompt:
+    prompt_text = data.get('prompt_override') or query_log.prompt_text
+
+    if _wants_background(request, data):
+        return await _enqueue_job('send_prompt', {'query_log_id': query_log.pk, 'prompt_override': prompt_text},
+                                  review_id=query_log.systematic_review_id)
+    if _is_true(data.get('stream') or request.query_params.get('stream')):
+        return await _stream_prompt(query_log, prompt_text)
+
+    try:
+        response_text = await aget_llm_response(query_log.llm_model, prompt_text)
+    except LLMError as e:
+        return Response({'detail': f"LLM call failed: {e}"}, status=status.HTTP_502_BAD_GATEWAY)
+
+    # Update the query log
+    query_log.prompt_text = prompt_text
+    query_log.response_text = response_text
+    usage_service.apply_stats(query_log, usage_service.last_call_stats())
+    await query_log.asave()
+
+    serializer = LLMQueryLogSerializer(query_log)
+    return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+async def _stream_prompt(query_log, prompt_text):
+    """
+    Streams text deltas to the client as NDJSON while they are generated,
+    then stores the full response on the query log.
+    """
+    llm_stream = await astream_llm_response(query_log.llm_model, prompt_text)
+
+    async def ndjson():
+        try:
+            async for delta in llm_stream:
+                yield json.dumps({'delta': delta}) + '\n'
+        except LLMError as e:
+            yield json.dumps({'done': True, 'error': str(e)}) + '\n'
+            return
+
+        query_log.prompt_text = prompt_text
+        query_log.response_text = llm_stream.text
+        usage_service.apply_stats(query_log, llm_stream.call_stats)
+        await query_log.asave()
+        yield json.dumps({'done': True, 'id': query_log.pk, **llm_stream.stats()}) + '\n'
+
+    response = StreamingHttpResponse(ndjson(), content_type='application/x-ndjson')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # don't let nginx buffer the stream
+    return response
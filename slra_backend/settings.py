@@ -72,11 +72,187 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'slra_backend.wsgi.application'
 
+# Served under ASGI (e.g. `uvicorn slra_backend.asgi:application`) the async
+# endpoints in slra.views don't hold a worker thread while waiting on LLMs.
+ASGI_APPLICATION = 'slra_backend.asgi.application'
+
 REST_FRAMEWORK = {
     'DEFAULT_RENDERER_CLASSES': [
         'rest_framework.renderers.JSONRenderer',
         'rest_framework.renderers.BrowsableAPIRenderer',
-    ]
+    ],
+    # Cursor pages keyed on the primary key (slra.pagination); ?page_size= up to 500
+    'DEFAULT_PAGINATION_CLASS': 'slra.pagination.PrimaryKeyCursorPagination',
+    'PAGE_SIZE': 50,
+}
+
+# LLM provider clients (slra.services.llm_clients)
+# Pooled keep-alive connections / SDK clients reused for the life of the process.
+
+SLRA_LLM_CLIENTS = {
+    'POOL_CONNECTIONS': 10,   # keep-alive connections per host
+    'POOL_MAXSIZE': 20,       # max simultaneous connections per provider
+    'IDLE_TIMEOUT': 300,      # seconds before an unused client is closed
+    'REQUEST_TIMEOUT': 300,   # per-request timeout (seconds)
+}
+
+# Batch LLM execution (slra.services.llm_integration.get_llm_responses)
+
+SLRA_LLM_BATCH = {
+    'MAX_WORKERS': 8,         # upper bound of worker threads per provider
+    'PROVIDER_CONCURRENCY': { # in-flight calls per provider (matched by name)
+        'ollama': 2,
+        'together': 8,
+    },
+}
+
+# LLM response cache (slra.services.llm_cache)
+# In-process LRU in front of the LLMQueryLog.cache_key lookup.
+
+SLRA_LLM_CACHE = {
+    'ENABLED': True,
+    'MAX_ENTRIES': 1024,           # in-process LRU size
+    'TTL': 60 * 60 * 24 * 30,      # seconds; None = never expire
+    'USE_QUERY_LOG': True,         # reuse responses already logged in LLMQueryLog
+}
+
+# LLM rate limits, retries and circuit breaker (slra.services.llm_throttle)
+# Rate limits are per provider, matched by name; unlisted providers are unlimited.
+# A call reserves its prompt and its max_tokens against TOKENS_PER_MINUTE
+# (COMPLETION_TOKENS when it sets none); the reported usage settles the rest.
+
+SLRA_LLM_RATE_LIMITS = {
+    'together': {
+        'REQUESTS_PER_MINUTE': 600,
+        'TOKENS_PER_MINUTE': 180000,
+        'COMPLETION_TOKENS': 512,
+    },
+}
+
+SLRA_LLM_RETRY = {
+    'MAX_RETRIES': 4,                  # retries for timeouts, 5xx and 429
+    'BASE_DELAY': 1.0,                 # seconds; doubled per attempt, jittered
+    'MAX_DELAY': 60.0,                 # cap for backoff and Retry-After
+    'CIRCUIT_FAILURE_THRESHOLD': 5,    # consecutive failures that open the circuit
+    'CIRCUIT_RESET_TIMEOUT': 30.0,     # seconds before a trial call is allowed
+}
+
+# LLM call prices (slra.services.llm_usage, LLMQueryLog.cost and /api/llm-usage/)
+# USD per million tokens, matched against the model name; unlisted models get no cost.
+
+SLRA_LLM_PRICING = {
+    # 'Llama-3.3-70B': {'PROMPT': 0.88, 'COMPLETION': 0.88},
+}
+
+# LLM relevancy screening (slra.services.screening, `manage.py screen_studies`)
+
+SLRA_SCREENING = {
+    'STUDIES_PER_PROMPT': 10,      # abstracts packed into one prompt
+    'PROMPTS_PER_ROUND': 16,       # concurrent prompts per checkpointed round
+    'MAX_ABSTRACT_CHARS': 1500,    # longer abstracts are truncated
+}
+
+# Study / research question embeddings (slra.services.embeddings, `manage.py embed_studies`)
+# Without an LLM model, a local hashing embedder is used.
+
+SLRA_EMBEDDINGS = {
+    'HASHING_DIMENSIONS': 1024,    # local embedder vector size
+    'BATCH_SIZE': 64,              # texts per embedding request
+    'MAX_TEXT_CHARS': 4000,        # title + abstract characters embedded
+}
+
+# Full-text search (slra.services.search, /api/search/ and the admin search box)
+# MySQL uses the FULLTEXT indexes from migration 0006; other databases use a
+# local inverted index (rebuild with `manage.py rebuild_search_index`).
+
+SLRA_SEARCH = {
+    'BACKEND': 'auto',        # 'auto', 'fulltext' (MySQL) or 'index'
+    'MAX_RESULTS': 100,       # upper bound for one /api/search/ page
+    'INDEX_BATCH_SIZE': 1000,
+}
+
+# Digital library searches (slra.services.library_search, `manage.py perform_library_search`)
+# Libraries are matched by DigitalLibrary name: arXiv, Crossref, OpenAlex,
+# Semantic Scholar, Google Scholar (needs the optional `scholarly` package).
+
+SLRA_LIBRARY_SEARCH = {
+    'MAX_RESULTS': 100,            # results per library and search
+    'ENRICH_WORKERS': 8,           # threads fetching landing pages for missing abstracts
+    'DEFAULT_HOST_CONCURRENCY': 4, # simultaneous requests per host
+    'HOST_CONCURRENCY': {
+        'export.arxiv.org': 1,
+        'api.semanticscholar.org': 1,
+        'scholar.google.com': 1,
+    },
+    'HOST_MIN_INTERVAL': {         # seconds between requests to a host
+        'export.arxiv.org': 3.0,
+        'api.semanticscholar.org': 1.0,
+    },
+    'REQUEST_TIMEOUT': 30,
+    'MAILTO': '',                  # contact address for the Crossref / OpenAlex polite pools
+    'HTML_PARSER': 'auto',         # abstract extraction: 'auto', 'selectolax', 'lxml' or 'bs4'
+    'INCREMENTAL_OVERLAP_DAYS': 30,  # incremental re-searches look this far behind the previous search
+}
+
+# On-disk cache of digital library responses (slra.services.http_cache, `manage.py http_cache`)
+# Stale entries are revalidated with ETag / Last-Modified; OFFLINE serves
+# everything from the cache (recorded fixtures) and never hits the network.
+
+SLRA_HTTP_CACHE = {
+    'ENABLED': True,
+    'PATH': BASE_DIR / 'http_cache.sqlite3',
+    'MAX_SIZE': 512 * 1024 * 1024,     # bytes of compressed bodies; LRU eviction beyond
+    'DEFAULT_TTL': 60 * 60 * 24 * 7,   # seconds, unless the response sets max-age / Expires
+    'LISTING_TTL': 60 * 5,             # at most, for search result pages (new publications show up there)
+    'OFFLINE': False,
+}
+
+# Streaming exports (slra.services.exporters, /api/export/<dataset>/, `manage.py export_data`)
+# Parquet needs the optional `pyarrow` package.
+
+SLRA_EXPORT = {
+    'BATCH_SIZE': 2000,           # rows fetched per query
+    'ROW_GROUP_SIZE': 20000,      # rows buffered per Parquet row group
+}
+
+# Snowballing (slra.services.snowballing, `manage.py snowball_studies`, admin action)
+# Reference / citation lists come from OpenAlex and Semantic Scholar.
+
+SLRA_SNOWBALLING = {
+    'LIBRARIES': ['OpenAlex', 'Semantic Scholar'],
+    'DIRECTION': 'both',          # 'backward' (references), 'forward' (citations) or 'both'
+    'ITERATIONS': 1,
+    'MAX_RELATED': 200,           # references / citations per study, library and direction
+    'MAX_NEW_STUDIES': 5000,      # breadth limit per iteration, best connected first
+    'WORKERS': 8,                 # threads fetching lists (per-host limits still apply)
+}
+
+# Citation graph (slra.services.citation_graph, `manage.py update_citation_graph`)
+# CSR graph of the citation edges per review; PageRank / degree / co-citation
+# scores order /api/primary-studies/?ordering=-pagerank.
+
+SLRA_CITATION_GRAPH = {
+    'DAMPING': 0.85,          # PageRank damping factor
+    'MAX_ITERATIONS': 100,    # power iterations at most ...
+    'TOLERANCE': 1e-10,       # ... or until the L1 change is below this
+}
+
+# Review statistics (slra.services.review_stats, /api/reviews/{id}/stats/, admin filters)
+# Refreshed by `run_jobs` workers; single saves mark a review changed, deletes wait for MAX_AGE.
+
+SLRA_REVIEW_STATS = {
+    'REFRESH_INTERVAL': 60,   # seconds between refreshes of the changed reviews
+    'MAX_AGE': 3600,          # seconds before statistics are recomputed without a recorded change
+}
+
+# Background jobs (slra.services.jobs, `manage.py run_jobs`, /api/jobs/)
+
+SLRA_JOBS = {
+    'WORKERS': 4,             # jobs run concurrently per run_jobs process
+    'POLL_INTERVAL': 2.0,     # seconds between queue polls when idle
+    'MAX_ATTEMPTS': 3,        # runs of a failing job before it is marked failed
+    'RETRY_DELAY': 30,        # seconds (times the attempt number) before a retry
+    'STALE_AFTER': 900,       # seconds without heartbeat before a running job is requeued
 }
 
 # Database